@@ -171,6 +171,9 @@ class AlbumElement(models.Model):
 
     class Meta:
         ordering = ['position']
+        indexes = [
+            models.Index(fields=['album', 'position'], name='albumelement_album_pos_idx'),
+        ]
 
     def __str__(self):
         # Return a human-readable reference indicating which type of item is linked
@@ -6,7 +6,7 @@ from .models import Album, AlbumElement
 from main.utils import generate_unique_slug
 from media.models import MediaItem, MediaItemVersion
 from social.utils import user_has_liked
-from media.utils.media_file import get_media_file_for_display, is_media_locked
+from media.utils.media_file import get_media_file_for_display, get_media_rendition, is_media_locked
 from posts.serializers import PostSerializer
 from media.serializers import MediaItemSerializer, TileInfoMixin
 
@@ -117,6 +117,9 @@ class AlbumDetailSerializer(TileInfoMixin, serializers.ModelSerializer):
         ).count()
 
     def get_has_liked(self, obj):
+        liked_album_ids = self.context.get('liked_album_ids')
+        if liked_album_ids is not None:
+            return obj.pk in liked_album_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return user_has_liked(request.user, album=obj)
@@ -152,7 +155,7 @@ class AlbumDetailSerializer(TileInfoMixin, serializers.ModelSerializer):
     def get_featured_image_dimensions(self, obj):
         if not obj.featured_item:
             return None
-        thumbnail = obj.featured_item.versions.filter(version_type=MediaItemVersion.THUMBNAIL).first()
+        thumbnail = get_media_rendition(obj.featured_item, MediaItemVersion.THUMBNAIL)
         if thumbnail and thumbnail.width and thumbnail.height:
             return (thumbnail.width, thumbnail.height)
         return None
@@ -19,9 +19,11 @@ from .serializers import (
 )
 from .permissions import IsAlbumOwnerOrAdminOrPublicRead
 from main.pagination import StandardResultsSetPagination
+from social.like_state import ALBUM
+from social.mixins import LikedIdsContextMixin
 
 
-class AlbumListView(generics.ListAPIView):
+class AlbumListView(LikedIdsContextMixin, generics.ListAPIView):
     """
     GET /api/albums/
     Returns a paginated list of 'public' albums using AlbumListSerializer.
@@ -29,6 +31,7 @@ class AlbumListView(generics.ListAPIView):
     serializer_class = AlbumDetailSerializer
     permission_classes = [AllowAny]
     pagination_class = StandardResultsSetPagination
+    like_target_type = ALBUM
 
     def get_queryset(self):
         # Example filter: only show PUBLISHED albums
@@ -37,7 +40,7 @@ class AlbumListView(generics.ListAPIView):
 
 # --- 1. MyAlbumsView ---
 
-class MyAlbumsView(generics.ListAPIView):
+class MyAlbumsView(LikedIdsContextMixin, generics.ListAPIView):
     """
     GET /api/albums/mine/
     Returns current user’s albums. If none exist, auto-create
@@ -46,6 +49,7 @@ class MyAlbumsView(generics.ListAPIView):
     serializer_class = MyAlbumSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    like_target_type = ALBUM
 
     def get_queryset(self):
         user = self.request.user
@@ -61,7 +65,7 @@ class MyAlbumsView(generics.ListAPIView):
             user_albums = Album.objects.filter(owner=user)
         return user_albums
 
-class MyAlbumsLatestView(generics.ListAPIView):
+class MyAlbumsLatestView(LikedIdsContextMixin, generics.ListAPIView):
     """
     GET /api/albums/mine/latest/
     Returns current user's albums ordered by latest modification.
@@ -70,6 +74,7 @@ class MyAlbumsLatestView(generics.ListAPIView):
     serializer_class = AlbumDetailSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = None
+    like_target_type = ALBUM
 
     def get_queryset(self):
         user = self.request.user
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from django.db import transaction
+        from django.db.models.signals import post_delete, post_save
+        from main.models import Setting
+        from main.providers.settings_provider import SettingsProvider
+
+        def invalidate_settings(sender, **kwargs):
+            SettingsProvider.invalidate()
+            transaction.on_commit(SettingsProvider.invalidate)
+
+        post_save.connect(invalidate_settings, sender=Setting, weak=False, dispatch_uid="settings-provider-save")
+        post_delete.connect(invalidate_settings, sender=Setting, weak=False, dispatch_uid="settings-provider-delete")
@@ -0,0 +1,198 @@
+# main/cache.py
+"""
+Cache-aside helpers on top of Django's default cache.
+
+- Keys are namespaced and versioned: invalidating a namespace bumps its version,
+  which orphans every key written under the previous one (they expire by TTL).
+- get_or_set() protects loaders against stampedes with a single-flight lock:
+  on a miss only one caller runs the loader, concurrent callers wait for its result.
+- invalidate_on_change() wires a namespace to post_save/post_delete of models.
+- Hits and misses are counted per namespace in the cache itself, so the numbers
+  are shared by all processes (see get_cache_stats() / the cache_stats command).
+- When the cache is down (django-redis with IGNORE_EXCEPTIONS turns errors into
+  misses), get_or_set() simply calls the loader.
+"""
+
+import functools
+import hashlib
+import logging
+import re
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "pv"
+DEFAULT_TTL = 5 * 60
+
+# Single-flight lock: how long a loader may hold it, and how long others wait for it.
+LOCK_TTL = 30
+LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+
+# Namespaces used across the project.
+TERMS_NAMESPACE = "taxonomy:terms"
+REJECTION_REASONS_NAMESPACE = "moderation:rejection_reasons"
+MEMBERSHIP_PLANS_NAMESPACE = "memberships:plans"
+FEATURED_POSTS_NAMESPACE = "posts:featured"
+SETTINGS_NAMESPACE = "main:settings"
+PAGINATION_COUNTS_NAMESPACE = "pagination:counts"
+
+# Key parts made only of these characters are used verbatim; anything else is hashed
+# so keys stay valid for every backend (no spaces/control characters, bounded length).
+_SAFE_KEY_PART = re.compile(r"^[\w.:/=-]{0,100}$")
+
+_MISSING = object()
+_namespaces = set()
+
+
+def _version_key(namespace):
+    return f"{KEY_PREFIX}:ns:{namespace}:version"
+
+
+def _stats_key(namespace, outcome):
+    return f"{KEY_PREFIX}:stats:{namespace}:{outcome}"
+
+
+def _initial_version():
+    # Time-based, so a version key lost to eviction never restarts at a version
+    # whose keys may still be cached.
+    return int(time.time() * 1000)
+
+
+def get_namespace_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def make_key(namespace, *parts):
+    """
+    Builds the versioned cache key for a namespace and key parts.
+    """
+    _namespaces.add(namespace)
+    suffix = ":".join(str(part) for part in parts)
+    if not _SAFE_KEY_PART.match(suffix):
+        suffix = hashlib.md5(suffix.encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{namespace}:v{get_namespace_version(namespace)}:{suffix}"
+
+
+def _count(namespace, outcome):
+    key = _stats_key(namespace, outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The counter vanished between add() and incr(); losing one sample is fine.
+            pass
+
+
+def get_or_set(namespace, key_parts, loader, ttl=DEFAULT_TTL):
+    """
+    Returns the cached value for (namespace, key_parts), calling loader() on a miss.
+    Only one caller at a time runs the loader for a given key; the others wait up
+    to LOCK_WAIT seconds for its result before falling back to loading themselves.
+    """
+    key = make_key(namespace, *key_parts)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(namespace, "hits")
+        return value
+    _count(namespace, "misses")
+
+    lock_key = f"{key}:lock"
+    acquired = cache.add(lock_key, 1, timeout=LOCK_TTL)
+    if acquired is None:
+        # django-redis returns None instead of a bool when it ignored a connection
+        # error: nobody can hold the lock, so do not wait for one.
+        return loader()
+    if acquired:
+        try:
+            value = loader()
+            cache.set(key, value, timeout=ttl)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    logger.warning("get_or_set: gave up waiting for %s, loading without the lock", key)
+    return loader()
+
+
+def cached(namespace, ttl=DEFAULT_TTL, key=None):
+    """
+    Decorator form of get_or_set(). `key` maps the call arguments to the key parts;
+    by default the positional and keyword arguments are used as they are.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if key is not None:
+                key_parts = key(*args, **kwargs)
+            else:
+                key_parts = (func.__name__,) + args + tuple(f"{k}={v}" for k, v in sorted(kwargs.items()))
+            return get_or_set(namespace, key_parts, lambda: func(*args, **kwargs), ttl=ttl)
+        return wrapper
+    return decorator
+
+
+def invalidate_namespace(namespace):
+    """
+    Invalidates every key of a namespace by bumping its version.
+    """
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+    logger.debug("invalidate_namespace: %s", namespace)
+
+
+def invalidate_on_change(namespace, *models):
+    """
+    Invalidates a namespace whenever an instance of one of the models is saved or
+    deleted. The namespace is bumped immediately and again once the surrounding
+    transaction commits, so concurrent readers cannot re-cache pre-commit data.
+    """
+    _namespaces.add(namespace)
+
+    def receiver(sender, **kwargs):
+        invalidate_namespace(namespace)
+        transaction.on_commit(lambda: invalidate_namespace(namespace))
+
+    for model in models:
+        uid = f"cache-invalidate:{namespace}:{model._meta.label}"
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f"{uid}:save")
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f"{uid}:delete")
+
+
+def get_cache_stats(namespaces=None):
+    """
+    Returns {namespace: {"hits": int, "misses": int, "hit_ratio": float | None}}.
+    """
+    stats = {}
+    for namespace in sorted(namespaces or _namespaces):
+        hits = cache.get(_stats_key(namespace, "hits"), 0)
+        misses = cache.get(_stats_key(namespace, "misses"), 0)
+        total = hits + misses
+        stats[namespace] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def reset_cache_stats(namespaces=None):
+    for namespace in namespaces or _namespaces:
+        cache.delete_many([_stats_key(namespace, "hits"), _stats_key(namespace, "misses")])
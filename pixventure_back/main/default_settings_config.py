@@ -28,4 +28,62 @@ DEFAULT_SETTINGS = {
     "full_watermarked_version_quality": -1, 
     # Same
     "preview_video_quality": -1,
+    # Encoding profile (a key of VIDEO_ENCODING_PROFILES) of each video rendition;
+    # the quality settings above, when not -1, override the profile's CRF
+    "watermarked_video_profile": "capped_crf",
+    "preview_video_profile": "capped_crf",
+    # Videos at least this long (seconds) have their watermarked version encoded in
+    # parallel segments; 0 disables segmented encoding
+    "video_segmented_min_duration": 600,
+    # Number of segments (and concurrent ffmpeg processes); 0 for one per CPU
+    "video_encode_segments": 0,
+    # Items whose phashes (64 bits) differ by at most this many bits are clustered
+    # as duplicates; 0 only clusters identical hashes
+    "duplicate_hamming_threshold": 6,
+}
+
+# Named video encoding profiles, selected per rendition by the *_video_profile settings.
+#   - codec, preset: the ffmpeg video encoder and its speed/size preset;
+#   - crf: constant rate factor (quality) of single-pass encodes;
+#   - maxrate: bitrate cap in bits per second (None: uncapped); the watermarked
+#     version is also capped at the original's bitrate and max_video_bitrate;
+#   - bufsize_factor: VBV buffer size as a multiple of the cap;
+#   - audio: "copy", "aac" (re-encoded at audio_bitrate) or "none";
+#   - threads: encoder threads (0: ffmpeg decides);
+#   - two_pass: two-pass encode at the capped bitrate instead of CRF (slower, opt-in).
+VIDEO_ENCODING_PROFILES = {
+    # Default fast path: single-pass CRF, capped so bitrate spikes stay bounded.
+    "capped_crf": {
+        "codec": "libx264",
+        "preset": "medium",
+        "crf": 20,
+        "maxrate": None,
+        "bufsize_factor": 2,
+        "audio": "copy",
+        "threads": 0,
+        "two_pass": False,
+    },
+    # Cheaper encode for short or low-value renditions, e.g. previews.
+    "capped_crf_fast": {
+        "codec": "libx264",
+        "preset": "veryfast",
+        "crf": 23,
+        "maxrate": 3000000,
+        "bufsize_factor": 2,
+        "audio": "aac",
+        "audio_bitrate": "128k",
+        "threads": 0,
+        "two_pass": False,
+    },
+    # The previous behaviour: two-pass ABR at the capped source bitrate, preset slow.
+    "two_pass": {
+        "codec": "libx264",
+        "preset": "slow",
+        "crf": None,
+        "maxrate": None,
+        "bufsize_factor": 2,
+        "audio": "copy",
+        "threads": 0,
+        "two_pass": True,
+    },
 }
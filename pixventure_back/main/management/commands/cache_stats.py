@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from main.cache import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show cache hit/miss counters per namespace."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        for namespace, stats in get_cache_stats().items():
+            ratio = "n/a" if stats["hit_ratio"] is None else f"{stats['hit_ratio']:.1%}"
+            self.stdout.write(f"{namespace}: {stats['hits']} hits, {stats['misses']} misses, hit ratio {ratio}")
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
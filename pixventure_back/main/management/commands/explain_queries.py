@@ -0,0 +1,111 @@
+import re
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from albums.models import Album, AlbumElement
+from media.models import MediaItem, MediaItemHash, MediaItemVersion
+from posts.managers.feed_assembler import FeedAssembler
+from posts.models import Post, PostMedia
+from social.models import Like
+from taxonomy.models import Term
+
+User = get_user_model()
+
+# Plan lines that mean "read the whole table", per backend.
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # SQLite: a plain "SCAN <table>" (without "USING ... INDEX") is a full table scan.
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!.*USING)'),
+}
+
+
+def endpoint_querysets():
+    """
+    Returns (name, queryset) pairs mirroring the hottest endpoint queries.
+    Sample ids are taken from existing rows so the plans use realistic values.
+    """
+    user_id = User.objects.values_list('id', flat=True).first() or 1
+    post_id = Post.objects.values_list('id', flat=True).first() or 1
+    media_item_id = MediaItem.objects.values_list('id', flat=True).first() or 1
+    album_id = Album.objects.values_list('id', flat=True).first() or 1
+    category = Term.objects.filter(term_type=Term.CATEGORY).values_list('slug', flat=True).first() or 'category'
+    hash_row = MediaItemHash.objects.values_list('hash_type_id', 'hash_value').first() or (1, '0' * 16)
+
+    published = Post.objects.filter(status=Post.PUBLISHED)
+    return [
+        ('public feed', FeedAssembler.prepare_queryset(published.order_by('-published', '-id'))[:20]),
+        ('featured feed', FeedAssembler.prepare_queryset(
+            published.filter(is_featured_post=True).order_by('-published', '-id'))[:20]),
+        ('category feed', published.filter(
+            terms__term_type=Term.CATEGORY, terms__slug=category).distinct().order_by('-published', '-id')[:20]),
+        ('my posts', Post.objects.filter(owner_id=user_id).order_by('-created', '-id')[:20]),
+        ('my media items', MediaItem.objects.filter(owner_id=user_id).order_by('-created', '-id')[:20]),
+        ('post media', PostMedia.objects.filter(post_id=post_id).order_by('position')),
+        ('media versions', MediaItemVersion.objects.filter(
+            media_item_id=media_item_id, version_type=MediaItemVersion.THUMBNAIL)),
+        ('liked posts', Like.objects.filter(
+            liking_user_id=user_id, is_active=True, post_id__in=[post_id]).values_list('post_id')),
+        ('liked media items', Like.objects.filter(
+            liking_user_id=user_id, is_active=True, media_item_id=media_item_id)),
+        ('hash lookup', MediaItemHash.objects.filter(hash_type_id=hash_row[0], hash_value=hash_row[1])),
+        ('duplicate index refresh', MediaItemHash.objects.filter(
+            hash_type__name='phash', media_item_version__version_type=MediaItemVersion.ORIGINAL,
+            updated__gte=timezone.now()).order_by('updated', 'id')),
+        ('album elements', AlbumElement.objects.filter(album_id=album_id).order_by('position')),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN over the hot endpoint querysets and flags sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-seq-scan',
+            action='store_true',
+            help="Exit with an error if any plan contains a sequential scan (for CI)."
+        )
+        parser.add_argument(
+            '--ignore-table',
+            action='append',
+            default=[],
+            help="Table whose sequential scans are acceptable (can be repeated)."
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help="Print full plans, not only the flagged lines."
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Unsupported database backend: {connection.vendor}")
+        ignored = set(options['ignore_table'])
+        flagged = []
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small CI databases make the planner prefer seq scans even when a
+                # usable index exists; disabling them shows whether one does.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, queryset in endpoint_querysets():
+                plan = queryset.explain()
+                scans = [
+                    line.strip() for line in plan.splitlines()
+                    if (match := pattern.search(line)) and match.group(1) not in ignored
+                ]
+                if options['verbose_plans']:
+                    self.stdout.write(f"== {name}\n{plan}\n")
+                if scans:
+                    flagged.append(name)
+                    self.stdout.write(self.style.WARNING(f"{name}: sequential scan"))
+                    for line in scans:
+                        self.stdout.write(f"    {line}")
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+
+        if flagged and options['fail_on_seq_scan']:
+            raise CommandError(f"Sequential scans in: {', '.join(flagged)}")
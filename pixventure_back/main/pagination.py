@@ -1,5 +1,12 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from main.cache import PAGINATION_COUNTS_NAMESPACE, get_or_set
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
@@ -14,4 +21,162 @@ class StandardResultsSetPagination(PageNumberPagination):
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data
-        })
\ No newline at end of file
+        })
+
+
+class KeysetPaginationMixin:
+    """
+    Adds keyset (cursor) pagination on (keyset_field, id), newest first, to a
+    page-number pagination class.
+
+    Keyset mode is used when the request carries a cursor or `pagination=cursor`;
+    otherwise the base class handles the request, so existing page-number clients
+    keep working unchanged. In keyset mode:
+      - each page is one index range scan: no COUNT(*) and no OFFSET;
+      - `next`/`previous` links carry opaque cursors;
+      - `count` is only included with `with_count=true`, as an approximate value
+        served from a short-lived cached counter.
+
+    Rows whose keyset_field is NULL cannot be positioned and are not listed in
+    keyset mode.
+    """
+    keyset_field = 'published'
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'with_count'
+    approximate_count_ttl = 5 * 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.keyset_page_size = self.get_page_size(request) or 20
+        position, reverse = self.decode_cursor(request)
+
+        base_queryset = queryset.filter(**{f'{self.keyset_field}__isnull': False})
+        self.approximate_count = self._get_approximate_count(base_queryset, request)
+
+        field = self.keyset_field
+        if reverse:
+            ordering = (field, 'id')
+        else:
+            ordering = (f'-{field}', '-id')
+        page_queryset = base_queryset.order_by(*ordering)
+        if position is not None:
+            value, pk = position
+            if reverse:
+                page_queryset = page_queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+            else:
+                page_queryset = page_queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+
+        rows = list(page_queryset[:self.keyset_page_size + 1])
+        has_more = len(rows) > self.keyset_page_size
+        rows = rows[:self.keyset_page_size]
+        if reverse:
+            rows.reverse()
+
+        # Moving backwards, "more" lies before the page; there is always a next
+        # page (the one we came from). Moving forwards it is the other way round.
+        self.has_next = (not reverse and has_more) or (reverse and position is not None)
+        self.has_previous = (reverse and has_more) or (not reverse and position is not None)
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.approximate_count is not None:
+            payload['count'] = self.approximate_count
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self._build_link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self._build_link(self.page_rows[0], reverse=True)
+
+    def _build_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = remove_query_param(url, self.mode_query_param)
+        value = getattr(row, self.keyset_field)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(value, row.pk, reverse))
+
+    def encode_cursor(self, value, pk, reverse=False):
+        payload = {'v': value.isoformat(), 'i': pk}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode('ascii')
+        return urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        """
+        Returns ((value, pk) | None, reverse) for the request's cursor.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            value = parse_datetime(payload['v'])
+            pk = int(payload['i'])
+            if value is None:
+                raise ValueError(payload['v'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('Invalid cursor')
+        return (value, pk), bool(payload.get('r'))
+
+    def _get_approximate_count(self, queryset, request):
+        if request.query_params.get(self.count_query_param) not in ('1', 'true'):
+            return None
+        params = sorted(
+            (key, value) for key, value in request.query_params.items()
+            if key not in (self.cursor_query_param, self.page_query_param)
+        )
+        return get_or_set(
+            PAGINATION_COUNTS_NAMESPACE,
+            (request.path, request.user.pk, json.dumps(params)),
+            queryset.count,
+            ttl=self.approximate_count_ttl,
+        )
+
+
+class FeedPagination(KeysetPaginationMixin, StandardResultsSetPagination):
+    """
+    Post feeds ordered by publication date.
+    """
+    keyset_field = 'published'
+
+
+class CreatedFeedPagination(KeysetPaginationMixin, StandardResultsSetPagination):
+    """
+    Lists ordered by creation date (e.g. the user's own posts).
+    """
+    keyset_field = 'created'
+
+
+class MediaItemPagination(KeysetPaginationMixin, PageNumberPagination):
+    """
+    The user's media items, ordered by creation date. Page-number mode keeps the
+    project-wide default pagination these lists had so far.
+    """
+    keyset_field = 'created'
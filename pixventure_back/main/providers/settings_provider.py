@@ -1,29 +1,147 @@
+import logging
+import time
+from types import MappingProxyType
+from main.cache import SETTINGS_NAMESPACE, get_namespace_version, invalidate_namespace
 from main.models import Setting
 from main.default_settings_config import DEFAULT_SETTINGS
 
+logger = logging.getLogger(__name__)
+
+_TRUE_STRINGS = {"1", "true", "yes", "on"}
+_FALSE_STRINGS = {"0", "false", "no", "off", ""}
+
+
+def _coerce(value, default):
+    """
+    Converts a stored (string) value to the type of its default.
+    Falls back to the default if the value cannot be parsed.
+    """
+    if default is None or value is None:
+        return value
+    try:
+        if isinstance(default, bool):
+            normalized = str(value).strip().lower()
+            if normalized in _TRUE_STRINGS:
+                return True
+            if normalized in _FALSE_STRINGS:
+                return False
+            raise ValueError(value)
+        if isinstance(default, int):
+            return int(float(value))
+        if isinstance(default, float):
+            return float(value)
+    except (TypeError, ValueError):
+        logger.warning("Invalid value %r for setting of type %s, using default %r",
+                       value, type(default).__name__, default)
+        return default
+    return value
+
+
+class SettingsSnapshot:
+    """
+    Immutable view of all settings, loaded in a single query.
+    Values of keys listed in DEFAULT_SETTINGS are converted to the type of their default.
+    """
+    __slots__ = ("_values", "version")
+
+    def __init__(self, values, version=None):
+        self._values = MappingProxyType(dict(values))
+        self.version = version
+
+    @classmethod
+    def load(cls, version=None):
+        values = dict(DEFAULT_SETTINGS)
+        for key, value in Setting.objects.values_list("key", "value"):
+            values[key] = _coerce(value, DEFAULT_SETTINGS.get(key))
+        return cls(values, version)
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def _get_typed(self, key, default):
+        value = self._values.get(key)
+        return default if value is None else _coerce(value, default)
+
+    def get_int(self, key, default=0):
+        return self._get_typed(key, int(default))
+
+    def get_float(self, key, default=0.0):
+        return self._get_typed(key, float(default))
+
+    def get_bool(self, key, default=False):
+        return self._get_typed(key, bool(default))
+
+    def as_dict(self):
+        """
+        Returns a plain (mutable, JSON-serialisable) copy, e.g. for Celery task arguments.
+        """
+        return dict(self._values)
+
+
 class SettingsProvider:
     """
     Fetches media settings from the main app's Setting model if available,
     otherwise returns default configuration values.
+
+    All settings are loaded at once into a SettingsSnapshot that is kept in the
+    process for LOCAL_TTL seconds. After that, the shared version stamp (bumped
+    whenever a Setting is saved or deleted) is checked and the snapshot is only
+    reloaded if it changed.
     """
 
-    @staticmethod
-    def get_setting(key: str):
+    LOCAL_TTL = 30
+
+    # (snapshot, monotonic time it was last validated); replaced atomically.
+    _state = (None, 0.0)
+
+    @classmethod
+    def get_snapshot(cls) -> SettingsSnapshot:
+        snapshot, checked_at = cls._state
+        now = time.monotonic()
+        if snapshot is not None and now - checked_at < cls.LOCAL_TTL:
+            return snapshot
+
+        version = get_namespace_version(SETTINGS_NAMESPACE)
+        if snapshot is None or snapshot.version != version:
+            snapshot = SettingsSnapshot.load(version)
+        cls._state = (snapshot, now)
+        return snapshot
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drops this process's snapshot and bumps the shared version stamp,
+        so other processes reload once their local TTL expires.
+        """
+        cls.clear_local_cache()
+        invalidate_namespace(SETTINGS_NAMESPACE)
+
+    @classmethod
+    def clear_local_cache(cls):
+        cls._state = (None, 0.0)
+
+    @classmethod
+    def get_setting(cls, key: str):
         """
         Get a single setting value by key.
         """
-        try:
-            setting = Setting.objects.get(key=key)
-            return setting.value
-        except Setting.DoesNotExist:
-            return DEFAULT_SETTINGS.get(key)
+        return cls.get_snapshot().get(key)
+
+    @classmethod
+    def get_int(cls, key: str, default=0):
+        return cls.get_snapshot().get_int(key, default)
+
+    @classmethod
+    def get_float(cls, key: str, default=0.0):
+        return cls.get_snapshot().get_float(key, default)
+
+    @classmethod
+    def get_bool(cls, key: str, default=False):
+        return cls.get_snapshot().get_bool(key, default)
 
-    @staticmethod
-    def get_all_settings():
+    @classmethod
+    def get_all_settings(cls):
         """
         Returns a dictionary of all media settings.
         """
-        settings = {}
-        for key, default in DEFAULT_SETTINGS.items():
-            settings[key] = SettingsProvider.get_setting(key)
-        return settings
+        return cls.get_snapshot().as_dict()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MediaItem, MediaItemVersion, MediaItemHash, HashType, DuplicateCluster
+from .models import MediaItem, MediaItemVersion, MediaItemHash, HashType, DuplicateCluster, VideoEncodeStat
 
 
 class MediaItemHashInline(admin.TabularInline):
@@ -73,6 +73,16 @@ class DuplicateClusterAdmin(admin.ModelAdmin):
     raw_id_fields = ('items', )
 
 
+@admin.register(VideoEncodeStat)
+class VideoEncodeStatAdmin(admin.ModelAdmin):
+    list_display = ('media_item_version', 'profile', 'encode_seconds', 'cpu_seconds', 'output_bitrate',
+                    'file_size', 'stream_copied', 'created')
+    list_filter = ('profile', 'stream_copied')
+    raw_id_fields = ('media_item_version', )
+    list_select_related = ('media_item_version', )
+    list_per_page = 20
+
+
 admin.site.register(MediaItem, MediaItemAdmin)
 admin.site.register(MediaItemVersion, MediaItemVersionAdmin)
 admin.site.register(HashType, HashTypeAdmin)
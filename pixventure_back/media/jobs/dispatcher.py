@@ -36,6 +36,34 @@ def dispatch_chain(task_list):
     logger.info("Dispatched chain with %d tasks.", len(tasks))
     return result
 
+def dispatch_ingest(media_item_id):
+    """
+    Dispatches the worker side of asynchronous ingest for an uploaded media item.
+    """
+    result = dispatch("media_ingest", media_item_id, {}).apply_async(ignore_result=True)
+    logger.info("Dispatched ingest for MediaItem %s.", media_item_id)
+    return result
+
+def dispatch_image_pipeline(media_item_id, config, regenerate=False):
+    """
+    Dispatches the single-pass image pipeline followed by duplicate detection,
+    which receives the phash computed by the pipeline.
+    """
+    result = chain(
+        dispatch("image_derivatives", media_item_id, config, regenerate),
+        dispatch_duplicate_detection()
+    ).apply_async(ignore_result=True)
+    logger.info("Dispatched image pipeline for MediaItem %s.", media_item_id)
+    return result
+
+def dispatch_video_pipeline(media_item_id, config, regenerate=False):
+    """
+    Dispatches the single-invocation video pipeline.
+    """
+    result = dispatch("video_derivatives", media_item_id, config, regenerate).apply_async(ignore_result=True)
+    logger.info("Dispatched video pipeline for MediaItem %s.", media_item_id)
+    return result
+
 def dispatch_fuzzy_hash(media_item_version_id, hash_type, regenerate=False):
     """
     Returns a task signature for computing the fuzzy hash.
@@ -0,0 +1,69 @@
+# media/management/commands/benchmark_chunked_upload.py
+import io
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import blake3
+from django.core.management.base import BaseCommand
+from media.services.chunked_upload import InOrderHasher, allocate_part_file, write_at
+
+DEFAULT_WRITERS = [1, 2, 4, 8]
+
+
+def run_upload(path, payload, chunk_size, writers, shuffle):
+    """
+    Writes payload to a sparse file with `writers` threads, chunk by chunk, the
+    way concurrent PUT requests would. Returns (seconds, hex digest).
+    """
+    total_size = len(payload)
+    chunk_count = (total_size + chunk_size - 1) // chunk_size
+    indexes = list(range(chunk_count))
+    if shuffle:
+        random.Random(0).shuffle(indexes)
+
+    allocate_part_file(path, total_size)
+    hasher = InOrderHasher(path, chunk_size, total_size)
+    view = memoryview(payload)
+
+    def put(index):
+        start = index * chunk_size
+        length = min(chunk_size, total_size - start)
+        write_at(path, start, io.BytesIO(view[start:start + length]), length)
+        hasher.chunk_written(index)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(put, indexes))
+    digest = hasher.hexdigest()
+    return time.perf_counter() - started, digest
+
+
+class Command(BaseCommand):
+    help = "Benchmarks resumable upload throughput (chunk writes + incremental BLAKE3) with concurrent writers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=256, help="Size of the simulated upload.")
+        parser.add_argument('--chunk-mb', type=int, default=8, help="Chunk size.")
+        parser.add_argument('--writers', type=int, action='append', help="Concurrent writers (repeatable).")
+        parser.add_argument('--in-order', action='store_true', help="Send chunks in order instead of shuffled.")
+        parser.add_argument('--dir', help="Directory for the spool file. Defaults to the system temp directory.")
+
+    def handle(self, *args, **options):
+        size = options['size_mb'] * 1024 * 1024
+        chunk_size = options['chunk_mb'] * 1024 * 1024
+        payload = os.urandom(size)
+        expected = blake3.blake3(payload, max_threads=blake3.blake3.AUTO).hexdigest()
+
+        self.stdout.write(f"{options['size_mb']} MiB upload, {options['chunk_mb']} MiB chunks, "
+                          f"{'in order' if options['in_order'] else 'shuffled'}")
+        with tempfile.TemporaryDirectory(dir=options['dir']) as directory:
+            path = os.path.join(directory, "benchmark.part")
+            for writers in options['writers'] or DEFAULT_WRITERS:
+                seconds, digest = run_upload(path, payload, chunk_size, writers, not options['in_order'])
+                if digest != expected:
+                    self.stderr.write(self.style.ERROR(f"{writers} writers: hash mismatch"))
+                    continue
+                self.stdout.write(f"    {writers} writers: {seconds * 1000:8.0f} ms  "
+                                  f"{size / seconds / 1024 / 1024:8.0f} MiB/s")
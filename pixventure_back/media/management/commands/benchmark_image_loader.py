@@ -0,0 +1,88 @@
+# media/management/commands/benchmark_image_loader.py
+import ctypes
+import ctypes.util
+import gc
+import os
+import statistics
+import imagehash
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from media.management.commands.benchmark_image_pipeline import directory_corpus, synthetic_corpus
+from media.services.hasher import FUZZY_HASH_DECODE_SIZE
+from media.services.memory_budget import track_peak_rss
+from media.utils.image_loader import open_image
+
+DEFAULT_SIZES = [(1200, 800), (4000, 3000), (6000, 4000)]
+
+# Call sites: (name, target size, work done on the decoded image).
+CALLS = [
+    ("thumbnail", 300, lambda image: image.convert("RGB").thumbnail((300, 300), Image.Resampling.LANCZOS)),
+    ("preview", 800, lambda image: image.convert("RGB").thumbnail((800, 800), Image.Resampling.LANCZOS)),
+    ("phash", FUZZY_HASH_DECODE_SIZE, lambda image: imagehash.phash(image.convert("RGB"))),
+]
+
+
+def _release_free_memory():
+    """
+    Returns freed heap pages to the OS so they don't hide the next call's peak.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def measure(fn):
+    """
+    Runs fn and returns (milliseconds, peak RSS growth in MiB or None).
+    """
+    _release_free_memory()
+    with track_peak_rss() as rss:
+        fn()
+    return rss.elapsed_ms, rss.growth_mb
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks open_image at full resolution against target_size decoding "
+            "(time and peak RSS per call) on a mixed JPEG/PNG/HEIC corpus.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            help="Directory of images (e.g. including HEIC files). Defaults to generated JPEG and PNG files."
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per call (median is reported).")
+
+    def handle(self, *args, **options):
+        if options['dir']:
+            if not os.path.isdir(options['dir']):
+                raise CommandError(f"Not a directory: {options['dir']}")
+            corpus = list(directory_corpus(options['dir']))
+        else:
+            corpus = list(synthetic_corpus(DEFAULT_SIZES)) + list(synthetic_corpus(DEFAULT_SIZES, "PNG"))
+
+        totals = {"full": 0, "reduced": 0}
+        for name, file_obj in corpus:
+            self.stdout.write(f"== {name}")
+            for call, target_size, work in CALLS:
+                results = {}
+                for mode, target in (("full", None), ("reduced", target_size)):
+                    def run():
+                        work(open_image(file_obj, target_size=target))
+                    runs = [measure(run) for _ in range(options['repeat'])]
+                    milliseconds = statistics.median(ms for ms, _ in runs)
+                    peaks = [rss for _, rss in runs if rss is not None]
+                    results[mode] = (milliseconds, max(peaks) if peaks else None)
+                    totals[mode] += milliseconds
+
+                (full_ms, full_rss), (reduced_ms, reduced_rss) = results["full"], results["reduced"]
+                rss = (f"peak RSS {full_rss:7.1f} -> {reduced_rss:7.1f} MiB"
+                       if full_rss is not None else "peak RSS n/a")
+                self.stdout.write(f"    {call:<10} {full_ms:8.1f} -> {reduced_ms:8.1f} ms "
+                                  f"({full_ms / max(reduced_ms, 0.001):5.1f}x)  {rss}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Corpus of {len(corpus)}: full {totals['full']:.0f} ms, "
+            f"target_size {totals['reduced']:.0f} ms ({totals['full'] / max(totals['reduced'], 0.001):.1f}x)"
+        ))
@@ -0,0 +1,149 @@
+# media/management/commands/benchmark_image_pipeline.py
+import io
+import os
+import statistics
+import time
+import imagehash
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from main.providers.settings_provider import SettingsProvider
+from media.models import MediaItemVersion
+from media.services import watermark
+from media.services.image_pipeline import render_versions
+from media.utils.image_loader import open_image
+
+ALL_VERSIONS = [
+    MediaItemVersion.PREVIEW,
+    MediaItemVersion.WATERMARKED,
+    MediaItemVersion.BLURRED_THUMBNAIL,
+    MediaItemVersion.BLURRED_PREVIEW,
+]
+
+# Synthetic corpus: (width, height) of the generated JPEGs.
+DEFAULT_SIZES = [(1200, 800), (3000, 2000), (4000, 3000), (6000, 4000)]
+
+
+def synthetic_corpus(sizes, image_format="JPEG"):
+    """
+    Yields (name, BytesIO) fixtures (JPEG by default) with enough texture to compress like photos.
+    """
+    rng = np.random.default_rng(0)
+    for width, height in sizes:
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        noise = rng.integers(0, 40, (height, width), dtype=np.uint8)
+        pixels = np.stack([
+            (x + y) / 2 + noise,
+            np.broadcast_to(x, (height, width)) + noise,
+            np.broadcast_to(y, (height, width)) + noise,
+        ], axis=-1).clip(0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        if image_format == "JPEG":
+            Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        else:
+            Image.fromarray(pixels).save(buffer, format=image_format)
+        buffer.seek(0)
+        buffer.name = f"synthetic_{width}x{height}.{image_format.lower()}"
+        yield buffer.name, buffer
+
+
+def directory_corpus(path):
+    for name in sorted(os.listdir(path)):
+        full_path = os.path.join(path, name)
+        if os.path.isfile(full_path):
+            with open(full_path, "rb") as f:
+                buffer = io.BytesIO(f.read())
+            buffer.name = name
+            yield name, buffer
+
+
+def legacy_run(file_obj, config):
+    """
+    The per-task path: every rendition (and the upload metadata / phash steps)
+    decodes the original on its own. Returns {stage: ms}.
+    """
+    timings = {}
+
+    def decode():
+        file_obj.seek(0)
+        return open_image(file_obj).convert("RGB")
+
+    def timed(stage, render):
+        started = time.perf_counter()
+        render()
+        timings[stage] = (time.perf_counter() - started) * 1000
+
+    def metadata():
+        image = open_image(file_obj)
+        image.verify()
+        decode()
+
+    def thumbnail():
+        image = decode()
+        image.thumbnail((300, 300), Image.Resampling.LANCZOS)
+        watermark.image_to_webp_file(image, "thumbnail.webp", 85)
+
+    timed("metadata", metadata)
+    timed("thumbnail", thumbnail)
+    timed("preview", lambda: watermark.image_to_webp_file(
+        watermark.render_watermarked_preview(decode(), config["preview_size"]),
+        "preview.webp", config["watermarked_preview_quality"]))
+    timed("watermarked", lambda: watermark.image_to_webp_file(
+        watermark.render_full_watermarked(decode(), config["full_watermark_transparency"]),
+        "full.webp", config["full_watermarked_version_quality"]))
+    timed("blurred_preview", lambda: watermark.image_to_webp_file(
+        watermark.render_blurred_preview(decode(), config["preview_size"], config["preview_blur_radius"]),
+        "blurred_preview.webp", config["blurred_preview_quality"]))
+    timed("blurred_thumbnail", lambda: watermark.image_to_webp_file(
+        watermark.render_blurred_thumbnail(decode(), config["thumbnail_size"], config["thumbnail_blur_radius"]),
+        "blurred_thumbnail.webp", config["blurred_thumbnail_quality"]))
+    timed("phash", lambda: imagehash.phash(decode()))
+    timings["total"] = sum(timings.values())
+    return timings
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the single-pass image pipeline against the per-task path on a fixture corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            help="Directory of images to use as the corpus. Defaults to a generated JPEG corpus."
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per image (median is reported).")
+
+    def handle(self, *args, **options):
+        config = SettingsProvider.get_all_settings()
+        if options['dir']:
+            if not os.path.isdir(options['dir']):
+                raise CommandError(f"Not a directory: {options['dir']}")
+            corpus = list(directory_corpus(options['dir']))
+        else:
+            corpus = list(synthetic_corpus(DEFAULT_SIZES))
+
+        legacy_totals, pipeline_totals = [], []
+        for name, file_obj in corpus:
+            legacy = [legacy_run(file_obj, config) for _ in range(options['repeat'])]
+            single = [
+                render_versions(file_obj, config, ALL_VERSIONS + [MediaItemVersion.THUMBNAIL]).timings
+                for _ in range(options['repeat'])
+            ]
+            legacy_ms = statistics.median(run["total"] for run in legacy)
+            single_ms = statistics.median(run["total"] for run in single)
+            legacy_totals.append(legacy_ms)
+            pipeline_totals.append(single_ms)
+
+            self.stdout.write(f"== {name}: per-task {legacy_ms:.0f} ms, single-pass {single_ms:.0f} ms "
+                              f"({legacy_ms / single_ms:.1f}x)")
+            for stage in single[0]:
+                if stage == "total":
+                    continue
+                median = statistics.median(run[stage] for run in single)
+                self.stdout.write(f"    {stage:<18} {median:8.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Corpus of {len(corpus)}: per-task {sum(legacy_totals):.0f} ms, "
+            f"single-pass {sum(pipeline_totals):.0f} ms "
+            f"({sum(legacy_totals) / sum(pipeline_totals):.1f}x)"
+        ))
@@ -0,0 +1,84 @@
+# media/management/commands/benchmark_segmented_encode.py
+import os
+import shutil
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from media.management.commands.benchmark_video_pipeline import CONFIG, generate_clip, measure
+from media.models import MediaItemVersion
+from media.services import video_pipeline
+from media.services.media_probe import MediaProbe
+from media.services.segmented_encode import SegmentedEncodeError, summarize_streams, verify_output
+
+# (duration in seconds, width, height) of the generated clip.
+DEFAULT_CLIP = (120, 1920, 1080)
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the watermarked encode of a long video: one ffmpeg run against parallel "
+            "keyframe segments. Reports wall time, CPU-seconds, speed-up and the output checks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clip', help="Sample clip. Defaults to a generated clip.")
+        parser.add_argument(
+            '--segments', type=int, action='append',
+            help="Segment count to try (repeatable). Defaults to 2, 4 and one per CPU."
+        )
+        parser.add_argument(
+            '--profile', default=video_pipeline.DEFAULT_PROFILE,
+            help="Encoding profile of the watermarked version (see VIDEO_ENCODING_PROFILES)."
+        )
+
+    def handle(self, *args, **options):
+        if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+            raise CommandError("ffmpeg and ffprobe are required.")
+        counts = options['segments'] or sorted({2, 4, os.cpu_count() or 1})
+        versions = [MediaItemVersion.WATERMARKED]
+
+        with tempfile.TemporaryDirectory() as workdir:
+            clip = options['clip']
+            if clip and not os.path.isfile(clip):
+                raise CommandError(f"No such clip: {clip}")
+            if not clip:
+                duration, width, height = DEFAULT_CLIP
+                clip = os.path.join(workdir, f"clip_{width}x{height}_{duration}s.mp4")
+                generate_clip(clip, duration, width, height)
+            with open(clip, "rb") as f:
+                probe = MediaProbe.probe_video(f)
+            source = summarize_streams(clip)
+            self.stdout.write(
+                f"{os.path.basename(clip)}: {probe.width}x{probe.height}, {probe.duration or 0:.1f} s, "
+                f"{source.video_frames} frames"
+            )
+
+            config = dict(CONFIG, watermarked_video_profile=options['profile'], video_segmented_min_duration=0)
+            single_options = video_pipeline.options_from_config(config)
+            single_dir = tempfile.mkdtemp(dir=workdir)
+            single_wall, single_cpu = measure(
+                lambda: video_pipeline.render_video_files(clip, probe, single_options, versions, single_dir)
+            )
+            self.stdout.write(f"  single run   {single_wall:7.2f} s wall {single_cpu:8.2f} CPU-s")
+
+            best = single_wall
+            for count in counts:
+                segmented_dir = tempfile.mkdtemp(dir=workdir)
+                output = os.path.join(segmented_dir, "segmented.mp4")
+                segmented_options = single_options._replace(segments=count)
+                try:
+                    wall, cpu = measure(lambda: video_pipeline.encode_watermarked_segmented(
+                        clip, probe, segmented_options, output, segmented_dir
+                    ))
+                except SegmentedEncodeError as e:
+                    self.stdout.write(self.style.ERROR(f"  {count:2d} segments  failed: {e}"))
+                    continue
+                problems = verify_output(source, summarize_streams(output))
+                best = min(best, wall)
+                self.stdout.write(
+                    f"  {count:2d} segments  {wall:7.2f} s wall {cpu:8.2f} CPU-s, "
+                    f"{single_wall / max(wall, 0.001):.2f}x faster, "
+                    f"{os.path.getsize(output) / 1024:.0f} KiB, checks: {'; '.join(problems) or 'ok'}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Watermarked encode: single run {single_wall:.2f} s, best segmented {best:.2f} s "
+            f"({single_wall / max(best, 0.001):.2f}x)"
+        ))
@@ -0,0 +1,157 @@
+# media/management/commands/benchmark_video_pipeline.py
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from media.models import MediaItemVersion
+from media.services import video_pipeline
+from media.services.media_probe import MediaProbe
+
+# (duration in seconds, width, height) of the generated clips.
+DEFAULT_CLIPS = [(10, 1280, 720), (30, 1920, 1080)]
+
+CONFIG = {
+    "full_watermarked_version_quality": -1,
+    "max_video_bitrate": 5000000,
+    "preview_video_quality": -1,
+    "preview_video_duration": 2,
+    "thumbnail_size": 300,
+}
+
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(fn):
+    """
+    Runs fn and returns (wall seconds, CPU seconds spent in child processes).
+    """
+    cpu = children_cpu_seconds()
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started, children_cpu_seconds() - cpu
+
+
+def run(cmd):
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def generate_clip(path, duration, width, height):
+    run([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-c:a", "aac", "-shortest", path,
+    ])
+
+
+def legacy_renditions(input_path, probe, workdir):
+    """
+    The previous implementation, for comparison: two-pass watermarked encode,
+    preview re-encoded from the watermarked output, poster frame seeked in the
+    original. Yields (rendition, command list) in order.
+    """
+    width, height = video_pipeline.even_size(*probe.display_size)
+    bitrate_k = video_pipeline.target_bitrate(probe.file_size, probe.duration, CONFIG["max_video_bitrate"]) // 1000
+    text = getattr(settings, "WATERMARK_TEXT_FOR_PREVIEWS", "Default Watermark")
+    filter_str = f"drawtext=text='{text}':x=w-tw-10:y=h-th-10:fontsize=17:fontcolor=red,scale={width}:{height}"
+    passlog = os.path.join(workdir, "passlog")
+    watermarked = os.path.join(workdir, "legacy_watermarked.mp4")
+    yield "watermarked", [
+        ["ffmpeg", "-y", "-i", input_path, "-vf", filter_str, "-c:v", "libx264", "-preset", "slow",
+         "-b:v", f"{bitrate_k}k", "-pass", "1", "-passlogfile", passlog, "-an", "-f", "mp4", os.devnull],
+        ["ffmpeg", "-y", "-i", input_path, "-vf", filter_str, "-c:v", "libx264", "-preset", "slow",
+         "-b:v", f"{bitrate_k}k", "-minrate", f"{bitrate_k}k", "-maxrate", f"{bitrate_k}k",
+         "-bufsize", f"{bitrate_k * 2}k", "-pass", "2", "-passlogfile", passlog,
+         "-c:a", "copy", "-f", "mp4", watermarked],
+    ]
+    yield "preview", [
+        ["ffmpeg", "-y", "-i", watermarked, "-t", str(CONFIG["preview_video_duration"]),
+         "-c:v", "libx264", "-preset", "slow", "-crf", "18", "-c:a", "copy", "-f", "mp4",
+         os.path.join(workdir, "legacy_preview.mp4")],
+    ]
+    yield "thumbnail", [
+        ["ffmpeg", "-y", "-i", input_path, "-ss", str((probe.duration or 0) / 2), "-frames:v", "1",
+         os.path.join(workdir, "legacy_thumbnail.png")],
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks video renditions (watermarked, preview, poster frame): wall time and "
+            "CPU-seconds of the previous per-rendition encodes against the single-invocation pipeline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clip', action='append', help="Sample clip (repeatable). Defaults to generated clips.")
+        parser.add_argument(
+            '--profile', default=video_pipeline.DEFAULT_PROFILE,
+            help="Encoding profile of the pipeline's video renditions (see VIDEO_ENCODING_PROFILES)."
+        )
+
+    def handle(self, *args, **options):
+        if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+            raise CommandError("ffmpeg and ffprobe are required.")
+        versions = video_pipeline.SUPPORTED_VERSIONS
+        render_options = video_pipeline.options_from_config(dict(
+            CONFIG, watermarked_video_profile=options['profile'], preview_video_profile=options['profile']
+        ))
+
+        with tempfile.TemporaryDirectory() as workdir:
+            clips = options['clip'] or []
+            for missing in [clip for clip in clips if not os.path.isfile(clip)]:
+                raise CommandError(f"No such clip: {missing}")
+            if not clips:
+                for duration, width, height in DEFAULT_CLIPS:
+                    path = os.path.join(workdir, f"clip_{width}x{height}_{duration}s.mp4")
+                    generate_clip(path, duration, width, height)
+                    clips.append(path)
+
+            total_legacy = total_pipeline = 0.0
+            for clip in clips:
+                with open(clip, "rb") as f:
+                    probe = MediaProbe.probe_video(f)
+                self.stdout.write(
+                    f"{os.path.basename(clip)}: {probe.width}x{probe.height}, {probe.duration or 0:.1f} s"
+                )
+
+                legacy_wall = legacy_cpu = 0.0
+                for rendition, commands in legacy_renditions(clip, probe, workdir):
+                    wall, cpu = measure(lambda: [run(cmd) for cmd in commands])
+                    legacy_wall, legacy_cpu = legacy_wall + wall, legacy_cpu + cpu
+                    self.stdout.write(f"  previous  {rendition:<12} {wall:7.2f} s wall {cpu:8.2f} CPU-s")
+                self.stdout.write(f"  previous  {'total':<12} {legacy_wall:7.2f} s wall {legacy_cpu:8.2f} CPU-s")
+
+                pipeline_dir = tempfile.mkdtemp(dir=workdir)
+                result = []
+                wall, cpu = measure(lambda: result.append(
+                    video_pipeline.render_video_files(clip, probe, render_options, versions, pipeline_dir)
+                ))
+                rendered = result[0]
+                for stage, milliseconds in rendered.timings.items():
+                    self.stdout.write(f"  pipeline  {stage:<12} {milliseconds / 1000:7.2f} s wall")
+                self.stdout.write(f"  pipeline  profile      {render_options.watermarked_profile}")
+                self.stdout.write(
+                    f"  pipeline  {'total':<12} {wall:7.2f} s wall {cpu:8.2f} CPU-s "
+                    f"({len(rendered.paths)} renditions, {cpu / max(len(rendered.paths), 1):.2f} CPU-s each; "
+                    f"preview stream-copied: {rendered.preview_stream_copied})"
+                )
+                for version_type, path in rendered.paths.items():
+                    name = dict(MediaItemVersion.VERSION_CHOICES).get(version_type, version_type)
+                    size = os.path.getsize(path)
+                    encode = rendered.encodes.get(version_type)
+                    duration = probe.duration if version_type == MediaItemVersion.WATERMARKED else None
+                    if version_type == MediaItemVersion.PREVIEW:
+                        duration = min(render_options.preview_duration, probe.duration or 0)
+                    bitrate = f", {size * 8 / duration / 1000:.0f} kbps" if encode and duration else ""
+                    self.stdout.write(f"    {name}: {size / 1024:.0f} KiB{bitrate}")
+                total_legacy += legacy_cpu
+                total_pipeline += cpu
+
+        self.stdout.write(self.style.SUCCESS(
+            f"CPU-seconds: previous {total_legacy:.2f}, pipeline {total_pipeline:.2f} "
+            f"({total_legacy / max(total_pipeline, 0.001):.1f}x less)"
+        ))
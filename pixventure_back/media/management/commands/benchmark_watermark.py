@@ -0,0 +1,97 @@
+# media/management/commands/benchmark_watermark.py
+import io
+import random
+import statistics
+import time
+import imageio
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from media.services import watermark, watermark_engine
+
+# Megapixels of the generated 3:2 inputs.
+DEFAULT_MEGAPIXELS = [1, 6, 12, 24, 60]
+
+
+def legacy_set_random_transparent_watermark(image, text, min_image_fraction, max_image_fraction, transparency):
+    """
+    The previous implementation, for comparison: the font is reloaded at every
+    size from 5pt up, brightness goes through a JPEG round trip, and a full-size
+    RGBA layer is composited over a full-size RGBA copy.
+    """
+    base_image = image.convert("RGBA")
+    W, H = base_image.size
+    image_fraction = random.uniform(min_image_fraction, max_image_fraction) / 100.0
+
+    font_size = 5
+    font = ImageFont.truetype(settings.FONT_LOCATION, font_size)
+    while font.getbbox(text)[2] < image_fraction * W:
+        font_size += 1
+        font = ImageFont.truetype(settings.FONT_LOCATION, font_size)
+    font_size = max(1, font_size - 1)
+    font = ImageFont.truetype(settings.FONT_LOCATION, font_size)
+
+    watermark_layer = Image.new("RGBA", base_image.size)
+    waterdraw = ImageDraw.Draw(watermark_layer, "RGBA")
+    bbox = waterdraw.textbbox((0, 0), text, font=font)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    x = watermark.biased_coordinate(max(W - text_width - 3, 0), margin_fraction=0.2)
+    y = watermark.biased_coordinate(max(H - text_height - 3, 0), margin_fraction=0.2)
+
+    image_area = base_image.crop((x, y, x + text_width, y + text_height))
+    temp_io = io.BytesIO()
+    image_area.convert("RGB").save(temp_io, format="JPEG", quality=95, optimize=True, progressive=True)
+    temp_io.seek(0)
+    light = np.mean(imageio.v2.imread(temp_io, mode='F')) > watermark.LIGHT_THRESHOLD
+    text_color = (0, 0, 0, transparency) if light else (255, 255, 255, transparency)
+
+    waterdraw.text((x, y), text, fill=text_color, font=font)
+    return Image.alpha_composite(base_image, watermark_layer).convert("RGB")
+
+
+def synthetic_image(megapixels):
+    width = int((megapixels * 1_000_000 * 1.5) ** 0.5)
+    height = int(width / 1.5)
+    return Image.linear_gradient("L").resize((width, height)).convert("RGB")
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmarks per-image watermark latency (previous implementation vs cached engine) for 1-60 MP inputs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, action='append', help="Input size (repeatable).")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per size (median is reported).")
+
+    def handle(self, *args, **options):
+        text = getattr(settings, "WATERMARK_TEXT_FOR_FULLRES", "Default Watermark")
+        for megapixels in options['megapixels'] or DEFAULT_MEGAPIXELS:
+            image = synthetic_image(megapixels)
+            fraction = (17, 18) if image.width * image.height < 250000 else (12, 13)
+
+            legacy = statistics.median(
+                timed(lambda: legacy_set_random_transparent_watermark(image, text, *fraction, 80))
+                for _ in range(options['repeat'])
+            )
+            watermark_engine.clear_caches()
+            cold = timed(lambda: watermark.render_full_watermarked(image, 80))
+            warm = statistics.median(
+                timed(lambda: watermark.render_full_watermarked(image, 80))
+                for _ in range(options['repeat'])
+            )
+            # What the pipeline does: draw on the decoded image, no copy.
+            in_place = statistics.median(
+                timed(lambda: watermark.render_full_watermarked(image, 80, in_place=True))
+                for _ in range(options['repeat'])
+            )
+            self.stdout.write(
+                f"{megapixels:5.0f} MP {image.width}x{image.height}: previous {legacy:8.1f} ms, "
+                f"engine cold {cold:7.1f} ms, warm {warm:7.1f} ms, in place {in_place:6.1f} ms "
+                f"({legacy / max(in_place, 0.001):.0f}x)"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from media.services.duplicate_index import get_index_path, rebuild_index
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds the near-duplicate phash index from every stored hash and saves it to DUPLICATE_INDEX_DIR "
+            "(workers load it on their next start and catch up incrementally).")
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} phashes in {get_index_path()}."))
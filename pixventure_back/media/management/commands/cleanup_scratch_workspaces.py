@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from media.services.scratch import cleanup_stale_workspaces
+
+
+class Command(BaseCommand):
+    help = "Deletes scratch workspaces older than MEDIA_SCRATCH_MAX_AGE (left behind by killed workers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help="Age in seconds (defaults to MEDIA_SCRATCH_MAX_AGE).")
+
+    def handle(self, *args, **options):
+        removed = cleanup_stale_workspaces(max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} scratch workspaces."))
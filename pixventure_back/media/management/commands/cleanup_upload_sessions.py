@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from media.services.chunked_upload import cleanup_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Deletes expired resumable upload sessions and their spool files."
+
+    def handle(self, *args, **options):
+        deleted = cleanup_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} upload sessions."))
@@ -0,0 +1,42 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from media.models import MediaItem, MediaItemVersion
+
+
+class Command(BaseCommand):
+    help = ("Reports derivative cache hit rates per media type and version type: versions linked "
+            "from an earlier rendering against versions rendered (see media.services.derivative_cache).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Only versions created in the last N days.")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        rows = (
+            MediaItemVersion.objects.filter(created__gte=since, derivative_key__isnull=False)
+            .values('media_item__media_type', 'version_type')
+            .annotate(
+                versions=Count('id'),
+                hits=Count('id', filter=Q(derivative_reused=True)),
+                bytes_reused=Sum('file_size', filter=Q(derivative_reused=True)),
+            )
+            .order_by('media_item__media_type', 'version_type')
+        )
+        media_types = dict(MediaItem.MEDIA_TYPE_CHOICES)
+        names = dict(MediaItemVersion.VERSION_CHOICES)
+        total = hits = 0
+        for row in rows:
+            total, hits = total + row['versions'], hits + row['hits']
+            media_type = media_types.get(row['media_item__media_type'], row['media_item__media_type'])
+            version = names.get(row['version_type'], row['version_type'])
+            self.stdout.write(
+                f"{media_type:<8} {version:<18} {row['versions']:8d} versions, {row['hits']:8d} reused "
+                f"({row['hits'] / row['versions']:6.1%}), {(row['bytes_reused'] or 0) / (1024 * 1024):10.1f} MiB "
+                f"not rendered again"
+            )
+        rate = hits / total if total else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Hit rate since {since:%Y-%m-%d}: {hits} of {total} versions ({rate:.1%})."
+        ))
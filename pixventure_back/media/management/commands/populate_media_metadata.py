@@ -2,7 +2,7 @@ import os
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from media.models import MediaItemVersion
-from media.utils.image_loader import open_image
+from media.services.media_probe import MediaProbe, ProbeError
 
 class Command(BaseCommand):
     help = 'Populates missing width, height, and file_size metadata for MediaItemVersion instances.'
@@ -33,22 +33,20 @@ class Command(BaseCommand):
                 metadata_updated = True
                 self.stdout.write(f'Set file_size for version id {version.id}: {version.file_size} bytes.')
 
-            # Populate width and height (assuming image files)
+            # Populate width and height (and duration) from the header probe
             if version.width is None or version.height is None:
+                version.probe = None
                 try:
-                    with open_image(file_path) as img:
-                        width, height = img.size
-                        version.width = width
-                        version.height = height
-                        metadata_updated = True
-                        self.stdout.write(
-                            f'Set dimensions for version id {version.id}: {width}x{height}.'
-                        )
-                except Exception as e:
+                    probe = MediaProbe.for_version(version)
+                except ProbeError as e:
                     self.stderr.write(
-                        f'Error reading image dimensions for file {file_path}: {str(e)}'
+                        f'Error reading dimensions for file {file_path}: {str(e)}'
                     )
-                    continue  # Skip saving if image can't be read
+                    continue  # Skip saving if the file can't be read
+                metadata_updated = True
+                self.stdout.write(
+                    f'Set dimensions for version id {version.id}: {probe.width}x{probe.height}.'
+                )
 
             if metadata_updated:
                 version.save()
@@ -12,11 +12,8 @@ except ImportError:
     TQDM_AVAILABLE = False
 
 from media.models import MediaItem, MediaItemVersion
-from media.services import image_metadata, video_metadata
 from media.services.hasher import compute_file_hash, compute_fuzzy_hash
-from media.utils.video_loader import get_video_metadata  # or use video_metadata.extract_video_metadata
-from media.services.video_metadata import extract_video_metadata
-from media.services.image_metadata import extract_image_metadata
+from media.services.media_probe import MediaProbe, ProbeError, apply_probe
 from media.models import HashType, MediaItemHash
 
 class Command(BaseCommand):
@@ -71,31 +68,13 @@ class Command(BaseCommand):
                     #    We'll check if width/height/file_size is 0 or None
                     missing_metadata = (not version.width or not version.height or not version.file_size)
                     if missing_metadata:
-                        if media_item.media_type == MediaItem.PHOTO:
-                            # Attempt to treat as an image
-                            meta = extract_image_metadata(file_field)
-                            # meta => {"width":..., "height":..., "file_size":..., "format":...}
-                            version.width = meta["width"]
-                            version.height = meta["height"]
-                            version.file_size = meta["file_size"]
-                            version.save()
-                            updated_count += 1
+                        # Header-only probe (cached on the version), from the file already open.
+                        try:
+                            probe = MediaProbe.probe(file_field, is_image=media_item.media_type == MediaItem.PHOTO)
+                        except ProbeError as e:
+                            self.stderr.write(f"Could not probe version {version.id}: {e}")
                         else:
-                            # Attempt to treat as a video
-                            # You could use either your "video_metadata.extract_video_metadata" or "get_video_metadata"
-                            # For example:
-                            meta = extract_video_metadata(file_field)
-                            # meta => {"width":..., "height":..., "duration":...}
-                            if meta["width"] and meta["height"]:
-                                version.width = meta["width"]
-                                version.height = meta["height"]
-                            if "duration" in meta:
-                                # If you want to store the duration, you'd need a field in MediaItemVersion
-                                pass
-                            # file_size is trickier for in-memory or remote storage
-                            # if file_field.size is accessible, you can set it:
-                            if hasattr(file_field, 'size'):
-                                version.file_size = file_field.size
+                            apply_probe(version, probe)
                             version.save()
                             updated_count += 1
 
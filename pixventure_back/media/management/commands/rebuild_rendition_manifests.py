@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from media.models import MediaItem
+from media.services.rendition_manifest import refresh_rendition_manifest
+
+
+class Command(BaseCommand):
+    help = 'Builds the rendition manifest of MediaItems (only items without one, unless --all is given).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild manifests for every MediaItem, e.g. after MEDIA_URL or storage changes.'
+        )
+
+    def handle(self, *args, **options):
+        items = MediaItem.objects.all().only('id')
+        if not options['all']:
+            items = items.filter(renditions={})
+
+        total = items.count()
+        self.stdout.write(f'Rebuilding rendition manifests for {total} MediaItem(s).')
+
+        for media_item in items.iterator(chunk_size=500):
+            refresh_rendition_manifest(media_item)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} rendition manifest(s).'))
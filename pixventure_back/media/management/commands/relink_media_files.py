@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from media.services.storage_relink import DEFAULT_BATCH_SIZE, pending_versions, relink_batch
+
+
+class Command(BaseCommand):
+    help = ("Moves media version files to the content-addressed layout (content/ab/cd/<blake3>.<ext>) "
+            "in batches. Interrupted runs resume where they stopped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--after-id', type=int, default=0, help="Start after this MediaItemVersion id.")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches.")
+        parser.add_argument(
+            '--remove-old', action='store_true',
+            help="Delete the old files once no version refers to them (keep them while caches may still "
+                 "request the old URLs)."
+        )
+
+    def handle(self, *args, **options):
+        after_id = options['after_id']
+        self.stdout.write(f"{pending_versions(after_id).count()} version(s) to relink.")
+        batches = relinked = deduplicated = missing = removed = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            batch = relink_batch(after_id, options['batch_size'], options['remove_old'])
+            if batch.last_id is None:
+                break
+            batches += 1
+            after_id = batch.last_id
+            relinked += batch.relinked
+            deduplicated += batch.deduplicated
+            missing += batch.missing
+            removed += batch.removed
+            self.stdout.write(
+                f"Batch {batches}: up to id {after_id}, {batch.relinked} relinked "
+                f"({batch.deduplicated} already stored), {batch.missing} missing."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Relinked {relinked} version(s), {deduplicated} deduplicated, {missing} missing files, "
+            f"{removed} old files removed. Resume with --after-id {after_id}."
+        ))
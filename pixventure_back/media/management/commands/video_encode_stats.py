@@ -0,0 +1,41 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Sum
+from django.utils import timezone
+from media.models import MediaItemVersion, VideoEncodeStat
+
+
+class Command(BaseCommand):
+    help = ("Summarises recorded video encodes per profile and version type: encode time per "
+            "second of video, CPU-seconds and output bitrate, to weigh encoding cost against size.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Only encodes from the last N days.")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        rows = (
+            VideoEncodeStat.objects.filter(created__gte=since)
+            .values('profile', 'media_item_version__version_type', 'stream_copied')
+            .annotate(
+                encodes=Count('id'),
+                encode_seconds=Sum('encode_seconds'),
+                cpu_seconds=Sum('cpu_seconds'),
+                video_seconds=Sum('duration'),
+                bitrate=Avg('output_bitrate'),
+                file_size=Avg('file_size'),
+            )
+            .order_by('profile', 'media_item_version__version_type', 'stream_copied')
+        )
+        names = dict(MediaItemVersion.VERSION_CHOICES)
+        for row in rows:
+            video_seconds = row['video_seconds'] or 0
+            per_second = row['encode_seconds'] / video_seconds if video_seconds else 0
+            cpu_per_second = (row['cpu_seconds'] or 0) / video_seconds if video_seconds else 0
+            version = names.get(row['media_item_version__version_type'], row['media_item_version__version_type'])
+            self.stdout.write(
+                f"{row['profile']:<16} {version:<12}{' (copy)' if row['stream_copied'] else '       '} "
+                f"{row['encodes']:6d} encodes, {per_second:6.3f} s and {cpu_per_second:6.3f} CPU-s per video second, "
+                f"{(row['bitrate'] or 0) / 1000:8.0f} kbps, {(row['file_size'] or 0) / (1024 * 1024):8.1f} MiB avg"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(rows)} profile/version combinations since {since:%Y-%m-%d}."))
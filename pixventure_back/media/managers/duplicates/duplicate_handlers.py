@@ -3,6 +3,7 @@
 import logging
 from media.managers.duplicates.duplicate_manager import DuplicateManager
 from media.models import MediaItemVersion, HashType
+from main.providers.settings_provider import SettingsProvider
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +16,14 @@ def handle_duplicate_detection(input_data, config, regenerate):
       - A direct media_item_version_id.
     
     It retrieves the fuzzy hash (either from the context or from the database) and then
-    invokes the DuplicateManager to process duplicate cases.
+    invokes the DuplicateManager to cluster the items whose hash differs by at most
+    config["duplicate_hamming_threshold"] bits (the site setting when absent).
     """
+    if not input_data:
+        # The previous task in the chain failed and has already logged why.
+        logger.info("Duplicate detection skipped: no fuzzy hash input.")
+        return {"duplicate_cases_created": 0}
+
     if isinstance(input_data, dict):
         context = input_data
         media_item_version_id = context.get("media_item_version_id")
@@ -37,9 +44,14 @@ def handle_duplicate_detection(input_data, config, regenerate):
             logger.error("Error retrieving fuzzy hash for MediaItemVersion %s: %s", media_item_version_id, e)
             raise e
 
-    duplicate_cases = DuplicateManager.process_duplicates(media_item_version_id, hash_value, hash_type)
+    threshold = config.get("duplicate_hamming_threshold")
+    if threshold is None:
+        threshold = SettingsProvider.get_int("duplicate_hamming_threshold", 6)
+
+    cluster = DuplicateManager.process_duplicates(media_item_version_id, hash_value, hash_type, int(threshold))
+    duplicate_cases = 0 if cluster is None else 1
     logger.info(
         "Duplicate detection completed for MediaItemVersion %s: %d cases created",
-        media_item_version_id, len(duplicate_cases)
+        media_item_version_id, duplicate_cases
     )
-    return {"duplicate_cases_created": len(duplicate_cases)}
+    return {"duplicate_cases_created": duplicate_cases}
@@ -1,67 +1,123 @@
 # media/managers/duplicate_manager.py
 import logging
+from django.db import transaction
+from django.db.models import Count
 from media.models import (
     MediaItemVersion,
     MediaItemHash,
     DuplicateCluster,
     HashType
 )
+from media.services import duplicate_index
 
 logger = logging.getLogger(__name__)
 
 class DuplicateManager:
     """
-    Manager that handles grouping items with the same fuzzy hash into a DuplicateCluster.
+    Manager that handles grouping items with similar fuzzy hashes into a DuplicateCluster.
     """
 
     @staticmethod
-    def process_duplicates(media_item_version_id, hash_value, hash_type="phash"):
+    def find_duplicate_versions(version, hash_value, hash_type="phash", threshold=0):
+        """
+        Returns the ids of the other versions whose hash is within `threshold`
+        bits of hash_value: looked up in the near-duplicate index for 64-bit
+        phashes, by exact match otherwise.
+        """
+        if hash_type == duplicate_index.HASH_TYPE:
+            matches = duplicate_index.find_similar_versions(hash_value, threshold, exclude_version_id=version.id)
+            if matches is not None:
+                return list(matches)
+        return list(
+            MediaItemHash.objects.filter(hash_type__name=hash_type, hash_value=hash_value)
+            .exclude(media_item_version=version)
+            .values_list("media_item_version_id", flat=True)
+        )
+
+    @staticmethod
+    def process_duplicates(media_item_version_id, hash_value, hash_type="phash", threshold=0):
+        """
+        Puts the item of the version and the items of every version within
+        `threshold` bits of its hash into one cluster: the cluster already
+        holding them (the largest one, merged with the others, when they are in
+        several), or the cluster of this hash value.
+        Returns the cluster, or None when no other item matches.
+        """
         try:
-            version = MediaItemVersion.objects.get(id=media_item_version_id)
+            version = MediaItemVersion.objects.select_related("media_item").get(id=media_item_version_id)
         except MediaItemVersion.DoesNotExist:
             logger.error("MediaItemVersion with ID %s does not exist.", media_item_version_id)
             return None
 
         candidate_media_item = version.media_item
 
-        # 1. Get or create a cluster for this (hash_type, hash_value).
         try:
             hash_type_obj = HashType.objects.get(name=hash_type)
         except HashType.DoesNotExist:
             logger.error("HashType '%s' does not exist.", hash_type)
             return None
 
-        cluster, created = DuplicateCluster.objects.get_or_create(
-            hash_type=hash_type_obj,
-            hash_value=hash_value,
-            defaults={"status": DuplicateCluster.PENDING}
+        # 1. Find the items of all other versions with a similar hash.
+        duplicate_version_ids = DuplicateManager.find_duplicate_versions(version, hash_value, hash_type, threshold)
+        duplicate_item_ids = set(
+            MediaItemVersion.objects.filter(id__in=duplicate_version_ids)
+            .exclude(media_item=candidate_media_item)
+            .values_list("media_item_id", flat=True)
         )
+        if not duplicate_item_ids:
+            logger.info("No duplicates of MediaItem %s (hash: %s).", candidate_media_item.id, hash_value)
+            return None
 
-        # 2. Add the candidate item to the cluster
-        cluster.items.add(candidate_media_item)
+        item_ids = {candidate_media_item.id} | duplicate_item_ids
+        through = DuplicateCluster.items.through
+        with transaction.atomic():
+            # 2. Find the clusters these items already belong to.
+            memberships = list(
+                through.objects.filter(mediaitem_id__in=item_ids, duplicatecluster__hash_type=hash_type_obj)
+                .values_list("duplicatecluster_id", "mediaitem_id")
+            )
+            cluster_ids = {cluster_id for cluster_id, _ in memberships}
+            new_item_ids = item_ids - {item_id for _, item_id in memberships}
+            clusters = list(
+                DuplicateCluster.objects.select_for_update().filter(id__in=cluster_ids).order_by("id")
+            )
 
-        # 3. Find all existing items that share the same hash (excluding current version)
-        duplicate_hashes = MediaItemHash.objects.filter(
-            hash_type__name=hash_type,
-            hash_value=hash_value
-        ).exclude(media_item_version=version)
+            # 3. Union: when the items bridge several clusters, merge them into the
+            # largest (union by size, so an item is moved at most log n times).
+            merged_best_ids = []
+            if clusters:
+                sizes = dict(
+                    through.objects.filter(duplicatecluster_id__in=cluster_ids)
+                    .values("duplicatecluster_id").annotate(size=Count("id"))
+                    .values_list("duplicatecluster_id", "size")
+                )
+                cluster = max(clusters, key=lambda c: (sizes.get(c.id, 0), -c.id))
+                merged_best_ids = cluster.merge(clusters)
+            else:
+                cluster, created = DuplicateCluster.objects.get_or_create(
+                    hash_type=hash_type_obj,
+                    hash_value=hash_value,
+                    defaults={"status": DuplicateCluster.PENDING}
+                )
 
-        # Add each of those items to the cluster (including older items like Item 1)
-        for dup_hash in duplicate_hashes:
-            existing_duplicate_item = dup_hash.media_item_version.media_item
-            cluster.items.add(existing_duplicate_item)
+            # 4. Add the items not in any cluster yet with one bulk insert.
+            cluster.add_items(new_item_ids)
 
-        # 4. Recompute the best item for the entire cluster now that all relevant items are in
-        cluster.update_best_item()
+            # 5. Clustered items were compared with their cluster's best already:
+            # only the newcomers and the merged clusters' best items are compared
+            # with the current best, whatever the cluster size.
+            cluster.consider_best_item(merged_best_ids + sorted(new_item_ids))
 
-        # 5. Update status if needed
-        if cluster.status != DuplicateCluster.CONFIRMED:
-            cluster.status = DuplicateCluster.PENDING
-        cluster.save()
+            # 6. New items reopen an ignored cluster for review; confirmed stays confirmed.
+            if new_item_ids and cluster.status != DuplicateCluster.CONFIRMED:
+                cluster.status = DuplicateCluster.PENDING
+            cluster.save()
 
         logger.info(
-            "DuplicateCluster %s updated with new item %s (hash: %s). Now has %d items.",
-            cluster.id, candidate_media_item.id, hash_value, cluster.items.count()
+            "DuplicateCluster %s updated with new item %s (hash: %s, %d duplicates within %d bits, "
+            "%d clusters merged). Now has %d items.",
+            cluster.id, candidate_media_item.id, hash_value, len(duplicate_item_ids), threshold,
+            max(len(clusters) - 1, 0), cluster.items.count()
         )
 
         return cluster
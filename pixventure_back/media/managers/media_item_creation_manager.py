@@ -2,10 +2,12 @@
 import random
 import logging
 from celery import chain
+from django.db import transaction
 from media.models import MediaItem, MediaItemVersion
-from media.services.file_processor import process_uploaded_file
+from media.services.file_processor import accept_uploaded_file, ingest_original, process_uploaded_file
+from media.services.ingest_status import mark_processing_failed
 from media.managers.media_versions.media_version_manager import MediaVersionManager
-from media.jobs.dispatcher import dispatch_fuzzy_hash, dispatch_duplicate_detection
+from media.jobs.dispatcher import dispatch_fuzzy_hash, dispatch_duplicate_detection, dispatch_ingest
 from main.providers.settings_provider import SettingsProvider
 
 logger = logging.getLogger(__name__)
@@ -20,20 +22,23 @@ class MediaItemCreationManager:
       3. Create the media item using the file processor.
       4. Update the media item's `is_blurred` flag.
       5. Call the MediaVersionManager to process required media versions.
-      6. Call the HashingManager to enqueue fuzzy hash computation for the original version.
+      6. Call the HashingManager to enqueue fuzzy hash computation for the original version
+         (not for images: the image pipeline computes their phash itself).
+
+    Asynchronous ingest splits this in two: accept_media_item() stores the upload
+    and returns right away; complete_ingest() runs steps 3 (metadata, thumbnail)
+    to 6 on a worker.
     """
+
+    @staticmethod
+    def _flip_blur_coin():
+        item_blur_probability = SettingsProvider.get_float("item_blur_probability", 0.0)
+        return random.random() < item_blur_probability
     
     @staticmethod
     def create_media_item(file_obj, user):
-        # 1. Fetch the item blur probability.
-        prob_str = SettingsProvider.get_setting("item_blur_probability")
-        try:
-            item_blur_probability = float(prob_str)
-        except (TypeError, ValueError):
-            item_blur_probability = 0.0  # Default
-        
-        # 2. Decide if the item should be blurred.
-        is_blurred = random.random() < item_blur_probability
+        # 1-2. Decide if the item should be blurred.
+        is_blurred = MediaItemCreationManager._flip_blur_coin()
         
         # 3. Process the file and create the media item.
         result = process_uploaded_file(file_obj, user)
@@ -44,6 +49,39 @@ class MediaItemCreationManager:
         # 4. Update the media item's blur flag.
         MediaItem.objects.filter(id=media_item_id).update(is_blurred=is_blurred)
         
+        # 5-6. Schedule versions and hashing.
+        MediaItemCreationManager.schedule_processing(media_item_id)
+        return result
+
+    @staticmethod
+    def accept_media_item(file_obj, user):
+        """
+        Stores the upload as a PROCESSING media item and enqueues the rest of the
+        ingest once the transaction commits. Returns {"media_item_id": ...} or {"error": ...}.
+        """
+        result = accept_uploaded_file(file_obj, user, is_blurred=MediaItemCreationManager._flip_blur_coin())
+        if "error" in result:
+            return result
+        media_item_id = result["media_item_id"]
+        transaction.on_commit(lambda: dispatch_ingest(media_item_id))
+        return result
+
+    @staticmethod
+    def complete_ingest(media_item_id):
+        """
+        Worker side of asynchronous ingest. On failure the item is marked
+        PROCESSING_FAILED with the reason and the error is re-raised.
+        """
+        media_item = MediaItem.objects.get(id=media_item_id)
+        try:
+            ingest_original(media_item)
+        except Exception as e:
+            mark_processing_failed(media_item_id, e)
+            raise
+        MediaItemCreationManager.schedule_processing(media_item_id)
+
+    @staticmethod
+    def schedule_processing(media_item_id):
         # 5. Delegate version creation to the MediaVersionManager.
         mvm = MediaVersionManager(media_item_id)
         # The MediaVersionManager will determine which versions are needed based on the media item.
@@ -51,7 +89,9 @@ class MediaItemCreationManager:
         
         # 6. Enqueue fuzzy hash computation via the HashingManager.
         try:
-            media_item = MediaItem.objects.get(id=media_item_id)
+            media_item = mvm.media_item
+            if media_item.media_type == MediaItem.PHOTO:
+                return
             original_version = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
             chain(
                 dispatch_fuzzy_hash(original_version.id, "phash", regenerate=False),
@@ -59,5 +99,3 @@ class MediaItemCreationManager:
             ).apply_async(ignore_result=True)
         except Exception as e:
             logger.error("Error scheduling hash and duplicate detection: %s", str(e))
-
-        return result
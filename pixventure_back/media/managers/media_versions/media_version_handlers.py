@@ -1,14 +1,87 @@
 # media/managers/media_version_handlers.py
 import logging
 from media.models import MediaItem, MediaItemVersion
-from media.services import media_version_creator, watermark, video_processor
+from media.services import derivative_cache, media_version_creator, watermark, video_processor, video_pipeline
+from media.services.image_pipeline import render_versions
 from media.services.image_resizer import generate_resized_image
+from media.services.ingest_status import mark_processing_failed
+from media.services.scratch import scratch_workspace
 
 logger = logging.getLogger(__name__)
 
+# ---------------------------
+# Ingest Handler
+# ---------------------------
+def handle_media_ingest(media_item_id, config, regenerate=False):
+    """
+    Finishes an asynchronously accepted upload (metadata, thumbnail) and schedules its versions.
+    """
+    # Imported here: the creation manager imports the dispatcher, which imports the task module.
+    from media.managers.media_item_creation_manager import MediaItemCreationManager
+    try:
+        MediaItemCreationManager.complete_ingest(media_item_id)
+        logger.info("Ingest completed for MediaItem %s", media_item_id)
+        return True
+    except Exception as e:
+        logger.error("Error in media ingest handler: %s", e)
+        return False
+
 # ---------------------------
 # Image Handlers
 # ---------------------------
+def handle_image_derivatives(media_item_id, config, regenerate=False):
+    """
+    Renders all image versions listed in config["allowed_versions"] and the phash
+    of the original from a single decode (see media.services.image_pipeline).
+    Versions already rendered from the same content and settings are linked
+    instead (see media.services.derivative_cache).
+
+    Returns the fuzzy hash context consumed by duplicate detection, or None on
+    failure (a media item not moderated yet is then marked PROCESSING_FAILED).
+    """
+    try:
+        media_item = MediaItem.objects.get(id=media_item_id)
+        original_version = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
+        source = derivative_cache.source_hash(original_version)
+        keys = derivative_cache.derivative_keys(source, derivative_cache.IMAGE, config["allowed_versions"], config)
+        cached = derivative_cache.find_cached(keys)
+        derivative_cache.log_lookup(media_item.id, derivative_cache.IMAGE, keys, cached)
+        for version_type, cached_version in cached.items():
+            media_version_creator.link_media_item_version(media_item, version_type, cached_version, keys[version_type])
+
+        to_render = [version for version in config["allowed_versions"] if version not in cached]
+        phash = derivative_cache.cached_phash(source)
+        timings = {}
+        if to_render or phash is None:
+            result = render_versions(original_version.file, config, to_render)
+            phash, timings = result.phash, result.timings
+            try:
+                for version_type, rendered in result.versions.items():
+                    media_version_creator.create_media_item_version(
+                        media_item=media_item,
+                        file_obj=rendered.file,
+                        version_type=version_type,
+                        is_image=True,
+                        meta=rendered.meta,
+                        derivative_key=keys.get(version_type)
+                    )
+            finally:
+                # Spooled outputs are moved into storage; closing drops those left behind.
+                for rendered in result.versions.values():
+                    rendered.file.close()
+
+        derivative_cache.store_phash(original_version, phash)
+        logger.info("Image derivatives created for MediaItem %s, timings (ms): %s", media_item.id, timings)
+        return {
+            "media_item_version_id": original_version.id,
+            "hash_value": phash,
+            "hash_type": "phash",
+        }
+    except Exception as e:
+        logger.error("Error in image derivatives handler: %s", e)
+        mark_processing_failed(media_item_id, e)
+        return None
+
 def handle_image_preview(media_item_id, config, regenerate=False):
     try:
         media_item = MediaItem.objects.get(id=media_item_id)
@@ -96,19 +169,65 @@ def handle_image_blurred_preview(media_item_id, config, regenerate=False):
 # ---------------------------
 # Video Handlers
 # ---------------------------
+def handle_video_derivatives(media_item_id, config, regenerate=False):
+    """
+    Renders all video versions listed in config["allowed_versions"] with a single
+    ffmpeg invocation (see media.services.video_pipeline). Versions already
+    rendered from the same content and settings are linked instead (see
+    media.services.derivative_cache). On failure, a media item not moderated yet
+    is marked PROCESSING_FAILED.
+    """
+    try:
+        media_item = MediaItem.objects.get(id=media_item_id)
+        original = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
+        source = derivative_cache.source_hash(original)
+        keys = derivative_cache.derivative_keys(source, derivative_cache.VIDEO, config["allowed_versions"], config)
+        cached = derivative_cache.find_cached(keys)
+        derivative_cache.log_lookup(media_item.id, derivative_cache.VIDEO, keys, cached)
+        for version_type, cached_version in cached.items():
+            media_version_creator.link_media_item_version(media_item, version_type, cached_version, keys[version_type])
+        to_render = [version for version in config["allowed_versions"] if version not in cached]
+        if not to_render:
+            logger.info("Video derivatives of MediaItem %s all reused", media_item.id)
+            return True
+
+        needed = video_pipeline.scratch_bytes_needed(original.file.size)
+        # The default scratch volume is the media volume, where storing outputs is a rename.
+        with scratch_workspace(prefix="video-", needed_bytes=needed) as workdir:
+            result = video_pipeline.render_video_versions(media_item, config, to_render, workdir)
+            stored = {}
+            for version_type, (file_obj, metadata) in result.versions.items():
+                is_image = version_type == MediaItemVersion.THUMBNAIL
+                stored[version_type] = media_version_creator.create_media_item_version(
+                    media_item=media_item,
+                    file_obj=file_obj,
+                    version_type=version_type,
+                    is_image=is_image,
+                    meta=metadata if is_image else None,
+                    probe=None if is_image else metadata,
+                    derivative_key=keys.get(version_type)
+                )
+                file_obj.close()
+        video_pipeline.record_encode_stats(stored, result.encodes)
+        logger.info(
+            "Video derivatives created for MediaItem %s (preview stream-copied: %s), timings (ms): %s",
+            media_item.id, result.preview_stream_copied, result.timings
+        )
+        return True
+    except Exception as e:
+        logger.error("Error in video derivatives handler: %s", e)
+        mark_processing_failed(media_item_id, e)
+        return False
+
 def handle_video_watermarked(media_item_id, config, regenerate=False):
     try:
         media_item = MediaItem.objects.get(id=media_item_id)
-        watermarked_file, duration = video_processor.create_watermarked_video(
+        # The original's duration is stored by its probe (MediaProbe.for_version).
+        watermarked_file, _ = video_processor.create_watermarked_video(
             media_item,
             quality=config["full_watermarked_version_quality"],
             max_video_bitrate=config["max_video_bitrate"]
         )
-        # Update original version with duration.
-        original_version = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
-        original_version.video_duration = duration
-        original_version.save()
-        
         media_version_creator.create_media_item_version(
             media_item=media_item,
             file_obj=watermarked_file,
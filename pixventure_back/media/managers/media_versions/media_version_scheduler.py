@@ -2,14 +2,15 @@
 import logging
 from media.models import MediaItem, MediaItemVersion
 from media.jobs import dispatcher
+from media.services.video_pipeline import SUPPORTED_VERSIONS as VIDEO_PIPELINE_VERSIONS
 
 logger = logging.getLogger(__name__)
 
 def schedule_versions(media_item, config, allowed_versions, regenerate=False):
     """
     Schedules version creation for a media item.
-    For images, tasks are dispatched concurrently.
-    For videos, tasks are dispatched as a chain.
+    For images, a single pipeline task renders all versions and the phash.
+    For videos, a single pipeline task renders all versions with one ffmpeg invocation.
     """
     from media.models import MediaItem
     if media_item.media_type == MediaItem.VIDEO:
@@ -20,51 +21,25 @@ def schedule_versions(media_item, config, allowed_versions, regenerate=False):
         logger.info("Unsupported media type for MediaItem %s", media_item.id)
 
 def _schedule_image_versions(media_item, config, allowed_versions, regenerate):
-    task_list = []
-    for version in allowed_versions:
-        task_name = _get_image_task_name(version)
-        if task_name:
-            task_list.append({
-                'task_name': task_name,
-                'media_item_id': media_item.id,
-                'config': config,
-                'regenerate': regenerate
-            })
-    if task_list:
-        dispatcher.dispatch_concurrent(task_list)
-        logger.info("Dispatched concurrent image tasks for MediaItem %s", media_item.id)
-    else:
-        logger.info("No image tasks to dispatch for MediaItem %s", media_item.id)
+    # One task decodes the original once and renders every version plus the phash.
+    versions = [version for version in allowed_versions if _get_image_task_name(version)]
+    dispatcher.dispatch_image_pipeline(
+        media_item.id,
+        dict(config, allowed_versions=versions),
+        regenerate
+    )
 
 def _schedule_video_versions(media_item, config, allowed_versions, regenerate):
-    task_list = []
-    # Define the chain order for video tasks: watermarked -> preview -> thumbnail.
-    if MediaItemVersion.WATERMARKED in allowed_versions:
-        task_list.append({
-            'task_name': "video_watermarked",
-            'media_item_id': media_item.id,
-            'config': config,
-            'regenerate': regenerate
-        })
-    if MediaItemVersion.PREVIEW in allowed_versions:
-        task_list.append({
-            'task_name': "video_preview",
-            'media_item_id': media_item.id,
-            'config': config,
-            'regenerate': regenerate
-        })
-    if MediaItemVersion.THUMBNAIL in allowed_versions:
-        task_list.append({
-            'task_name': "video_thumbnail",
-            'media_item_id': media_item.id,
-            'config': config,
-            'regenerate': regenerate
-        })
-    if task_list:
-        dispatcher.dispatch_chain(task_list)
-        logger.info("Dispatched video task chain for MediaItem %s", media_item.id)
-    else:
+    # One task decodes the original once and renders every version in a single ffmpeg run.
+    versions = [version for version in allowed_versions if version in VIDEO_PIPELINE_VERSIONS]
+    if not versions:
         logger.info("No video tasks to dispatch for MediaItem %s", media_item.id)
+        return
+    dispatcher.dispatch_video_pipeline(
+        media_item.id,
+        dict(config, allowed_versions=versions),
+        regenerate
+    )
 
 def _get_image_task_name(version_type):
     mapping = {
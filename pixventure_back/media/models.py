@@ -2,6 +2,7 @@ import os
 import uuid
 from django.db import models
 from django.contrib.auth.models import User
+from media.storage import get_media_version_storage
 
 
 def media_version_upload_to(instance, filename):
@@ -10,6 +11,7 @@ def media_version_upload_to(instance, filename):
     
     For the ORIGINAL version, a generic filename is generated (e.g. original_<uuid>.<ext>).
     For other versions, files are stored in version-specific folders.
+    Only the extension is kept in the content-addressed layout (see media.storage).
     """
     # Mapping from version type to folder name.
     folder_map = {
@@ -52,6 +54,8 @@ class MediaItem(models.Model):
     REJECTED = 5
     DELETED = 6
     ARCHIVED = 7
+    PROCESSING = 8
+    PROCESSING_FAILED = 9
 
     STATUS_CHOICES = [
         (DRAFT, 'Draft'),
@@ -62,6 +66,8 @@ class MediaItem(models.Model):
         (REJECTED, 'Rejected by moderation'),
         (DELETED, 'Deleted'),
         (ARCHIVED, 'Archived'),
+        (PROCESSING, 'Processing upload'),
+        (PROCESSING_FAILED, 'Upload processing failed'),
     ]
 
     status = models.IntegerField(
@@ -71,6 +77,9 @@ class MediaItem(models.Model):
         blank=False
     )
 
+    # Why asynchronous ingest failed (status PROCESSING_FAILED).
+    processing_error = models.CharField(max_length=255, blank=True, default='')
+
     # Media type (photo or video)
     PHOTO = 1
     VIDEO = 2
@@ -98,6 +107,16 @@ class MediaItem(models.Model):
     # Blurred items will be blurred for non-paying users
     is_blurred = models.BooleanField(default=False)
 
+    # Denormalised rendition manifest: version_type -> url, width, height, file_size.
+    # Rewritten whenever a version is created (see media.services.rendition_manifest).
+    renditions = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the owner's media items: ORDER BY created DESC, id DESC
+            models.Index(fields=['owner', '-created', '-id'], name='mediaitem_owner_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.id} (Type: {self.get_media_type_display()})"
     
@@ -132,7 +151,9 @@ class MediaItemVersion(models.Model):
     media_item = models.ForeignKey('MediaItem', on_delete=models.CASCADE, related_name='versions')
 
     # File reference for this version using the custom upload_to callable.
-    file = models.FileField(upload_to=media_version_upload_to, null=True, blank=True)
+    file = models.FileField(
+        upload_to=media_version_upload_to, storage=get_media_version_storage, null=True, blank=True
+    )
 
     # Metadata specific to this version
     width = models.IntegerField(null=True, blank=True)
@@ -141,10 +162,24 @@ class MediaItemVersion(models.Model):
     
     # For videos only – store duration in seconds.
     video_duration = models.FloatField(null=True, blank=True)
+
+    # Header probe of the file (format, codec, rotation...), see media.services.media_probe.
+    probe = models.JSONField(null=True, blank=True)
     
     # Whether the file has been renamed for SEO or other reasons
     is_renamed = models.BooleanField(default=False)
 
+    # Cache key of rendered versions (source content, settings, code version), and
+    # whether the file was linked from an earlier version with the same key instead
+    # of being rendered. See media.services.derivative_cache.
+    derivative_key = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    derivative_reused = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['media_item', 'version_type'], name='mediaversion_item_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_version_type_display()} version of MediaItem {self.media_item.id}"
 
@@ -176,37 +211,58 @@ class MediaItemHash(models.Model):
     hash_type = models.ForeignKey(HashType, null=True, on_delete=models.CASCADE, related_name='hashes')
     hash_value = models.CharField(null=True, max_length=64)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['hash_type', 'hash_value'], name='mediahash_type_value_idx'),
+            # Incremental duplicate index refreshes: hashes of a type updated since a watermark.
+            models.Index(fields=['hash_type', 'updated'], name='mediahash_type_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Hash ({self.hash_type.name}) for MediaItemVersion {self.media_item_version.id}"
     
     
+def _original_ranks(media_item_ids):
+    """
+    Returns {MediaItem id: (pixels, file size)} of the original versions of the
+    given items, in a single query. Items without an original are left out.
+    """
+    ranks = {}
+    originals = MediaItemVersion.objects.filter(
+        media_item_id__in=media_item_ids, version_type=MediaItemVersion.ORIGINAL
+    ).order_by("-id").values_list("media_item_id", "width", "height", "file_size")
+    for media_item_id, width, height, file_size in originals:
+        ranks[media_item_id] = ((width or 0) * (height or 0), file_size or 0)
+    return ranks
+
+
+def _best_of(media_item_ids):
+    """
+    Returns the id of the best of the given items: highest resolution, then
+    biggest file. The first one listed wins ties, so an incumbent listed first
+    is only replaced by a strictly better item.
+    """
+    ranks = _original_ranks(media_item_ids)
+    best_id = None
+    for media_item_id in media_item_ids:
+        rank = ranks.get(media_item_id)
+        if rank is not None and (best_id is None or rank > ranks[best_id]):
+            best_id = media_item_id
+    return best_id
+
+
 def _is_better_than(candidate: MediaItem, incumbent: MediaItem) -> bool:
     """
     Returns True if candidate is "better" than incumbent by:
-      1) Higher resolution (width x height),
+      1) Higher resolution (width x height) of the original version,
       2) If resolution ties, bigger file size.
+    False when either has no original version.
     """
-    # We assume 'best' means highest total pixels. If items have multiple versions,
-    # we need to figure out which version to compare. Let's assume the original version.
-    cand_original = candidate.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
-    inc_original = incumbent.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
-
-    # If either doesn't exist or data is missing, default to false or fallback logic
-    if not cand_original or not inc_original:
+    ranks = _original_ranks([candidate.id, incumbent.id])
+    if candidate.id not in ranks or incumbent.id not in ranks:
         return False
+    return ranks[candidate.id] > ranks[incumbent.id]
 
-    cand_pixels = (cand_original.width or 0) * (cand_original.height or 0)
-    inc_pixels = (inc_original.width or 0) * (inc_original.height or 0)
-
-    if cand_pixels > inc_pixels:
-        return True
-    elif cand_pixels < inc_pixels:
-        return False
-    else:
-        # If pixel count is the same, fallback to file size.
-        cand_size = cand_original.file_size or 0
-        inc_size = inc_original.file_size or 0
-        return cand_size > inc_size
 
 class DuplicateCluster(models.Model):
     PENDING = 0
@@ -249,21 +305,152 @@ class DuplicateCluster(models.Model):
     def __str__(self):
         return f"Cluster {self.id} - {self.hash_type.name}:{self.hash_value}"
 
+    def member_ids(self):
+        return list(DuplicateCluster.items.through.objects.filter(duplicatecluster=self)
+                    .values_list("mediaitem_id", flat=True))
+
+    def add_items(self, media_item_ids):
+        """
+        Adds items with one bulk insert into the through table (existing members are skipped).
+        """
+        through = DuplicateCluster.items.through
+        through.objects.bulk_create(
+            [through(duplicatecluster_id=self.id, mediaitem_id=media_item_id) for media_item_id in set(media_item_ids)],
+            ignore_conflicts=True
+        )
+
+    def merge(self, others):
+        """
+        Union of clusters: moves the items of the other clusters into this one
+        and deletes them. A moderator's decision on any of them is kept: the
+        cluster takes the strongest status (confirmed, then ignored, then
+        pending; not saved). Returns the best items of the merged clusters (the
+        candidates for this cluster's best item).
+        """
+        others = [other for other in others if other.id != self.id]
+        if not others:
+            return []
+        statuses = {self.status} | {other.status for other in others}
+        self.status = next(status for status in (self.CONFIRMED, self.IGNORED, self.PENDING) if status in statuses)
+        other_ids = [other.id for other in others]
+        self.add_items(
+            DuplicateCluster.items.through.objects.filter(duplicatecluster_id__in=other_ids)
+            .values_list("mediaitem_id", flat=True)
+        )
+        DuplicateCluster.objects.filter(id__in=other_ids).delete()
+        return [other.best_item_id for other in others if other.best_item_id]
+
+    def consider_best_item(self, media_item_ids):
+        """
+        Incremental best item update for items joining the cluster: compares
+        them with the current best only (one query), whatever the cluster size.
+        Returns True when the best item changed (not saved).
+        """
+        candidates = ([self.best_item_id] if self.best_item_id else []) + [
+            media_item_id for media_item_id in media_item_ids if media_item_id != self.best_item_id
+        ]
+        best_id = _best_of(candidates)
+        if best_id is None or best_id == self.best_item_id:
+            return False
+        self.best_item_id = best_id
+        return True
+
     def update_best_item(self):
         """
         Always re-evaluates which item in this cluster is 'best' according to:
         1. Higher resolution (width * height)
         2. If resolution ties, prefer larger file size.
+        Reads the cluster in two queries whatever its size; consider_best_item() is enough
+        when items are only added.
+        """
+        self.best_item_id = _best_of(sorted(self.member_ids()))
+        self.save()
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked upload (see media.services.chunked_upload).
+    Chunks are written into a sparse spool file at their offsets, in any order;
+    the received chunk indexes are tracked here until the session is completed.
+    """
+    OPEN = 0
+    COMPLETED = 1
+    ABORTED = 2
+
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETED, 'Completed'),
+        (ABORTED, 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=256)
+    content_type = models.CharField(max_length=128, blank=True, default='')
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    received_chunks = models.JSONField(default=list, blank=True)
+    # Every accepted PUT, including re-sent chunks.
+    chunk_writes = models.IntegerField(default=0)
+    status = models.IntegerField(choices=STATUS_CHOICES, default=OPEN)
+    expires_at = models.DateTimeField()
+    media_item = models.ForeignKey(
+        MediaItem, null=True, blank=True, on_delete=models.SET_NULL, related_name='upload_sessions'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='uploadsession_status_exp_idx'),
+        ]
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """
+        Expected byte length of chunk `index` (the last one may be shorter).
         """
-        if not self.items.exists():
-            self.best_item = None
-            self.save()
-            return
-
-        best_item = None
-        for item in self.items.all():
-            if best_item is None or _is_better_than(item, best_item):
-                best_item = item
-
-        self.best_item = best_item
-        self.save()
\ No newline at end of file
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+
+    def missing_chunks(self):
+        received = set(self.received_chunks)
+        return [index for index in range(self.chunk_count) if index not in received]
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.filename}, {self.get_status_display()})"
+
+
+class VideoEncodeStat(models.Model):
+    """
+    Cost and size of one encoded video version, by encoding profile
+    (see media.services.video_pipeline), to tune profiles with data.
+    """
+    created = models.DateTimeField(auto_now_add=True)
+
+    media_item_version = models.ForeignKey(
+        MediaItemVersion, on_delete=models.CASCADE, related_name='encode_stats'
+    )
+    profile = models.CharField(max_length=64)
+    # Wall and CPU time of the ffmpeg run(s) that produced the file; versions
+    # encoded by the same run share them.
+    encode_seconds = models.FloatField()
+    cpu_seconds = models.FloatField(null=True, blank=True)
+    # Cut from another version without re-encoding.
+    stream_copied = models.BooleanField(default=False)
+    # Parallel segments the encode was split into (see media.services.segmented_encode).
+    segments = models.PositiveSmallIntegerField(default=1)
+    duration = models.FloatField(null=True, blank=True)
+    file_size = models.BigIntegerField()
+    # Bits per second.
+    output_bitrate = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'created'], name='encodestat_profile_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.profile} encode of MediaItemVersion {self.media_item_version_id}"
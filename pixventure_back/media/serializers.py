@@ -1,9 +1,9 @@
 # media/serializers.py
 
 from rest_framework import serializers
-from .models import MediaItem, MediaItemVersion
+from .models import MediaItem, MediaItemVersion, UploadSession
 from social.utils import user_has_liked
-from media.utils.media_file import get_media_file_for_display, is_media_locked
+from media.utils.media_file import get_media_file_for_display, get_media_rendition, is_media_locked
 
 
 class TileInfoMixin(serializers.Serializer):
@@ -73,6 +73,9 @@ class MediaItemSerializer(TileInfoMixin, serializers.ModelSerializer):
         return "unknown"
 
     def get_has_liked(self, obj):
+        liked_media_ids = self.context.get('liked_media_ids')
+        if liked_media_ids is not None:
+            return obj.pk in liked_media_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return user_has_liked(request.user, media_item=obj)
@@ -100,7 +103,7 @@ class MediaItemSerializer(TileInfoMixin, serializers.ModelSerializer):
         
     # TileInfoMixin's required method:
     def get_featured_image_dimensions(self, obj):
-        thumbnail = obj.versions.filter(version_type=MediaItemVersion.THUMBNAIL).first()
+        thumbnail = get_media_rendition(obj, MediaItemVersion.THUMBNAIL)
         if thumbnail and thumbnail.width and thumbnail.height:
             return (thumbnail.width, thumbnail.height)
         return None
@@ -180,19 +183,53 @@ class UnpublishedMediaItemSerializer(serializers.ModelSerializer):
         return obj.get_status_display()
 
     def get_thumbnail_url(self, obj):
-        thumb_version = obj.versions.filter(version_type=MediaItemVersion.THUMBNAIL).first()
-        if thumb_version and thumb_version.file:
-            return thumb_version.file.url
-        return ""
+        thumb_version = get_media_rendition(obj, MediaItemVersion.THUMBNAIL)
+        return thumb_version.url if thumb_version else ""
 
     def get_width(self, obj):
-        orig_version = obj.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
+        orig_version = get_media_rendition(obj, MediaItemVersion.ORIGINAL)
         return orig_version.width if orig_version else None
 
     def get_height(self, obj):
-        orig_version = obj.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
+        orig_version = get_media_rendition(obj, MediaItemVersion.ORIGINAL)
         return orig_version.height if orig_version else None
 
     def get_file_size(self, obj):
-        orig_version = obj.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
-        return orig_version.file_size if orig_version else None
\ No newline at end of file
+        orig_version = get_media_rendition(obj, MediaItemVersion.ORIGINAL)
+        return orig_version.file_size if orig_version else None
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=256)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=128, required=False, allow_blank=True)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    State of a resumable upload: what has been received and what is missing.
+    """
+    upload_id = serializers.UUIDField(source="id", read_only=True)
+    status = serializers.SerializerMethodField()
+    chunk_count = serializers.IntegerField(read_only=True)
+    missing_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "upload_id",
+            "status",
+            "filename",
+            "total_size",
+            "chunk_size",
+            "chunk_count",
+            "received_chunks",
+            "missing_chunks",
+            "expires_at",
+            "media_item",
+        ]
+
+    def get_status(self, obj):
+        return obj.get_status_display().lower()
+
+    def get_missing_chunks(self, obj):
+        return obj.missing_chunks()
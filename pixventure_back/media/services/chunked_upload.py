@@ -0,0 +1,346 @@
+# media/services/chunked_upload.py
+"""
+Resumable chunked uploads.
+
+Protocol (see the upload views in media.views):
+  1. create a session: the server fixes the chunk size and pre-allocates a sparse
+     spool file of the announced total size;
+  2. PUT chunks by index, in any order and in parallel; each one is checked
+     (length), written straight to its offset (pwrite) and its index recorded on
+     the session; re-sending a chunk after a network error simply overwrites it;
+  3. complete: once every chunk is there, the assembled file is handed to
+     MediaItemCreationManager like a regular streamed upload.
+
+BLAKE3 is computed incrementally in chunk order: whenever the chunk at the
+hashing frontier arrives, the frontier advances over every contiguous chunk
+already on disk. The hasher lives in the process that received the chunks. It
+is only trusted at completion if it saw every chunk write of the session;
+otherwise (chunks spread over several processes, a hashed chunk re-sent, the
+hasher evicted) the file is hashed again at completion time. Each process keeps
+at most MEDIA_UPLOAD_MAX_HASHERS hashers and drops those of sessions idle for
+longer than the session TTL (abandoned uploads), least recently used first.
+
+Abandoned sessions expire after MEDIA_UPLOAD_SESSION_TTL seconds without
+activity and are removed by cleanup_expired_sessions().
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+import blake3
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from media.models import UploadSession
+from media.upload_handlers import SNIFF_BYTES, AssembledUploadedFile, get_spool_dir, sniff_content_type
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_SIZE = 4 * 1024 * 1024 * 1024
+DEFAULT_SESSION_TTL = 24 * 60 * 60
+DEFAULT_MAX_HASHERS = 256
+IO_BLOCK_SIZE = 1024 * 1024
+
+
+class ChunkError(ValueError):
+    """
+    A chunk or session request that cannot be accepted (bad index, size, state).
+    """
+
+
+def get_chunk_size():
+    return getattr(settings, "MEDIA_UPLOAD_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+
+def get_max_size():
+    return getattr(settings, "MEDIA_UPLOAD_MAX_SIZE", DEFAULT_MAX_SIZE)
+
+
+def get_session_ttl():
+    return timedelta(seconds=getattr(settings, "MEDIA_UPLOAD_SESSION_TTL", DEFAULT_SESSION_TTL))
+
+
+def part_path(session_id):
+    return os.path.join(get_spool_dir(), f"{session_id}.part")
+
+
+# ---------------------------
+# Disk and hashing (no database access)
+# ---------------------------
+def allocate_part_file(path, total_size):
+    """
+    Creates the spool file at its final size without writing data (sparse).
+    """
+    with open(path, "wb") as f:
+        f.truncate(total_size)
+
+
+def read_chunk(stream, expected_length, block_size=IO_BLOCK_SIZE):
+    """
+    Reads exactly expected_length bytes from stream, block by block.
+
+    :raises ChunkError: If the stream holds more or fewer bytes than expected.
+    """
+    data = bytearray()
+    while len(data) <= expected_length:
+        block = stream.read(min(block_size, expected_length + 1 - len(data)))
+        if not block:
+            break
+        data += block
+    if len(data) != expected_length:
+        raise ChunkError(f"Chunk must be exactly {expected_length} bytes.")
+    return data
+
+
+def write_at(path, offset, stream, expected_length, block_size=IO_BLOCK_SIZE):
+    """
+    Copies expected_length bytes from stream to path at offset. The chunk is
+    read and checked before anything is written, so a rejected re-send leaves
+    the bytes already received intact. Returns the number of bytes written.
+
+    :raises ChunkError: If the stream holds more or fewer bytes than expected.
+    """
+    data = read_chunk(stream, expected_length, block_size)
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        written = 0
+        while written < expected_length:
+            written += os.pwrite(fd, view[written:], offset + written)
+    finally:
+        os.close(fd)
+    return written
+
+
+def _hash_range(hasher, path, start, length, block_size=IO_BLOCK_SIZE):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        position, end = start, start + length
+        while position < end:
+            block = os.pread(fd, min(block_size, end - position), position)
+            if not block:
+                raise ChunkError("Spool file is shorter than the upload.")
+            hasher.update(block)
+            position += len(block)
+    finally:
+        os.close(fd)
+
+
+class InOrderHasher:
+    """
+    BLAKE3 over a file whose fixed-size chunks are written in any order.
+    chunk_written() advances the hash over every contiguous chunk available.
+    """
+
+    def __init__(self, path, chunk_size, total_size):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.total_size = total_size
+        self.lock = threading.Lock()
+        self.hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        self.next_index = 0
+        self.hashed_bytes = 0
+        self.pending = set()
+        self.stale = False
+        self.writes_seen = 0
+
+    def chunk_written(self, index):
+        with self.lock:
+            self.writes_seen += 1
+            if index < self.next_index:
+                # Already hashed and now overwritten: the running hash can't be trusted.
+                self.stale = True
+                return
+            self.pending.add(index)
+            while self.next_index in self.pending:
+                self.pending.discard(self.next_index)
+                start = self.next_index * self.chunk_size
+                length = min(self.chunk_size, self.total_size - start)
+                _hash_range(self.hasher, self.path, start, length)
+                self.hashed_bytes = start + length
+                self.next_index += 1
+
+    def hexdigest(self):
+        """
+        Returns the hash of the whole file, hashing whatever the frontier has not covered.
+        """
+        with self.lock:
+            if self.stale:
+                hasher, start = blake3.blake3(max_threads=blake3.blake3.AUTO), 0
+            else:
+                hasher, start = self.hasher.copy(), self.hashed_bytes
+            _hash_range(hasher, self.path, start, self.total_size - start)
+            return hasher.hexdigest()
+
+
+# Session id -> (InOrderHasher, monotonic time of its last chunk), least recently used first.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def _evict_hashers(now):
+    """
+    Drops the hashers of sessions idle for longer than the session TTL (they have
+    expired), then the least recently used ones above MEDIA_UPLOAD_MAX_HASHERS.
+    Called with _hashers_lock held.
+    """
+    idle_limit = now - get_session_ttl().total_seconds()
+    max_hashers = getattr(settings, "MEDIA_UPLOAD_MAX_HASHERS", DEFAULT_MAX_HASHERS)
+    while _hashers:
+        key, (_, last_used) = next(iter(_hashers.items()))
+        if last_used > idle_limit and len(_hashers) <= max_hashers:
+            break
+        del _hashers[key]
+
+
+def _get_hasher(session):
+    key = str(session.id)
+    now = time.monotonic()
+    with _hashers_lock:
+        entry = _hashers.pop(key, None)
+        hasher = entry[0] if entry else InOrderHasher(part_path(session.id), session.chunk_size, session.total_size)
+        _hashers[key] = (hasher, now)
+        _evict_hashers(now)
+        return hasher
+
+
+def _drop_hasher(session_id):
+    with _hashers_lock:
+        entry = _hashers.pop(str(session_id), None)
+        return entry[0] if entry else None
+
+
+# ---------------------------
+# Sessions
+# ---------------------------
+def create_session(user, filename, total_size, content_type=""):
+    if total_size <= 0:
+        raise ChunkError("Upload size must be positive.")
+    if total_size > get_max_size():
+        raise ChunkError(f"Upload exceeds the maximum size of {get_max_size()} bytes.")
+
+    session = UploadSession.objects.create(
+        owner=user,
+        filename=os.path.basename(filename)[:256] or "upload",
+        content_type=content_type or "",
+        total_size=total_size,
+        chunk_size=get_chunk_size(),
+        expires_at=timezone.now() + get_session_ttl(),
+    )
+    allocate_part_file(part_path(session.id), total_size)
+    return session
+
+
+def _check_open(session):
+    if session.status != UploadSession.OPEN:
+        raise ChunkError("Upload session is no longer open.")
+    if session.expires_at <= timezone.now():
+        raise ChunkError("Upload session has expired.")
+
+
+def write_chunk(session, index, stream):
+    """
+    Writes chunk `index` from stream and records it on the session.
+    Returns the updated session.
+    """
+    _check_open(session)
+    if not 0 <= index < session.chunk_count:
+        raise ChunkError(f"Chunk index must be between 0 and {session.chunk_count - 1}.")
+
+    try:
+        write_at(part_path(session.id), index * session.chunk_size, stream, session.chunk_length(index))
+    except OSError:
+        # The chunk may be partly overwritten: it must be sent again and the file re-hashed.
+        _drop_hasher(session.id)
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if index in session.received_chunks:
+                session.received_chunks = [i for i in session.received_chunks if i != index]
+                session.save(update_fields=["received_chunks", "updated"])
+        raise
+    _get_hasher(session).chunk_written(index)
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if index not in session.received_chunks:
+            session.received_chunks = sorted(session.received_chunks + [index])
+        session.chunk_writes += 1
+        session.expires_at = timezone.now() + get_session_ttl()
+        session.save(update_fields=["received_chunks", "chunk_writes", "expires_at", "updated"])
+    return session
+
+
+def assemble(session):
+    """
+    Returns the completed upload as an AssembledUploadedFile (hashed and sniffed).
+
+    :raises ChunkError: If chunks are missing.
+    """
+    _check_open(session)
+    missing = session.missing_chunks()
+    if missing:
+        raise ChunkError(f"{len(missing)} chunk(s) missing, first: {missing[0]}.")
+
+    path = part_path(session.id)
+    hasher = _drop_hasher(session.id)
+    if hasher is None or hasher.writes_seen != session.chunk_writes:
+        hasher = InOrderHasher(path, session.chunk_size, session.total_size)
+    digest = hasher.hexdigest()
+    with open(path, "rb") as f:
+        header = f.read(SNIFF_BYTES)
+    return AssembledUploadedFile(
+        path,
+        session.filename,
+        session.content_type or "application/octet-stream",
+        session.total_size,
+        blake3_hex=digest,
+        sniffed_content_type=sniff_content_type(header),
+    )
+
+
+def mark_completed(session, media_item_id):
+    UploadSession.objects.filter(pk=session.pk).update(
+        status=UploadSession.COMPLETED, media_item_id=media_item_id, updated=timezone.now()
+    )
+    _remove_part_file(session.id)
+
+
+def abort_session(session):
+    UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.ABORTED, updated=timezone.now())
+    _drop_hasher(session.id)
+    _remove_part_file(session.id)
+
+
+def _remove_part_file(session_id):
+    try:
+        os.remove(part_path(session_id))
+    except FileNotFoundError:
+        # Already moved into storage, or never created.
+        pass
+
+
+def cleanup_expired_sessions(now=None):
+    """
+    Removes expired open sessions with their spool files, plus finished sessions
+    older than the TTL. Returns the number of sessions deleted.
+    """
+    now = now or timezone.now()
+    expired = UploadSession.objects.filter(status=UploadSession.OPEN, expires_at__lte=now)
+    finished = UploadSession.objects.filter(
+        status__in=[UploadSession.COMPLETED, UploadSession.ABORTED],
+        updated__lte=now - get_session_ttl(),
+    )
+    deleted = 0
+    for queryset in (expired, finished):
+        session_ids = list(queryset.values_list("id", flat=True))
+        for session_id in session_ids:
+            _drop_hasher(session_id)
+            _remove_part_file(session_id)
+        deleted += UploadSession.objects.filter(id__in=session_ids).delete()[0]
+    if deleted:
+        logger.info("Removed %d upload sessions.", deleted)
+    return deleted
@@ -0,0 +1,174 @@
+# media/services/derivative_cache.py
+"""
+Content-addressed cache of rendered versions.
+
+A rendition is fully determined by its source file and by the settings its
+renderer reads, so its cache key (derivative_key) is the BLAKE3 of:
+  - the BLAKE3 of the ORIGINAL (already stored in MediaItemHash);
+  - the pipeline and version type;
+  - the values of the settings that rendition depends on (RENDITION_SETTINGS),
+    including the Django settings such as the watermark text;
+  - the pipeline's code version (CODE_VERSIONS), bumped whenever a change to
+    the rendering code changes its output.
+Rendered versions store their key. Before rendering, the handlers look up a
+version with the same key (a regeneration, or a byte-identical re-upload
+under another account) and link its file instead of rendering it again.
+Linked versions share the file: media files are never deleted, so nothing
+else has to track the sharing.
+
+Whether each version was rendered or linked is stored with it
+(MediaItemVersion.derivative_reused), which is what derivative_cache_stats
+reports hit rates from.
+"""
+
+import json
+import logging
+import blake3
+from django.conf import settings
+from main.default_settings_config import VIDEO_ENCODING_PROFILES
+from media.models import HashType, MediaItemHash, MediaItemVersion
+
+logger = logging.getLogger(__name__)
+
+IMAGE = "image"
+VIDEO = "video"
+
+# Bump when a change to the pipeline changes its output, so old renditions are not reused.
+CODE_VERSIONS = {
+    IMAGE: 1,
+    VIDEO: 1,
+}
+
+V = MediaItemVersion
+# (pipeline, version type) -> (SettingsProvider keys, Django settings) the rendition depends on.
+RENDITION_SETTINGS = {
+    (IMAGE, V.THUMBNAIL): (
+        ("preview_size", "thumbnail_size"), ()
+    ),
+    (IMAGE, V.BLURRED_THUMBNAIL): (
+        ("preview_size", "thumbnail_size", "thumbnail_blur_radius", "blurred_thumbnail_quality"), ()
+    ),
+    (IMAGE, V.PREVIEW): (
+        ("preview_size", "watermarked_preview_quality"), ("WATERMARK_TEXT_FOR_PREVIEWS", "FONT_LOCATION")
+    ),
+    (IMAGE, V.BLURRED_PREVIEW): (
+        ("preview_size", "preview_blur_radius", "blurred_preview_quality"), ()
+    ),
+    (IMAGE, V.WATERMARKED): (
+        ("full_watermark_transparency", "full_watermarked_version_quality"),
+        ("WATERMARK_TEXT_FOR_FULLRES", "FONT_LOCATION", "IMAGE_TASK_MEMORY_BUDGET", "IMAGE_OVERSIZE_POLICY"),
+    ),
+    # Segmented encodes cut GOPs at segment boundaries: the segment settings change the output.
+    (VIDEO, V.WATERMARKED): (
+        ("watermarked_video_profile", "full_watermarked_version_quality", "max_video_bitrate",
+         "video_segmented_min_duration", "video_encode_segments"),
+        ("WATERMARK_TEXT_FOR_PREVIEWS", "FONT_LOCATION"),
+    ),
+    # The preview may be cut from the watermarked encode, so it depends on both.
+    (VIDEO, V.PREVIEW): (
+        ("watermarked_video_profile", "full_watermarked_version_quality", "max_video_bitrate",
+         "video_segmented_min_duration", "video_encode_segments",
+         "preview_video_profile", "preview_video_quality", "preview_video_duration"),
+        ("WATERMARK_TEXT_FOR_PREVIEWS", "FONT_LOCATION"),
+    ),
+    (VIDEO, V.THUMBNAIL): (
+        ("thumbnail_size",), ()
+    ),
+}
+
+# Settings naming an encoding profile: the profile's definition goes into the key.
+PROFILE_SETTINGS = ("watermarked_video_profile", "preview_video_profile")
+
+
+def source_hash(original_version):
+    """
+    Returns the BLAKE3 of an ORIGINAL version's file, or None if it was not hashed.
+    """
+    return (
+        MediaItemHash.objects.filter(media_item_version=original_version, hash_type__name="blake3")
+        .values_list("hash_value", flat=True).first()
+    )
+
+
+def derivative_key(source_blake3, pipeline, version_type, config):
+    """
+    Returns the cache key of a rendition, or None if it cannot be cached.
+    """
+    if not source_blake3 or (pipeline, version_type) not in RENDITION_SETTINGS:
+        return None
+    config_keys, django_settings = RENDITION_SETTINGS[(pipeline, version_type)]
+    values = {key: str(config.get(key)) for key in config_keys}
+    for key in PROFILE_SETTINGS:
+        if key in values:
+            values[key] = [values[key], VIDEO_ENCODING_PROFILES.get(config.get(key))]
+    values.update({name: str(getattr(settings, name, None)) for name in django_settings})
+    description = json.dumps(
+        [source_blake3, pipeline, version_type, CODE_VERSIONS[pipeline], values], sort_keys=True, default=str
+    )
+    return blake3.blake3(description.encode()).hexdigest()
+
+
+def derivative_keys(source_blake3, pipeline, version_types, config):
+    """
+    Returns {version_type: key} for the version types that can be cached.
+    """
+    keys = {
+        version_type: derivative_key(source_blake3, pipeline, version_type, config) for version_type in version_types
+    }
+    return {version_type: key for version_type, key in keys.items() if key}
+
+
+def find_cached(keys):
+    """
+    Returns {version_type: MediaItemVersion} holding a file rendered with the
+    same key, for the {version_type: key} given, in one query.
+    """
+    if not keys:
+        return {}
+    by_key = {}
+    candidates = (
+        MediaItemVersion.objects.filter(derivative_key__in=keys.values())
+        .exclude(file="").exclude(file__isnull=True)
+        .order_by("id")
+    )
+    for version in candidates:
+        by_key.setdefault(version.derivative_key, version)
+    found = {}
+    for version_type, key in keys.items():
+        version = by_key.get(key)
+        if version is not None and version.file.storage.exists(version.file.name):
+            found[version_type] = version
+    return found
+
+
+def cached_phash(source_blake3):
+    """
+    Returns the phash of another original with the same content, or None.
+    """
+    if not source_blake3:
+        return None
+    originals = MediaItemHash.objects.filter(
+        hash_type__name="blake3", hash_value=source_blake3,
+        media_item_version__version_type=MediaItemVersion.ORIGINAL,
+    ).values("media_item_version_id")
+    return (
+        MediaItemHash.objects.filter(hash_type__name="phash", media_item_version_id__in=originals)
+        .values_list("hash_value", flat=True).first()
+    )
+
+
+def store_phash(original_version, phash):
+    hash_type_obj, _ = HashType.objects.get_or_create(name="phash")
+    MediaItemHash.objects.update_or_create(
+        media_item_version=original_version,
+        hash_type=hash_type_obj,
+        defaults={"hash_value": phash}
+    )
+
+
+def log_lookup(media_item_id, pipeline, keys, cached):
+    if keys:
+        logger.info(
+            "Derivative cache for %s MediaItem %s: %d of %d versions reused",
+            pipeline, media_item_id, len(cached), len(keys)
+        )
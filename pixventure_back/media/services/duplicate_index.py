@@ -0,0 +1,163 @@
+# media/services/duplicate_index.py
+"""
+The phash near-duplicate index of a worker process (see media.utils.hamming_index).
+
+Indexes the phash of every original version, keyed by MediaItemVersion id.
+The index is held in memory for the life of the worker and kept up to date
+incrementally: before each lookup, hashes updated since the last refresh (the
+watermark) are added. Rows are read again from DUPLICATE_INDEX_REFRESH_MARGIN
+seconds before the watermark, so a hash whose transaction committed after a
+later one moved the watermark is still picked up (adding a hash twice is
+harmless). It is persisted to settings.DUPLICATE_INDEX_DIR every
+DUPLICATE_INDEX_SAVE_EVERY new hashes, so a restarted worker loads it and only
+catches up on what changed since, instead of reading every hash again.
+
+Deleted versions are not removed incrementally (their hashes are gone with
+them); lookups only return versions still in the database, and the
+build_duplicate_index command rebuilds the index from scratch.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from media.models import MediaItemHash, MediaItemVersion
+from media.utils.hamming_index import HammingIndex, hex_to_code
+
+logger = logging.getLogger(__name__)
+
+HASH_TYPE = "phash"
+INDEX_FILE = "phash.npz"
+DEFAULT_SAVE_EVERY = 1000
+DEFAULT_REFRESH_MARGIN = 5 * 60
+REFRESH_CHUNK_SIZE = 10000
+
+_lock = threading.Lock()
+_state = {"index": None, "watermark": None, "unsaved": 0}
+
+
+def get_index_path():
+    index_dir = getattr(settings, "DUPLICATE_INDEX_DIR", None) or os.path.join(settings.BASE_DIR, "var", "indexes")
+    return os.path.join(index_dir, INDEX_FILE)
+
+
+def clear_loaded_index():
+    """
+    Drops the in-memory index; the next lookup loads it from disk again.
+    """
+    with _lock:
+        _state.update(index=None, watermark=None, unsaved=0)
+
+
+def _indexed_hashes(since=None):
+    hashes = MediaItemHash.objects.filter(
+        hash_type__name=HASH_TYPE, media_item_version__version_type=MediaItemVersion.ORIGINAL
+    )
+    if since is not None:
+        # Transactions commit out of timestamp order: re-read a window before the watermark.
+        margin = getattr(settings, "DUPLICATE_INDEX_REFRESH_MARGIN", DEFAULT_REFRESH_MARGIN)
+        hashes = hashes.filter(updated__gte=since - timedelta(seconds=margin))
+    return hashes.order_by("updated", "id").values_list("media_item_version_id", "hash_value", "updated")
+
+
+def _add_hashes(index, since=None):
+    """
+    Adds the hashes updated since `since` (minus the refresh margin) to the index.
+    Returns (number of hashes updated after `since`, new watermark).
+    """
+    added, watermark = 0, since
+    rows = _indexed_hashes(since).iterator(chunk_size=REFRESH_CHUNK_SIZE)
+    while True:
+        chunk = [row for _, row in zip(range(REFRESH_CHUNK_SIZE), rows)]
+        if not chunk:
+            return added, watermark
+        ids, codes = [], []
+        for version_id, hash_value, updated in chunk:
+            code = hex_to_code(hash_value)
+            if code is not None:
+                ids.append(version_id)
+                codes.append(code)
+                added += since is None or updated > since
+        index.add(ids, codes)
+        watermark = max(chunk[-1][2], watermark) if watermark else chunk[-1][2]
+
+
+def save_index(index, watermark, path=None):
+    """
+    Writes the index atomically (readers never see a partial file).
+    """
+    path = path or get_index_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.partial.npz"
+    index.save(partial, watermark=watermark.isoformat() if watermark else "")
+    os.replace(partial, path)
+
+
+def load_index(path=None):
+    """
+    Returns (index, watermark) from disk, or (empty index, None) when there is
+    no usable file.
+    """
+    path = path or get_index_path()
+    if os.path.exists(path):
+        try:
+            index, meta = HammingIndex.load(path)
+            return index, parse_datetime(meta.get("watermark", "")) if meta.get("watermark") else None
+        except Exception as e:
+            logger.warning("Could not load duplicate index %s, rebuilding it: %s", path, e)
+    return HammingIndex(), None
+
+
+def rebuild_index():
+    """
+    Builds the index from every stored phash, saves it and makes it this
+    process's index. Returns the number of hashes indexed.
+    """
+    index = HammingIndex()
+    added, watermark = _add_hashes(index)
+    save_index(index, watermark)
+    with _lock:
+        _state.update(index=index, watermark=watermark, unsaved=0)
+    return added
+
+
+def get_index():
+    """
+    Returns this process's index, loaded on first use and brought up to date.
+    """
+    with _lock:
+        if _state["index"] is None:
+            _state["index"], _state["watermark"] = load_index()
+        added, _state["watermark"] = _add_hashes(_state["index"], _state["watermark"])
+        _state["unsaved"] += added
+        save_every = getattr(settings, "DUPLICATE_INDEX_SAVE_EVERY", DEFAULT_SAVE_EVERY)
+        if _state["unsaved"] and _state["unsaved"] >= save_every:
+            try:
+                save_index(_state["index"], _state["watermark"])
+                _state["unsaved"] = 0
+            except OSError as e:
+                logger.warning("Could not save duplicate index: %s", e)
+        return _state["index"]
+
+
+def find_similar_versions(hash_value, threshold, exclude_version_id=None):
+    """
+    Returns {MediaItemVersion id: Hamming distance} of the original versions
+    whose phash is within `threshold` bits of hash_value, or None when
+    hash_value is not a 64-bit hex hash.
+    """
+    code = hex_to_code(hash_value)
+    if code is None:
+        return None
+    started = time.perf_counter()
+    ids, distances = get_index().query(code, threshold)
+    matches = {int(version_id): int(distance) for version_id, distance in zip(ids, distances)
+               if version_id != exclude_version_id}
+    logger.debug(
+        "Duplicate index lookup within %d bits: %d matches in %.1f ms",
+        threshold, len(matches), (time.perf_counter() - started) * 1000
+    )
+    return matches
@@ -0,0 +1,134 @@
+# media/services/encode_governor.py
+"""
+Host-level governor for ffmpeg jobs.
+
+Every ffmpeg process started by the media tasks goes through run_ffmpeg, which:
+  - takes one of settings.FFMPEG_MAX_JOBS slots first. Slots are lock files
+    (flock) in FFMPEG_LOCK_DIR, so the limit holds across every worker
+    process and thread on the host, and a slot is released by the kernel
+    when its holder dies;
+  - runs ffmpeg under `nice` (FFMPEG_NICE), so web and image work on the same
+    host keep their CPU share;
+  - kills ffmpeg after FFMPEG_TIMEOUT seconds (EncodeTimeout) instead of
+    letting a stuck encode hold its slot forever.
+Encoder threads are capped separately (FFMPEG_THREADS, see cap_threads), as
+they are part of the encoder options.
+
+Without fcntl (non-POSIX hosts) there is no cross-process limit.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 4 * 60 * 60
+DEFAULT_SLOT_WAIT = 60 * 60
+DEFAULT_NICE = 10
+SLOT_POLL_INTERVAL = 0.2
+
+
+class EncodeTimeout(RuntimeError):
+    """
+    ffmpeg ran longer than allowed and was killed.
+    """
+
+
+class EncodeSlotUnavailable(RuntimeError):
+    """
+    No ffmpeg slot became free in time.
+    """
+
+
+def get_max_jobs():
+    return max(1, int(getattr(settings, "FFMPEG_MAX_JOBS", None) or max(1, (os.cpu_count() or 2) // 2)))
+
+
+def get_lock_dir():
+    lock_dir = getattr(settings, "FFMPEG_LOCK_DIR", None) or os.path.join(tempfile.gettempdir(), "pixventure-ffmpeg")
+    os.makedirs(lock_dir, exist_ok=True)
+    return lock_dir
+
+
+def cap_threads(threads):
+    """
+    Encoder thread count under the FFMPEG_THREADS cap (0: no cap; threads 0: ffmpeg's choice).
+    """
+    cap = int(getattr(settings, "FFMPEG_THREADS", 0) or 0)
+    if cap <= 0:
+        return threads
+    return min(threads, cap) if threads else cap
+
+
+@contextmanager
+def encode_slot(wait=None):
+    """
+    Holds one of the host's ffmpeg slots for the enclosed block. Yields the slot number.
+
+    :param wait: Seconds to wait for a free slot (defaults to FFMPEG_SLOT_WAIT).
+    :raises EncodeSlotUnavailable: If none is freed in time.
+    """
+    if fcntl is None:
+        yield None
+        return
+    wait = getattr(settings, "FFMPEG_SLOT_WAIT", DEFAULT_SLOT_WAIT) if wait is None else wait
+    lock_dir = get_lock_dir()
+    deadline = time.monotonic() + wait
+    while True:
+        for slot in range(get_max_jobs()):
+            lock_file = open(os.path.join(lock_dir, f"slot-{slot}.lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            try:
+                yield slot
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+        if time.monotonic() >= deadline:
+            raise EncodeSlotUnavailable(f"All {get_max_jobs()} ffmpeg slots stayed busy for {wait} s.")
+        time.sleep(SLOT_POLL_INTERVAL)
+
+
+def governed_command(cmd):
+    """
+    cmd run under `nice` when FFMPEG_NICE is set and nice is available.
+    """
+    niceness = int(getattr(settings, "FFMPEG_NICE", DEFAULT_NICE) or 0)
+    if niceness and shutil.which("nice"):
+        return ["nice", "-n", str(niceness), *cmd]
+    return list(cmd)
+
+
+def run_ffmpeg(cmd, timeout=None):
+    """
+    Runs an ffmpeg command in a slot, niced, with a hard timeout.
+
+    :raises subprocess.CalledProcessError: If ffmpeg fails (stderr captured).
+    :raises EncodeTimeout: If it runs longer than timeout (defaults to FFMPEG_TIMEOUT).
+    :raises EncodeSlotUnavailable: If no slot is freed in time.
+    """
+    timeout = getattr(settings, "FFMPEG_TIMEOUT", DEFAULT_TIMEOUT) if timeout is None else timeout
+    with encode_slot():
+        try:
+            return subprocess.run(
+                governed_command(cmd), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            # subprocess.run has killed and reaped ffmpeg by now.
+            raise EncodeTimeout(f"ffmpeg killed after {timeout} s: {' '.join(cmd[:8])} ...")
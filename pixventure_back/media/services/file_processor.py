@@ -4,62 +4,99 @@ from django.db import transaction
 from django.core.files.uploadedfile import UploadedFile
 from rest_framework.exceptions import ValidationError
 
-from media.models import MediaItem, MediaItemVersion, HashType, MediaItemHash
+from media.models import MediaItem, MediaItemVersion, MediaItemHash
 from media.services.hasher import compute_file_hash
-from media.services.image_metadata import extract_image_metadata
-from media.services.image_resizer import generate_resized_image
+from media.services.image_pipeline import decode_image, render_thumbnail
+from media.services.media_probe import MediaProbe
 from media.services.media_version_creator import create_media_item_version
+from media.services.rendition_manifest import refresh_rendition_manifest
+from media.services.watermark import image_to_webp_file
 
-def process_uploaded_file(file_obj: UploadedFile, user):
+# Bounding box of the thumbnail made at upload; originals are decoded only at this size.
+THUMBNAIL_SIZE = 300
+
+def _check_upload(file_obj):
     """
-    Main orchestrator for handling file uploads:
-    - Validates the incoming file (image or video).
-    - Checks duplicates via BLAKE3 hash.
-    - Creates a new MediaItem in the database.
-    - Creates the "original" version of the file.
-    - If the file is an image, generates a thumbnail version.
-    
-    Returns a dict with success info or an error message.
+    Validates the upload type and rejects exact duplicates.
+    Returns {"is_image": bool, "hash_value": str} or {"error": ...}.
     """
-    # 1. Basic file validation
     if file_obj.size == 0:
         return {"error": "File is empty."}
 
-    content_type = file_obj.content_type
+    # Uploads streamed through HashingUploadHandler carry the type sniffed from
+    # their content; prefer it over the client-declared one.
+    content_type = getattr(file_obj, "sniffed_content_type", None) or file_obj.content_type
     is_image = content_type.startswith("image/")
     is_video = content_type.startswith("video/")
 
     if not is_image and not is_video:
         return {"error": f"Unsupported file type: {content_type}"}
 
-    # 2. Optional: if image, extract dimensions/metadata for validation
-    #    You can do it here or wait until the creation of the version.
-    width, height = None, None
+    # Compute BLAKE3 hash for deduplication (already done while receiving
+    # the upload when it went through HashingUploadHandler).
+    hash_value = getattr(file_obj, "blake3", None)
+    if not hash_value:
+        try:
+            hash_value = compute_file_hash(file_obj, hash_type="blake3")
+            file_obj.seek(0)
+        except Exception as e:
+            return {"error": f"Hash computation failed: {e}"}
+
+    if MediaItemHash.objects.filter(hash_type__name="blake3", hash_value=hash_value).exists():
+        return {"error": "Duplicate file detected (BLAKE3 match)."}
+
+    return {"is_image": is_image, "hash_value": hash_value}
+
+def _create_thumbnail_version(media_item, image):
+    thumbnail = render_thumbnail(image, THUMBNAIL_SIZE)
+    resized_file = image_to_webp_file(thumbnail, "thumbnail.webp", 85)
+    return create_media_item_version(
+        media_item=media_item,
+        file_obj=resized_file,
+        version_type=MediaItemVersion.THUMBNAIL,
+        hash_type_name="blake3",
+        is_image=True,
+        meta={
+            "width": thumbnail.width,
+            "height": thumbnail.height,
+            "file_size": resized_file.size,
+        }
+    )
+
+def process_uploaded_file(file_obj: UploadedFile, user):
+    """
+    Main orchestrator for handling file uploads:
+    - Validates the incoming file (image or video).
+    - Checks duplicates via BLAKE3 hash.
+    - Creates a new MediaItem in the database.
+    - Creates the "original" version of the file.
+    - If the file is an image, generates a thumbnail version.
+    Metadata comes from a header probe (cached on the original version); images
+    are decoded once, at the reduced resolution the thumbnail needs.
+
+    Returns a dict with success info or an error message.
+    """
+    # 1. Validate the file type and compute its BLAKE3 hash.
+    checked = _check_upload(file_obj)
+    if "error" in checked:
+        return checked
+    is_image = checked["is_image"]
+
+    # 2. If image, probe its header, then decode it once for the thumbnail, at
+    # thumbnail resolution (the metadata comes from the probe).
+    decoded = probe = None
     if is_image:
         try:
-            meta = extract_image_metadata(file_obj)
-            width, height = meta["width"], meta["height"]
-            # We won't store in DB here; we'll do that in create_media_item_version.
-            # But you could do extra validation if needed (e.g., max dimension checks).
+            probe = MediaProbe.probe_image(file_obj)
+            decoded = decode_image(file_obj, target_size=(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            # You could do extra validation here if needed (e.g., max dimension checks).
         except Exception as e:
             return {"error": f"Invalid image file: {e}"}
         finally:
             # Seek back to start for further usage
             file_obj.seek(0)
 
-    # 3. Compute BLAKE3 hash for deduplication
-    try:
-        hash_value = compute_file_hash(file_obj, hash_type="blake3")
-        file_obj.seek(0)
-    except Exception as e:
-        return {"error": f"Hash computation failed: {e}"}
-
-    # 4. Check for duplicates
-    hash_type_obj, _ = HashType.objects.get_or_create(name="blake3")
-    if MediaItemHash.objects.filter(hash_type=hash_type_obj, hash_value=hash_value).exists():
-        return {"error": "Duplicate file detected (BLAKE3 match)."}
-
-    # 5. Create the MediaItem and the Original version
+    # 3. Create the MediaItem and the Original version
     with transaction.atomic():
         media_type = MediaItem.PHOTO if is_image else MediaItem.VIDEO
         media_item = MediaItem.objects.create(
@@ -69,36 +106,86 @@ def process_uploaded_file(file_obj: UploadedFile, user):
             status=MediaItem.PENDING_MODERATION
         )
 
-        original_version = create_media_item_version(
+        create_media_item_version(
             media_item=media_item,
             file_obj=file_obj,
             version_type=MediaItemVersion.ORIGINAL,
             hash_type_name="blake3",
-            existing_hash_value=hash_value,
-            is_image=is_image
+            existing_hash_value=checked["hash_value"],
+            is_image=is_image,
+            probe=probe
         )
 
         thumbnail_version = None
 
-        # 6. If it's an image, generate a thumbnail
+        # 4. If it's an image, generate a thumbnail
         if is_image:
             try:
-                resized_file = generate_resized_image(file_obj)  # defaults to max 300x300
-                thumbnail_version = create_media_item_version(
-                    media_item=media_item,
-                    file_obj=resized_file,
-                    version_type=MediaItemVersion.THUMBNAIL,
-                    hash_type_name="blake3",
-                    # We could let the function compute a new hash, or we can compute it ourselves
-                    # existing_hash_value=some_hash
-                    is_image=True
-                )
+                thumbnail_version = _create_thumbnail_version(media_item, decoded.image)
             except ValueError as e:
                 return {"error": f"Thumbnail creation failed: {e}"}
 
-    # 7. Build response
+    # 5. Build response
     resp = {"media_item_id": media_item.id}
     if thumbnail_version:
         resp["thumbnail_url"] = thumbnail_version.file.url
 
     return resp
+
+def accept_uploaded_file(file_obj: UploadedFile, user, is_blurred=False):
+    """
+    Fast path of asynchronous ingest, run inside the request:
+    - Validates the type and checks duplicates (the hash is usually precomputed).
+    - Stores the original as-is and creates the MediaItem in the PROCESSING state.
+    Decoding, metadata and the thumbnail are left to ingest_original() on a worker.
+
+    Returns a dict with the media item ID or an error message.
+    """
+    checked = _check_upload(file_obj)
+    if "error" in checked:
+        return checked
+
+    with transaction.atomic():
+        media_item = MediaItem.objects.create(
+            owner=user,
+            media_type=MediaItem.PHOTO if checked["is_image"] else MediaItem.VIDEO,
+            original_filename=file_obj.name,
+            status=MediaItem.PROCESSING,
+            is_blurred=is_blurred
+        )
+        # Storing the BLAKE3 hash now makes concurrent re-uploads hit the duplicate check.
+        create_media_item_version(
+            media_item=media_item,
+            file_obj=file_obj,
+            version_type=MediaItemVersion.ORIGINAL,
+            hash_type_name="blake3",
+            existing_hash_value=checked["hash_value"],
+            is_image=checked["is_image"],
+            meta={"width": None, "height": None, "file_size": file_obj.size}
+        )
+
+    return {"media_item_id": media_item.id}
+
+def ingest_original(media_item: MediaItem):
+    """
+    Worker side of asynchronous ingest: probes the stored original (the probe is
+    cached on it for later stages) and, for images, decodes it at thumbnail
+    resolution for the thumbnail.
+    Moves the item from PROCESSING to PENDING_MODERATION.
+
+    :raises ValueError: If the original cannot be decoded.
+    """
+    original = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
+    with transaction.atomic():
+        MediaProbe.for_version(original)
+        if media_item.media_type == MediaItem.PHOTO:
+            with original.file.open("rb") as f:
+                decoded = decode_image(f, target_size=(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            _create_thumbnail_version(media_item, decoded.image)
+        else:
+            refresh_rendition_manifest(media_item)
+
+        MediaItem.objects.filter(pk=media_item.pk).update(
+            status=MediaItem.PENDING_MODERATION, processing_error=""
+        )
+        media_item.status = MediaItem.PENDING_MODERATION
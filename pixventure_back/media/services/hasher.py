@@ -4,6 +4,10 @@ import blake3
 import imagehash
 from media.utils.image_loader import open_image
 
+# phash works on a 32x32 reduction; decoding at this size instead of full resolution
+# changes at most a few bits (see open_image's target_size).
+FUZZY_HASH_DECODE_SIZE = 256
+
 def compute_file_hash(file_obj, hash_type="blake3"):
     """
     Compute a hash (defaults to BLAKE3) for a file-like object.
@@ -30,7 +34,7 @@ def compute_fuzzy_hash(file_obj, hash_type="phash"):
     :return: String representation of the computed hash.
     """
     try:
-        image = open_image(file_obj).convert("RGB")
+        image = open_image(file_obj, target_size=FUZZY_HASH_DECODE_SIZE).convert("RGB")
     except Exception as e:
         raise ValueError(f"Cannot open image for fuzzy hash: {e}")
     
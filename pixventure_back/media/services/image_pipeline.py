@@ -0,0 +1,227 @@
+# media/services/image_pipeline.py
+"""
+Single-pass image derivative pipeline.
+
+The original is decoded once. Every rendition is derived from that decode:
+  - the watermarked full-resolution version from the full image;
+  - everything else (thumbnail, preview, blurred variants, perceptual hash)
+    from one shared working copy, downscaled once to the preview size.
+The full image is released as soon as the full-resolution work is done, so
+peak memory is one full decode plus one preview-sized copy. Originals whose
+full-resolution rendering would exceed the per-task memory budget are
+downscaled first, or get no full-resolution version, by policy (see
+media.services.memory_budget). The watermarked version is encoded to disk.
+
+Every stage is timed; the breakdown (milliseconds per stage) is returned with
+the result and logged, so slow renditions show up per item.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+import imagehash
+from PIL import Image
+from media.models import MediaItemVersion
+from media.services import watermark
+from media.services.media_probe import MediaProbe
+from media.services.memory_budget import ImageTooLarge, plan_full_resolution
+from media.utils.image_loader import open_image
+
+logger = logging.getLogger(__name__)
+
+# Version types the pipeline can produce.
+SUPPORTED_VERSIONS = (
+    MediaItemVersion.THUMBNAIL,
+    MediaItemVersion.PREVIEW,
+    MediaItemVersion.BLURRED_THUMBNAIL,
+    MediaItemVersion.BLURRED_PREVIEW,
+    MediaItemVersion.WATERMARKED,
+)
+
+
+class DecodedImage(NamedTuple):
+    """
+    An original decoded once, with the metadata read while decoding it.
+    """
+    image: Image.Image
+    width: int
+    height: int
+    format: str
+    file_size: int
+
+
+class RenderedVersion(NamedTuple):
+    file: object
+    width: int
+    height: int
+    file_size: int
+
+    @property
+    def meta(self):
+        return {"width": self.width, "height": self.height, "file_size": self.file_size}
+
+
+class PipelineResult(NamedTuple):
+    original: DecodedImage
+    versions: dict   # {version_type: RenderedVersion}
+    phash: str
+    timings: dict    # {stage: milliseconds}
+
+
+@contextmanager
+def _timed(timings, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _file_size(file_obj):
+    size = getattr(file_obj, "size", None)
+    if size is None:
+        position = file_obj.tell()
+        file_obj.seek(0, 2)
+        size = file_obj.tell()
+        file_obj.seek(position)
+    return size
+
+
+def decode_image(file_obj, target_size=None) -> DecodedImage:
+    """
+    Decodes an image file once into RGB. Fully loading the pixels also validates
+    the file (truncated or corrupt data raises), so no separate verify() pass is needed.
+    With target_size, the image may be decoded at a reduced resolution (see
+    open_image); width and height are still those of the original.
+
+    :raises ValueError: If the file is not a decodable image.
+    """
+    file_obj.seek(0)
+    try:
+        image = open_image(file_obj, target_size=target_size)
+        image_format = image.format
+        image.load()
+        width, height = image.info.get("original_size", image.size)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Failed to decode image: {e}")
+    finally:
+        file_obj.seek(0)
+    return DecodedImage(image, width, height, image_format, _file_size(file_obj))
+
+
+def make_working_copy(image: Image.Image, max_dimension: int) -> Image.Image:
+    """
+    Returns a copy of the image downscaled to fit max_dimension (never upscaled).
+    """
+    working = image.copy()
+    working.thumbnail((int(max_dimension), int(max_dimension)), Image.Resampling.LANCZOS)
+    return working
+
+
+def render_thumbnail(image: Image.Image, thumbnail_size=300) -> Image.Image:
+    return make_working_copy(image, thumbnail_size)
+
+
+def _rendered(image, name, quality):
+    file_obj = watermark.image_to_webp_file(image, name, quality)
+    return RenderedVersion(file_obj, image.width, image.height, file_obj.size)
+
+
+def render_versions(file_obj, config, version_types, with_phash=True) -> PipelineResult:
+    """
+    Decodes file_obj once and renders the requested version types from it.
+
+    :param file_obj: The original image file.
+    :param config: Settings dict (sizes, qualities, blur radii, watermark transparency).
+    :param version_types: Iterable of MediaItemVersion types to render.
+    :param with_phash: Also compute the perceptual hash of the original.
+    """
+    wanted = set(version_types) & set(SUPPORTED_VERSIONS)
+    timings = {}
+    versions = {}
+
+    plan = None
+    if MediaItemVersion.WATERMARKED in wanted:
+        probe = MediaProbe.probe_image(file_obj)
+        try:
+            plan = plan_full_resolution(probe.width, probe.height)
+        except ImageTooLarge as e:
+            logger.warning("No full-resolution version: %s", e)
+            wanted.discard(MediaItemVersion.WATERMARKED)
+
+    with _timed(timings, "decode"):
+        # Without the full-resolution version, nothing needs more than the preview size.
+        if plan is None:
+            target_size = config["preview_size"]
+        else:
+            target_size = plan.target_size
+        original = decode_image(file_obj, target_size=target_size)
+    full_image = original.image
+    if plan is not None and plan.downscaled:
+        with _timed(timings, "downscale"):
+            full_image.thumbnail(plan.target_size, Image.Resampling.LANCZOS)
+
+    with _timed(timings, "working_copy"):
+        working = make_working_copy(full_image, config["preview_size"])
+
+    if MediaItemVersion.WATERMARKED in wanted:
+        with _timed(timings, "watermarked"):
+            # The working copy is taken: the full image can be drawn on directly.
+            watermarked = watermark.render_full_watermarked(
+                full_image, watermark_transparency=config["full_watermark_transparency"], in_place=True
+            )
+            output = watermark.image_to_webp_temp_file(
+                watermarked, "full_watermarked.webp", config["full_watermarked_version_quality"]
+            )
+            versions[MediaItemVersion.WATERMARKED] = RenderedVersion(
+                output, watermarked.width, watermarked.height, output.size
+            )
+            del watermarked
+    # Everything below works on the preview-sized copy.
+    original = original._replace(image=None)
+    del full_image
+
+    if MediaItemVersion.PREVIEW in wanted:
+        with _timed(timings, "preview"):
+            preview = watermark.render_watermarked_preview(working, preview_size=config["preview_size"])
+            versions[MediaItemVersion.PREVIEW] = _rendered(
+                preview, "watermarked_preview.webp", config["watermarked_preview_quality"]
+            )
+
+    if MediaItemVersion.BLURRED_PREVIEW in wanted:
+        with _timed(timings, "blurred_preview"):
+            blurred_preview = watermark.render_blurred_preview(
+                working, preview_size=config["preview_size"], blur_radius=config["preview_blur_radius"]
+            )
+            versions[MediaItemVersion.BLURRED_PREVIEW] = _rendered(
+                blurred_preview, "blurred_preview.webp", config["blurred_preview_quality"]
+            )
+
+    if wanted & {MediaItemVersion.THUMBNAIL, MediaItemVersion.BLURRED_THUMBNAIL}:
+        with _timed(timings, "thumbnail"):
+            thumbnail = render_thumbnail(working, config["thumbnail_size"])
+            if MediaItemVersion.THUMBNAIL in wanted:
+                versions[MediaItemVersion.THUMBNAIL] = _rendered(thumbnail, "thumbnail.webp", 85)
+        if MediaItemVersion.BLURRED_THUMBNAIL in wanted:
+            with _timed(timings, "blurred_thumbnail"):
+                blurred_thumbnail = watermark.render_blurred_thumbnail(
+                    thumbnail, thumbnail_size=config["thumbnail_size"], blur_radius=config["thumbnail_blur_radius"]
+                )
+                versions[MediaItemVersion.BLURRED_THUMBNAIL] = _rendered(
+                    blurred_thumbnail, "blurred_thumbnail.webp", config["blurred_thumbnail_quality"]
+                )
+
+    phash = None
+    if with_phash:
+        with _timed(timings, "phash"):
+            # phash reduces the image to 32x32 first, so hashing the working copy
+            # instead of the full image changes at most a few bits.
+            phash = str(imagehash.phash(working))
+
+    timings["total"] = round(sum(timings.values()), 2)
+    return PipelineResult(original, versions, phash, timings)
@@ -29,7 +29,8 @@ def generate_resized_image(
         image = open_image(file_obj)
         image.verify()
         file_obj.seek(0)
-        image = open_image(file_obj)
+        # Only decode what the thumbnail needs (see open_image's target_size).
+        image = open_image(file_obj, target_size=max_size)
 
         # Convert to desired color mode, e.g. RGB
         image = image.convert(image_mode)
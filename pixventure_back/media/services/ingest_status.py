@@ -0,0 +1,90 @@
+# media/services/ingest_status.py
+from media.managers.media_versions.media_version_determiner import determine_allowed_versions
+from media.models import MediaItem, MediaItemVersion
+from media.services.memory_budget import ImageTooLarge, plan_full_resolution
+
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+# Rendition names used in the status payload, e.g. "blurred_thumbnail".
+VERSION_NAMES = {
+    version_type: label.lower().replace(" ", "_")
+    for version_type, label in MediaItemVersion.VERSION_CHOICES
+}
+
+
+# Statuses a failed version pipeline may still turn into PROCESSING_FAILED; a
+# failure while regenerating the versions of a moderated item leaves it as is.
+UNMODERATED_STATUSES = [MediaItem.PROCESSING, MediaItem.PENDING_MODERATION]
+
+
+def mark_processing_failed(media_item_id, error):
+    """
+    Ends the processing of a media item that has not been moderated yet with the
+    PROCESSING_FAILED status and the reason.
+    """
+    MediaItem.objects.filter(id=media_item_id, status__in=UNMODERATED_STATUSES).update(
+        status=MediaItem.PROCESSING_FAILED,
+        processing_error=str(error)[:255]
+    )
+
+
+def _is_refused(media_item, version_type, manifest):
+    """
+    Whether the image pipeline skips this version under the oversize policy
+    (see media.services.memory_budget), judged from the original's dimensions.
+    """
+    if media_item.media_type != MediaItem.PHOTO or version_type != MediaItemVersion.WATERMARKED:
+        return False
+    original = manifest.get(str(MediaItemVersion.ORIGINAL)) or {}
+    if not original.get("width") or not original.get("height"):
+        return False
+    try:
+        plan_full_resolution(original["width"], original["height"])
+    except ImageTooLarge:
+        return True
+    return False
+
+
+def expected_versions(media_item):
+    """
+    Version types the media item is expected to end up with, leaving out those
+    refused by the oversize policy.
+    """
+    manifest = media_item.renditions or {}
+    versions = [MediaItemVersion.ORIGINAL, MediaItemVersion.THUMBNAIL]
+    versions += [v for v in determine_allowed_versions(media_item) if v not in versions]
+    return [v for v in versions if not _is_refused(media_item, v, manifest)]
+
+
+def get_processing_status(media_item):
+    """
+    Returns the ingest state of a media item and the readiness of each rendition
+    it is expected to have, read from the rendition manifest (no extra queries).
+    """
+    manifest = media_item.renditions or {}
+    renditions = {}
+    for version_type in expected_versions(media_item):
+        entry = manifest.get(str(version_type))
+        renditions[VERSION_NAMES[version_type]] = {
+            "ready": entry is not None,
+            "url": entry["url"] if entry else None,
+            "width": entry["width"] if entry else None,
+            "height": entry["height"] if entry else None,
+        }
+
+    if media_item.status == MediaItem.PROCESSING_FAILED:
+        state = FAILED
+    elif media_item.status == MediaItem.PROCESSING or not all(r["ready"] for r in renditions.values()):
+        state = PROCESSING
+    else:
+        state = READY
+
+    return {
+        "media_item_id": media_item.id,
+        "state": state,
+        "status": media_item.status,
+        "error": media_item.processing_error or None,
+        "renditions": renditions,
+    }
@@ -0,0 +1,366 @@
+# media/services/media_probe.py
+"""
+Header-only media probing.
+
+MediaProbe reads what every stage needs to know about a file (dimensions,
+container format, codec, duration, rotation) without decoding pixels or frames:
+  - images: Pillow's lazy Image.open() (header and EXIF only);
+  - HEIC/HEIF/AVIF: the `ispe` (size) and `irot` (rotation) properties of the
+    primary item, parsed from the `meta` box;
+  - videos: a single ffprobe call.
+
+The result of probing an original is stored on its MediaItemVersion (`probe`),
+so later stages (ingest, video encodes, thumbnails) read it from the database
+instead of opening the file again.
+"""
+
+import json
+import logging
+import os
+import struct
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+from PIL import Image
+from media.models import MediaItem, MediaItemVersion
+from media.upload_handlers import SNIFF_BYTES, sniff_content_type
+
+logger = logging.getLogger(__name__)
+
+FFPROBE_TIMEOUT = 60
+HEIF_CONTENT_TYPES = ("image/heic", "image/heif", "image/avif")
+
+# EXIF orientation -> clockwise rotation needed for display (mirroring is ignored).
+EXIF_ROTATIONS = {3: 180, 4: 180, 5: 90, 6: 90, 7: 270, 8: 270}
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+class ProbeError(ValueError):
+    """
+    The file could not be probed (unknown format, unreadable header, ffprobe failure).
+    """
+
+
+class ProbeResult(NamedTuple):
+    """
+    Stored dimensions (as encoded, before rotation) and stream information.
+    rotation is the clockwise rotation, in degrees, a player applies for display.
+    """
+    kind: str                 # "image" or "video"
+    width: int
+    height: int
+    format: str
+    file_size: int
+    rotation: int = 0
+    codec: Optional[str] = None
+    duration: Optional[float] = None
+
+    @property
+    def display_size(self):
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    def to_dict(self):
+        return self._asdict()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data.get(field) for field in cls._fields})
+
+
+def _file_size(file_obj):
+    size = getattr(file_obj, "size", None)
+    if size is None:
+        position = file_obj.tell()
+        file_obj.seek(0, 2)
+        size = file_obj.tell()
+        file_obj.seek(position)
+    return size
+
+
+# ---------------------------
+# HEIF box parsing
+# ---------------------------
+def _iter_boxes(data, start=0, end=None):
+    """
+    Yields (type, body_start, body_end) for the ISO BMFF boxes in data[start:end].
+    """
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[position:position + 8])
+        header = 8
+        if size == 1:
+            if position + 16 > end:
+                return
+            size = struct.unpack(">Q", data[position + 8:position + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            return
+        yield box_type, position + header, position + size
+        position += size
+
+
+def _read_meta_box(file_obj, limit=16 * 1024 * 1024):
+    """
+    Returns the body of the top-level `meta` box, reading only box headers
+    until it is found.
+    """
+    file_obj.seek(0)
+    position = 0
+    while position < limit:
+        header = file_obj.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        if box_type == b"meta":
+            if size == 0 or size > limit:
+                raise ProbeError("HEIF meta box is too large.")
+            file_obj.seek(position + header_size)
+            return file_obj.read(size - header_size)
+        if size < header_size:
+            break
+        position += size
+        file_obj.seek(position)
+    raise ProbeError("No meta box found in HEIF file.")
+
+
+def _heif_primary_item(meta, start, end):
+    for box_type, body_start, _ in _iter_boxes(meta, start, end):
+        if box_type == b"pitm":
+            version = meta[body_start]
+            if version == 0:
+                return struct.unpack(">H", meta[body_start + 4:body_start + 6])[0]
+            return struct.unpack(">I", meta[body_start + 4:body_start + 8])[0]
+    return None
+
+
+def _heif_associations(meta, start, end):
+    """
+    Parses an `ipma` box into {item_id: [property index (1-based)]}.
+    """
+    version, flags = meta[start], int.from_bytes(meta[start + 1:start + 4], "big")
+    position = start + 4
+    entry_count = struct.unpack(">I", meta[position:position + 4])[0]
+    position += 4
+    associations = {}
+    for _ in range(entry_count):
+        if version < 1:
+            item_id = struct.unpack(">H", meta[position:position + 2])[0]
+            position += 2
+        else:
+            item_id = struct.unpack(">I", meta[position:position + 4])[0]
+            position += 4
+        count = meta[position]
+        position += 1
+        indexes = []
+        for _ in range(count):
+            if flags & 1:
+                indexes.append(struct.unpack(">H", meta[position:position + 2])[0] & 0x7FFF)
+                position += 2
+            else:
+                indexes.append(meta[position] & 0x7F)
+                position += 1
+        associations[item_id] = indexes
+    return associations
+
+
+def parse_heif_header(file_obj):
+    """
+    Returns (width, height, rotation) of the primary image of a HEIF file from
+    its ispe/irot properties.
+    """
+    meta = _read_meta_box(file_obj)
+    start = 4  # meta is a full box: version and flags.
+    primary = _heif_primary_item(meta, start, len(meta))
+
+    properties, associations = [], {}
+    for box_type, body_start, body_end in _iter_boxes(meta, start):
+        if box_type != b"iprp":
+            continue
+        for child_type, child_start, child_end in _iter_boxes(meta, body_start, body_end):
+            if child_type == b"ipco":
+                properties = list(_iter_boxes(meta, child_start, child_end))
+            elif child_type == b"ipma":
+                associations.update(_heif_associations(meta, child_start, child_end))
+
+    if primary is not None and primary in associations:
+        selected = [properties[i - 1] for i in associations[primary] if 0 < i <= len(properties)]
+    else:
+        selected = properties
+
+    sizes, rotation = [], 0
+    for box_type, body_start, _ in selected:
+        if box_type == b"ispe":
+            sizes.append(struct.unpack(">II", meta[body_start + 4:body_start + 12]))
+        elif box_type == b"irot":
+            # Counter-clockwise quarter turns.
+            rotation = (360 - (meta[body_start] & 0x03) * 90) % 360
+    if not sizes:
+        raise ProbeError("No ispe property found in HEIF file.")
+    # Without item associations, the largest image is the primary one (others are thumbnails).
+    width, height = max(sizes, key=lambda size: size[0] * size[1])
+    return width, height, rotation
+
+
+# ---------------------------
+# Video
+# ---------------------------
+@contextmanager
+def _local_path(file_obj):
+    """
+    Yields a filesystem path for file_obj, spooling it to a temporary file
+    only when it has none.
+    """
+    try:
+        path = getattr(file_obj, "path", None)
+    except NotImplementedError:
+        # Storage without local files.
+        path = None
+    if path is None and hasattr(file_obj, "temporary_file_path"):
+        path = file_obj.temporary_file_path()
+    if path is not None:
+        yield path
+        return
+
+    _, ext = os.path.splitext(getattr(file_obj, "name", "") or "")
+    with tempfile.NamedTemporaryFile(suffix=ext or ".mp4") as tmp:
+        file_obj.seek(0)
+        for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+            tmp.write(chunk)
+        tmp.flush()
+        file_obj.seek(0)
+        yield tmp.name
+
+
+def _video_rotation(stream):
+    rotate = (stream.get("tags") or {}).get("rotate")
+    if rotate is not None:
+        return int(float(rotate)) % 360
+    for side_data in stream.get("side_data_list") or []:
+        if "rotation" in side_data:
+            # The display matrix rotation is counter-clockwise.
+            return int(-float(side_data["rotation"])) % 360
+    return 0
+
+
+def parse_ffprobe_output(data, file_size):
+    streams = data.get("streams") or []
+    if not streams:
+        raise ProbeError("No video stream found.")
+    stream, container = streams[0], data.get("format") or {}
+    duration = container.get("duration") or stream.get("duration")
+    return ProbeResult(
+        kind="video",
+        width=int(stream.get("width") or 0),
+        height=int(stream.get("height") or 0),
+        format=(container.get("format_name") or "").split(",")[0],
+        file_size=file_size,
+        rotation=_video_rotation(stream),
+        codec=stream.get("codec_name"),
+        duration=float(duration) if duration else None,
+    )
+
+
+# ---------------------------
+# Service
+# ---------------------------
+class MediaProbe:
+    """
+    Entry point: MediaProbe.probe(file) for a file, MediaProbe.for_version(version)
+    (or .for_media_item(item)) for the probe cached on a stored version.
+    """
+
+    @staticmethod
+    def probe_image(file_obj) -> ProbeResult:
+        file_obj.seek(0)
+        header = file_obj.read(SNIFF_BYTES)
+        file_obj.seek(0)
+        size = _file_size(file_obj)
+        try:
+            content_type = sniff_content_type(header)
+            if content_type in HEIF_CONTENT_TYPES:
+                width, height, rotation = parse_heif_header(file_obj)
+                return ProbeResult("image", width, height, content_type.split("/")[1].upper(), size, rotation)
+
+            # Lazy: only the header (and EXIF) is read, no pixel is decoded.
+            image = Image.open(file_obj)
+            orientation = image.getexif().get(EXIF_ORIENTATION_TAG)
+            return ProbeResult(
+                "image", image.width, image.height, image.format, size, EXIF_ROTATIONS.get(orientation, 0)
+            )
+        except ProbeError:
+            raise
+        except Exception as e:
+            raise ProbeError(f"Failed to read image header: {e}")
+        finally:
+            file_obj.seek(0)
+
+    @staticmethod
+    def probe_video(file_obj) -> ProbeResult:
+        size = _file_size(file_obj)
+        with _local_path(file_obj) as path:
+            cmd = [
+                "ffprobe", "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "format=format_name,duration:stream=codec_name,width,height,duration"
+                                 ":stream_tags=rotate:stream_side_data=rotation",
+                "-print_format", "json",
+                path,
+            ]
+            try:
+                result = subprocess.run(
+                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                    check=True, timeout=FFPROBE_TIMEOUT
+                )
+                data = json.loads(result.stdout)
+            except (OSError, subprocess.SubprocessError, ValueError) as e:
+                raise ProbeError(f"ffprobe failed: {e}")
+        return parse_ffprobe_output(data, size)
+
+    @classmethod
+    def probe(cls, file_obj, is_image) -> ProbeResult:
+        """
+        :raises ProbeError: If the file headers cannot be read.
+        """
+        return cls.probe_image(file_obj) if is_image else cls.probe_video(file_obj)
+
+    @classmethod
+    def for_version(cls, version: MediaItemVersion) -> ProbeResult:
+        """
+        Returns the probe cached on version, probing its file (and caching the
+        result with the width/height/duration columns) on first use.
+        """
+        if version.probe:
+            return ProbeResult.from_dict(version.probe)
+
+        is_image = version.media_item.media_type == MediaItem.PHOTO
+        with version.file.open("rb") as f:
+            result = cls.probe(f, is_image)
+        apply_probe(version, result)
+        version.save(update_fields=["probe", "width", "height", "video_duration", "file_size"])
+        return result
+
+    @classmethod
+    def for_media_item(cls, media_item) -> ProbeResult:
+        return cls.for_version(media_item.versions.get(version_type=MediaItemVersion.ORIGINAL))
+
+
+def apply_probe(version, result: ProbeResult):
+    """
+    Copies a probe result onto a version's metadata columns (without saving).
+    """
+    version.probe = result.to_dict()
+    version.width = result.width
+    version.height = result.height
+    version.file_size = result.file_size
+    if result.duration is not None:
+        version.video_duration = result.duration
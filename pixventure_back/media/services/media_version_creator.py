@@ -3,7 +3,9 @@ import logging
 from django.db import transaction
 from media.models import MediaItem, MediaItemVersion, MediaItemHash, HashType
 from media.services.hasher import compute_file_hash
-from media.services.image_metadata import extract_image_metadata
+from media.services.media_probe import MediaProbe, ProbeError, apply_probe
+from media.services.rendition_manifest import refresh_rendition_manifest
+from media.storage import digest_from_name
 
 logger = logging.getLogger(__name__)
 
@@ -13,45 +15,55 @@ def create_media_item_version(
     version_type: int,
     hash_type_name: str = "blake3",
     existing_hash_value: str = None,
-    is_image: bool = False
+    is_image: bool = False,
+    meta: dict = None,
+    probe=None,
+    derivative_key: str = None
 ) -> MediaItemVersion:
-    from media.services.video_metadata import extract_video_metadata  # if you have that
+    """
+    Stores file_obj as a new version of media_item, with its metadata and hash.
+    Pass `meta` (width, height, file_size) when the caller already knows it
+    (e.g. it rendered the image itself), or the `probe` (ProbeResult) it already
+    has; otherwise the file headers are probed here (MediaProbe) and the probe
+    is cached on the version. Rendered versions pass their `derivative_key`
+    (see media.services.derivative_cache).
+    """
+    # Probe before storing: saving a spooled upload moves its file.
+    if probe is None and meta is None:
+        try:
+            probe = MediaProbe.probe(file_obj, is_image=is_image)
+            logger.debug("create_media_item_version: Probe: %s", probe)
+        except ProbeError as e:
+            if is_image:
+                logger.error("create_media_item_version: Could not extract image metadata: %s", e)
+                raise ValueError("Could not extract image metadata.")
+            logger.warning("create_media_item_version: Could not extract video metadata: %s", e)
+
     with transaction.atomic():
         version = MediaItemVersion.objects.create(
             media_item=media_item,
             version_type=version_type,
-            file=file_obj
+            file=file_obj,
+            derivative_key=derivative_key
         )
         logger.debug("create_media_item_version: Created version id=%s, is_image=%s", version.id, is_image)
 
-        if is_image:
-            try:
-                meta = extract_image_metadata(file_obj)
-                logger.debug("create_media_item_version: Image meta: %s", meta)
-                version.width = meta["width"]
-                version.height = meta["height"]
-                version.file_size = meta["file_size"]
-            except Exception as e:
-                logger.error("create_media_item_version: Could not extract image metadata: %s", e)
-                raise ValueError("Could not extract image metadata.")
-        else:
-            # Attempt video metadata extraction
-            try:
-                vmeta = extract_video_metadata(file_obj)
-                logger.debug("create_media_item_version: Video meta: %s", vmeta)
-                version.width = vmeta["width"]
-                version.height = vmeta["height"]
-                version.video_duration = vmeta["duration"]
-                version.file_size = file_obj.size
-            except Exception as e:
-                logger.warning("create_media_item_version: Could not extract video metadata: %s", e)
-                # fallback to file_size only
-                version.file_size = file_obj.size
+        # Overridden by the probe or meta when available.
+        version.file_size = file_obj.size
+        if probe is not None:
+            apply_probe(version, probe)
+        if meta is not None:
+            version.width = meta["width"]
+            version.height = meta["height"]
+            version.file_size = meta["file_size"]
 
         version.save()
 
         if existing_hash_value:
             hash_value = existing_hash_value
+        elif hash_type_name == "blake3" and digest_from_name(version.file.name):
+            # Content-addressed: the storage hashed it already.
+            hash_value = digest_from_name(version.file.name)
         else:
             hash_value = compute_file_hash(file_obj, hash_type=hash_type_name)
         hash_type_obj, _ = HashType.objects.get_or_create(name=hash_type_name)
@@ -61,5 +73,36 @@ def create_media_item_version(
             hash_value=hash_value
         )
 
+        # Keep the denormalised manifest used by the display resolver in sync.
+        refresh_rendition_manifest(media_item)
+
         logger.debug("create_media_item_version: Version id=%s finalized, returning it.", version.id)
     return version
+
+
+def link_media_item_version(media_item: MediaItem, version_type: int, source: MediaItemVersion,
+                            derivative_key: str) -> MediaItemVersion:
+    """
+    Creates a version of media_item sharing the file of `source`, a version
+    rendered with the same derivative_key: nothing is rendered, copied or hashed.
+    """
+    with transaction.atomic():
+        version = MediaItemVersion.objects.create(
+            media_item=media_item,
+            version_type=version_type,
+            file=source.file.name,
+            width=source.width,
+            height=source.height,
+            file_size=source.file_size,
+            video_duration=source.video_duration,
+            probe=source.probe,
+            derivative_key=derivative_key,
+            derivative_reused=True
+        )
+        MediaItemHash.objects.bulk_create([
+            MediaItemHash(media_item_version=version, hash_type_id=hash_type_id, hash_value=hash_value)
+            for hash_type_id, hash_value in source.hashes.values_list("hash_type_id", "hash_value")
+        ])
+        refresh_rendition_manifest(media_item)
+        logger.debug("link_media_item_version: Version id=%s shares the file of version id=%s", version.id, source.id)
+    return version
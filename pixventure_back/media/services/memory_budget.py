@@ -0,0 +1,150 @@
+# media/services/memory_budget.py
+"""
+Memory budget for full-resolution image work.
+
+The full-resolution watermarked version is the only rendition that needs the
+whole original in memory. Its peak is estimated from the header dimensions
+before anything is decoded, and inputs that would not fit the per-task budget
+(settings.IMAGE_TASK_MEMORY_BUDGET) are either downscaled to fit or refused,
+according to settings.IMAGE_OVERSIZE_POLICY, instead of taking a worker down.
+
+track_peak_rss() measures the peak resident memory of a block of work, so
+task logs show what each handler actually used.
+"""
+
+import math
+import resource
+import time
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+from django.conf import settings
+
+DOWNSCALE = "downscale"
+REFUSE = "refuse"
+
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+# Resident bytes per pixel of the original while rendering and encoding the
+# watermarked version, measured on 24 MP JPEGs: ~4 for the RGB decode (the
+# watermark is drawn in place) and ~13 inside the libwebp encoder (RGBA and YUV
+# copies, analysis buffers).
+PEAK_BYTES_PER_PIXEL = 18
+# Largest width or height a WebP image can have.
+WEBP_MAX_DIMENSION = 16383
+
+
+class ImageTooLarge(ValueError):
+    """
+    The image does not fit the memory budget and the policy is to refuse it.
+    """
+
+
+class DecodePlan(NamedTuple):
+    """
+    target_size is None to work at full resolution, else the (width, height)
+    the image must be brought down to.
+    """
+    target_size: Optional[tuple]
+    estimated_bytes: int
+
+    @property
+    def downscaled(self):
+        return self.target_size is not None
+
+
+def get_memory_budget():
+    return getattr(settings, "IMAGE_TASK_MEMORY_BUDGET", DEFAULT_MEMORY_BUDGET)
+
+
+def get_oversize_policy():
+    return getattr(settings, "IMAGE_OVERSIZE_POLICY", DOWNSCALE)
+
+
+def estimate_peak_bytes(width, height):
+    return width * height * PEAK_BYTES_PER_PIXEL
+
+
+def plan_full_resolution(width, height, budget=None, policy=None) -> DecodePlan:
+    """
+    Decides how a width x height original can be rendered at "full" resolution
+    within the memory budget (and the WebP size limit).
+
+    :raises ImageTooLarge: If it does not fit and the policy is REFUSE.
+    """
+    budget = get_memory_budget() if budget is None else budget
+    policy = get_oversize_policy() if policy is None else policy
+    estimated = estimate_peak_bytes(width, height)
+
+    scale = min(1.0, WEBP_MAX_DIMENSION / max(width, height))
+    if estimated > budget:
+        scale = min(scale, math.sqrt(budget / estimated))
+    if scale >= 1.0:
+        return DecodePlan(None, estimated)
+
+    if policy == REFUSE:
+        raise ImageTooLarge(
+            f"{width}x{height} image needs about {estimated // (1024 * 1024)} MiB "
+            f"(budget {budget // (1024 * 1024)} MiB, max dimension {WEBP_MAX_DIMENSION})."
+        )
+    target = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return DecodePlan(target, estimate_peak_bytes(*target))
+
+
+# ---------------------------
+# Peak RSS measurement
+# ---------------------------
+def _status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """
+    Resets the process peak RSS (VmHWM). Linux only; returns False elsewhere.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class RssReport:
+    def __init__(self):
+        self.start_mb = None
+        self.peak_mb = None
+        self.elapsed_ms = None
+
+    @property
+    def growth_mb(self):
+        if self.start_mb is None or self.peak_mb is None:
+            return None
+        return max(0.0, self.peak_mb - self.start_mb)
+
+
+@contextmanager
+def track_peak_rss():
+    """
+    Measures the peak resident memory of the enclosed block (in MiB) and its duration.
+    Without /proc (non-Linux), peak_mb is the process-lifetime peak instead.
+    """
+    report = RssReport()
+    reset = _reset_peak_rss()
+    rss_kb = _status_kb("VmRSS") if reset else None
+    report.start_mb = rss_kb / 1024 if rss_kb is not None else None
+    started = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report.elapsed_ms = (time.perf_counter() - started) * 1000
+        peak_kb = _status_kb("VmHWM") if reset else None
+        if peak_kb is None:
+            # ru_maxrss is in KiB on Linux.
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report.peak_mb = peak_kb / 1024
@@ -0,0 +1,21 @@
+# media/services/rendition_manifest.py
+import logging
+from media.models import MediaItem, MediaItemVersion
+from media.utils.renditions import build_manifest
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_rendition_manifest(media_item: MediaItem) -> dict:
+    """
+    Rebuilds the rendition manifest of a MediaItem from its versions and stores it.
+    Uses a targeted UPDATE so concurrent edits to other MediaItem fields are not overwritten.
+    """
+    versions = MediaItemVersion.objects.filter(media_item=media_item).only(
+        'id', 'version_type', 'file', 'width', 'height', 'file_size'
+    )
+    manifest = build_manifest(versions)
+    MediaItem.objects.filter(pk=media_item.pk).update(renditions=manifest)
+    media_item.renditions = manifest
+    logger.debug("refresh_rendition_manifest: MediaItem %s has renditions %s", media_item.pk, list(manifest))
+    return manifest
@@ -0,0 +1,93 @@
+# media/services/scratch.py
+"""
+Per-task scratch workspaces.
+
+Every task that writes intermediate files (ffmpeg outputs, two-pass logs,
+segments) gets its own directory, so concurrent tasks on a host never share
+file names:
+  - workspaces live under settings.MEDIA_SCRATCH_DIR, which can point at a
+    fast local volume or a tmpfs; by default they live next to the media
+    volume (MEDIA_UPLOAD_SPOOL_DIR/scratch), where storing an output is a
+    rename instead of a copy;
+  - the free space is checked before the task starts, against its estimate
+    plus MEDIA_SCRATCH_RESERVE, so a full disk fails the task early instead of
+    halfway through an encode;
+  - the workspace is removed when the task ends, however it ends. Workspaces
+    left by killed workers are removed by cleanup_stale_workspaces (Celery beat).
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from media.upload_handlers import get_spool_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESERVE = 1024 * 1024 * 1024
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+
+class InsufficientScratchSpace(OSError):
+    """
+    The scratch volume does not have room for the task.
+    """
+
+
+def get_scratch_root():
+    root = getattr(settings, "MEDIA_SCRATCH_DIR", None) or os.path.join(get_spool_dir(), "scratch")
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def check_free_space(root, needed_bytes=0, reserve=None):
+    """
+    :raises InsufficientScratchSpace: If root has less than needed_bytes plus the reserve free.
+    """
+    reserve = getattr(settings, "MEDIA_SCRATCH_RESERVE", DEFAULT_RESERVE) if reserve is None else reserve
+    free = shutil.disk_usage(root).free
+    if free < needed_bytes + reserve:
+        raise InsufficientScratchSpace(
+            f"{root} has {free // (1024 * 1024)} MiB free, the task needs "
+            f"{needed_bytes // (1024 * 1024)} MiB plus a {reserve // (1024 * 1024)} MiB reserve."
+        )
+    return free
+
+
+@contextmanager
+def scratch_workspace(prefix="task-", needed_bytes=0):
+    """
+    Yields the path of a new, empty directory, removed with its content on exit.
+
+    :param needed_bytes: Estimated disk usage of the task, checked before it starts.
+    :raises InsufficientScratchSpace: If the scratch volume is too full.
+    """
+    root = get_scratch_root()
+    check_free_space(root, needed_bytes)
+    workdir = tempfile.mkdtemp(prefix=prefix, dir=root)
+    try:
+        yield workdir
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def cleanup_stale_workspaces(max_age=None, now=None):
+    """
+    Removes workspaces older than max_age seconds (left behind by killed
+    workers). Returns the number removed.
+    """
+    max_age = getattr(settings, "MEDIA_SCRATCH_MAX_AGE", DEFAULT_MAX_AGE) if max_age is None else max_age
+    now = time.time() if now is None else now
+    root = get_scratch_root()
+    removed = 0
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir(follow_symlinks=False) and now - entry.stat().st_mtime > max_age:
+                shutil.rmtree(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.warning("Could not remove scratch workspace %s: %s", entry.path, e)
+    return removed
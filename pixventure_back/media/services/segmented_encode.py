@@ -0,0 +1,308 @@
+# media/services/segmented_encode.py
+"""
+Segmented video encoding, for long videos.
+
+The source is cut at keyframes into N segments of similar duration, the
+segments are encoded concurrently by separate ffmpeg processes, and the
+encoded segments are joined without re-encoding by the concat demuxer:
+  - segments are read straight from the source with an input seek to their
+    keyframe and an exact frame count, so nothing is split or copied first and
+    every frame belongs to exactly one segment;
+  - every segment gets the same video filter (the watermark is static), the
+    same encoder options and no audio;
+  - the audio is taken once, continuously, from the source when the segments
+    are concatenated, so there is no gap or drift at the joins.
+
+The result is checked against the source before it is used: same number of
+video frames, same duration, and the same audio/video alignment. A failed
+check raises SegmentedEncodeError, and the caller falls back to a single
+encode.
+
+Segments are encoded by a local pool. Fanning them out as a Celery group would
+need a shared result backend to join them; the configured one is in-memory.
+Each segment takes its own encode governor slot, so a host never runs more
+ffmpeg processes than FFMPEG_MAX_JOBS, segments included.
+"""
+
+import bisect
+import json
+import logging
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+from media.services.encode_governor import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+FFPROBE_TIMEOUT = 300
+# Shortest segment planned; below this, process startup and GOP edges dominate.
+MIN_SEGMENT_SECONDS = 10
+# Seeks land this much before a keyframe, so rounding never skips it (frames
+# before the seek point are decoded and dropped).
+SEEK_EPSILON = 0.001
+# Accepted differences between the source and the joined output.
+DURATION_TOLERANCE = 0.1
+AV_SYNC_TOLERANCE = 0.05
+
+
+class SegmentedEncodeError(RuntimeError):
+    """
+    Segmented encoding failed or its output does not match the source.
+    """
+
+
+class Segment(NamedTuple):
+    index: int
+    start: float
+    end: Optional[float]      # None: until the end of the source
+    frames: Optional[int] = None
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+
+class StreamSummary(NamedTuple):
+    video_frames: Optional[int]
+    video_start: float
+    video_duration: Optional[float]
+    audio_start: Optional[float]
+    audio_duration: Optional[float]
+    # Start time of the container, which input seeks are relative to.
+    start: float = 0.0
+
+    @property
+    def av_offset(self):
+        """
+        Difference between the ends of the audio and video streams, or None without audio.
+        """
+        if self.audio_duration is None or self.video_duration is None:
+            return None
+        return (self.audio_start + self.audio_duration) - (self.video_start + self.video_duration)
+
+
+class SegmentedEncodeResult(NamedTuple):
+    segments: List[Segment]
+    source: StreamSummary
+    output: StreamSummary
+
+
+def _ffprobe_json(args):
+    cmd = ["ffprobe", "-v", "error", *args, "-of", "json"]
+    try:
+        result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=FFPROBE_TIMEOUT
+        )
+        return json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        raise SegmentedEncodeError(f"ffprobe failed: {e}")
+
+
+def list_packets(path):
+    """
+    Returns (presentation times of all video packets, of the keyframes), sorted,
+    from packet flags (no decoding).
+    """
+    data = _ffprobe_json(["-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", path])
+    times, keyframes = [], []
+    for packet in data.get("packets") or []:
+        if packet.get("pts_time") in (None, "N/A"):
+            continue
+        times.append(float(packet["pts_time"]))
+        if "K" in (packet.get("flags") or ""):
+            keyframes.append(times[-1])
+    return sorted(times), sorted(keyframes)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def summarize_streams(path) -> StreamSummary:
+    """
+    Counts the video frames (packets, no decoding) and reads the stream timings.
+    """
+    data = _ffprobe_json([
+        "-count_packets",
+        "-show_entries", "stream=codec_type,nb_read_packets,start_time,duration:format=start_time,duration",
+        path,
+    ])
+    return parse_stream_summary(data)
+
+
+def parse_stream_summary(data) -> StreamSummary:
+    container = data.get("format") or {}
+    container_duration = _float(container.get("duration"))
+    video = audio = None
+    for stream in data.get("streams") or []:
+        if stream.get("codec_type") == "video" and video is None:
+            video = stream
+        elif stream.get("codec_type") == "audio" and audio is None:
+            audio = stream
+    if video is None:
+        raise SegmentedEncodeError("No video stream found.")
+    frames = video.get("nb_read_packets")
+    return StreamSummary(
+        video_frames=int(frames) if frames not in (None, "N/A") else None,
+        video_start=_float(video.get("start_time")) or 0.0,
+        video_duration=_float(video.get("duration")) or container_duration,
+        audio_start=(_float(audio.get("start_time")) or 0.0) if audio else None,
+        audio_duration=(_float(audio.get("duration")) or container_duration) if audio else None,
+        start=_float(container.get("start_time")) or 0.0,
+    )
+
+
+def plan_segments(keyframes, duration, count, min_segment=MIN_SEGMENT_SECONDS, frame_times=None) -> List[Segment]:
+    """
+    Splits [0, duration) into at most `count` segments starting at keyframes,
+    each as close as possible to duration / count long and at least min_segment.
+    With frame_times (the presentation times of every frame), each segment but
+    the last also gets its exact frame count.
+    """
+    if count < 2 or not duration or duration < 2 * min_segment:
+        return [Segment(0, 0.0, None)]
+    starts = [0.0]
+    for i in range(1, count):
+        target = duration * i / count
+        candidates = [
+            keyframe for keyframe in keyframes
+            if starts[-1] + min_segment <= keyframe <= duration - min_segment
+        ]
+        if not candidates:
+            break
+        starts.append(min(candidates, key=lambda keyframe: abs(keyframe - target)))
+
+    segments = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else None
+        frames = None
+        if frame_times is not None and end is not None:
+            frames = bisect.bisect_left(frame_times, end) - bisect.bisect_left(frame_times, start)
+        segments.append(Segment(index, start, end, frames))
+    return segments
+
+
+# ---------------------------
+# Commands
+# ---------------------------
+def build_segment_command(input_path, segment: Segment, video_filter, encoder_args, output_path, first_pass=False):
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostdin"]
+    if segment.start:
+        # Before -i: fast seek to the keyframe, which is exactly the segment start.
+        cmd += ["-ss", f"{max(0.0, segment.start - SEEK_EPSILON):.6f}"]
+    cmd += ["-i", input_path]
+    if segment.frames:
+        # Exact: the segment ends on the frame before the next segment's keyframe.
+        cmd += ["-frames:v", str(segment.frames)]
+    elif segment.end is not None:
+        cmd += ["-t", f"{segment.duration:.6f}"]
+    cmd += ["-map", "0:v:0", "-vf", video_filter, "-an", *encoder_args]
+    cmd += ["-f", "null", os.devnull] if first_pass else ["-f", "mp4", output_path]
+    return cmd
+
+
+def write_concat_list(paths, list_path):
+    with open(list_path, "w") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def build_concat_command(list_path, input_path, audio_args, output_path):
+    """
+    Joins the encoded segments (stream copy) and adds the source's audio.
+    audio_args map and encode audio from input 1 (the source).
+    """
+    return [
+        "ffmpeg", "-y", "-hide_banner", "-nostdin",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", input_path,
+        "-map", "0:v:0", "-c:v", "copy", *audio_args,
+        "-f", "mp4", output_path,
+    ]
+
+
+def verify_output(source: StreamSummary, output: StreamSummary, frame_duration=None):
+    """
+    Returns the problems found comparing the joined output with its source (empty when fine).
+    """
+    problems = []
+    if source.video_frames is not None and output.video_frames != source.video_frames:
+        problems.append(f"frame count {output.video_frames} != {source.video_frames}")
+    tolerance = max(DURATION_TOLERANCE, 2 * (frame_duration or 0))
+    if source.video_duration and output.video_duration is not None:
+        if abs(output.video_duration - source.video_duration) > tolerance:
+            problems.append(f"duration {output.video_duration:.3f} != {source.video_duration:.3f}")
+    if source.av_offset is not None:
+        if output.av_offset is None:
+            problems.append("audio stream missing")
+        elif abs(output.av_offset - source.av_offset) > max(AV_SYNC_TOLERANCE, frame_duration or 0):
+            problems.append(f"A/V offset {output.av_offset:.3f} != {source.av_offset:.3f}")
+    return problems
+
+
+def _run(cmd):
+    try:
+        run_ffmpeg(cmd)
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode(errors="replace").strip().splitlines()
+        raise SegmentedEncodeError(f"ffmpeg failed ({e.returncode}): {stderr[-1] if stderr else 'no output'}")
+
+
+# ---------------------------
+# Encoding
+# ---------------------------
+def encode_segmented(input_path, duration, video_filter, encoder_args_for, audio_args, output_path, workdir,
+                     segments=None, workers=None, two_pass=False) -> SegmentedEncodeResult:
+    """
+    Encodes input_path to output_path in parallel segments and checks the result.
+
+    :param video_filter: The -vf filter applied to every segment.
+    :param encoder_args_for: encoder_args_for(segment, pass_number, passlog) -> video encoder
+        options for a segment (pass_number is None for single-pass encodes).
+    :param audio_args: Audio options of the joined output, for input 1 (the source).
+    :param segments: Number of segments (defaults to the number of CPUs).
+    :param workers: Concurrent ffmpeg processes (defaults to the number of segments).
+    :raises SegmentedEncodeError: If an encode fails or the output does not match the source.
+    """
+    count = segments or os.cpu_count() or 1
+    source = summarize_streams(input_path)
+    frame_times, keyframes = list_packets(input_path)
+    # Seeks are relative to the container start.
+    frame_times = [time - source.start for time in frame_times]
+    keyframes = [time - source.start for time in keyframes]
+    plan = plan_segments(keyframes, duration, count, frame_times=frame_times)
+    base = os.path.join(workdir, "segment")
+
+    def encode(segment):
+        output = f"{base}-{segment.index:03d}.mp4"
+        passlog = f"{base}-{segment.index:03d}.passlog"
+        if two_pass:
+            _run(build_segment_command(
+                input_path, segment, video_filter, encoder_args_for(segment, 1, passlog), output, first_pass=True
+            ))
+        _run(build_segment_command(
+            input_path, segment, video_filter, encoder_args_for(segment, 2 if two_pass else None, passlog), output
+        ))
+        return output
+
+    with ThreadPoolExecutor(max_workers=min(workers or len(plan), len(plan))) as pool:
+        outputs = list(pool.map(encode, plan))
+
+    list_path = write_concat_list(outputs, f"{base}s.txt")
+    _run(build_concat_command(list_path, input_path, audio_args, output_path))
+    for path in outputs:
+        os.remove(path)
+
+    output = summarize_streams(output_path)
+    frame_duration = source.video_duration / source.video_frames if source.video_frames else None
+    problems = verify_output(source, output, frame_duration)
+    if problems:
+        raise SegmentedEncodeError("Segmented output does not match the source: " + "; ".join(problems))
+    logger.info("Encoded %s in %d segments, %s frames", input_path, len(plan), output.video_frames)
+    return SegmentedEncodeResult(plan, source, output)
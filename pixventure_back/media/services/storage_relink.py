@@ -0,0 +1,106 @@
+# media/services/storage_relink.py
+"""
+Moves existing media version files to the content-addressed layout (see media.storage).
+
+Versions are processed in batches by increasing id. Each file is hard-linked
+(copied across volumes) to its content name, the versions of the batch are
+repointed in one bulk update and the rendition manifests of their items are
+rebuilt. Already relinked versions no longer match the batch query, so an
+interrupted run simply resumes where it stopped when run again.
+Files renamed for SEO (is_renamed) keep their names.
+"""
+
+import logging
+import os
+import shutil
+from typing import NamedTuple
+from django.db import transaction
+from media.models import MediaItem, MediaItemHash, MediaItemVersion
+from media.services.rendition_manifest import refresh_rendition_manifest
+from media.storage import CONTENT_PREFIX, content_digest, content_name, media_version_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class RelinkBatch(NamedTuple):
+    last_id: int          # None when there was nothing left to relink
+    relinked: int
+    deduplicated: int     # content already stored under its content name
+    missing: int          # file not found, left as is
+    removed: int          # old files deleted (remove_old)
+
+
+def pending_versions(after_id=0):
+    return (
+        MediaItemVersion.objects.filter(id__gt=after_id, is_renamed=False)
+        .exclude(file="").exclude(file__isnull=True)
+        .exclude(file__startswith=f"{CONTENT_PREFIX}/")
+        .order_by("id")
+    )
+
+
+def link_or_copy(source_path, target_path):
+    """
+    Hard-links source_path to target_path, or copies it (atomically) across volumes.
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.link(source_path, target_path)
+    except FileExistsError:
+        pass
+    except OSError:
+        partial = f"{target_path}.{os.getpid()}.partial"
+        shutil.copy2(source_path, partial)
+        os.replace(partial, target_path)
+
+
+def relink_batch(after_id=0, batch_size=DEFAULT_BATCH_SIZE, remove_old=False) -> RelinkBatch:
+    """
+    Relinks the next batch_size pending versions with an id above after_id.
+
+    :param remove_old: Delete the old files no version refers to any more.
+    """
+    storage = media_version_storage
+    versions = list(pending_versions(after_id).only("id", "file", "media_item_id")[:batch_size])
+    if not versions:
+        return RelinkBatch(None, 0, 0, 0, 0)
+    digests = dict(
+        MediaItemHash.objects.filter(
+            media_item_version_id__in=[version.id for version in versions], hash_type__name="blake3"
+        ).values_list("media_item_version_id", "hash_value")
+    )
+
+    changed, old_names, deduplicated, missing = [], set(), 0, 0
+    for version in versions:
+        old_name = version.file.name
+        if not storage.exists(old_name):
+            logger.warning("relink_batch: File of MediaItemVersion %s is missing: %s", version.id, old_name)
+            missing += 1
+            continue
+        digest = digests.get(version.id)
+        if not digest:
+            with storage.open(old_name, "rb") as f:
+                digest = content_digest(f)
+        new_name = content_name(digest, os.path.splitext(old_name)[1])
+        if storage.exists(new_name):
+            deduplicated += 1
+        else:
+            link_or_copy(storage.path(old_name), storage.path(new_name))
+        version.file.name = new_name
+        changed.append(version)
+        old_names.add(old_name)
+
+    with transaction.atomic():
+        MediaItemVersion.objects.bulk_update(changed, ["file"])
+        for media_item in MediaItem.objects.filter(id__in={version.media_item_id for version in changed}).only("id"):
+            refresh_rendition_manifest(media_item)
+
+    removed = 0
+    if remove_old and old_names:
+        still_used = set(MediaItemVersion.objects.filter(file__in=old_names).values_list("file", flat=True))
+        for name in old_names - still_used:
+            storage.delete(name)
+            removed += 1
+    return RelinkBatch(versions[-1].id, len(changed), deduplicated, missing, removed)
@@ -0,0 +1,620 @@
+# media/services/video_pipeline.py
+"""
+Single-invocation video rendition pipeline.
+
+The original is decoded once. One ffmpeg run with a multi-output filter graph
+emits every requested rendition from that decode:
+  - the watermarked full video (drawtext + scale to the display size);
+  - the preview clip, from the same watermarked frames, trimmed to its duration;
+  - the poster frame, taken from the unwatermarked frames at mid-duration and
+    scaled to the thumbnail size (converted to WEBP afterwards).
+When the watermarked video is produced in the same run with the preview's
+encoding, the preview is not encoded at all: a keyframe is forced at the
+preview's end, so the clip is cut from the watermarked output by stream copy
+(a remux, no decode or encode).
+
+Each video rendition is encoded with a named profile (VIDEO_ENCODING_PROFILES,
+selected by the watermarked_video_profile / preview_video_profile settings).
+The default is a single-pass CRF encode capped at the original's bitrate;
+two-pass profiles add one analysis run before the main one. The wall time,
+CPU time and output bitrate of every encode are recorded (VideoEncodeStat).
+
+Long videos (video_segmented_min_duration) get their watermarked version
+encoded in parallel segments instead (see media.services.segmented_encode);
+the other renditions then come from a second, cheap run (the poster frame is
+seeked, the preview stream-copied or encoded from its first seconds only).
+
+Source dimensions and duration come from the original's probe
+(MediaProbe.for_version), so nothing is probed again. Outputs are written to a
+work directory the caller owns (a scratch workspace, see scratch_bytes_needed);
+every stage is timed. ffmpeg runs through the host's encode governor
+(media.services.encode_governor), and encoder threads are capped by it.
+"""
+
+import logging
+import os
+import resource
+import subprocess
+import time
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+from PIL import Image
+from django.conf import settings
+from main.default_settings_config import VIDEO_ENCODING_PROFILES
+from media.models import MediaItemVersion, VideoEncodeStat
+from media.services import watermark
+from media.services.encode_governor import cap_threads, run_ffmpeg
+from media.services.media_probe import MediaProbe, ProbeResult
+from media.services.segmented_encode import SegmentedEncodeError, encode_segmented
+from media.upload_handlers import AssembledUploadedFile
+
+logger = logging.getLogger(__name__)
+
+# Version types the pipeline can produce.
+SUPPORTED_VERSIONS = (
+    MediaItemVersion.WATERMARKED,
+    MediaItemVersion.PREVIEW,
+    MediaItemVersion.THUMBNAIL,
+)
+VIDEO_VERSIONS = (MediaItemVersion.WATERMARKED, MediaItemVersion.PREVIEW)
+
+DEFAULT_PROFILE = "capped_crf"
+# CRF of single-pass profiles that define none: 18 is visually lossless for x264.
+DEFAULT_CRF = 18
+DEFAULT_MAX_BITRATE = 5000000
+DEFAULT_PREVIEW_DURATION = 2
+DEFAULT_THUMBNAIL_SIZE = 300
+THUMBNAIL_WEBP_QUALITY = 85
+WATERMARK_FONT_SIZE = 17
+WATERMARK_FONT_COLOR = "red"
+
+
+class EncodingProfile(NamedTuple):
+    """
+    A video encoding profile (see VIDEO_ENCODING_PROFILES for the fields).
+    """
+    name: str
+    codec: str = "libx264"
+    preset: str = "medium"
+    crf: Optional[int] = DEFAULT_CRF
+    maxrate: Optional[int] = None
+    bufsize_factor: float = 2
+    audio: str = "copy"
+    audio_bitrate: str = "128k"
+    threads: int = 0
+    two_pass: bool = False
+
+
+class VideoRenderOptions(NamedTuple):
+    watermarked_profile: EncodingProfile
+    preview_profile: EncodingProfile
+    max_bitrate: int          # bits per second
+    preview_duration: float   # seconds
+    thumbnail_size: int
+    watermark_text: str
+    segment_min_duration: float = 0   # seconds; 0: never segment
+    segments: int = 0                 # 0: one per CPU
+
+    def profile_for(self, version_type):
+        if version_type == MediaItemVersion.PREVIEW:
+            return self.preview_profile
+        return self.watermarked_profile
+
+
+class EncodeStats(NamedTuple):
+    """
+    Cost of one encoded rendition. encode_ms and cpu_seconds are those of the
+    ffmpeg run(s) that produced it, shared by renditions encoded together.
+    """
+    profile: str
+    encode_ms: float
+    cpu_seconds: float
+    stream_copied: bool = False
+    file_size: Optional[int] = None
+    duration: Optional[float] = None
+    segments: int = 1
+
+    @property
+    def output_bitrate(self):
+        if not self.file_size or not self.duration:
+            return None
+        return int(self.file_size * 8 / self.duration)
+
+
+class RenderedVideoFiles(NamedTuple):
+    paths: dict               # {version_type: path}
+    preview_stream_copied: bool
+    timings: dict             # {stage: milliseconds}
+    encodes: dict             # {version_type: EncodeStats} for video renditions
+
+
+class VideoPipelineResult(NamedTuple):
+    versions: dict            # {version_type: (file, probe or meta dict)}
+    preview_stream_copied: bool
+    timings: dict
+    encodes: dict             # {version_type: EncodeStats}, with output sizes
+
+
+def _children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def _timed(timings, stage, cpu=None):
+    """
+    Records the wall time of the block in timings[stage] (ms) and, with `cpu`,
+    the CPU time of the child processes it waited for in cpu[stage] (seconds).
+    """
+    started = time.perf_counter()
+    cpu_started = _children_cpu_seconds() if cpu is not None else 0
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+        if cpu is not None:
+            cpu[stage] = round(_children_cpu_seconds() - cpu_started, 3)
+
+
+def _crf(quality):
+    """
+    Returns the CRF a quality setting asks for, or None for "profile default" (-1).
+    """
+    try:
+        quality = int(quality)
+    except (TypeError, ValueError):
+        return None
+    return quality if 0 <= quality <= 51 else None
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def get_encoding_profile(name, quality=None) -> EncodingProfile:
+    """
+    Returns the named profile (the default one if unknown), with its CRF
+    replaced by the quality setting unless that is -1.
+    """
+    definition = VIDEO_ENCODING_PROFILES.get(name)
+    if definition is None:
+        logger.warning("Unknown video encoding profile %r, using %r", name, DEFAULT_PROFILE)
+        name, definition = DEFAULT_PROFILE, VIDEO_ENCODING_PROFILES[DEFAULT_PROFILE]
+    fields = {key: value for key, value in definition.items() if key in EncodingProfile._fields}
+    profile = EncodingProfile(name=name, **fields)
+    crf = _crf(quality)
+    return profile if crf is None else profile._replace(crf=crf)
+
+
+def options_from_config(config) -> VideoRenderOptions:
+    try:
+        preview_duration = float(config.get("preview_video_duration", DEFAULT_PREVIEW_DURATION))
+    except (TypeError, ValueError):
+        preview_duration = DEFAULT_PREVIEW_DURATION
+    watermarked_profile = get_encoding_profile(
+        config.get("watermarked_video_profile", DEFAULT_PROFILE), config.get("full_watermarked_version_quality")
+    )
+    preview_profile = get_encoding_profile(
+        config.get("preview_video_profile", DEFAULT_PROFILE), config.get("preview_video_quality")
+    )
+    return VideoRenderOptions(
+        watermarked_profile=watermarked_profile._replace(threads=cap_threads(watermarked_profile.threads)),
+        preview_profile=preview_profile._replace(threads=cap_threads(preview_profile.threads)),
+        max_bitrate=_positive_int(config.get("max_video_bitrate"), DEFAULT_MAX_BITRATE),
+        preview_duration=preview_duration if preview_duration > 0 else DEFAULT_PREVIEW_DURATION,
+        thumbnail_size=_positive_int(config.get("thumbnail_size"), DEFAULT_THUMBNAIL_SIZE),
+        watermark_text=getattr(settings, "WATERMARK_TEXT_FOR_PREVIEWS", "Default Watermark"),
+        segment_min_duration=_positive_int(config.get("video_segmented_min_duration"), 0),
+        segments=_positive_int(config.get("video_encode_segments"), 0),
+    )
+
+
+def target_bitrate(file_size, duration, max_bitrate):
+    """
+    The original's average bitrate, capped at max_bitrate (bits per second).
+    """
+    computed = int(file_size * 8 / duration) if duration and duration > 0 else 0
+    if computed <= 0:
+        return max_bitrate
+    return min(computed, max_bitrate)
+
+
+def even_size(width, height):
+    # x264 with 4:2:0 chroma needs even dimensions.
+    return width + width % 2, height + height % 2
+
+
+def escape_drawtext(text):
+    """
+    Escapes text for an unquoted drawtext `text=` option inside a filter graph:
+    once for drawtext's own expansion (%), once for the option parser and once
+    for the filter graph parser.
+    """
+    text = text.replace("\\", "\\\\").replace("%", "\\%")
+    for char in ("\\", "'", ":"):
+        text = text.replace(char, "\\" + char)
+    for char in ("\\", "'", "[", "]", ",", ";"):
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def preview_can_be_copied(version_types, options: VideoRenderOptions, duration):
+    """
+    The preview is cut from the watermarked output by stream copy when that
+    output is rendered in the same run with the preview's encoding and is
+    longer than the preview (the cut then ends on a forced keyframe).
+    """
+    return (
+        MediaItemVersion.WATERMARKED in version_types
+        and MediaItemVersion.PREVIEW in version_types
+        and options.watermarked_profile._replace(name="") == options.preview_profile._replace(name="")
+        and bool(duration) and duration > options.preview_duration
+    )
+
+
+# ---------------------------
+# Command building
+# ---------------------------
+def encoder_args(profile: EncodingProfile, bitrate_cap=None, pass_number=None, passlog=None):
+    """
+    Video encoder options of a profile. bitrate_cap (bits per second) further
+    caps single-pass encodes and is the target of two-pass ones.
+    """
+    args = ["-c:v", profile.codec, "-preset", profile.preset]
+    caps = [rate for rate in (profile.maxrate, bitrate_cap) if rate]
+    cap_k = max(1, min(caps) // 1000) if caps else None
+    if profile.two_pass and pass_number:
+        cap_k = cap_k or DEFAULT_MAX_BITRATE // 1000
+        args += ["-b:v", f"{cap_k}k", "-maxrate", f"{cap_k}k"]
+        args += ["-bufsize", f"{int(cap_k * profile.bufsize_factor)}k"]
+        args += ["-pass", str(pass_number), "-passlogfile", passlog]
+    else:
+        args += ["-crf", str(DEFAULT_CRF if profile.crf is None else profile.crf)]
+        if cap_k:
+            args += ["-maxrate", f"{cap_k}k", "-bufsize", f"{int(cap_k * profile.bufsize_factor)}k"]
+    if profile.threads:
+        args += ["-threads", str(profile.threads)]
+    return args
+
+
+def audio_args(profile: EncodingProfile, input_index=0):
+    if profile.audio == "none":
+        return ["-an"]
+    if profile.audio == "aac":
+        return ["-map", f"{input_index}:a?", "-c:a", "aac", "-b:a", profile.audio_bitrate]
+    return ["-map", f"{input_index}:a?", "-c:a", "copy"]
+
+
+def passlog_prefix(passlog, version_type):
+    return f"{passlog}-{version_type}"
+
+
+def build_watermark_filter(options: VideoRenderOptions, probe: ProbeResult):
+    """
+    The watermark and scaling filter chain. It does not depend on timestamps,
+    so segments encoded separately get the same watermark.
+    """
+    width, height = even_size(*probe.display_size)
+    return (
+        f"drawtext=text={escape_drawtext(options.watermark_text)}:x=w-tw-10:y=h-th-10"
+        f":fontsize={WATERMARK_FONT_SIZE}:fontcolor={WATERMARK_FONT_COLOR},scale={width}:{height}"
+    )
+
+
+def renders_anything(outputs, copy_preview=False):
+    """
+    Whether build_render_command has any output to produce.
+    """
+    return (
+        MediaItemVersion.WATERMARKED in outputs
+        or MediaItemVersion.THUMBNAIL in outputs
+        or (MediaItemVersion.PREVIEW in outputs and not copy_preview)
+    )
+
+
+def build_render_command(input_path, probe: ProbeResult, options: VideoRenderOptions, outputs: dict,
+                         copy_preview=False, passlog=None, first_pass=False):
+    """
+    Builds the single ffmpeg invocation rendering `outputs` ({version_type: path})
+    from input_path. With copy_preview, the PREVIEW output is not part of the
+    graph (see build_preview_copy_command) and a keyframe is forced at its end
+    in the watermarked encode.
+
+    Renditions with a two-pass profile read their statistics from passlog
+    (see passlog_prefix). With first_pass, the command is the analysis run
+    instead: only those renditions, without audio, to the null muxer.
+    """
+    duration = probe.duration or 0
+    if first_pass:
+        outputs = {
+            version: os.devnull for version in outputs
+            if version in VIDEO_VERSIONS and options.profile_for(version).two_pass
+            and not (version == MediaItemVersion.PREVIEW and copy_preview)
+        }
+    wants_watermarked = MediaItemVersion.WATERMARKED in outputs
+    wants_preview = MediaItemVersion.PREVIEW in outputs and not copy_preview
+    wants_thumbnail = MediaItemVersion.THUMBNAIL in outputs
+
+    watermark_filter = build_watermark_filter(options, probe)
+    thumbnail_filter = (
+        f"scale={options.thumbnail_size}:{options.thumbnail_size}"
+        f":force_original_aspect_ratio=decrease:flags=lanczos"
+    )
+
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostdin"]
+    if wants_thumbnail and not (wants_watermarked or wants_preview):
+        # Poster frame only: seek the input instead of decoding the first half.
+        cmd += ["-ss", f"{duration / 2:.3f}", "-i", input_path]
+        cmd += ["-map", "0:v:0", "-vf", thumbnail_filter, "-frames:v", "1", "-update", "1",
+                outputs[MediaItemVersion.THUMBNAIL]]
+        return cmd
+
+    graph = []
+    source = "[0:v]"
+    if wants_thumbnail:
+        graph.append("[0:v]split=2[src][thumbsrc]")
+        graph.append(f"[thumbsrc]trim=start={duration / 2:.3f},setpts=PTS-STARTPTS,{thumbnail_filter}[thumb]")
+        source = "[src]"
+    if wants_watermarked and wants_preview:
+        graph.append(f"{source}{watermark_filter},split=2[wm][wmsrc]")
+        graph.append(f"[wmsrc]trim=duration={options.preview_duration},setpts=PTS-STARTPTS[preview]")
+    elif wants_watermarked:
+        graph.append(f"{source}{watermark_filter}[wm]")
+    elif wants_preview:
+        graph.append(
+            f"{source}{watermark_filter},trim=duration={options.preview_duration},setpts=PTS-STARTPTS[preview]"
+        )
+
+    cmd += ["-i", input_path, "-filter_complex", ";".join(graph)]
+    bitrate_cap = target_bitrate(probe.file_size, duration, options.max_bitrate)
+    for version_type, label, wanted in (
+        (MediaItemVersion.WATERMARKED, "[wm]", wants_watermarked),
+        (MediaItemVersion.PREVIEW, "[preview]", wants_preview),
+    ):
+        if not wanted:
+            continue
+        profile = options.profile_for(version_type)
+        pass_number = (1 if first_pass else 2) if profile.two_pass else None
+        cmd += ["-map", label] + (["-an"] if first_pass else audio_args(profile))
+        if version_type == MediaItemVersion.PREVIEW:
+            cmd += ["-t", f"{options.preview_duration}"]
+        cmd += encoder_args(
+            profile, bitrate_cap, pass_number, passlog_prefix(passlog, version_type) if pass_number else None
+        )
+        if version_type == MediaItemVersion.WATERMARKED and copy_preview:
+            cmd += ["-force_key_frames", f"{options.preview_duration}"]
+        cmd += ["-f", "null" if first_pass else "mp4", outputs[version_type]]
+    if wants_thumbnail:
+        cmd += ["-map", "[thumb]", "-frames:v", "1", "-update", "1", outputs[MediaItemVersion.THUMBNAIL]]
+    return cmd
+
+
+def build_preview_copy_command(watermarked_path, preview_duration, output_path):
+    """
+    Cuts the first preview_duration seconds of the watermarked output without re-encoding.
+    """
+    return [
+        "ffmpeg", "-y", "-hide_banner", "-nostdin",
+        "-i", watermarked_path,
+        "-map", "0", "-t", f"{preview_duration}", "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-f", "mp4", output_path,
+    ]
+
+
+def _run(cmd):
+    try:
+        run_ffmpeg(cmd)
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode(errors="replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg failed ({e.returncode}): {stderr[-1] if stderr else 'no output'}")
+
+
+# ---------------------------
+# Rendering
+# ---------------------------
+def render_video_files(input_path, probe: ProbeResult, options: VideoRenderOptions, version_types,
+                       workdir) -> RenderedVideoFiles:
+    """
+    Renders the requested version types of the video at input_path into workdir.
+    """
+    wanted = [version for version in SUPPORTED_VERSIONS if version in set(version_types)]
+    if not wanted:
+        return RenderedVideoFiles({}, False, {}, {})
+
+    base = os.path.join(workdir, os.path.splitext(os.path.basename(input_path))[0])
+    paths = {
+        MediaItemVersion.WATERMARKED: base + ".watermarked.mp4",
+        MediaItemVersion.PREVIEW: base + ".preview.mp4",
+        MediaItemVersion.THUMBNAIL: base + ".thumbnail.png",
+    }
+    outputs = {version: paths[version] for version in wanted}
+    copy_preview = preview_can_be_copied(wanted, options, probe.duration)
+    passlog = base + ".passlog"
+    timings, cpu = {}, {}
+
+    segments = 0
+    if should_segment(outputs, options, probe.duration):
+        try:
+            with _timed(timings, "segmented", cpu):
+                segments = encode_watermarked_segmented(
+                    input_path, probe, options, outputs[MediaItemVersion.WATERMARKED], workdir, copy_preview
+                )
+        except SegmentedEncodeError as e:
+            logger.warning("Segmented encode of %s failed, encoding it in one run: %s", input_path, e)
+            timings.pop("segmented", None)
+    # The renditions left to render. Without the watermarked version there is no
+    # shared decode to gain, so each gets its own cheap run (seek, short trim).
+    remaining = {
+        version: path for version, path in outputs.items()
+        if not (segments and version == MediaItemVersion.WATERMARKED)
+    }
+    runs = [{version: path} for version, path in remaining.items()] if segments else [remaining]
+    runs = [run for run in runs if renders_anything(run, copy_preview)]
+
+    first_passes = [
+        build_render_command(input_path, probe, options, run, copy_preview=copy_preview, passlog=passlog,
+                             first_pass=True)
+        for run in runs
+    ]
+    first_passes = [command for command in first_passes if "-pass" in command]
+    if first_passes:
+        # Timed as a whole, like the renders below: the stats cover every run.
+        with _timed(timings, "first_pass", cpu):
+            for command in first_passes:
+                _run(command)
+    with _timed(timings, "render", cpu):
+        for run in runs:
+            _run(build_render_command(input_path, probe, options, run, copy_preview=copy_preview, passlog=passlog))
+    if copy_preview:
+        with _timed(timings, "preview_copy", cpu):
+            _run(build_preview_copy_command(
+                outputs[MediaItemVersion.WATERMARKED], options.preview_duration, outputs[MediaItemVersion.PREVIEW]
+            ))
+
+    def stages_of(version_type):
+        profile = options.profile_for(version_type)
+        if version_type == MediaItemVersion.WATERMARKED and segments:
+            return ["segmented"]
+        return ["render"] + (["first_pass"] if profile.two_pass and "first_pass" in timings else [])
+
+    encodes = {}
+    for version_type in [version for version in VIDEO_VERSIONS if version in outputs]:
+        profile, stages = options.profile_for(version_type), stages_of(version_type)
+        copied = version_type == MediaItemVersion.PREVIEW and copy_preview
+        if copied:
+            # Produced by the watermarked encode plus the copy.
+            profile = options.watermarked_profile
+            stages = stages_of(MediaItemVersion.WATERMARKED) + ["preview_copy"]
+        encodes[version_type] = EncodeStats(
+            profile.name,
+            round(sum(timings[stage] for stage in stages), 2),
+            round(sum(cpu[stage] for stage in stages), 3),
+            stream_copied=copied,
+            segments=(segments or 1) if version_type == MediaItemVersion.WATERMARKED or copied else 1,
+        )
+    return RenderedVideoFiles(outputs, copy_preview, timings, encodes)
+
+
+def should_segment(outputs, options: VideoRenderOptions, duration):
+    return (
+        MediaItemVersion.WATERMARKED in outputs
+        and options.segment_min_duration > 0
+        and bool(duration) and duration >= options.segment_min_duration
+    )
+
+
+def encode_watermarked_segmented(input_path, probe: ProbeResult, options: VideoRenderOptions, output_path,
+                                 workdir, copy_preview=False):
+    """
+    Encodes the watermarked version in parallel segments (same filter and
+    profile as the single run). Returns the number of segments.
+
+    :raises SegmentedEncodeError: If it fails or its output does not match the source.
+    """
+    profile = options.watermarked_profile
+    count = options.segments or os.cpu_count() or 1
+    if not profile.threads:
+        # Segments run side by side: share the cores instead of oversubscribing them.
+        profile = profile._replace(threads=max(1, (os.cpu_count() or 1) // count))
+    bitrate_cap = target_bitrate(probe.file_size, probe.duration, options.max_bitrate)
+
+    def encoder_args_for(segment, pass_number, passlog):
+        args = encoder_args(profile, bitrate_cap, pass_number, passlog)
+        if copy_preview and segment.index == 0:
+            args += ["-force_key_frames", f"{options.preview_duration}"]
+        return args
+
+    result = encode_segmented(
+        input_path, probe.duration, build_watermark_filter(options, probe), encoder_args_for,
+        audio_args(profile, input_index=1), output_path, workdir, segments=count, two_pass=profile.two_pass
+    )
+    return len(result.segments)
+
+
+def scratch_bytes_needed(original_size):
+    """
+    Disk space the renditions of an original of original_size bytes need while
+    rendering: the outputs stay within the original's bitrate, and a segmented
+    encode briefly holds its segments and the joined output together.
+    """
+    return 2 * (original_size or 0)
+
+
+def _video_output(path, name, width, height, duration):
+    size = os.path.getsize(path)
+    result = ProbeResult("video", width, height, "mp4", size, 0, "h264", duration)
+    return AssembledUploadedFile(path, name, "video/mp4", size, None, "video/mp4"), result
+
+
+def render_video_versions(media_item, config, version_types, workdir) -> VideoPipelineResult:
+    """
+    Renders the requested version types of a video MediaItem into workdir and
+    returns them ready to store: {version_type: (file, probe)} for videos and
+    {THUMBNAIL: (file, meta)} for the poster frame. Files are moved when stored;
+    the caller removes workdir afterwards.
+    """
+    original = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
+    probe = MediaProbe.for_version(original)
+    options = options_from_config(config)
+    rendered = render_video_files(original.file.path, probe, options, version_types, workdir)
+
+    width, height = even_size(*probe.display_size)
+    versions, encodes = {}, {}
+    timings = dict(rendered.timings)
+    with _timed(timings, "outputs"):
+        for version_type, path in rendered.paths.items():
+            name = f"{media_item.id}_{os.path.basename(path)}"
+            if version_type in VIDEO_VERSIONS:
+                duration = probe.duration
+                if version_type == MediaItemVersion.PREVIEW:
+                    duration = min(options.preview_duration, probe.duration or options.preview_duration)
+                versions[version_type] = _video_output(path, name, width, height, duration)
+                encodes[version_type] = rendered.encodes[version_type]._replace(
+                    file_size=versions[version_type][1].file_size, duration=duration
+                )
+            else:
+                with Image.open(path) as frame:
+                    frame = frame.convert("RGB")
+                thumbnail = watermark.image_to_webp_file(
+                    frame, name.replace(".png", ".webp"), THUMBNAIL_WEBP_QUALITY
+                )
+                versions[version_type] = (
+                    thumbnail, {"width": frame.width, "height": frame.height, "file_size": thumbnail.size}
+                )
+    return VideoPipelineResult(versions, rendered.preview_stream_copied, timings, encodes)
+
+
+def record_encode_stats(stored_versions, encodes):
+    """
+    Stores the encode statistics of rendered videos.
+
+    :param stored_versions: {version_type: MediaItemVersion} created from the renditions.
+    :param encodes: {version_type: EncodeStats} (VideoPipelineResult.encodes).
+    """
+    stats = [
+        VideoEncodeStat(
+            media_item_version=stored_versions[version_type],
+            profile=encode.profile,
+            encode_seconds=encode.encode_ms / 1000,
+            cpu_seconds=encode.cpu_seconds,
+            stream_copied=encode.stream_copied,
+            duration=encode.duration,
+            file_size=encode.file_size or 0,
+            output_bitrate=encode.output_bitrate,
+            segments=encode.segments,
+        )
+        for version_type, encode in encodes.items() if version_type in stored_versions
+    ]
+    VideoEncodeStat.objects.bulk_create(stats)
+    for stat in stats:
+        logger.info(
+            "Encoded version %s with profile %s in %.1f s (%.1f CPU-s), %s bps%s",
+            stat.media_item_version.id, stat.profile, stat.encode_seconds, stat.cpu_seconds,
+            stat.output_bitrate, " (stream copy)" if stat.stream_copied else ""
+        )
+    return stats
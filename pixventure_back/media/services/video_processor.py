@@ -1,10 +1,11 @@
 # media/services/video_processor.py
 import os
-import subprocess
 from io import BytesIO
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.conf import settings
-from media.utils.video_loader import get_video_metadata
+from media.services.encode_governor import run_ffmpeg
+from media.services.media_probe import MediaProbe
+from media.services.scratch import scratch_workspace
 from main.utils import random_alphanumeric_string
 from media.models import MediaItemVersion
 
@@ -40,7 +41,10 @@ def create_watermarked_video(media_item, quality, max_video_bitrate):
     # Get original video details.
     original_version = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
     input_path = original_version.file.path
-    width, height, duration = get_video_metadata(input_path)
+    probe = MediaProbe.for_version(original_version)
+    # ffmpeg applies the rotation before the filters, so scale to the display size.
+    width, height = probe.display_size
+    duration = probe.duration or 0
     if width % 2 != 0:
         width += 1
     if height % 2 != 0:
@@ -60,70 +64,61 @@ def create_watermarked_video(media_item, quality, max_video_bitrate):
     target_bitrate_k = target_bitrate // 1000
 
     output_filename = random_alphanumeric_string(30) + '.mp4'
-    destination_folder = os.path.join('watermarked_video')
-    os.makedirs(destination_folder, exist_ok=True)
-    output_path = os.path.join(destination_folder, output_filename)
-
-    watermark_text = getattr(settings, "WATERMARK_TEXT_FOR_PREVIEWS", "Default Watermark")
-
-    # Build the base filter: watermark overlay and scaling.
-    # (You could refine the filter if needed.)
-    filter_str = f"drawtext=text='{watermark_text}':x=w-tw-10:y=h-th-10:fontsize=17:fontcolor=red,scale={width}:{height}"
-
-    # Define a temporary passlog file prefix.
-    passlog = os.path.join(destination_folder, "passlog")
-
-    # --- First pass ---
-    # In first pass we don't output audio and we output to null.
-    ffmpeg_pass1 = [
-        'ffmpeg',
-        '-y',                      # Overwrite output files
-        '-i', input_path,
-        '-vf', filter_str,
-        '-c:v', 'libx264',
-        '-preset', 'slow',
-        '-b:v', f'{target_bitrate_k}k',  # set target bitrate for analysis
-        '-pass', '1',
-        '-passlogfile', passlog,
-        '-an',                     # no audio
-        '-f', 'mp4',
-        os.devnull
-    ]
-    subprocess.run(ffmpeg_pass1, check=True)
-
-    # --- Second pass ---
-    # In second pass, we encode the video with audio copy and target the computed bitrate.
-    ffmpeg_pass2 = [
-        'ffmpeg',
-        '-y',
-        '-i', input_path,
-        '-vf', filter_str,
-        '-c:v', 'libx264',
-        '-preset', 'slow',
-        '-b:v', f'{target_bitrate_k}k',
-        '-minrate', f'{target_bitrate_k}k',
-        '-maxrate', f'{target_bitrate_k}k',
-        '-bufsize', f'{target_bitrate_k * 2}k',
-        '-pass', '2',
-        '-passlogfile', passlog,
-        '-c:a', 'copy',
-        '-f', 'mp4',
-        output_path
-    ]
-    subprocess.run(ffmpeg_pass2, check=True)
-
-    # Clean up temporary log files (they usually have names like passlog-0.log, etc.)
-    for filename in os.listdir(destination_folder):
-        if filename.startswith("passlog"):
-            try:
-                os.remove(os.path.join(destination_folder, filename))
-            except Exception:
-                pass
-
-    # Read the output file into memory.
-    with open(output_path, 'rb') as f:
-        file_data = f.read()
-    from io import BytesIO
+    # A workspace of its own: concurrent tasks never share the passlog.
+    with scratch_workspace(prefix="video-", needed_bytes=2 * size_bytes) as destination_folder:
+        output_path = os.path.join(destination_folder, output_filename)
+
+        watermark_text = getattr(settings, "WATERMARK_TEXT_FOR_PREVIEWS", "Default Watermark")
+
+        # Build the base filter: watermark overlay and scaling.
+        # (You could refine the filter if needed.)
+        filter_str = f"drawtext=text='{watermark_text}':x=w-tw-10:y=h-th-10:fontsize=17:fontcolor=red,scale={width}:{height}"
+
+        # Define a temporary passlog file prefix.
+        passlog = os.path.join(destination_folder, "passlog")
+
+        # --- First pass ---
+        # In first pass we don't output audio and we output to null.
+        ffmpeg_pass1 = [
+            'ffmpeg',
+            '-y',                      # Overwrite output files
+            '-i', input_path,
+            '-vf', filter_str,
+            '-c:v', 'libx264',
+            '-preset', 'slow',
+            '-b:v', f'{target_bitrate_k}k',  # set target bitrate for analysis
+            '-pass', '1',
+            '-passlogfile', passlog,
+            '-an',                     # no audio
+            '-f', 'mp4',
+            os.devnull
+        ]
+        run_ffmpeg(ffmpeg_pass1)
+
+        # --- Second pass ---
+        # In second pass, we encode the video with audio copy and target the computed bitrate.
+        ffmpeg_pass2 = [
+            'ffmpeg',
+            '-y',
+            '-i', input_path,
+            '-vf', filter_str,
+            '-c:v', 'libx264',
+            '-preset', 'slow',
+            '-b:v', f'{target_bitrate_k}k',
+            '-minrate', f'{target_bitrate_k}k',
+            '-maxrate', f'{target_bitrate_k}k',
+            '-bufsize', f'{target_bitrate_k * 2}k',
+            '-pass', '2',
+            '-passlogfile', passlog,
+            '-c:a', 'copy',
+            '-f', 'mp4',
+            output_path
+        ]
+        run_ffmpeg(ffmpeg_pass2)
+
+        # Read the output file into memory (the workspace is removed with the passlog files).
+        with open(output_path, 'rb') as f:
+            file_data = f.read()
     temp_io = BytesIO(file_data)
     video_file = InMemoryUploadedFile(
         temp_io,
@@ -133,7 +128,6 @@ def create_watermarked_video(media_item, quality, max_video_bitrate):
         len(file_data),
         None
     )
-    os.remove(output_path)
     return video_file, duration
 
 def create_video_preview(media_item, quality, preview_duration):
@@ -147,9 +141,6 @@ def create_video_preview(media_item, quality, preview_duration):
     watermarked_version = media_item.versions.get(version_type=MediaItemVersion.WATERMARKED)
     input_path = watermarked_version.file.path
     output_filename = random_alphanumeric_string(30) + '.mp4'
-    destination_folder = os.path.join('short_video_preview')
-    os.makedirs(destination_folder, exist_ok=True)
-    output_path = os.path.join(destination_folder, output_filename)
 
     try:
         quality = int(quality)
@@ -158,23 +149,24 @@ def create_video_preview(media_item, quality, preview_duration):
     if quality < 0:
         quality = 18
 
-    ffmpeg_cmd = [
-        'ffmpeg',
-        '-y',
-        '-i', input_path,
-        '-t', str(preview_duration),
-        '-c:v', 'libx264',
-        '-preset', 'slow',
-        '-crf', str(quality),
-        '-c:a', 'copy',
-        '-f', 'mp4',
-        output_path
-    ]
-    subprocess.run(ffmpeg_cmd, check=True)
-
-    with open(output_path, 'rb') as f:
-        file_bytes = f.read()
-    from io import BytesIO
+    with scratch_workspace(prefix="video-") as destination_folder:
+        output_path = os.path.join(destination_folder, output_filename)
+        ffmpeg_cmd = [
+            'ffmpeg',
+            '-y',
+            '-i', input_path,
+            '-t', str(preview_duration),
+            '-c:v', 'libx264',
+            '-preset', 'slow',
+            '-crf', str(quality),
+            '-c:a', 'copy',
+            '-f', 'mp4',
+            output_path
+        ]
+        run_ffmpeg(ffmpeg_cmd)
+
+        with open(output_path, 'rb') as f:
+            file_bytes = f.read()
     temp_io = BytesIO(file_bytes)
     preview_file = InMemoryUploadedFile(
         temp_io,
@@ -184,7 +176,6 @@ def create_video_preview(media_item, quality, preview_duration):
         len(file_bytes),
         None
     )
-    os.remove(output_path)
     return preview_file
 
 
@@ -195,29 +186,27 @@ def create_video_thumbnail(media_item):
     """
     original_version = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
     input_path = original_version.file.path
-    _, _, duration = get_video_metadata(input_path)
+    duration = MediaProbe.for_version(original_version).duration or 0
     middle_time = duration / 2 if duration > 0 else 0
     
     output_filename = random_alphanumeric_string(30) + '.png'
-    destination_folder = os.path.join('video_thumbnail')
-    os.makedirs(destination_folder, exist_ok=True)
-    output_path = os.path.join(destination_folder, output_filename)
-    
-    ffmpeg_cmd = [
-        'ffmpeg',
-        '-i', input_path,
-        '-ss', str(middle_time),
-        '-frames:v', '1',
-        output_path
-    ]
-    subprocess.run(ffmpeg_cmd, check=True)
-    
     from PIL import Image
-    with Image.open(output_path) as img:
-        img = img.convert("RGB")
-        temp_io = BytesIO()
-        img.save(temp_io, format='WEBP', quality=85, optimize=True)
-        temp_io.seek(0)
+    with scratch_workspace(prefix="video-") as destination_folder:
+        output_path = os.path.join(destination_folder, output_filename)
+        ffmpeg_cmd = [
+            'ffmpeg',
+            '-i', input_path,
+            '-ss', str(middle_time),
+            '-frames:v', '1',
+            output_path
+        ]
+        run_ffmpeg(ffmpeg_cmd)
+
+        with Image.open(output_path) as img:
+            img = img.convert("RGB")
+            temp_io = BytesIO()
+            img.save(temp_io, format='WEBP', quality=85, optimize=True)
+            temp_io.seek(0)
     
     thumbnail_file = InMemoryUploadedFile(
         temp_io,
@@ -227,5 +216,4 @@ def create_video_thumbnail(media_item):
         temp_io.getbuffer().nbytes,
         None
     )
-    os.remove(output_path)
     return thumbnail_file
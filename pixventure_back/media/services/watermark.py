@@ -1,12 +1,19 @@
 # media/services/watermark.py
 import io
 import random
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageFilter
 from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from media.models import MediaItemVersion
+from media.services import watermark_engine
+from media.services.media_probe import MediaProbe
+from media.services.memory_budget import DecodePlan, plan_full_resolution
+from media.upload_handlers import HashedUploadedFile
 from media.utils.image_loader import open_image
 
+CORNER_WATERMARK_COLOR = (236, 50, 64)
+LIGHT_THRESHOLD = 80
+
 def set_watermark_in_corner(image: Image.Image, text: str, font_size: int, w_offset: int, h_offset: int) -> Image.Image:
     """
     Adds a watermark to the bottom right corner of the image.
@@ -18,17 +25,15 @@ def set_watermark_in_corner(image: Image.Image, text: str, font_size: int, w_off
     :param h_offset: Vertical offset from the image edge.
     :return: New watermarked PIL Image.
     """
-    font = ImageFont.truetype(settings.FONT_LOCATION, int(font_size))
+    font = watermark_engine.get_font(font_size)
     watermarked_image = image.copy()
-    watermark_layer = Image.new("RGBA", watermarked_image.size)
-    waterdraw = ImageDraw.Draw(watermark_layer, "RGBA")
     
     W, H = watermarked_image.size
-    bbox = waterdraw.textbbox((0, 0), text, font=font)
+    bbox = font.getbbox(text)
     w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
     
-    waterdraw.text((W - w - int(w_offset), H - h - int(h_offset)), text, (236, 50, 64), font=font)
-    watermarked_image.paste(watermark_layer, (0, 0), watermark_layer)
+    stamp = watermark_engine.get_text_stamp(text, font_size, CORNER_WATERMARK_COLOR)
+    watermarked_image.paste(stamp, (W - w - int(w_offset), H - h - int(h_offset)), stamp)
     
     return watermarked_image
 
@@ -49,9 +54,12 @@ def biased_coordinate(total, margin_fraction=0.2):
     else:
         return random.randint(total - margin, total)
 
-def set_random_transparent_watermark(image: Image.Image, text: str, min_image_fraction: int, max_image_fraction: int, number_of_lines: int, transparency: int = 80) -> Image.Image:
+def set_random_transparent_watermark(image: Image.Image, text: str, min_image_fraction: int, max_image_fraction: int, number_of_lines: int, transparency: int = 80, in_place: bool = False) -> Image.Image:
     """
     Adds one or more semi-transparent watermarks to an image, preferring to place them near the edges.
+    Only the region under each watermark is converted to RGBA and composited, so the
+    extra memory is proportional to the text size, not to the image size. Fonts,
+    font sizes and text stamps come from the watermark_engine caches.
     
     :param image: PIL Image.
     :param text: Watermark text.
@@ -59,32 +67,20 @@ def set_random_transparent_watermark(image: Image.Image, text: str, min_image_fr
     :param max_image_fraction: Maximum percentage (of image width) used to determine font size.
     :param number_of_lines: Number of watermark lines to add.
     :param transparency: Alpha value for watermark text (0=transparent, 255=opaque). Default is 85.
-    :return: New PIL Image with watermarks applied.
+    :param in_place: Draw on `image` itself (must be RGB) instead of a copy.
+    :return: PIL Image with watermarks applied.
     """
-    import imageio
-    import numpy as np
-
-    def is_light(img_array, threshold):
-        return np.mean(img_array) > threshold
-
-    base_image = image.convert("RGBA")
+    if in_place and image.mode == "RGB":
+        base_image = image
+    else:
+        base_image = image.convert("RGB")
     
     for _ in range(number_of_lines):
         W, H = base_image.size
         image_fraction = random.uniform(min_image_fraction, max_image_fraction) / 100.0
 
-        font_size = 5
-        font = ImageFont.truetype(settings.FONT_LOCATION, font_size)
-        while font.getbbox(text)[2] < image_fraction * W:
-            font_size += 1
-            font = ImageFont.truetype(settings.FONT_LOCATION, font_size)
-        font_size = max(1, font_size - 1)
-        font = ImageFont.truetype(settings.FONT_LOCATION, font_size)
-
-        watermark_layer = Image.new("RGBA", base_image.size)
-        waterdraw = ImageDraw.Draw(watermark_layer, "RGBA")
-
-        bbox = waterdraw.textbbox((0, 0), text, font=font)
+        font_size = watermark_engine.fit_font_size(text, image_fraction * W)
+        bbox = watermark_engine.get_font(font_size).getbbox(text)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
 
@@ -94,71 +90,79 @@ def set_random_transparent_watermark(image: Image.Image, text: str, min_image_fr
         y = biased_coordinate(max_y, margin_fraction=0.2)
 
         image_area = base_image.crop((x, y, x + text_width, y + text_height))
-        temp_io = io.BytesIO()
-        image_area.convert("RGB").save(temp_io, format="JPEG", quality=95, optimize=True, progressive=True)
-        temp_io.seek(0)
-        image_area_gray = imageio.imread(temp_io, mode='F')
-        light_threshold = 80
-
-        if np.mean(image_area_gray) > light_threshold:
+        if watermark_engine.mean_luminance(image_area) > LIGHT_THRESHOLD:
             text_color = (0, 0, 0, transparency)
         else:
             text_color = (255, 255, 255, transparency)
 
-        waterdraw.text((x, y), text, fill=text_color, font=font)
-        base_image = Image.alpha_composite(base_image, watermark_layer)
+        # Composite the text over the region it covers only (the glyphs extend
+        # to the bbox's right/bottom edge, past the sampled area).
+        stamp = watermark_engine.get_text_stamp(text, font_size, text_color)
+        region_box = (x, y, min(W, x + stamp.width), min(H, y + stamp.height))
+        region = base_image.crop(region_box).convert("RGBA")
+        if stamp.size != region.size:
+            stamp = stamp.crop((0, 0) + region.size)
+        base_image.paste(Image.alpha_composite(region, stamp).convert("RGB"), region_box[:2])
     
-    return base_image.convert("RGB")
+    return base_image
 
-def create_watermarked_preview(media_item, quality=85, preview_size=800) -> InMemoryUploadedFile:
+DEFAULT_WEBP_QUALITY = 90
+
+def image_to_webp_file(image: Image.Image, name: str, quality: int) -> InMemoryUploadedFile:
     """
-    Creates a watermarked preview version from the original media.
-    
-    :param media_item: MediaItem instance.
-    :param quality: Quality for the preview image.
-    :param preview_size: Maximum dimension (width/height) for the preview.
-    :return: InMemoryUploadedFile containing the watermarked preview image in WEBP format.
+    Encodes a PIL Image as WEBP into an in-memory upload file.
+    A quality outside 1-100 falls back to DEFAULT_WEBP_QUALITY: full_watermarked_version_quality
+    is shared with videos, where -1 means "encoder default".
     """
     quality = int(quality)
-    preview_size = int(preview_size)
-    
-    original_file = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL).file
-    image = open_image(original_file).convert("RGB")
-    
-    # Resize image to preview size
-    image.thumbnail((preview_size, preview_size), Image.Resampling.LANCZOS)
-    
-    watermarked_image = set_watermark_in_corner(
-        image, 
-        text=settings.WATERMARK_TEXT_FOR_PREVIEWS, 
-        font_size=20, 
-        w_offset=5, 
-        h_offset=3
-    )
-    
+    if not 1 <= quality <= 100:
+        quality = DEFAULT_WEBP_QUALITY
     temp_io = io.BytesIO()
-    watermarked_image.save(temp_io, format='WEBP', quality=quality, optimize=True)
+    image.save(temp_io, format='WEBP', quality=quality, optimize=True)
     temp_io.seek(0)
-    
     return InMemoryUploadedFile(
-        temp_io, None, 'watermarked_preview.webp', 'image/webp', temp_io.getbuffer().nbytes, None
+        temp_io, None, name, 'image/webp', temp_io.getbuffer().nbytes, None
     )
 
-def create_full_watermarked_version(media_item, quality=90, watermark_transparency=80) -> InMemoryUploadedFile:
+def image_to_webp_temp_file(image: Image.Image, name: str, quality: int) -> HashedUploadedFile:
     """
-    Creates a full watermarked version (for paid users) with an inconspicuous, random watermark.
-    The watermark is applied using a random position and a font size determined by image resolution.
-    
-    :param media_item: MediaItem instance.
-    :param quality: Quality for the output image; defaults to settings.WATERMARKED_VERSION_QUALITY.
-    :return: InMemoryUploadedFile containing the full watermarked image in WEBP format.
+    Encodes a PIL Image as WEBP into a temporary file in the upload spool directory,
+    for large outputs: nothing is buffered in memory and storing it is a rename.
     """
+    quality = int(quality)
+    if not 1 <= quality <= 100:
+        quality = DEFAULT_WEBP_QUALITY
+    output = HashedUploadedFile(name, 'image/webp', 0, None)
+    image.save(output.file, format='WEBP', quality=quality, optimize=True)
+    output.file.flush()
+    output.size = output.file.tell()
+    output.seek(0)
+    return output
 
-    # Get the original file (assume version_type ORIGINAL exists)
-    original_file = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL).file
-    image = open_image(original_file).convert("RGB")
-    
-    # Determine image resolution and choose watermark parameters accordingly.
+def _blur_radius(blur_radius):
+    return 5 if blur_radius is None else float(blur_radius)
+
+def render_watermarked_preview(image: Image.Image, preview_size=800) -> Image.Image:
+    """
+    Downsizes an RGB image to preview size and stamps the preview watermark in the corner.
+    """
+    preview_size = int(preview_size)
+    image = image.copy()
+    image.thumbnail((preview_size, preview_size), Image.Resampling.LANCZOS)
+    return set_watermark_in_corner(
+        image,
+        text=settings.WATERMARK_TEXT_FOR_PREVIEWS,
+        font_size=20,
+        w_offset=5,
+        h_offset=3
+    )
+
+def render_full_watermarked(image: Image.Image, watermark_transparency=80, in_place=False) -> Image.Image:
+    """
+    Applies the inconspicuous random watermark to a full-resolution RGB image
+    (drawing on the image itself with in_place, to avoid a full-size copy).
+    The font size is chosen from the image resolution.
+    """
     width, height = image.size
     image_resolution = width * height
     if image_resolution < 250000:
@@ -169,18 +173,82 @@ def create_full_watermarked_version(media_item, quality=90, watermark_transparen
 
     # Use the configured watermark text for full resolution from settings.
     watermark_text = getattr(settings, "WATERMARK_TEXT_FOR_FULLRES", "Default Watermark")
+    return set_random_transparent_watermark(
+        image, watermark_text, min_fraction, max_fraction, number_of_lines=1,
+        transparency=watermark_transparency, in_place=in_place
+    )
+
+def render_blurred_thumbnail(image: Image.Image, thumbnail_size=300, blur_radius=None) -> Image.Image:
+    """
+    Blurs an image and fits it into the thumbnail size.
+    """
+    thumbnail_size = int(thumbnail_size)
+    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=_blur_radius(blur_radius)))
+    blurred_image.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS)
+    return blurred_image
+
+def render_blurred_preview(image: Image.Image, preview_size=800, blur_radius=None) -> Image.Image:
+    """
+    Downsizes an RGB image to preview size, blurs it and stamps the preview watermark.
+    """
+    preview_size = int(preview_size)
+    image = image.copy()
+    image.thumbnail((preview_size, preview_size), Image.Resampling.LANCZOS)
+    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=_blur_radius(blur_radius)))
+    return set_watermark_in_corner(
+        blurred_image,
+        text=settings.WATERMARK_TEXT_FOR_PREVIEWS,
+        font_size=20,
+        w_offset=5,
+        h_offset=3
+    )
+
+def create_watermarked_preview(media_item, quality=85, preview_size=800) -> InMemoryUploadedFile:
+    """
+    Creates a watermarked preview version from the original media.
     
-    # Apply a random, transparent watermark.
-    watermarked_image = set_random_transparent_watermark(image, watermark_text, min_fraction, max_fraction, number_of_lines=1, transparency=watermark_transparency)
-    
-    # Save the watermarked image to an in-memory file as WEBP.
-    temp_io = io.BytesIO()
-    watermarked_image.save(temp_io, format="WEBP", quality=quality, optimize=True)
-    temp_io.seek(0)
+    :param media_item: MediaItem instance.
+    :param quality: Quality for the preview image.
+    :param preview_size: Maximum dimension (width/height) for the preview.
+    :return: InMemoryUploadedFile containing the watermarked preview image in WEBP format.
+    """
+    original_file = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL).file
+    image = open_image(original_file, target_size=preview_size).convert("RGB")
+    watermarked_image = render_watermarked_preview(image, preview_size=preview_size)
+    return image_to_webp_file(watermarked_image, 'watermarked_preview.webp', quality)
+
+def open_full_resolution(file_obj, plan: DecodePlan) -> Image.Image:
+    """
+    Decodes an original for full-resolution work as planned by
+    memory_budget.plan_full_resolution(): as is, or brought down to the planned size
+    (decoding at reduced resolution where the format allows it).
+    """
+    image = open_image(file_obj, target_size=plan.target_size)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if plan.downscaled:
+        image.thumbnail(plan.target_size, Image.Resampling.LANCZOS)
+    return image
+
+def create_full_watermarked_version(media_item, quality=90, watermark_transparency=80) -> HashedUploadedFile:
+    """
+    Creates a full watermarked version (for paid users) with an inconspicuous, random watermark.
+    The watermark is applied using a random position and a font size determined by image resolution.
+    Originals over the memory budget are downscaled or refused (see media.services.memory_budget);
+    the output is encoded to disk.
     
-    return InMemoryUploadedFile(
-        temp_io, None, 'full_watermarked.webp', 'image/webp', temp_io.getbuffer().nbytes, None
-    )
+    :param media_item: MediaItem instance.
+    :param quality: Quality for the output image; defaults to settings.WATERMARKED_VERSION_QUALITY.
+    :return: Temporary file containing the full watermarked image in WEBP format.
+    :raises ImageTooLarge: If the original exceeds the budget and the policy is to refuse.
+    """
+    original_version = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
+    probe = MediaProbe.for_version(original_version)
+    plan = plan_full_resolution(probe.width, probe.height)
+    with original_version.file.open("rb") as original_file:
+        image = open_full_resolution(original_file, plan)
+    watermarked_image = render_full_watermarked(image, watermark_transparency=watermark_transparency, in_place=True)
+    return image_to_webp_temp_file(watermarked_image, 'full_watermarked.webp', quality)
 
 def create_blurred_thumbnail(file_obj, quality=75, thumbnail_size=300, blur_radius=None) -> InMemoryUploadedFile:
     """
@@ -192,25 +260,9 @@ def create_blurred_thumbnail(file_obj, quality=75, thumbnail_size=300, blur_radi
     :param blur_radius: Blur radius for Gaussian blur; if not provided, defaults to 5.
     :return: InMemoryUploadedFile containing the blurred thumbnail in WEBP format.
     """
-    quality = int(quality)
-    thumbnail_size = int(thumbnail_size)
-    
     image = open_image(file_obj)
-    if blur_radius is None:
-        blur_radius = 5
-    else:
-        blur_radius = float(blur_radius)
-    
-    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-    blurred_image.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS)
-    
-    temp_io = io.BytesIO()
-    blurred_image.save(temp_io, format='WEBP', quality=quality, optimize=True)
-    temp_io.seek(0)
-    
-    return InMemoryUploadedFile(
-        temp_io, None, 'blurred_thumbnail.webp', 'image/webp', temp_io.getbuffer().nbytes, None
-    )
+    blurred_image = render_blurred_thumbnail(image, thumbnail_size=thumbnail_size, blur_radius=blur_radius)
+    return image_to_webp_file(blurred_image, 'blurred_thumbnail.webp', quality)
 
 def create_blurred_preview(media_item, quality=75, preview_size=800, blur_radius=None) -> InMemoryUploadedFile:
     """
@@ -222,32 +274,7 @@ def create_blurred_preview(media_item, quality=75, preview_size=800, blur_radius
     :param blur_radius: Blur radius for Gaussian blur; if not provided, defaults to 5.
     :return: InMemoryUploadedFile containing the blurred preview in WEBP format.
     """
-    quality = int(quality)
-    preview_size = int(preview_size)
-    
     original_file = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL).file
-    image = open_image(original_file).convert("RGB")
-    
-    if blur_radius is None:
-        blur_radius = 5
-    else:
-        blur_radius = float(blur_radius)
-    
-    image.thumbnail((preview_size, preview_size), Image.Resampling.LANCZOS)
-    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-    
-    blurred_image = set_watermark_in_corner(
-        blurred_image, 
-        text=settings.WATERMARK_TEXT_FOR_PREVIEWS, 
-        font_size=20, 
-        w_offset=5, 
-        h_offset=3
-    )
-    
-    temp_io = io.BytesIO()
-    blurred_image.save(temp_io, format='WEBP', quality=quality, optimize=True)
-    temp_io.seek(0)
-    
-    return InMemoryUploadedFile(
-        temp_io, None, 'blurred_preview.webp', 'image/webp', temp_io.getbuffer().nbytes, None
-    )
+    image = open_image(original_file, target_size=preview_size).convert("RGB")
+    blurred_image = render_blurred_preview(image, preview_size=preview_size, blur_radius=blur_radius)
+    return image_to_webp_file(blurred_image, 'blurred_preview.webp', quality)
@@ -0,0 +1,104 @@
+# media/services/watermark_engine.py
+"""
+Building blocks of watermark rendering, cached across items:
+  - fonts are loaded once per (file, size) (LRU);
+  - the font size giving a text width is found by a binary search seeded from
+    one measurement, instead of loading every size from 5pt upwards;
+  - the text itself is rendered once per (text, size, colour) into an RGBA
+    stamp that is composited wherever it is needed;
+  - the brightness under a watermark is the mean luminance of the crop,
+    computed with NumPy.
+"""
+
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from django.conf import settings
+
+MIN_FONT_SIZE = 5
+# Size at which the text is measured to seed the font size search.
+REFERENCE_FONT_SIZE = 100
+# ITU-R 601-2 luma weights, as used by Pillow's convert("L").
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+@lru_cache(maxsize=128)
+def _load_font(font_path, size):
+    return ImageFont.truetype(font_path, size)
+
+
+def get_font(size, font_path=None):
+    return _load_font(font_path or settings.FONT_LOCATION, int(size))
+
+
+@lru_cache(maxsize=1024)
+def _text_right(font_path, size, text):
+    return _load_font(font_path, size).getbbox(text)[2]
+
+
+def fit_font_size(text, max_width, font_path=None):
+    """
+    Returns the largest font size whose text extent stays below max_width (at
+    least 1): the size just before the first one reaching max_width, counting
+    from MIN_FONT_SIZE.
+    """
+    font_path = font_path or settings.FONT_LOCATION
+
+    def width(size):
+        return _text_right(font_path, size, text)
+
+    if width(MIN_FONT_SIZE) >= max_width:
+        return max(1, MIN_FONT_SIZE - 1)
+
+    # Text width is close to proportional to the size: one measurement gives a
+    # narrow bracket, which the binary search then resolves exactly.
+    estimate = max(MIN_FONT_SIZE, int(max_width * REFERENCE_FONT_SIZE / max(1, width(REFERENCE_FONT_SIZE))))
+    low, high = MIN_FONT_SIZE, estimate + 2
+    if width(high) < max_width:
+        while width(high) < max_width:
+            low, high = high, high * 2
+    elif width(max(MIN_FONT_SIZE, estimate - 2)) < max_width:
+        low = max(MIN_FONT_SIZE, estimate - 2)
+    # Invariant: width(low) < max_width <= width(high).
+    while high - low > 1:
+        middle = (low + high) // 2
+        if width(middle) < max_width:
+            low = middle
+        else:
+            high = middle
+    return max(1, high - 1)
+
+
+@lru_cache(maxsize=256)
+def _render_stamp(font_path, size, text, fill):
+    font = _load_font(font_path, size)
+    bbox = font.getbbox(text)
+    stamp = Image.new("RGBA", (max(1, bbox[2]), max(1, bbox[3])))
+    ImageDraw.Draw(stamp, "RGBA").text((0, 0), text, fill=fill, font=font)
+    return stamp
+
+
+def get_text_stamp(text, size, fill, font_path=None):
+    """
+    Returns the text rendered at (0, 0) on a transparent RGBA image of its extent.
+    The image is shared between callers: do not modify it.
+    """
+    return _render_stamp(font_path or settings.FONT_LOCATION, int(size), text, tuple(fill))
+
+
+def mean_luminance(image):
+    """
+    Mean luma (0-255) of an RGB(A) or L image.
+    """
+    pixels = np.asarray(image)
+    if pixels.size == 0:
+        return 0.0
+    if pixels.ndim == 2:
+        return float(pixels.mean())
+    return float((pixels[..., :3].reshape(-1, 3) @ LUMA_WEIGHTS).mean())
+
+
+def clear_caches():
+    _load_font.cache_clear()
+    _text_right.cache_clear()
+    _render_stamp.cache_clear()
@@ -0,0 +1,122 @@
+# media/storage.py
+"""
+Content-addressed storage for media version files.
+
+Files are named by the BLAKE3 digest of their content and sharded by its
+first bytes, instead of flat per-type folders holding millions of entries:
+
+    content/ab/cd/abcd...ef.webp
+
+  - identical content is stored once: saving a file whose digest is already
+    stored writes nothing and returns the existing name (a regenerated
+    rendition, the same original in two items);
+  - a name never changes content, so the files can be served with far-future
+    `Cache-Control: immutable` headers (see serve_media);
+  - spooled uploads carry their digest already (HashedUploadedFile.blake3), so
+    they are not read again.
+
+settings.MEDIA_STORAGE_LAYOUT selects the layout of new files: "content"
+(above) or "legacy" (media_version_upload_to's <folder>/<folder>_<uuid>.<ext>).
+Existing files are moved to the content layout by the relink_media_files
+command.
+
+Web servers serving MEDIA_ROOT directly should send the same header for
+content/ paths, e.g. with nginx:
+
+    location /media/content/ { add_header Cache-Control "public, max-age=31536000, immutable"; }
+"""
+
+import os
+import re
+import blake3
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+CONTENT = "content"
+LEGACY = "legacy"
+
+CONTENT_PREFIX = "content"
+DEFAULT_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_CONTENT_NAME = re.compile(rf"^{CONTENT_PREFIX}/([0-9a-f]{{2}})/([0-9a-f]{{2}})/([0-9a-f]{{64}})(\.[0-9a-z]+)?$")
+
+
+def get_storage_layout():
+    return getattr(settings, "MEDIA_STORAGE_LAYOUT", CONTENT)
+
+
+def content_name(digest, ext=""):
+    """
+    Storage name of content with the given BLAKE3 hex digest (ext includes the dot).
+    """
+    return f"{CONTENT_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def digest_from_name(name):
+    """
+    Returns the BLAKE3 hex digest of a content-addressed storage name, or None
+    for other names.
+    """
+    match = _CONTENT_NAME.match(name or "")
+    if match is None or match.group(3)[:2] != match.group(1) or match.group(3)[2:4] != match.group(2):
+        return None
+    return match.group(3)
+
+
+def is_content_addressed(name):
+    return digest_from_name(name) is not None
+
+
+def content_digest(content):
+    """
+    BLAKE3 hex digest of a File, reusing the one computed while spooling an upload.
+    """
+    digest = getattr(content, "blake3", None) or getattr(getattr(content, "file", None), "blake3", None)
+    if digest:
+        return digest
+    hasher = blake3.blake3()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage saving files under their content name (see module docstring).
+    """
+
+    def save(self, name, content, max_length=None):
+        if get_storage_layout() != CONTENT:
+            return super().save(name, content, max_length=max_length)
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        target = content_name(content_digest(content), os.path.splitext(name)[1])
+        if self.exists(target):
+            return target
+        # Two tasks storing the same new content at once: the second gets a
+        # suffixed name (a copy), which is harmless.
+        return super().save(target, content, max_length=max_length)
+
+
+media_version_storage = ContentAddressedStorage()
+
+
+def get_media_version_storage():
+    return media_version_storage
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    django.views.static.serve, with far-future immutable caching of content-addressed files.
+    """
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if response.status_code == 200 and is_content_addressed(path):
+        max_age = getattr(settings, "MEDIA_IMMUTABLE_MAX_AGE", DEFAULT_IMMUTABLE_MAX_AGE)
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    return response
@@ -8,15 +8,21 @@ import logging
 from media.managers.media_versions import media_version_handlers
 from media.managers.hashing import media_hash_handlers
 from media.managers.duplicates.duplicate_handlers import handle_duplicate_detection
+from media.services.chunked_upload import cleanup_expired_sessions
+from media.services.memory_budget import track_peak_rss
+from media.services.scratch import cleanup_stale_workspaces
 
 logger = logging.getLogger(__name__)
 
 # Mapping handler names to functions.
 HANDLER_MAPPING = {
+    "media_ingest": media_version_handlers.handle_media_ingest,
+    "image_derivatives": media_version_handlers.handle_image_derivatives,
     "image_preview": media_version_handlers.handle_image_preview,
     "image_full_watermarked": media_version_handlers.handle_image_full_watermarked,
     "image_blurred_thumbnail": media_version_handlers.handle_image_blurred_thumbnail,
     "image_blurred_preview": media_version_handlers.handle_image_blurred_preview,
+    "video_derivatives": media_version_handlers.handle_video_derivatives,
     "video_watermarked": media_version_handlers.handle_video_watermarked,
     "video_preview": media_version_handlers.handle_video_preview,
     "video_thumbnail": media_version_handlers.handle_video_thumbnail,
@@ -33,7 +39,13 @@ def run_version_task(task_name, media_item_id, config, regenerate=False):
         handler = HANDLER_MAPPING.get(task_name)
         if not handler:
             raise ValueError(f"Handler for task '{task_name}' not found.")
-        result = handler(media_item_id, config, regenerate)
+        with track_peak_rss() as rss:
+            result = handler(media_item_id, config, regenerate)
+        logger.info(
+            "Task %s for MediaItem %s took %.0f ms, peak RSS %.0f MiB (+%s MiB)",
+            task_name, media_item_id, rss.elapsed_ms, rss.peak_mb,
+            "?" if rss.growth_mb is None else f"{rss.growth_mb:.0f}"
+        )
         return result
     except Exception as e:
         logger.error("Error in task %s for MediaItem %s: %s", task_name, media_item_id, e)
@@ -54,4 +66,26 @@ def run_duplicate_detection(input_data, config=None, regenerate=False):
         return result
     except Exception as e:
         logger.error("Error in duplicate detection: %s", e)
-        raise e
\ No newline at end of file
+        raise e
+@shared_task(name="media.tasks.cleanup_upload_sessions", ignore_result=True)
+def cleanup_upload_sessions():
+    """
+    Removes expired resumable upload sessions and their spool files. Scheduled by Celery beat.
+    """
+    try:
+        return cleanup_expired_sessions()
+    except Exception as e:
+        logger.error("Error cleaning up upload sessions: %s", e)
+        raise e
+
+
+@shared_task(name="media.tasks.cleanup_scratch_workspaces", ignore_result=True)
+def cleanup_scratch_workspaces():
+    """
+    Removes scratch workspaces left behind by killed workers. Scheduled by Celery beat.
+    """
+    try:
+        return cleanup_stale_workspaces()
+    except Exception as e:
+        logger.error("Error cleaning up scratch workspaces: %s", e)
+        raise e
@@ -0,0 +1,122 @@
+# media/upload_handlers.py
+"""
+Streaming upload ingest.
+
+HashingUploadHandler writes every uploaded file chunk by chunk into a spool
+file on the media volume, computing BLAKE3 and keeping the first bytes for
+type sniffing along the way. When the view runs, the file is already:
+  - on disk (saving it to FileSystemStorage is a rename, not a copy),
+  - hashed (HashedUploadedFile.blake3),
+  - typed from its content (HashedUploadedFile.sniffed_content_type).
+Memory per upload is bounded by chunk_size, whatever the file size.
+"""
+
+import os
+import tempfile
+import blake3
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+SNIFF_BYTES = 64
+
+# (offset, signature, content type). Checked in order.
+_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftypheix", "image/heic"),
+    (4, b"ftyphevc", "image/heic"),
+    (4, b"ftypmif1", "image/heif"),
+    (4, b"ftypavif", "image/avif"),
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+]
+
+
+def sniff_content_type(header):
+    """
+    Returns the content type detected from the first bytes of a file, or None.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[:4] == b"RIFF" and header[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    for offset, signature, content_type in _SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            return content_type
+    return None
+
+
+def get_spool_dir():
+    spool_dir = getattr(settings, "MEDIA_UPLOAD_SPOOL_DIR", None) or os.path.join(settings.MEDIA_ROOT, "spool")
+    os.makedirs(spool_dir, exist_ok=True)
+    return spool_dir
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    """
+    A TemporaryUploadedFile spooled in the media volume, carrying its BLAKE3
+    hash and sniffed content type once the upload is complete.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None, spool_dir=None):
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix=".upload" + ext, dir=spool_dir or get_spool_dir())
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+        self.blake3 = None
+        self.sniffed_content_type = None
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Streams uploads to a spool file while hashing them (see module docstring).
+    Install per view with request.upload_handlers = [HashingUploadHandler(request)].
+    """
+    chunk_size = 1024 * 1024
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        self.hasher = blake3.blake3()
+        self.header = b""
+
+    def receive_data_chunk(self, raw_data, start):
+        if len(self.header) < SNIFF_BYTES:
+            self.header += raw_data[:SNIFF_BYTES - len(self.header)]
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.blake3 = self.hasher.hexdigest()
+        self.file.sniffed_content_type = sniff_content_type(self.header)
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, "file"):
+            temp_location = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
+
+
+class AssembledUploadedFile(HashedUploadedFile):
+    """
+    A file already assembled in the spool directory outside of an upload
+    handler (e.g. from chunks), presented like a HashedUploadedFile.
+    Storing it moves the file; it is not deleted on close().
+    """
+
+    def __init__(self, path, name, content_type, size, blake3_hex, sniffed_content_type=None):
+        UploadedFile.__init__(self, open(path, "rb"), name, content_type, size, None)
+        self.blake3 = blake3_hex
+        self.sniffed_content_type = sniffed_content_type
@@ -6,8 +6,13 @@ from .views import (
     MediaItemDeleteView,
     MediaItemListView,
     MediaItemDetailView,
+    MediaItemStatusView,
     MediaItemAvailableForPostView,
     RandomMediaItemView,
+    UploadChunkView,
+    UploadSessionCompleteView,
+    UploadSessionCreateView,
+    UploadSessionDetailView,
 )
 
 urlpatterns = [
@@ -17,9 +22,18 @@ urlpatterns = [
     # Create a new media item
     path('new/', MediaItemCreateView.as_view(), name='media-item-create'),
     
+    # Resumable chunked uploads
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('uploads/<uuid:upload_id>/', UploadSessionDetailView.as_view(), name='upload-session-detail'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:upload_id>/complete/', UploadSessionCompleteView.as_view(), name='upload-session-complete'),
+
     # View details of a specific media item
     path('<int:pk>/', MediaItemDetailView.as_view(), name='media-item-detail'),
     
+    # Processing state of an uploaded media item
+    path('<int:pk>/status/', MediaItemStatusView.as_view(), name='media-item-status'),
+
     # Delete a media item
     path('<int:pk>/delete/', MediaItemDeleteView.as_view(), name='media-item-delete'),
     
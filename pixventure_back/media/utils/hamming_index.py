@@ -0,0 +1,252 @@
+# media/utils/hamming_index.py
+"""
+In-memory index of 64-bit codes (perceptual hashes) answering "all codes
+within Hamming distance k" without scanning every code.
+
+Multi-index hashing: each code is cut into m disjoint substrings. If two codes
+differ in at most k bits, at least one of their m substrings differs in at most
+k // m bits (pigeonhole). A query therefore looks up, in each substring table,
+every value within k // m bits of its own substring, and only the rows found
+there are verified with a full 64-bit popcount.
+
+Everything is held in NumPy arrays:
+  - codes (uint64) and ids (int64) by row; removed rows get id -1;
+  - per substring, the substring values of the indexed rows, sorted, and the
+    rows in that order: a lookup is a vectorised searchsorted of all probe
+    values at once;
+  - rows added since the tables were last sorted are verified by a linear
+    scan of that tail, and merged into the tables once the tail grows past a
+    fraction of the index (amortised O(log n) per insertion).
+
+Pure: nothing here touches the database (see media.services.duplicate_index).
+"""
+
+from itertools import combinations
+import numpy as np
+
+CODE_BITS = 64
+DEFAULT_SUBSTRINGS = 4
+# Radius per substring above which probing costs more than it saves.
+MAX_PROBE_RADIUS = 3
+# The unsorted tail is merged once it exceeds this fraction of the sorted rows.
+MERGE_FRACTION = 0.05
+MIN_MERGE_ROWS = 4096
+
+
+def hex_to_code(value):
+    """
+    Returns the 64-bit code of a 16-digit hex hash (imagehash's str()), or None.
+    """
+    if not value or len(value) != CODE_BITS // 4:
+        return None
+    try:
+        return int(value, 16)
+    except ValueError:
+        return None
+
+
+def hamming_distances(codes, code):
+    """
+    Hamming distances between every code of a uint64 array and one code.
+    """
+    return np.bitwise_count(codes ^ np.uint64(code))
+
+
+def _substring_bounds(count):
+    widths = [CODE_BITS // count + (1 if i < CODE_BITS % count else 0) for i in range(count)]
+    shifts = [sum(widths[:i]) for i in range(count)]
+    return list(zip(shifts, widths))
+
+
+def _key_dtype(width):
+    return np.uint16 if width <= 16 else np.uint32 if width <= 32 else np.uint64
+
+
+_probe_masks = {}
+
+
+def probe_masks(width, radius):
+    """
+    Every value of `width` bits with at most `radius` bits set (the XOR masks
+    reaching all substrings within radius), cached.
+    """
+    key = (width, radius)
+    if key not in _probe_masks:
+        masks = [0]
+        for bits in range(1, radius + 1):
+            masks += [sum(1 << bit for bit in chosen) for chosen in combinations(range(width), bits)]
+        _probe_masks[key] = np.array(masks, dtype=np.uint64)
+    return _probe_masks[key]
+
+
+def _expand_ranges(starts, stops):
+    """
+    Concatenation of range(start, stop) for every pair, without a Python loop.
+    """
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+class HammingIndex:
+    def __init__(self, substrings=DEFAULT_SUBSTRINGS):
+        self.bounds = _substring_bounds(substrings)
+        self._codes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        # Rows [0, _sorted_rows) are in the substring tables: [(sorted keys, rows)].
+        self._tables = [(np.empty(0, dtype=_key_dtype(width)), np.empty(0, dtype=np.int64))
+                        for _, width in self.bounds]
+        self._sorted_rows = 0
+        # Ids of the sorted rows, sorted, and their rows: finds the row of an id.
+        self._id_keys = np.empty(0, dtype=np.int64)
+        self._id_rows = np.empty(0, dtype=np.int64)
+        self._removed = 0
+
+    def __len__(self):
+        return self._size - self._removed
+
+    @property
+    def substrings(self):
+        return len(self.bounds)
+
+    @property
+    def nbytes(self):
+        return self._codes.nbytes + self._ids.nbytes + sum(keys.nbytes + rows.nbytes for keys, rows in self._tables)
+
+    def _keys(self, codes, shift, width):
+        mask = np.uint64((1 << width) - 1)
+        return ((codes >> np.uint64(shift)) & mask).astype(_key_dtype(width))
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._codes):
+            return
+        capacity = max(needed, 2 * len(self._codes), 1024)
+        codes, ids = np.empty(capacity, dtype=np.uint64), np.full(capacity, -1, dtype=np.int64)
+        codes[:self._size], ids[:self._size] = self._codes[:self._size], self._ids[:self._size]
+        self._codes, self._ids = codes, ids
+
+    def remove(self, ids):
+        """
+        Removes the entries of the given ids. Returns how many were found.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not self._size or not len(ids):
+            return 0
+        positions = np.minimum(np.searchsorted(self._id_keys, ids), max(len(self._id_keys) - 1, 0))
+        rows = self._id_rows[positions[self._id_keys[positions] == ids]] if len(self._id_keys) else positions[:0]
+        tail = self._ids[self._sorted_rows:self._size]
+        rows = np.concatenate([rows, self._sorted_rows + np.nonzero(np.isin(tail, ids))[0]])
+        live = self._ids[:self._size]
+        rows = rows[live[rows] >= 0]
+        live[rows] = -1
+        self._removed += len(rows)
+        return len(rows)
+
+    def add(self, ids, codes):
+        """
+        Adds (id, code) entries; an id already in the index gets its new code.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        codes = np.asarray(codes, dtype=np.uint64)
+        if not len(ids):
+            return
+        self.remove(ids)
+        self._reserve(len(ids))
+        self._codes[self._size:self._size + len(ids)] = codes
+        self._ids[self._size:self._size + len(ids)] = ids
+        self._size += len(ids)
+        if self._size - self._sorted_rows > max(MIN_MERGE_ROWS, MERGE_FRACTION * self._sorted_rows):
+            self.merge()
+
+    def merge(self):
+        """
+        Sorts every row into the substring tables, dropping removed rows.
+        """
+        if self._removed:
+            keep = self._ids[:self._size] >= 0
+            self._codes, self._ids = self._codes[:self._size][keep], self._ids[:self._size][keep]
+            self._size, self._removed = len(self._ids), 0
+        codes = self._codes[:self._size]
+        tables = []
+        for shift, width in self.bounds:
+            keys = self._keys(codes, shift, width)
+            order = np.argsort(keys, kind="stable")
+            tables.append((keys[order], order.astype(np.int64)))
+        self._tables, self._sorted_rows = tables, self._size
+        self._id_rows = np.argsort(self._ids[:self._size], kind="stable")
+        self._id_keys = self._ids[:self._size][self._id_rows]
+
+    def _candidates(self, code, radius):
+        probe_radius = radius // self.substrings
+        if probe_radius > MAX_PROBE_RADIUS:
+            return np.arange(self._size)
+        code = np.uint64(code)
+        found = []
+        for (shift, width), (keys, rows) in zip(self.bounds, self._tables):
+            if not len(keys):
+                continue
+            own = self._keys(code, shift, width)
+            probes = (probe_masks(width, probe_radius) ^ np.uint64(own)).astype(keys.dtype)
+            starts = np.searchsorted(keys, probes, side="left")
+            stops = np.searchsorted(keys, probes, side="right")
+            found.append(rows[_expand_ranges(starts, stops)])
+        found.append(np.arange(self._sorted_rows, self._size))
+        return np.unique(np.concatenate(found))
+
+    def query(self, code, radius):
+        """
+        Returns (ids, distances) of the entries within `radius` bits of code,
+        nearest first.
+        """
+        rows = self._candidates(code, radius)
+        distances = hamming_distances(self._codes[rows], code)
+        keep = (distances <= radius) & (self._ids[rows] >= 0)
+        rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return self._ids[rows][order], distances[order].astype(np.int64)
+
+    def scan(self, code, radius):
+        """
+        query() by linear scan of every code (reference and benchmark baseline).
+        """
+        distances = hamming_distances(self._codes[:self._size], code)
+        rows = np.nonzero((distances <= radius) & (self._ids[:self._size] >= 0))[0]
+        order = np.argsort(distances[rows], kind="stable")
+        return self._ids[rows][order], distances[rows][order].astype(np.int64)
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    def save(self, path, **meta):
+        """
+        Writes the index (tables included, so loading does not sort again) and
+        the given metadata to an .npz file.
+        """
+        self.merge()
+        arrays = {f"keys_{i}": keys for i, (keys, _) in enumerate(self._tables)}
+        arrays.update({f"rows_{i}": rows for i, (_, rows) in enumerate(self._tables)})
+        np.savez(
+            path, codes=self._codes[:self._size], ids=self._ids[:self._size],
+            substrings=np.array(self.substrings), meta_keys=np.array(list(meta), dtype=str),
+            meta_values=np.array([str(value) for value in meta.values()], dtype=str), **arrays
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns (index, metadata dict of strings) read from a file written by save().
+        """
+        with np.load(path) as data:
+            index = cls(int(data["substrings"]))
+            index._codes, index._ids = data["codes"].copy(), data["ids"].copy()
+            index._size = index._sorted_rows = len(index._ids)
+            index._tables = [(data[f"keys_{i}"].copy(), data[f"rows_{i}"].copy()) for i in range(index.substrings)]
+            index._id_rows = np.argsort(index._ids, kind="stable")
+            index._id_keys = index._ids[index._id_rows]
+            meta = dict(zip(data["meta_keys"].tolist(), data["meta_values"].tolist()))
+        return index, meta
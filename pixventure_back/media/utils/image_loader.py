@@ -1,28 +1,132 @@
 # media/utils/image_loader.py
-import os
-from PIL import Image
+import io
+import math
+from PIL import ExifTags, Image
 import pyheif
 
-def open_image(file_obj):
+# EXIF IFD1 tags locating the embedded JPEG thumbnail.
+EXIF_THUMBNAIL_OFFSET = 0x0201
+EXIF_THUMBNAIL_LENGTH = 0x0202
+# Largest aspect ratio difference accepted between an embedded thumbnail and its
+# image (some cameras letterbox thumbnails to 4:3).
+THUMBNAIL_ASPECT_TOLERANCE = 0.01
+
+
+def _normalize_target(target_size):
+    if target_size is None:
+        return None
+    if isinstance(target_size, (int, float)):
+        target_size = (target_size, target_size)
+    return max(1, int(target_size[0])), max(1, int(target_size[1]))
+
+
+def required_size(size, target_size):
+    """
+    Returns the size Image.thumbnail(target_size) produces from an image of `size`
+    (never larger than the image itself).
+    """
+    width, height = size
+    scale = min(target_size[0] / width, target_size[1] / height, 1)
+    return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+
+def _exif_thumbnail(exif_bytes):
+    """
+    Returns the JPEG thumbnail stored in IFD1 of an EXIF block, unopened (bytes), or None.
+    """
+    exif = Image.Exif()
+    exif.load(exif_bytes)
+    ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    offset, length = ifd1.get(EXIF_THUMBNAIL_OFFSET), ifd1.get(EXIF_THUMBNAIL_LENGTH)
+    if not offset or not length:
+        return None
+    # Offsets are relative to the TIFF header, after the "Exif\0\0" marker.
+    tiff = exif_bytes[6:] if exif_bytes.startswith(b"Exif\x00\x00") else exif_bytes
+    return tiff[offset:offset + length]
+
+
+def _embedded_thumbnail(exif_bytes, original_size, needed):
+    """
+    Returns the embedded EXIF thumbnail as a loaded image if it has the image's
+    aspect ratio and is at least `needed`, otherwise None.
+    """
+    if not exif_bytes:
+        return None
+    try:
+        data = _exif_thumbnail(exif_bytes)
+        if not data:
+            return None
+        thumbnail = Image.open(io.BytesIO(data))
+        width, height = thumbnail.size
+        if width < needed[0] or height < needed[1]:
+            return None
+        if abs(width / height - original_size[0] / original_size[1]) > THUMBNAIL_ASPECT_TOLERANCE * width / height:
+            return None
+        thumbnail.load()
+        return thumbnail
+    except Exception:
+        # A broken thumbnail is not a broken image: decode the image itself.
+        return None
+
+
+def _reduce(image, needed):
+    """
+    Downscales a loaded image by the largest integer factor that keeps it at least `needed`.
+    """
+    factor = min(image.width // needed[0], image.height // needed[1])
+    if factor < 2:
+        return image
+    try:
+        reduced = image.reduce(factor)
+    except ValueError:
+        # Modes reduce() does not support (e.g. palette images).
+        return image
+    reduced.format = image.format
+    return reduced
+
+
+def _heif_exif(heif_file):
+    for block in heif_file.metadata or []:
+        if block.get("type") == "Exif":
+            data = block["data"]
+            # libheif prefixes the block with the offset of the TIFF header.
+            marker = data.find(b"Exif\x00\x00", 0, 16)
+            return data[marker:] if marker >= 0 else data[4:]
+    return None
+
+
+def open_image(file_obj, target_size=None):
     """
     Opens an image from a file-like object.
-    
+
     - If the file is HEIC/HEIF (detected by filename or header signature), reads all bytes
       and passes them to pyheif to decode the image.
     - Otherwise, uses Pillow's Image.open().
-    
+
+    target_size ((width, height) or a maximum dimension) tells the loader the caller
+    only needs an image it can thumbnail() to that size. It may then return a
+    smaller, already loaded image:
+    - the embedded EXIF thumbnail (JPEG/HEIC) when it is large enough,
+    - a JPEG decoded with DCT-domain scaling (Image.draft, 1/2 to 1/8),
+    - otherwise the decoded image reduced by an integer factor (reduce()).
+    The result is never smaller than what thumbnail(target_size) would produce from
+    the full image. When it was reduced, image.info["original_size"] holds the
+    full-resolution size.
+
     Returns a PIL Image.
     """
+    target_size = _normalize_target(target_size)
+
     # Attempt to get the filename (default to empty string if not available)
     filename = getattr(file_obj, 'name', '').lower()
-    
+
     # Ensure the file pointer is at the start
     file_obj.seek(0)
-    
+
     # Read the header bytes to help detect HEIC/HEIF if filename is absent or ambiguous
     header = file_obj.read(32)
     file_obj.seek(0)
-    
+
     # Determine if the file is HEIC/HEIF either by filename or header signature.
     is_heic = False
     if filename.endswith(('.heic', '.heif')):
@@ -35,14 +139,23 @@ def open_image(file_obj):
 
     if is_heic:
         try:
-            # Read the entire file as bytes.
+            # Read the entire file as bytes; pixels are only decoded by load().
             heif_bytes = file_obj.read()
             file_obj.seek(0)
-            heif_file = pyheif.read(heif_bytes)
+            heif_file = pyheif.open(heif_bytes)
         except Exception as e:
             raise ValueError(f"Failed to read HEIC file: {e}")
-        
+
+        if target_size:
+            needed = required_size(heif_file.size, target_size)
+            thumbnail = _embedded_thumbnail(_heif_exif(heif_file), heif_file.size, needed)
+            if thumbnail is not None:
+                thumbnail = thumbnail.convert("RGB")
+                thumbnail.info["original_size"] = heif_file.size
+                return thumbnail
+
         try:
+            heif_file = heif_file.load()
             image = Image.frombytes(
                 heif_file.mode,
                 heif_file.size,
@@ -53,10 +166,38 @@ def open_image(file_obj):
             )
         except Exception as e:
             raise ValueError(f"Error converting HEIC data to image: {e}")
-        
-        return image.convert("RGB")
+
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if target_size:
+            image = _reduce(image, required_size(heif_file.size, target_size))
+            if image.size != heif_file.size:
+                image.info["original_size"] = heif_file.size
+        return image
     else:
         try:
-            return Image.open(file_obj)
+            image = Image.open(file_obj)
         except Exception as e:
             raise ValueError(f"Failed to open image: {e}")
+
+        if not target_size:
+            return image
+
+        original_size = image.size
+        needed = required_size(original_size, target_size)
+        if image.format == "JPEG":
+            thumbnail = _embedded_thumbnail(image.info.get("exif"), original_size, needed)
+            if thumbnail is not None:
+                thumbnail.format = image.format
+                image = thumbnail
+            else:
+                # DCT-domain scaling: decodes straight to 1/2, 1/4 or 1/8 of the size.
+                image.draft(None, needed)
+                image.load()
+        else:
+            image.load()
+            image = _reduce(image, needed)
+
+        if image.size != original_size:
+            image.info["original_size"] = original_size
+        return image
@@ -0,0 +1,102 @@
+# media/utils/renditions.py
+"""
+Rendition manifests.
+
+A rendition manifest is a compact, denormalised description of the versions
+available for a MediaItem:
+
+    {"<version_type>": {"url": ..., "width": ..., "height": ..., "file_size": ...}}
+
+It is stored on MediaItem.renditions and rewritten whenever a version is created,
+so resolving which file to serve needs no database access. Keys are strings
+because the manifest round-trips through a JSON column.
+
+Everything in this module is pure: it works on plain dicts and never touches the
+database, so the selection rules can be unit-tested and benchmarked in isolation.
+"""
+
+from typing import NamedTuple, Optional
+from media.models import MediaItem, MediaItemVersion
+
+
+class Rendition(NamedTuple):
+    """
+    A single entry of a rendition manifest. Exposes the same attributes the
+    serializers read from MediaItemVersion (version_type, width, height, file_size).
+    """
+    version_type: int
+    url: str
+    width: Optional[int]
+    height: Optional[int]
+    file_size: Optional[int]
+
+
+def manifest_entry(version):
+    """
+    Returns the manifest entry for a MediaItemVersion, or None if it has no file.
+    """
+    if not version.file:
+        return None
+    return {
+        "url": version.file.url,
+        "width": version.width,
+        "height": version.height,
+        "file_size": version.file_size,
+    }
+
+
+def build_manifest(versions):
+    """
+    Builds a manifest from an iterable of MediaItemVersion objects.
+    When several versions share a type, the oldest one (lowest pk) wins,
+    matching the previous versions.filter(...).first() behaviour.
+    """
+    manifest = {}
+    for version in sorted(versions, key=lambda v: v.pk):
+        key = str(version.version_type)
+        if key in manifest:
+            continue
+        entry = manifest_entry(version)
+        if entry is not None:
+            manifest[key] = entry
+    return manifest
+
+
+def get_rendition(manifest, version_type):
+    """
+    Returns the Rendition of the given type from a manifest, or None.
+    """
+    entry = manifest.get(str(version_type)) if manifest else None
+    if not entry or not entry.get("url"):
+        return None
+    return Rendition(
+        version_type=version_type,
+        url=entry["url"],
+        width=entry.get("width"),
+        height=entry.get("height"),
+        file_size=entry.get("file_size"),
+    )
+
+
+def select_version_type(media_type, user_is_paying, is_blurred, thumbnail=False):
+    """
+    Decides which version type should be served:
+      - Paying users get the watermarked version (or the thumbnail).
+      - Non-paying users get the preview (or the thumbnail); blurred photos
+        get the blurred preview / blurred thumbnail instead.
+      - Videos are never blurred.
+    """
+    if user_is_paying:
+        return MediaItemVersion.THUMBNAIL if thumbnail else MediaItemVersion.WATERMARKED
+    if is_blurred and media_type != MediaItem.VIDEO:
+        return MediaItemVersion.BLURRED_THUMBNAIL if thumbnail else MediaItemVersion.BLURRED_PREVIEW
+    return MediaItemVersion.THUMBNAIL if thumbnail else MediaItemVersion.PREVIEW
+
+
+def select_rendition(manifest, media_type, user_is_paying, is_blurred, thumbnail=False):
+    """
+    Returns the Rendition to serve from a manifest, or None if that version
+    does not exist (callers then serve an empty URL).
+    """
+    version_type = select_version_type(media_type, user_is_paying, is_blurred, thumbnail)
+    return get_rendition(manifest, version_type)
@@ -1,52 +1,230 @@
 # media/views.py
 
 import random
+from django.conf import settings
 from django.db.models import Min, Max
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from .models import MediaItem
-from .serializers import MediaItemSerializer, UnpublishedMediaItemSerializer
+from .models import MediaItem, UploadSession
+from .serializers import (
+    MediaItemSerializer,
+    UnpublishedMediaItemSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
+)
 from media.managers.media_item_creation_manager import MediaItemCreationManager
+from media.services import chunked_upload
+from media.services.ingest_status import PROCESSING, get_processing_status
+from media.upload_handlers import HashingUploadHandler
 from rest_framework.exceptions import PermissionDenied
+from main.pagination import MediaItemPagination
+from social.like_state import MEDIA, get_liked_ids
+from social.mixins import LikedIdsContextMixin
 
-class MediaItemListView(generics.ListAPIView):
+class MediaItemListView(LikedIdsContextMixin, generics.ListAPIView):
     """
     GET /api/media/
     Returns a paginated list of media items for the authenticated user.
     """
     serializer_class = MediaItemSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MediaItemPagination
+    like_target_type = MEDIA
 
     def get_queryset(self):
         return MediaItem.objects.filter(owner=self.request.user).order_by('-created')
 
-class MediaItemCreateView(generics.CreateAPIView):
+class MediaIngestMixin:
+    """
+    Hands an uploaded file to MediaItemCreationManager and builds the response:
+    201 with the thumbnail once processed, or, with `?async=true` (or
+    settings.MEDIA_ASYNC_INGEST), 202 Accepted as soon as the file is stored;
+    metadata, thumbnail and versions are then produced by a worker and can be
+    followed at GET /api/media/<id>/status/.
+    """
+
+    def use_async_ingest(self, request):
+        requested = request.query_params.get("async")
+        if requested in ("1", "true"):
+            return True
+        if requested in ("0", "false"):
+            return False
+        return getattr(settings, "MEDIA_ASYNC_INGEST", False)
+
+    def ingest(self, request, upload_file):
+        """
+        Returns (result, response); result holds "media_item_id" or "error".
+        """
+        if self.use_async_ingest(request):
+            result = MediaItemCreationManager.accept_media_item(upload_file, request.user)
+            if "error" in result:
+                return result, Response({"detail": result["error"]}, status=status.HTTP_400_BAD_REQUEST)
+            status_url = request.build_absolute_uri(
+                reverse("media-item-status", kwargs={"pk": result["media_item_id"]})
+            )
+            return result, Response(
+                {
+                    "media_item_id": result["media_item_id"],
+                    "state": PROCESSING,
+                    "status_url": status_url,
+                },
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": status_url}
+            )
+
+        result = MediaItemCreationManager.create_media_item(upload_file, request.user)
+        if "error" in result:
+            return result, Response({"detail": result["error"]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return result, Response(
+            {
+                "media_item_id": result["media_item_id"],
+                "thumbnail_url": result.get("thumbnail_url"),
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+class MediaItemCreateView(MediaIngestMixin, generics.CreateAPIView):
     """
     POST /api/media/new/
     Creates a new media item from a single file uploaded by the user.
-    Delegates creation logic to MediaItemCreationManager.
+    Delegates creation logic to MediaItemCreationManager (see MediaIngestMixin
+    for the synchronous and asynchronous modes).
+    The upload is streamed to disk and hashed while it is received (HashingUploadHandler).
+    Large files should rather use the resumable upload API (/api/media/uploads/).
     """
     permission_classes = [IsAuthenticated]
     serializer_class = MediaItemSerializer
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be set before anything (e.g. authentication) reads the request body.
+        request.upload_handlers = [HashingUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         upload_file = request.FILES.get("file")
         if not upload_file:
             return Response({"detail": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+        _, response = self.ingest(request, upload_file)
+        return response
 
-        result = MediaItemCreationManager.create_media_item(upload_file, request.user)
+class UploadSessionCreateView(APIView):
+    """
+    POST /api/media/uploads/  {"filename", "size", "content_type"?}
+    Starts a resumable upload. The response gives the chunk size and count to use
+    with PUT /api/media/uploads/<id>/chunks/<index>/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = chunked_upload.create_session(
+                request.user,
+                serializer.validated_data["filename"],
+                serializer.validated_data["size"],
+                serializer.validated_data.get("content_type", ""),
+            )
+        except chunked_upload.ChunkError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+class UploadSessionMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, request, upload_id):
+        return get_object_or_404(UploadSession, pk=upload_id, owner=request.user)
+
+class UploadSessionDetailView(UploadSessionMixin, APIView):
+    """
+    GET /api/media/uploads/<id>/     Received and missing chunks (to resume an upload).
+    DELETE /api/media/uploads/<id>/  Aborts the upload and frees its spool file.
+    """
+
+    def get(self, request, upload_id, *args, **kwargs):
+        return Response(UploadSessionSerializer(self.get_session(request, upload_id)).data)
+
+    def delete(self, request, upload_id, *args, **kwargs):
+        session = self.get_session(request, upload_id)
+        if session.status == UploadSession.OPEN:
+            chunked_upload.abort_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadChunkView(UploadSessionMixin, APIView):
+    """
+    PUT /api/media/uploads/<id>/chunks/<index>/
+    The raw request body is chunk `index`: bytes [index * chunk_size, (index + 1) * chunk_size).
+    Chunks can be sent in any order and in parallel; re-sending one overwrites it.
+    """
+
+    def put(self, request, upload_id, index, *args, **kwargs):
+        session = self.get_session(request, upload_id)
+        try:
+            session = chunked_upload.write_chunk(session, index, request.stream)
+        except chunked_upload.ChunkError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "received": len(session.received_chunks),
+            "chunk_count": session.chunk_count,
+        })
+
+class UploadSessionCompleteView(MediaIngestMixin, UploadSessionMixin, APIView):
+    """
+    POST /api/media/uploads/<id>/complete/
+    Assembles the upload and creates the media item exactly like POST /api/media/new/
+    (including `?async=true`). Fails with the missing chunks while any are missing.
+    """
+
+    def post(self, request, upload_id, *args, **kwargs):
+        session = self.get_session(request, upload_id)
+        try:
+            upload_file = chunked_upload.assemble(session)
+        except chunked_upload.ChunkError as e:
+            return Response(
+                {"detail": str(e), "missing_chunks": session.missing_chunks()},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result, response = self.ingest(request, upload_file)
+        finally:
+            upload_file.close()
         if "error" in result:
-            return Response({"detail": result["error"]}, status=status.HTTP_400_BAD_REQUEST)
+            # Validation errors (type, duplicate) are final for this file.
+            chunked_upload.abort_session(session)
+        else:
+            chunked_upload.mark_completed(session, result["media_item_id"])
+        return response
 
-        return Response(
-            {
-                "media_item_id": result["media_item_id"],
-                "thumbnail_url": result.get("thumbnail_url"),
-            },
-            status=status.HTTP_201_CREATED
+class MediaItemStatusView(APIView):
+    """
+    GET /api/media/<pk>/status/
+    Reports the processing state of the user's media item ("processing", "ready"
+    or "failed") and the readiness of each rendition.
+
+    Answers at once; while the item is processing, the Retry-After header tells
+    clients when to poll again (the request never waits on a worker).
+    """
+    permission_classes = [IsAuthenticated]
+    RETRY_AFTER = 2
+
+    def get_media_item(self, request, pk):
+        queryset = MediaItem.objects.only(
+            "id", "owner_id", "status", "media_type", "is_blurred", "renditions", "processing_error"
         )
+        if not request.user.is_staff:
+            queryset = queryset.filter(owner=request.user)
+        return get_object_or_404(queryset, pk=pk)
+
+    def get(self, request, pk, *args, **kwargs):
+        payload = get_processing_status(self.get_media_item(request, pk))
+        headers = {"Retry-After": str(self.RETRY_AFTER)} if payload["state"] == PROCESSING else None
+        return Response(payload, headers=headers)
 
 class MediaItemDetailView(generics.RetrieveAPIView):
     """
@@ -159,5 +337,10 @@ class RandomMediaItemView(APIView):
             # Randomly select the required number from the candidate pool.
             candidate_items = random.sample(candidate_items, required)
 
-        serializer = MediaItemSerializer(candidate_items, many=True, context={'request': request})
+        liked_media_ids = get_liked_ids(request.user, MEDIA, [item.pk for item in candidate_items])
+        serializer = MediaItemSerializer(
+            candidate_items,
+            many=True,
+            context={'request': request, 'liked_media_ids': liked_media_ids},
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
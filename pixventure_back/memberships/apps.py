@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MembershipsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'memberships'
+
+    def ready(self):
+        from main.cache import MEMBERSHIP_PLANS_NAMESPACE, invalidate_on_change
+        from memberships.models import MembershipPlan
+        invalidate_on_change(MEMBERSHIP_PLANS_NAMESPACE, MembershipPlan)
@@ -0,0 +1,103 @@
+# memberships/entitlements.py
+"""
+Entitlement resolution for paywalled content.
+
+A user's membership state is resolved at most once per request: the result is
+memoised on the user instance that DRF/Django authentication attaches to the
+request, so every serializer and helper rendering that request shares it.
+Across requests the resolved "paid until" timestamp is kept in the shared cache,
+with an expiry tied to the membership's end_date, and is explicitly invalidated
+whenever a membership is created or a payment completes.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from memberships.models import UserMembership
+
+ENTITLEMENT_CACHE_KEY = "memberships:entitlement:{user_id}"
+
+# Upper bound on how long a resolved membership is trusted, even if it runs longer.
+# This limits the impact of out-of-band edits (e.g. a membership deactivated in the admin).
+MAX_ENTITLEMENT_TTL = 60 * 60
+
+# How long a "not paying" result is cached. Purchases invalidate it explicitly.
+NOT_PAYING_TTL = 10 * 60
+
+# Attribute used to memoise the resolved state on the request's user instance.
+_USER_MEMO_ATTR = "_entitlement_paid_until"
+_NOT_RESOLVED = object()
+
+
+def _cache_key(user_id):
+    return ENTITLEMENT_CACHE_KEY.format(user_id=user_id)
+
+
+def _load_paid_until(user):
+    """
+    Returns the latest end_date among the user's currently active memberships,
+    or None. Mirrors UserMembership.is_currently_active in a single query.
+    """
+    return (
+        UserMembership.objects
+        .filter(user=user, is_active=True, end_date__gt=timezone.now())
+        .order_by('-end_date')
+        .values_list('end_date', flat=True)
+        .first()
+    )
+
+
+def _cache_timeout(paid_until):
+    if paid_until is None:
+        return NOT_PAYING_TTL
+    seconds_left = int((paid_until - timezone.now()).total_seconds())
+    return max(1, min(seconds_left, MAX_ENTITLEMENT_TTL))
+
+
+def get_paid_until(user):
+    """
+    Returns the datetime until which the user has paid access, or None.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+
+    memo = getattr(user, _USER_MEMO_ATTR, _NOT_RESOLVED)
+    if memo is not _NOT_RESOLVED:
+        return memo
+
+    key = _cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        paid_until = _load_paid_until(user)
+        # 0 marks a cached "not paying" result (None means a cache miss).
+        stamp = paid_until.timestamp() if paid_until else 0
+        cache.set(key, stamp, timeout=_cache_timeout(paid_until))
+    else:
+        paid_until = datetime.fromtimestamp(cached, tz=dt_timezone.utc) if cached else None
+
+    setattr(user, _USER_MEMO_ATTR, paid_until)
+    return paid_until
+
+
+def is_user_paying(user):
+    """
+    True if the user currently has an active, unexpired membership.
+    """
+    paid_until = get_paid_until(user)
+    return paid_until is not None and paid_until > timezone.now()
+
+
+def invalidate_entitlement(user):
+    """
+    Drops the cached entitlement for a user. The cache entry is removed immediately
+    and again once the surrounding transaction commits, so a concurrent request
+    cannot re-cache the pre-commit state.
+    """
+    if user is None or user.pk is None:
+        return
+    key = _cache_key(user.pk)
+    if hasattr(user, _USER_MEMO_ATTR):
+        delattr(user, _USER_MEMO_ATTR)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -2,6 +2,7 @@
 
 from django.utils import timezone
 from memberships.models import UserMembership, MembershipPlan
+from memberships.entitlements import invalidate_entitlement
 
 class MembershipManager:
     """
@@ -28,5 +29,7 @@ class MembershipManager:
             user=user,
             plan=membership_plan
         )
+        # Paywall checks must see the new membership on the user's next request.
+        invalidate_entitlement(user)
         # Optionally, trigger notifications or logging here.
         return membership
@@ -1,6 +1,6 @@
+from memberships.entitlements import is_user_paying
+
+
 def check_if_user_is_paying(user):
-    # Query user memberships or do a cached property
-    if user.is_authenticated:
-        return user.memberships.filter(is_active=True).exists()
-    else:
-        return False
\ No newline at end of file
+    # Resolved once per request and cached across requests (see memberships.entitlements).
+    return is_user_paying(user)
@@ -1,6 +1,8 @@
 # memberships/views.py
 
 from rest_framework import viewsets
+from rest_framework.response import Response
+from main.cache import MEMBERSHIP_PLANS_NAMESPACE, get_or_set
 from .models import MembershipPlan
 from .serializers import MembershipPlanSerializer
 
@@ -11,3 +13,11 @@ class MembershipPlanViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = MembershipPlan.objects.filter(is_active=True)
     serializer_class = MembershipPlanSerializer
     pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        data = get_or_set(
+            MEMBERSHIP_PLANS_NAMESPACE,
+            ("active",),
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+        )
+        return Response(data)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ModerationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'moderation'
+
+    def ready(self):
+        from main.cache import REJECTION_REASONS_NAMESPACE, invalidate_on_change
+        from moderation.models import RejectionReason
+        invalidate_on_change(REJECTION_REASONS_NAMESPACE, RejectionReason)
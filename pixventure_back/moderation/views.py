@@ -10,6 +10,7 @@ from .models import RejectionReason
 from .serializers import PostModerationSerializer, ModerationActionCreateSerializer, RejectionReasonSerializer, DuplicateClusterModerationSerializer
 from media.serializers import UnpublishedMediaItemSerializer
 from moderation.managers import ModerationManager
+from main.cache import REJECTION_REASONS_NAMESPACE, get_or_set
 
 class ModerationDashboardView(generics.ListAPIView):
     """
@@ -118,6 +119,14 @@ class ActiveRejectionReasonListView(generics.ListAPIView):
     permission_classes = [IsAdminUser]
     pagination_class = None
     queryset = RejectionReason.objects.filter(is_active=True).order_by('order')
+
+    def list(self, request, *args, **kwargs):
+        data = get_or_set(
+            REJECTION_REASONS_NAMESPACE,
+            ("active",),
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+        )
+        return Response(data)
     
     
 class DuplicateClusterListView(generics.ListAPIView):
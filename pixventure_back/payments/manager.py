@@ -10,6 +10,7 @@ and ensures that the most current version of the Transaction is retrieved from t
 from payments.models import Transaction
 from django.utils import timezone
 from memberships.manager import MembershipManager
+from memberships.entitlements import invalidate_entitlement
 
 class PaymentManager:
     """
@@ -49,3 +50,4 @@ class PaymentManager:
         if transaction.status == Transaction.STATUS_COMPLETED and transaction.membership_plan:
             membership_manager = MembershipManager()
             membership_manager.create_membership(transaction.user, transaction.membership_plan)
+            invalidate_entitlement(transaction.user)
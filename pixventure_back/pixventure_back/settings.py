@@ -175,6 +175,58 @@ MEDIA_URL = 'media/'
 
 STATIC_ROOT = os.path.join(BASE_DIR,'static')
 MEDIA_ROOT = os.path.join(BASE_DIR,'media_files')
+# Uploads are streamed here while being received; keep it on the same volume as
+# MEDIA_ROOT so storing the original is a rename.
+MEDIA_UPLOAD_SPOOL_DIR = os.path.join(MEDIA_ROOT, 'spool')
+# Layout of new media version files (media.storage): "content" names them by their
+# BLAKE3 digest in sharded folders (content/ab/cd/<digest>.<ext>), stores identical
+# content once and serves it as immutable for MEDIA_IMMUTABLE_MAX_AGE seconds;
+# "legacy" keeps the per-type folders.
+MEDIA_STORAGE_LAYOUT = os.environ.get('PIXVENTURE_MEDIA_STORAGE_LAYOUT', 'content')
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Default for POST /api/media/new/: store and answer 202, process on a worker.
+# Clients can choose per request with ?async=true|false.
+MEDIA_ASYNC_INGEST = False
+# Resumable uploads (/api/media/uploads/): chunk size imposed on clients, largest
+# accepted file, and inactivity delay after which a session is cleaned up (seconds).
+MEDIA_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MEDIA_UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024
+MEDIA_UPLOAD_SESSION_TTL = 24 * 60 * 60
+# Incremental upload hashers kept per web process (least recently used ones are
+# dropped; their uploads are hashed again at completion).
+MEDIA_UPLOAD_MAX_HASHERS = 256
+# Memory an image task may use for the full-resolution watermarked version, and
+# what to do with originals that need more: "downscale" them to fit, or "refuse"
+# to create that version.
+IMAGE_TASK_MEMORY_BUDGET = int(os.environ.get('PIXVENTURE_IMAGE_MEMORY_BUDGET', 1024 * 1024 * 1024))
+IMAGE_OVERSIZE_POLICY = os.environ.get('PIXVENTURE_IMAGE_OVERSIZE_POLICY', 'downscale')
+# Per-task scratch workspaces (media.services.scratch). Point PIXVENTURE_SCRATCH_DIR
+# at a fast local volume or a tmpfs; by default they are on the media volume
+# (MEDIA_UPLOAD_SPOOL_DIR/scratch), where storing outputs is a rename. Tasks need
+# their estimate plus the reserve free to start; workspaces older than the max age
+# (left by killed workers) are removed by the cleanup-scratch-workspaces beat task.
+MEDIA_SCRATCH_DIR = os.environ.get('PIXVENTURE_SCRATCH_DIR') or None
+MEDIA_SCRATCH_RESERVE = int(os.environ.get('PIXVENTURE_SCRATCH_RESERVE', 1024 * 1024 * 1024))
+MEDIA_SCRATCH_MAX_AGE = 24 * 60 * 60
+# Host-level ffmpeg governor (media.services.encode_governor): simultaneous ffmpeg
+# processes across all workers (default: half the CPUs), their niceness, encoder
+# thread cap (0: no cap), hard timeout and how long a task waits for a free slot
+# (seconds).
+FFMPEG_MAX_JOBS = int(os.environ.get('PIXVENTURE_FFMPEG_MAX_JOBS', 0)) or None
+FFMPEG_NICE = int(os.environ.get('PIXVENTURE_FFMPEG_NICE', 10))
+FFMPEG_THREADS = int(os.environ.get('PIXVENTURE_FFMPEG_THREADS', 0))
+FFMPEG_TIMEOUT = int(os.environ.get('PIXVENTURE_FFMPEG_TIMEOUT', 4 * 60 * 60))
+FFMPEG_SLOT_WAIT = 60 * 60
+FFMPEG_LOCK_DIR = os.environ.get('PIXVENTURE_FFMPEG_LOCK_DIR') or None
+
+# Near-duplicate phash index (media.services.duplicate_index): each worker keeps it
+# in memory and saves it here every DUPLICATE_INDEX_SAVE_EVERY new hashes, so a
+# restarted worker only reads the hashes added since. Rebuilt from scratch by the
+# build_duplicate_index command. Each refresh re-reads the hashes of the last
+# DUPLICATE_INDEX_REFRESH_MARGIN seconds before the watermark, for late commits.
+DUPLICATE_INDEX_DIR = os.environ.get('PIXVENTURE_DUPLICATE_INDEX_DIR') or os.path.join(BASE_DIR, 'var', 'indexes')
+DUPLICATE_INDEX_SAVE_EVERY = 1000
+DUPLICATE_INDEX_REFRESH_MARGIN = 5 * 60
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -183,11 +235,62 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Shared cache. Redis by default; set PIXVENTURE_CACHE_URL to an empty string to use
+# an in-process cache instead (e.g. tests or local development without Redis).
+CACHE_URL = os.environ.get('PIXVENTURE_CACHE_URL', 'redis://localhost:6379/1')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'pixventure',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'SOCKET_CONNECT_TIMEOUT': 1,
+                'SOCKET_TIMEOUT': 1,
+                # A Redis outage turns reads into misses (and writes into no-ops)
+                # instead of failing the requests; everything cached has a loader.
+                'IGNORE_EXCEPTIONS': True,
+            },
+        },
+    }
+    DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pixventure',
+            'TIMEOUT': 300,
+        },
+    }
+
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'cache+memory://'
 CELERY_IGNORE_RESULT = True
 CELERY_RESULT_EXPIRES = 3600
+CELERY_BEAT_SCHEDULE = {
+    'flush-like-counters': {
+        'task': 'social.tasks.flush_like_counters',
+        'schedule': 10.0,
+    },
+    'cleanup-upload-sessions': {
+        'task': 'media.tasks.cleanup_upload_sessions',
+        'schedule': 60.0 * 60,
+    },
+    'cleanup-scratch-workspaces': {
+        'task': 'media.tasks.cleanup_scratch_workspaces',
+        'schedule': 60.0 * 60,
+    },
+}
+
+# "atomic": likes_counter is updated in the like's transaction.
+# "write_behind": deltas are buffered and applied by the flush-like-counters beat task.
+# Write-behind needs the Redis cache (the buffer is shared with the worker); with the
+# in-process cache, counters are updated atomically.
+LIKE_COUNTER_MODE = os.environ.get('PIXVENTURE_LIKE_COUNTER_MODE', 'atomic')
 
-FONT_LOCATION = '/home/daniel/Documents/Synched/Projects/pixventure/pixventure_back/fonts/OpenSans-Bold.ttf'
+FONT_LOCATION = os.path.join(BASE_DIR, 'fonts', 'OpenSans-Bold.ttf')
 WATERMARK_TEXT_FOR_PREVIEWS = 'sample.com'
 WATERMARK_TEXT_FOR_FULLRES = 'sample.com'
\ No newline at end of file
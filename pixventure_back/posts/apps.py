@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from main.cache import FEATURED_POSTS_NAMESPACE, invalidate_on_change
+        from posts.models import Post, PostMedia
+        # New media versions are picked up when the short featured feed TTL expires.
+        invalidate_on_change(FEATURED_POSTS_NAMESPACE, Post, PostMedia)
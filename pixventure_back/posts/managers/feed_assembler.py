@@ -0,0 +1,66 @@
+# posts/managers/feed_assembler.py
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from posts.models import PostMedia
+from media.models import MediaItem
+from memberships.utils import check_if_user_is_paying
+from social.like_state import POST, get_liked_ids
+
+
+def _media_count_subquery(media_type):
+    """
+    Correlated subquery counting the PostMedia links of a given media type.
+    A subquery (rather than a JOIN + GROUP BY) keeps the paginator's COUNT(*) cheap.
+    """
+    counts = (
+        PostMedia.objects
+        .filter(post=OuterRef('pk'), media_item__media_type=media_type)
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class FeedAssembler:
+    """
+    Preloads everything PostSerializer needs for a page of posts, so that a feed
+    renders in a constant number of queries regardless of page size.
+
+    Workflow:
+      1. Annotate the queryset with photo/video counts and join owner,
+         main category and featured item into the page query.
+      2. Prefetch the featured items' versions for the whole page in one query.
+      3. Resolve the current user's likes for the whole page at once
+         (see social.like_state).
+      4. Resolve the paying flag once per request.
+
+    The serializer reads the annotations directly from the post instances and the
+    rest from the serializer context produced by build_context().
+    """
+
+    @staticmethod
+    def prepare_queryset(queryset):
+        return (
+            queryset
+            .select_related('owner', 'main_category', 'featured_item')
+            .prefetch_related('featured_item__versions')
+            .annotate(
+                feed_images_count=_media_count_subquery(MediaItem.PHOTO),
+                feed_videos_count=_media_count_subquery(MediaItem.VIDEO),
+            )
+        )
+
+    @staticmethod
+    def build_context(posts, user):
+        """
+        Returns the extra serializer context for an already evaluated page of posts.
+        """
+        is_authenticated = user is not None and user.is_authenticated
+
+        return {
+            'liked_post_ids': get_liked_ids(user, POST, [post.pk for post in posts]),
+            'user_is_paying': check_if_user_is_paying(user) if is_authenticated else False,
+        }
@@ -27,11 +27,7 @@ class PostCreationManager:
     @staticmethod
     def create_post(data, user):
         # 1. Fetch post blur probability
-        prob_str = SettingsProvider.get_setting("post_blur_probability")
-        try:
-            post_blur_probability = float(prob_str)
-        except (TypeError, ValueError):
-            post_blur_probability = 0.0  # Default to 0 if invalid
+        post_blur_probability = SettingsProvider.get_float("post_blur_probability", 0.0)
 
         # 2. Decide if the post should be blurred
         is_blurred = random.random() < post_blur_probability
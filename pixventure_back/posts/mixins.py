@@ -0,0 +1,27 @@
+# posts/mixins.py
+
+from posts.managers.feed_assembler import FeedAssembler
+
+
+class FeedAssemblyMixin:
+    """
+    Mixin for list views that render pages of posts with PostSerializer
+    (or a subclass of it).
+
+    - filter_queryset() applies the FeedAssembler annotations and prefetches.
+    - get_serializer() resolves likes and the paying flag once for the whole page
+      and hands them to the serializer through its context.
+    """
+
+    def filter_queryset(self, queryset):
+        return FeedAssembler.prepare_queryset(super().filter_queryset(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # Evaluate the page once; the serializer iterates the same list.
+            posts = list(args[0])
+            args = (posts,) + args[1:]
+            context = self.get_serializer_context()
+            context.update(FeedAssembler.build_context(posts, self.request.user))
+            kwargs['context'] = context
+        return super().get_serializer(*args, **kwargs)
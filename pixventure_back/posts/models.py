@@ -4,6 +4,10 @@ from django.conf import settings
 from taxonomy.models import Term
 from media.models import MediaItem
 
+# Post.PUBLISHED, also needed before the class exists (index conditions).
+PUBLISHED = 3
+
+
 class Post(models.Model):
     """
     Represents a Post, which can include multiple MediaItems in a defined order
@@ -16,7 +20,7 @@ class Post(models.Model):
     DRAFT = 0
     PENDING_MODERATION = 1
     APPROVED = 2
-    PUBLISHED = 3
+    PUBLISHED = PUBLISHED
     PRIVATE = 4
     REJECTED = 5
     DELETED = 6
@@ -69,6 +73,21 @@ class Post(models.Model):
     # Blurred posts will have all content blurred for non-paying users
     is_blurred = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of feeds: WHERE status = ... ORDER BY published DESC, id DESC
+            models.Index(fields=['status', '-published', '-id'], name='post_status_published_id_idx'),
+            # Keyset pagination of the owner's posts: ORDER BY created DESC, id DESC
+            models.Index(fields=['owner', '-created', '-id'], name='post_owner_created_id_idx'),
+            # Featured feed: only ever reads published featured posts, so a partial index
+            # keeps it small (the condition is ignored on backends without support).
+            models.Index(
+                fields=['-published', '-id'],
+                condition=models.Q(status=PUBLISHED, is_featured_post=True),
+                name='post_featured_feed_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -88,6 +107,9 @@ class PostMedia(models.Model):
     class Meta:
         unique_together = (('post', 'media_item'),)
         ordering = ['position']
+        indexes = [
+            models.Index(fields=['post', 'position'], name='postmedia_post_position_idx'),
+        ]
 
     def __str__(self):
         return f"{self.post} -> {self.media_item} (pos: {self.position})"
\ No newline at end of file
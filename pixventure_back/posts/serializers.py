@@ -5,7 +5,12 @@ from posts.models import PostMedia
 from media.models import MediaItem, MediaItemVersion
 from social.utils import user_has_liked
 from memberships.utils import check_if_user_is_paying
-from media.utils.media_file import get_media_file_for_display, get_media_display_info, is_media_locked
+from media.utils.media_file import (
+    get_media_file_for_display,
+    get_media_display_info,
+    get_media_rendition,
+    is_media_locked,
+)
 from media.serializers import TileInfoMixin
 from taxonomy.models import Term
 from django.core.exceptions import ValidationError
@@ -22,6 +27,10 @@ class PostSerializer(TileInfoMixin, serializers.ModelSerializer):
     - whether current user has liked this post
     - post thumbnail URL
     - owner's username
+
+    List views using FeedAssemblyMixin provide annotated media counts, prefetched
+    featured item versions, the page's liked post IDs and the paying flag, so no
+    per-row queries are needed. Without them, each value is looked up per row.
     """
     id = serializers.IntegerField(read_only=True, source='pk')
     images_count = serializers.SerializerMethodField()
@@ -50,15 +59,26 @@ class PostSerializer(TileInfoMixin, serializers.ModelSerializer):
             'main_category_slug',
         ]
 
+    def _get_user_is_paying(self):
+        # Precomputed once per request by the FeedAssembler; None means "look it up".
+        return self.context.get('user_is_paying')
+
     def get_images_count(self, obj):
+        if hasattr(obj, 'feed_images_count'):
+            return obj.feed_images_count
         # Query PostMedia for this post, counting items that are PHOTOS
         return obj.post_media_links.filter(media_item__media_type=MediaItem.PHOTO).count()
 
     def get_videos_count(self, obj):
+        if hasattr(obj, 'feed_videos_count'):
+            return obj.feed_videos_count
         # Query PostMedia for this post, counting items that are VIDEOS
         return obj.post_media_links.filter(media_item__media_type=MediaItem.VIDEO).count()
 
     def get_has_liked(self, obj):
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return user_has_liked(request.user, post=obj)
@@ -81,7 +101,8 @@ class PostSerializer(TileInfoMixin, serializers.ModelSerializer):
             media_item=featured,  # We pass the MediaItem itself
             user=user,
             post=obj,  # in case the post is blurred
-            thumbnail=True  # we want the 'thumbnail' variant
+            thumbnail=True,  # we want the 'thumbnail' variant
+            user_is_paying=self._get_user_is_paying(),
         )
         
     def get_locked(self, obj):
@@ -93,14 +114,14 @@ class PostSerializer(TileInfoMixin, serializers.ModelSerializer):
         featured = obj.featured_item
         if not featured:
             return False
-        return is_media_locked(featured, user, post=obj)
+        return is_media_locked(featured, user, post=obj, user_is_paying=self._get_user_is_paying())
         
     # TileInfoMixin's required method:
     def get_featured_image_dimensions(self, obj):
         # We assume that the Post has a featured_item field (a MediaItem)
         if not obj.featured_item:
             return None
-        thumbnail = obj.featured_item.versions.filter(version_type=MediaItemVersion.THUMBNAIL).first()
+        thumbnail = get_media_rendition(obj.featured_item, MediaItemVersion.THUMBNAIL)
         if thumbnail and thumbnail.width and thumbnail.height:
             return (thumbnail.width, thumbnail.height)
         return None
@@ -229,7 +250,7 @@ class PostMediaItemDetailSerializer(serializers.ModelSerializer):
 
     def _get_display_info(self, obj):
         """
-        Returns (chosen_version, chosen_url) for this media item.
+        Returns (chosen_rendition, chosen_url) for this media item.
         Caches the result in the serializer context to avoid multiple queries.
         """
         cache_key = f"postmedia_item_{obj.pk}_info"
@@ -263,12 +284,12 @@ class PostMediaItemDetailSerializer(serializers.ModelSerializer):
 
     def get_original_width(self, obj):
         """Return the width of the original media version."""
-        original = obj.media_item.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
+        original = get_media_rendition(obj.media_item, MediaItemVersion.ORIGINAL)
         return original.width if original and original.width else None
 
     def get_original_height(self, obj):
         """Return the height of the original media version."""
-        original = obj.media_item.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
+        original = get_media_rendition(obj.media_item, MediaItemVersion.ORIGINAL)
         return original.height if original and original.height else None
 
     def get_higher_resolution_available(self, obj):
@@ -292,7 +313,7 @@ class PostMediaItemDetailSerializer(serializers.ModelSerializer):
             MediaItemVersion.PREVIEW,
             MediaItemVersion.BLURRED_PREVIEW,
         ]:
-            original = obj.media_item.versions.filter(version_type=MediaItemVersion.ORIGINAL).first()
+            original = get_media_rendition(obj.media_item, MediaItemVersion.ORIGINAL)
             if not original:
                 return False
 
@@ -328,12 +349,10 @@ class PostMediaItemDetailSerializer(serializers.ModelSerializer):
             return None
 
         # Assume there is a 'THUMBNAIL' version type used as a poster.
-        thumbnail_version = obj.media_item.versions.filter(
-            version_type=MediaItemVersion.THUMBNAIL
-        ).first()
+        thumbnail_version = get_media_rendition(obj.media_item, MediaItemVersion.THUMBNAIL)
 
-        if thumbnail_version and thumbnail_version.file:
-            return thumbnail_version.file.url
+        if thumbnail_version:
+            return thumbnail_version.url
 
         return None
 
@@ -2,7 +2,7 @@
 
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from django.db.models import Max
+from django.db.models import Max, Q
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -20,12 +20,20 @@ from .serializers import (
 )
 from media.serializers import MediaItemSerializer
 from .permissions import IsPostOwnerOrAdminOrPublicRead
-from main.pagination import StandardResultsSetPagination
+from .mixins import FeedAssemblyMixin
+from social.like_state import MEDIA
+from social.mixins import LikedIdsContextMixin
+from main.pagination import CreatedFeedPagination, FeedPagination, StandardResultsSetPagination
+from main.cache import FEATURED_POSTS_NAMESPACE, get_or_set
 from taxonomy.models import Term
 
 
+# Anonymous featured feed pages are cached this long (seconds).
+FEATURED_POSTS_TTL = 60
+
+
 # 0. All public posts list
-class PublicPostListView(generics.ListAPIView):
+class PublicPostListView(FeedAssemblyMixin, generics.ListAPIView):
     """
     GET /api/posts/?slug=some-slug
     If no slug is provided, returns a paginated list of published posts.
@@ -34,7 +42,7 @@ class PublicPostListView(generics.ListAPIView):
     """
     serializer_class = PostSerializer
     permission_classes = [IsPostOwnerOrAdminOrPublicRead]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
 
     def get_queryset(self):
         qs = Post.objects.all().order_by('-published')
@@ -58,23 +66,36 @@ class PublicPostListView(generics.ListAPIView):
         return qs.select_related('owner')
     
 # 1. Featured posts list (displayed on main page)
-class FeaturedPostListView(generics.ListAPIView):
+class FeaturedPostListView(FeedAssemblyMixin, generics.ListAPIView):
     """
     GET /api/posts/featured/
     Returns a paginated list of PUBLISHED + FEATURED posts using PostSerializer.
     """
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
 
     def get_queryset(self):
         # Only show PUBLISHED + is_featured_post
         qs = Post.objects.filter(status=Post.PUBLISHED, is_featured_post=True).order_by('-published')
         return qs
+
+    def list(self, request, *args, **kwargs):
+        # Anonymous visitors all get the same payload (no likes, not paying), so their
+        # pages are cached; pagination links are absolute, hence the host in the key.
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        data = get_or_set(
+            FEATURED_POSTS_NAMESPACE,
+            ("anonymous", request.get_host(), request.GET.urlencode()),
+            lambda: super(FeaturedPostListView, self).list(request, *args, **kwargs).data,
+            ttl=FEATURED_POSTS_TTL,
+        )
+        return Response(data)
     
 
 # 2. MyPostsView
-class MyPostsView(generics.ListAPIView):
+class MyPostsView(FeedAssemblyMixin, generics.ListAPIView):
     """
     GET /api/posts/mine/
     Returns the current user’s posts. 
@@ -82,7 +103,7 @@ class MyPostsView(generics.ListAPIView):
     """
     serializer_class = MyPostSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = CreatedFeedPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -136,7 +157,7 @@ class PostUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # 6. PostMediaListCreateView
-class PostMediaListCreateView(generics.ListCreateAPIView):
+class PostMediaListCreateView(LikedIdsContextMixin, generics.ListCreateAPIView):
     """
     GET /api/posts/<pk>/items/
       - list media items in a post
@@ -146,6 +167,7 @@ class PostMediaListCreateView(generics.ListCreateAPIView):
     serializer_class = MediaItemSerializer
     permission_classes = [IsPostOwnerOrAdminOrPublicRead]
     pagination_class = StandardResultsSetPagination
+    like_target_type = MEDIA
 
     def get_post(self):
         post = get_object_or_404(Post, slug=self.kwargs['slug'])
@@ -275,7 +297,7 @@ class PostMetaView(generics.RetrieveAPIView):
     
     
 # 8. Retrieve post lists filtered by categories and tags
-class CategoryPostsListView(generics.ListAPIView):
+class CategoryPostsListView(FeedAssemblyMixin, generics.ListAPIView):
     """
     GET /api/categories/<slug>/posts/
     Returns a paginated list of PUBLISHED posts that have a category
@@ -283,7 +305,7 @@ class CategoryPostsListView(generics.ListAPIView):
     """
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
 
     def get_queryset(self):
         category_slug = self.kwargs['slug']
@@ -301,14 +323,14 @@ class CategoryPostsListView(generics.ListAPIView):
         )
 
 
-class TagPostsListView(generics.ListAPIView):
+class TagPostsListView(FeedAssemblyMixin, generics.ListAPIView):
     """
     GET /api/tags/<slug>/posts/
     Returns a paginated list of PUBLISHED posts that have a tag matching <slug>.
     """
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
 
     def get_queryset(self):
         tag_slug = self.kwargs['slug']
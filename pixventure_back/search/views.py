@@ -4,21 +4,23 @@ from rest_framework.permissions import AllowAny
 from django.db.models import Q
 from posts.models import Post
 from posts.serializers import PostSerializer
-from main.pagination import StandardResultsSetPagination
+from posts.mixins import FeedAssemblyMixin
+from main.pagination import FeedPagination
 
-class BasicSearchView(generics.ListAPIView):
+class BasicSearchView(FeedAssemblyMixin, generics.ListAPIView):
     """
     Basic Search API Endpoint
 
     GET parameters:
       - q: The search query string to match against post name and text.
       - page: Pagination parameter for page number (handled by pagination).
+      - cursor / pagination=cursor: keyset pagination instead (see FeedPagination).
 
     This view returns a paginated list of published posts that match the search query.
     """
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
 
     def get_queryset(self):
         query = self.request.query_params.get('q', '')
@@ -0,0 +1,313 @@
+# social/counters.py
+"""
+likes_counter maintenance for posts, media items, albums and user profiles.
+
+Two modes, selected with settings.LIKE_COUNTER_MODE:
+
+- "atomic" (default): every like/unlike issues a single
+  UPDATE ... SET likes_counter = GREATEST(likes_counter + delta, 0),
+  so concurrent likes never lose updates.
+- "write_behind": deltas are buffered in Redis hashes and applied in batches
+  by the flush_like_counters Celery beat task. Hot rows (a viral post) then see
+  one UPDATE per flush instead of one per like. Counters lag by up to one flush
+  interval; reconcile_like_counters recomputes them from Like rows.
+
+Flushes hold a lock in the cache. A recomputation takes the same lock and drops
+the deltas buffered for the recomputed type (see discarding_buffered_deltas()):
+their likes are already in the Like rows it counts.
+
+The buffer must be shared by the web processes recording deltas and the worker
+flushing them, so write-behind needs the django-redis cache: without it (e.g.
+PIXVENTURE_CACHE_URL empty) counters are updated atomically and a warning is
+logged. InMemoryCounterBuffer only sees its own process's deltas; tests install
+it explicitly.
+"""
+
+import logging
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+ATOMIC = "atomic"
+WRITE_BEHIND = "write_behind"
+
+SHARD_COUNT = 16
+REDIS_BUFFER_KEY = "social:like_deltas:{shard}"
+
+# Held while buffered deltas are drained and applied (or dropped by a recomputation).
+FLUSH_LOCK_KEY = "social:like_deltas:flush_lock"
+FLUSH_LOCK_TTL = 10 * 60
+FLUSH_LOCK_WAIT = 60
+FLUSH_LOCK_POLL_INTERVAL = 0.1
+
+
+def _counter_models():
+    """
+    Returns {target_type: (model, lookup field for the target id)}.
+    Likes on a user are counted on their UserProfile.
+    """
+    from accounts.models import UserProfile
+    from albums.models import Album
+    from media.models import MediaItem
+    from posts.models import Post
+    return {
+        'post': (Post, 'pk'),
+        'media': (MediaItem, 'pk'),
+        'album': (Album, 'pk'),
+        'user': (UserProfile, 'user_id'),
+    }
+
+
+def has_shared_buffer():
+    return "django_redis" in settings.CACHES["default"]["BACKEND"]
+
+
+_warned_no_buffer = False
+
+
+def get_mode():
+    """
+    The configured mode, or atomic when write-behind has no buffer to use.
+    """
+    global _warned_no_buffer
+    mode = getattr(settings, 'LIKE_COUNTER_MODE', ATOMIC)
+    if mode == WRITE_BEHIND and _buffer is None and not has_shared_buffer():
+        if not _warned_no_buffer:
+            logger.warning(
+                "LIKE_COUNTER_MODE is write_behind but the default cache is not Redis: "
+                "deltas could not reach the flush task, updating like counters atomically instead."
+            )
+            _warned_no_buffer = True
+        return ATOMIC
+    return mode
+
+
+def apply_delta(target_type, target_ids, delta):
+    """
+    Adds delta to likes_counter of the given targets in one UPDATE, never going below 0.
+    Returns the number of rows updated.
+    """
+    if not target_ids or not delta:
+        return 0
+    model, field = _counter_models()[target_type]
+    if target_type == 'user':
+        # Profiles are not guaranteed to exist for every user.
+        existing = set(model.objects.filter(user_id__in=target_ids).values_list('user_id', flat=True))
+        model.objects.bulk_create(
+            [model(user_id=user_id) for user_id in set(target_ids) - existing],
+            ignore_conflicts=True,
+        )
+    return model.objects.filter(**{f'{field}__in': target_ids}).update(
+        likes_counter=Greatest(F('likes_counter') + delta, Value(0))
+    )
+
+
+class InMemoryCounterBuffer:
+    """
+    Process-local buffer, sharded so concurrent writers rarely share a lock.
+    """
+
+    def __init__(self, shard_count=SHARD_COUNT):
+        self._shards = [(threading.Lock(), defaultdict(int)) for _ in range(shard_count)]
+
+    def _shard(self, key):
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def add(self, target_type, target_id, delta):
+        key = f"{target_type}:{target_id}"
+        lock, deltas = self._shard(key)
+        with lock:
+            deltas[key] += delta
+
+    def drain(self):
+        """
+        Returns and clears all buffered deltas as {"type:id": delta}.
+        """
+        drained = defaultdict(int)
+        for lock, deltas in self._shards:
+            with lock:
+                entries = list(deltas.items())
+                deltas.clear()
+            for key, delta in entries:
+                drained[key] += delta
+        return drained
+
+
+class RedisCounterBuffer:
+    """
+    Buffer shared by all processes: one Redis hash per shard, HINCRBY per like.
+    Draining renames each hash to a ":flushing" key before reading it, so deltas
+    recorded during a flush land in the next one. A ":flushing" key left by a
+    flush that died before reading it is drained first, never overwritten.
+    """
+
+    def __init__(self, shard_count=SHARD_COUNT, redis=None):
+        if redis is None:
+            from django_redis import get_redis_connection
+            redis = get_redis_connection("default")
+        self._redis = redis
+        self._shard_count = shard_count
+
+    def _shard_key(self, key):
+        return REDIS_BUFFER_KEY.format(shard=zlib.crc32(key.encode()) % self._shard_count)
+
+    def add(self, target_type, target_id, delta):
+        key = f"{target_type}:{target_id}"
+        self._redis.hincrby(self._shard_key(key), key, delta)
+
+    def drain(self):
+        from redis.exceptions import ResponseError
+        drained = defaultdict(int)
+        for shard in range(self._shard_count):
+            shard_key = REDIS_BUFFER_KEY.format(shard=shard)
+            flushing_key = f"{shard_key}:flushing"
+            try:
+                # False when a previous flush left its ":flushing" hash behind: that
+                # one is drained now and this shard in the next flush.
+                self._redis.renamenx(shard_key, flushing_key)
+            except ResponseError:
+                pass  # Empty shard: the key does not exist.
+            # MULTI/EXEC: concurrent drains cannot both read the same hash.
+            pipe = self._redis.pipeline()
+            pipe.hgetall(flushing_key)
+            pipe.delete(flushing_key)
+            entries, _ = pipe.execute()
+            for key, delta in entries.items():
+                drained[key.decode()] += int(delta)
+        return drained
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    The delta buffer: the installed one (tests), else the Redis buffer, or None without Redis.
+    """
+    global _buffer
+    if _buffer is None and has_shared_buffer():
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = RedisCounterBuffer()
+    return _buffer
+
+
+def record_like_delta(target_type, target_id, delta):
+    """
+    Records a +1/-1 change of a target's likes. In atomic mode the counter is
+    updated right away (inside the caller's transaction); in write-behind mode
+    the delta is buffered once the transaction commits.
+    """
+    if get_mode() == WRITE_BEHIND:
+        transaction.on_commit(lambda: get_buffer().add(target_type, target_id, delta))
+    else:
+        apply_delta(target_type, [target_id], delta)
+
+
+@contextmanager
+def flush_lock(wait=0):
+    """
+    Cache lock shared by every process flushing deltas. Yields False if another
+    holder kept it for `wait` seconds. When the cache is down (django-redis
+    returns None), the block runs without the lock.
+    """
+    deadline = time.monotonic() + wait
+    acquired = cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TTL)
+    while acquired is False and time.monotonic() < deadline:
+        time.sleep(FLUSH_LOCK_POLL_INTERVAL)
+        acquired = cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TTL)
+    if acquired is False:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        if acquired:
+            cache.delete(FLUSH_LOCK_KEY)
+
+
+def _buffer_again(buffer, drained):
+    for key, delta in drained.items():
+        target_type, target_id = key.split(":", 1)
+        buffer.add(target_type, target_id, delta)
+
+
+def _apply_drained(buffer, drained):
+    """
+    Applies drained deltas, batching targets of the same type that share a
+    delta into one UPDATE. Returns the number of targets updated.
+    """
+    by_type_and_delta = defaultdict(list)
+    for key, delta in drained.items():
+        if not delta:
+            continue
+        target_type, target_id = key.split(":", 1)
+        by_type_and_delta[(target_type, delta)].append(int(target_id))
+
+    updated = 0
+    try:
+        with transaction.atomic():
+            for (target_type, delta), target_ids in by_type_and_delta.items():
+                apply_delta(target_type, target_ids, delta)
+                updated += len(target_ids)
+    except Exception:
+        # Put the deltas back so the next flush retries them.
+        _buffer_again(buffer, drained)
+        raise
+    return updated
+
+
+def flush_buffered_deltas():
+    """
+    Applies all buffered deltas. Returns the number of targets updated (0 when
+    another flush or a recomputation holds the flush lock: the deltas wait for
+    the next flush).
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        return 0
+    with flush_lock() as acquired:
+        if not acquired:
+            logger.info("Like counter flush skipped: the flush lock is held.")
+            return 0
+        updated = _apply_drained(buffer, buffer.drain())
+    if updated:
+        logger.info("Flushed like counter deltas for %d targets.", updated)
+    return updated
+
+
+@contextmanager
+def discarding_buffered_deltas(target_type, wait=FLUSH_LOCK_WAIT):
+    """
+    Wraps a recomputation of the counters of target_type from Like rows. Holds
+    the flush lock, drops the deltas buffered for target_type (their likes are
+    committed, so the recomputation counts them) and applies the others. If the
+    block fails, the dropped deltas are buffered again.
+
+    :raises RuntimeError: If the flush lock stays held for `wait` seconds.
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        yield
+        return
+    with flush_lock(wait) as acquired:
+        if not acquired:
+            raise RuntimeError("Like counters are being flushed, try again later.")
+        drained = buffer.drain()
+        discarded = {key: delta for key, delta in drained.items() if key.split(":", 1)[0] == target_type}
+        _apply_drained(buffer, {key: delta for key, delta in drained.items() if key not in discarded})
+        try:
+            yield
+        except Exception:
+            _buffer_again(buffer, discarded)
+            raise
@@ -0,0 +1,210 @@
+# social/like_state.py
+"""
+Like state resolution ("has the current user liked X?") for whole pages of targets.
+
+For each user and target type (post / media / album) the IDs of everything the
+user has liked are kept in the shared cache as a packed, sorted int64 array, so
+membership is a binary search and a page of targets costs no queries. The array
+is loaded with one query on first use, memoised on the request's user instance,
+and updated incrementally by toggle_like() once the like is committed.
+
+Each cached set is stamped with a per-set version, bumped by every committed
+like change. A set whose stamp is not the current version is reloaded: a reader
+that loaded from the database before a like committed cannot cache its stale
+set for the whole TTL, even if it writes after the like's update ran.
+
+Users with more than MAX_CACHED_LIKES likes of a type are not cached; for them
+get_liked_ids() resolves a page with a single IN query instead.
+"""
+
+from array import array
+from bisect import bisect_left
+from django.core.cache import cache
+from django.db import transaction
+from social.models import Like
+
+POST = 'post'
+MEDIA = 'media'
+ALBUM = 'album'
+
+# Like column holding the target id, per target type.
+TARGET_FIELDS = {
+    POST: 'post_id',
+    MEDIA: 'media_item_id',
+    ALBUM: 'album_id',
+}
+
+LIKED_SET_CACHE_KEY = "social:liked:{user_id}:{target_type}"
+LIKED_SET_VERSION_KEY = "social:liked:{user_id}:{target_type}:version"
+LIKED_SET_TTL = 60 * 60
+MAX_CACHED_LIKES = 20000
+UPDATE_LOCK_TTL = 10
+
+# Cached in place of the array for users above MAX_CACHED_LIKES.
+_OVERFLOW = b"overflow"
+_TYPECODE = 'q'
+
+# Attribute used to memoise loaded sets on the request's user instance.
+_USER_MEMO_ATTR = "_liked_id_sets"
+
+
+def _cache_key(user_id, target_type):
+    return LIKED_SET_CACHE_KEY.format(user_id=user_id, target_type=target_type)
+
+
+def _version_key(user_id, target_type):
+    return LIKED_SET_VERSION_KEY.format(user_id=user_id, target_type=target_type)
+
+
+def _bump_version(user_id, target_type):
+    """
+    Marks every cached copy of the set as stale. Returns the new version, or None
+    if the version could not be bumped (the set must then be dropped).
+    """
+    key = _version_key(user_id, target_type)
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return None
+
+
+def _unpack(packed):
+    ids = array(_TYPECODE)
+    ids.frombytes(packed)
+    return ids
+
+
+def _contains(sorted_ids, target_id):
+    index = bisect_left(sorted_ids, target_id)
+    return index < len(sorted_ids) and sorted_ids[index] == target_id
+
+
+def _load_packed(user, target_type):
+    field = TARGET_FIELDS[target_type]
+    ids = list(
+        Like.objects
+        .filter(liking_user=user, is_active=True, **{f'{field}__isnull': False})
+        .order_by(field)
+        .values_list(field, flat=True)
+        .distinct()[:MAX_CACHED_LIKES + 1]
+    )
+    if len(ids) > MAX_CACHED_LIKES:
+        return _OVERFLOW
+    return array(_TYPECODE, ids).tobytes()
+
+
+def get_liked_set(user, target_type):
+    """
+    Returns the sorted array of target IDs the user has liked, or None if the
+    user has too many likes of this type to cache.
+    """
+    memo = getattr(user, _USER_MEMO_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(user, _USER_MEMO_ATTR, memo)
+    if target_type in memo:
+        return memo[target_type]
+
+    key, version_key = _cache_key(user.pk, target_type), _version_key(user.pk, target_type)
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key, 0)
+    stamped = cached.get(key)
+    if stamped is not None and stamped[0] == version:
+        packed = stamped[1]
+    else:
+        packed = _load_packed(user, target_type)
+        # Stamped with the version read before loading: if a like commits in the
+        # meantime, the version moves on and this copy is never used.
+        if stamped is None:
+            cache.add(key, (version, packed), timeout=LIKED_SET_TTL)
+        else:
+            cache.set(key, (version, packed), timeout=LIKED_SET_TTL)
+    liked = None if packed == _OVERFLOW else _unpack(packed)
+    memo[target_type] = liked
+    return liked
+
+
+def get_liked_ids(user, target_type, target_ids):
+    """
+    Returns the subset of target_ids the user has actively liked.
+    """
+    target_ids = [target_id for target_id in target_ids if target_id is not None]
+    if user is None or not user.is_authenticated or not target_ids:
+        return set()
+
+    liked = get_liked_set(user, target_type)
+    if liked is not None:
+        return {target_id for target_id in target_ids if _contains(liked, target_id)}
+
+    field = TARGET_FIELDS[target_type]
+    return set(
+        Like.objects.filter(
+            liking_user=user,
+            is_active=True,
+            **{f'{field}__in': target_ids},
+        ).values_list(field, flat=True)
+    )
+
+
+def has_liked(user, target_type, target_id):
+    return bool(get_liked_ids(user, target_type, [target_id]))
+
+
+def _apply_like_change(user_id, target_type, target_id, liked):
+    key = _cache_key(user_id, target_type)
+    version = _bump_version(user_id, target_type)
+    lock_key = f"{key}:lock"
+    if version is None or not cache.add(lock_key, 1, timeout=UPDATE_LOCK_TTL):
+        # Another update is in flight; dropping the set is always safe.
+        cache.delete(key)
+        return
+    try:
+        stamped = cache.get(key)
+        if stamped is None or stamped[0] != version - 1:
+            # Missing, or loaded before another change: the next lookup reloads it.
+            cache.delete(key)
+            return
+        packed = stamped[1]
+        if packed == _OVERFLOW:
+            cache.set(key, (version, _OVERFLOW), timeout=LIKED_SET_TTL)
+            return
+        ids = _unpack(packed)
+        index = bisect_left(ids, target_id)
+        present = index < len(ids) and ids[index] == target_id
+        if liked and not present:
+            if len(ids) >= MAX_CACHED_LIKES:
+                cache.set(key, (version, _OVERFLOW), timeout=LIKED_SET_TTL)
+                return
+            ids.insert(index, target_id)
+        elif not liked and present:
+            del ids[index]
+        cache.set(key, (version, ids.tobytes()), timeout=LIKED_SET_TTL)
+    finally:
+        cache.delete(lock_key)
+
+
+def invalidate_liked_ids(user, target_types=None):
+    """
+    Drops the user's cached liked sets, e.g. after likes were changed without
+    going through toggle_like(). The next lookup reloads them.
+    """
+    target_types = target_types or list(TARGET_FIELDS)
+    if hasattr(user, _USER_MEMO_ATTR):
+        delattr(user, _USER_MEMO_ATTR)
+    for target_type in target_types:
+        _bump_version(user.pk, target_type)
+    cache.delete_many([_cache_key(user.pk, target_type) for target_type in target_types])
+
+
+def record_like_change(user, target_type, target_id, liked):
+    """
+    Updates the user's cached liked set after a like/unlike. The shared cache is
+    updated once the surrounding transaction commits.
+    """
+    if target_type not in TARGET_FIELDS:
+        return
+    memo = getattr(user, _USER_MEMO_ATTR, None)
+    if memo:
+        memo.pop(target_type, None)
+    transaction.on_commit(lambda: _apply_like_change(user.pk, target_type, target_id, liked))
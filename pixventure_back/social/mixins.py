@@ -0,0 +1,30 @@
+# social/mixins.py
+
+from social.like_state import get_liked_ids
+
+
+class LikedIdsContextMixin:
+    """
+    Mixin for list views whose serializer reports `has_liked`.
+
+    get_serializer() resolves the current user's likes for the whole page at once
+    and hands them to the serializer as `liked_<like_target_type>_ids` in its context.
+    """
+    like_target_type = None
+
+    def get_like_target_id(self, obj):
+        return obj.pk
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # Evaluate the page once; the serializer iterates the same list.
+            items = list(args[0])
+            args = (items,) + args[1:]
+            context = self.get_serializer_context()
+            context[f'liked_{self.like_target_type}_ids'] = get_liked_ids(
+                self.request.user,
+                self.like_target_type,
+                [self.get_like_target_id(item) for item in items],
+            )
+            kwargs['context'] = context
+        return super().get_serializer(*args, **kwargs)
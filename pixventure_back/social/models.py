@@ -22,6 +22,14 @@ class Like(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # "Has this user liked X" lookups, single and bulk (IN) over a page.
+            models.Index(fields=['liking_user', 'is_active', 'post'], name='like_user_active_post_idx'),
+            models.Index(fields=['liking_user', 'is_active', 'media_item'], name='like_user_active_media_idx'),
+            models.Index(fields=['liking_user', 'is_active', 'album'], name='like_user_active_album_idx'),
+        ]
+
     def __str__(self):
         target = self.post or self.media_item or self.album or self.liked_user
         return f"Like by {self.liking_user} on {target} (active={self.is_active})"
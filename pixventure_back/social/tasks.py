@@ -0,0 +1,16 @@
+from celery import shared_task
+import logging
+from social.counters import flush_buffered_deltas
+
+logger = logging.getLogger(__name__)
+
+@shared_task(name="social.tasks.flush_like_counters", ignore_result=True)
+def flush_like_counters():
+    """
+    Applies buffered likes_counter deltas (write-behind mode). Scheduled by Celery beat.
+    """
+    try:
+        return flush_buffered_deltas()
+    except Exception as e:
+        logger.error("Error flushing like counters: %s", e)
+        raise e
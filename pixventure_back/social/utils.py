@@ -2,6 +2,8 @@
 from django.db import transaction
 from django.conf import settings
 from .models import Like
+from .like_state import has_liked, record_like_change
+from .counters import record_like_delta
 from django.contrib.auth import get_user_model
 
 def user_has_liked(user, post=None, media_item=None, album=None, liked_user=None):
@@ -11,6 +13,14 @@ def user_has_liked(user, post=None, media_item=None, album=None, liked_user=None
     if not user or not user.is_authenticated:
         return False
 
+    # Single targets are answered from the user's cached liked set.
+    if liked_user is None:
+        targets = [('post', post), ('media', media_item), ('album', album)]
+        given = [(target_type, obj) for target_type, obj in targets if obj is not None]
+        if len(given) == 1:
+            target_type, obj = given[0]
+            return has_liked(user, target_type, obj.pk)
+
     like_qs = Like.objects.filter(liking_user=user, is_active=True)
     if post:
         like_qs = like_qs.filter(post=post)
@@ -29,7 +39,8 @@ def toggle_like(user, target_type, target_id, like=True):
     Toggles a like for the specified target.
     
     If like=True:
-      - Creates a new Like (or re-activates an existing inactive Like) and increments the target's likes_counter.
+      - Creates a new Like (or re-activates an existing inactive Like) and increments the target's likes_counter
+        (see social.counters; likes on a user are counted on their UserProfile).
     If like=False:
       - Deactivates an active Like (if one exists) and decrements the target's likes_counter.
       
@@ -78,18 +89,11 @@ def toggle_like(user, target_type, target_id, like=True):
         if created or not like_obj.is_active:
             like_obj.is_active = True
             like_obj.save()
-            increment_likes_counter(target_obj)
+            record_like_delta(target_type, target_obj.pk, +1)
+            record_like_change(user, target_type, target_obj.pk, liked=True)
     else:
         if like_obj.is_active:
             like_obj.is_active = False
             like_obj.save()
-            decrement_likes_counter(target_obj)
-
-def increment_likes_counter(target_obj):
-    target_obj.likes_counter += 1
-    target_obj.save(update_fields=['likes_counter'])
-
-def decrement_likes_counter(target_obj):
-    if target_obj.likes_counter > 0:
-        target_obj.likes_counter -= 1
-        target_obj.save(update_fields=['likes_counter'])
+            record_like_delta(target_type, target_obj.pk, -1)
+            record_like_change(user, target_type, target_obj.pk, liked=False)
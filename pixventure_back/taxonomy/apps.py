@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TaxonomyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'taxonomy'
+
+    def ready(self):
+        from main.cache import TERMS_NAMESPACE, invalidate_on_change
+        from taxonomy.models import Term
+        invalidate_on_change(TERMS_NAMESPACE, Term)
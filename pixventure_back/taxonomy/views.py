@@ -9,6 +9,7 @@ from django.shortcuts import get_object_or_404
 from .models import Term
 from .serializers import TermSerializer, AllTermsSerializer
 from main.pagination import StandardResultsSetPagination
+from main.cache import TERMS_NAMESPACE, get_or_set
 
 class AllTermsView(APIView):
     """
@@ -17,6 +18,10 @@ class AllTermsView(APIView):
     """
     permission_classes = [AllowAny]
     def get(self, request, format=None):
+        return Response(get_or_set(TERMS_NAMESPACE, ("all",), self._load_terms))
+
+    @staticmethod
+    def _load_terms():
         categories_qs = Term.objects.filter(term_type=2)
         tags_qs = Term.objects.filter(term_type=1)
 
@@ -24,7 +29,7 @@ class AllTermsView(APIView):
             "categories": categories_qs,
             "tags": tags_qs
         })
-        return Response(serializer.data)
+        return serializer.data
 
 
 class TermCreateView(generics.CreateAPIView):
@@ -1,8 +1,29 @@
 import pytest
 import django
 from django.conf import settings
+from django.core.cache import cache
+from main.providers.settings_provider import SettingsProvider
 from .factories import UserFactory, MediaItemFactory, TermFactory
 
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    """
+    Tests run against an in-process cache instead of Redis.
+    Cached state (e.g. membership entitlements) is keyed by primary keys,
+    which are reused between tests, so every test starts with an empty cache.
+    """
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pixventure-tests',
+        },
+    }
+    cache.clear()
+    SettingsProvider.clear_local_cache()
+    yield
+    cache.clear()
+    SettingsProvider.clear_local_cache()
+
 @pytest.fixture
 def user_factory():
     """
@@ -0,0 +1,107 @@
+# tests/main/test_cache.py
+
+import threading
+import time
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from main.cache import (
+    LOCK_WAIT,
+    TERMS_NAMESPACE,
+    cached,
+    get_cache_stats,
+    get_or_set,
+    invalidate_namespace,
+)
+from taxonomy.models import Term
+
+
+def test_get_or_set_counts_hits_and_misses():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert get_or_set("tests:counters", ("a",), loader) == {"value": 1}
+    assert get_or_set("tests:counters", ("a",), loader) == {"value": 1}
+    assert len(calls) == 1
+    assert get_cache_stats(["tests:counters"])["tests:counters"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_invalidate_namespace_orphans_old_keys():
+    values = iter(["old", "new"])
+    assert get_or_set("tests:versioned", ("k",), lambda: next(values)) == "old"
+    invalidate_namespace("tests:versioned")
+    assert get_or_set("tests:versioned", ("k",), lambda: next(values)) == "new"
+
+
+def test_cached_decorator_caches_none_per_arguments():
+    calls = []
+
+    @cached("tests:decorator")
+    def lookup(value):
+        calls.append(value)
+        return None
+
+    assert lookup(1) is None
+    assert lookup(1) is None
+    assert lookup(2) is None
+    assert calls == [1, 2]
+
+
+def test_single_flight_runs_loader_once():
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(get_or_set("tests:flight", ("k",), slow_loader)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_get_or_set_degrades_to_loader_when_redis_is_down(settings):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': 'redis://127.0.0.1:1/0',
+            'OPTIONS': {'SOCKET_CONNECT_TIMEOUT': 0.1, 'SOCKET_TIMEOUT': 0.1, 'IGNORE_EXCEPTIONS': True},
+        },
+    }
+    started = time.monotonic()
+    assert get_or_set("tests:down", ("k",), lambda: "loaded") == "loaded"
+    invalidate_namespace("tests:down")
+    assert get_or_set("tests:down", ("k",), lambda: "again") == "again"
+    # No single-flight wait for a lock nobody can hold.
+    assert time.monotonic() - started < LOCK_WAIT
+
+
+@pytest.mark.django_db
+def test_term_changes_invalidate_term_list(term_factory, django_capture_on_commit_callbacks):
+    term_factory(term_type=Term.TAG, name="First")
+    client = APIClient()
+    url = reverse('term-list')
+
+    assert len(client.get(url).json()["tags"]) == 1
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(url)
+    assert len(ctx.captured_queries) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        term_factory(term_type=Term.TAG, name="Second")
+    assert len(client.get(url).json()["tags"]) == 2
+    assert get_cache_stats([TERMS_NAMESPACE])[TERMS_NAMESPACE]["hits"] == 1
@@ -0,0 +1,25 @@
+# tests/main/test_explain_queries.py
+
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from main.management.commands.explain_queries import SEQ_SCAN_PATTERNS
+
+
+@pytest.mark.django_db
+def test_hot_queries_use_indexes():
+    out = StringIO()
+    call_command('explain_queries', '--fail-on-seq-scan', stdout=out)
+    assert "sequential scan" not in out.getvalue()
+
+
+@pytest.mark.parametrize("vendor, line, table", [
+    ("sqlite", "2 0 0 SCAN posts_post", "posts_post"),
+    ("sqlite", "2 0 0 SCAN posts_post USING INDEX post_status_published_id_idx", None),
+    ("sqlite", "3 0 0 SEARCH social_like USING INDEX like_user_active_post_idx (liking_user_id=?)", None),
+    ("postgresql", "  ->  Seq Scan on posts_post  (cost=0.00..35.50 rows=10 width=4)", "posts_post"),
+    ("postgresql", "  ->  Index Scan using post_status_published_id_idx on posts_post", None),
+])
+def test_seq_scan_detection(vendor, line, table):
+    match = SEQ_SCAN_PATTERNS[vendor].search(line)
+    assert (match.group(1) if match else None) == table
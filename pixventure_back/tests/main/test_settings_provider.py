@@ -0,0 +1,57 @@
+# tests/main/test_settings_provider.py
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from main.default_settings_config import DEFAULT_SETTINGS
+from main.models import Setting
+from main.providers.settings_provider import SettingsProvider
+
+
+def _setting_queries(ctx):
+    return [q for q in ctx.captured_queries if "main_setting" in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_all_settings_load_in_one_query_and_stay_cached():
+    Setting.objects.create(key="preview_size", value="1024")
+
+    with CaptureQueriesContext(connection) as ctx:
+        config = SettingsProvider.get_all_settings()
+        SettingsProvider.get_all_settings()
+        SettingsProvider.get_setting("thumbnail_size")
+    assert len(_setting_queries(ctx)) == 1
+    assert set(DEFAULT_SETTINGS) <= set(config)
+    assert config["preview_size"] == 1024
+
+
+@pytest.mark.django_db
+def test_typed_accessors_parse_stored_strings():
+    Setting.objects.create(key="item_blur_probability", value="0.25")
+    Setting.objects.create(key="thumbnail_size", value="not-a-number")
+
+    assert SettingsProvider.get_float("item_blur_probability") == 0.25
+    assert SettingsProvider.get_int("thumbnail_size") == DEFAULT_SETTINGS["thumbnail_size"]
+    assert SettingsProvider.get_int("missing_key", default=7) == 7
+    assert SettingsProvider.get_bool("missing_key", default=True) is True
+
+
+@pytest.mark.django_db
+def test_saving_a_setting_invalidates_the_snapshot():
+    assert SettingsProvider.get_int("preview_size") == DEFAULT_SETTINGS["preview_size"]
+    Setting.objects.create(key="preview_size", value="640")
+    assert SettingsProvider.get_int("preview_size") == 640
+
+
+@pytest.mark.django_db
+def test_other_processes_reload_when_version_changes():
+    snapshot = SettingsProvider.get_snapshot()
+    # Simulate the local TTL expiring without any change elsewhere: no reload.
+    SettingsProvider._state = (snapshot, 0.0)
+    assert SettingsProvider.get_snapshot() is snapshot
+
+    # Another process saved a setting: the version stamp moved, so the snapshot is reloaded.
+    Setting.objects.create(key="preview_size", value="500")
+    SettingsProvider._state = (snapshot, 0.0)
+    assert SettingsProvider.get_snapshot() is not snapshot
+    assert SettingsProvider.get_int("preview_size") == 500
@@ -0,0 +1,141 @@
+# tests/media/test_async_ingest.py
+
+import io
+import pytest
+from PIL import Image
+from django.urls import reverse
+from rest_framework.test import APIClient
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.managers.media_versions.media_version_determiner import determine_allowed_versions
+from media.managers.media_versions import media_version_handlers
+from media.managers.media_versions.media_version_handlers import handle_image_derivatives, handle_media_ingest
+from media.models import MediaItem, MediaItemVersion
+
+
+def _upload(content=None, name="photo.jpg"):
+    if content is None:
+        buffer = io.BytesIO()
+        Image.linear_gradient("L").resize((1200, 900)).convert("RGB").save(buffer, format="JPEG")
+        content = buffer.getvalue()
+    upload = io.BytesIO(content)
+    upload.name = name
+    return upload
+
+
+@pytest.fixture
+def client_for(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+
+    def make(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+    return make
+
+
+def _status(client, media_item_id):
+    response = client.get(reverse("media-item-status", kwargs={"pk": media_item_id}))
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.mark.django_db
+def test_async_upload_returns_202_and_reports_progress(user_factory, client_for, django_capture_on_commit_callbacks):
+    client = client_for(user_factory())
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = client.post(reverse("media-item-create") + "?async=true", {"file": _upload()}, format="multipart")
+    assert response.status_code == 202, response.data
+    assert len(callbacks) == 1  # The ingest task is dispatched after commit.
+    media_item_id = response.data["media_item_id"]
+    assert response["Location"].endswith(f"/{media_item_id}/status/")
+
+    media_item = MediaItem.objects.get(pk=media_item_id)
+    assert media_item.status == MediaItem.PROCESSING
+    assert media_item.versions.get().width is None  # Not decoded in the request.
+
+    response = client.get(reverse("media-item-status", kwargs={"pk": media_item_id}))
+    assert response["Retry-After"] == "2"  # Answered at once, polled again later.
+    status = response.data
+    assert status["state"] == "processing"
+    assert status["renditions"]["original"]["ready"] is True
+    assert status["renditions"]["thumbnail"]["ready"] is False
+
+    # Worker side: metadata + thumbnail, then the version pipeline.
+    assert handle_media_ingest(media_item_id, {}) is True
+    status = _status(client, media_item_id)
+    assert status["status"] == MediaItem.PENDING_MODERATION
+    assert status["renditions"]["original"]["width"] == 1200
+    assert status["renditions"]["thumbnail"]["ready"] is True
+    assert status["state"] == "processing"
+
+    media_item.refresh_from_db()
+    handle_image_derivatives(media_item_id, dict(DEFAULT_SETTINGS, allowed_versions=determine_allowed_versions(media_item)))
+    response = client.get(reverse("media-item-status", kwargs={"pk": media_item_id}))
+    assert response.data["state"] == "ready"
+    assert not response.has_header("Retry-After")
+
+
+@pytest.mark.django_db
+def test_failed_ingest_is_reported(user_factory, client_for, django_capture_on_commit_callbacks):
+    client = client_for(user_factory())
+    corrupt = b"\xff\xd8\xff\xe0" + b"\x00" * 512
+
+    with django_capture_on_commit_callbacks():
+        response = client.post(reverse("media-item-create") + "?async=true", {"file": _upload(corrupt)}, format="multipart")
+    assert response.status_code == 202
+    media_item_id = response.data["media_item_id"]
+
+    assert handle_media_ingest(media_item_id, {}) is False
+    status = _status(client, media_item_id)
+    assert status["state"] == "failed"
+    assert status["status"] == MediaItem.PROCESSING_FAILED
+    assert status["error"]
+
+
+def _ingested(client):
+    response = client.post(reverse("media-item-create") + "?async=true", {"file": _upload()}, format="multipart")
+    media_item_id = response.data["media_item_id"]
+    assert handle_media_ingest(media_item_id, {}) is True
+    media_item = MediaItem.objects.get(pk=media_item_id)
+    return media_item, dict(DEFAULT_SETTINGS, allowed_versions=determine_allowed_versions(media_item))
+
+
+@pytest.mark.django_db
+def test_failed_derivatives_are_reported(user_factory, client_for, monkeypatch):
+    client = client_for(user_factory())
+    media_item, config = _ingested(client)
+
+    def failing_render(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(media_version_handlers, "render_versions", failing_render)
+    assert handle_image_derivatives(media_item.id, config) is None
+    status = _status(client, media_item.id)
+    assert status["state"] == "failed"
+    assert status["error"] == "disk full"
+
+
+@pytest.mark.django_db
+def test_refused_full_resolution_version_is_not_awaited(user_factory, client_for, settings):
+    settings.IMAGE_OVERSIZE_POLICY = "refuse"
+    settings.IMAGE_TASK_MEMORY_BUDGET = 1024 * 1024
+    client = client_for(user_factory())
+    media_item, config = _ingested(client)
+
+    handle_image_derivatives(media_item.id, config)
+    status = _status(client, media_item.id)
+    assert "watermarked" not in status["renditions"]
+    assert status["state"] == "ready"
+
+
+@pytest.mark.django_db
+def test_status_is_private_to_owner(user_factory, client_for, media_item_factory):
+    media_item = media_item_factory(status=MediaItem.PROCESSING)
+    client = client_for(user_factory())
+    response = client.get(reverse("media-item-status", kwargs={"pk": media_item.pk}))
+    assert response.status_code == 404
+
+    owner_client = client_for(media_item.owner)
+    assert _status(owner_client, media_item.pk)["state"] == "processing"
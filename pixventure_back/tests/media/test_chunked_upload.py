@@ -0,0 +1,213 @@
+# tests/media/test_chunked_upload.py
+
+import io
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import blake3
+import pytest
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from media.models import MediaItem, MediaItemHash, UploadSession
+from media.services import chunked_upload
+
+
+def _jpeg_bytes(width=1600, height=1200):
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def uploads(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+    settings.MEDIA_UPLOAD_CHUNK_SIZE = 64 * 1024
+    return tmp_path
+
+
+def _client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _start(client, content, name="photo.jpg"):
+    response = client.post(reverse("upload-session-create"), {"filename": name, "size": len(content)}, format="json")
+    assert response.status_code == 201, response.data
+    return response.data
+
+
+def _put(client, upload_id, index, data):
+    url = reverse("upload-chunk", kwargs={"upload_id": upload_id, "index": index})
+    return client.put(url, data=data, content_type="application/octet-stream")
+
+
+def _chunk(content, index, chunk_size):
+    return content[index * chunk_size:(index + 1) * chunk_size]
+
+
+@pytest.mark.django_db
+def test_out_of_order_chunks_are_assembled_and_ingested(user_factory, uploads):
+    client = _client(user_factory())
+    content = _jpeg_bytes()
+    session = _start(client, content)
+    chunk_size = session["chunk_size"]
+    assert session["chunk_count"] == -(-len(content) // chunk_size) > 2
+
+    indexes = list(range(session["chunk_count"]))
+    random.Random(1).shuffle(indexes)
+    for index in indexes:
+        assert _put(client, session["upload_id"], index, _chunk(content, index, chunk_size)).status_code == 200
+
+    response = client.post(reverse("upload-session-complete", kwargs={"upload_id": session["upload_id"]}) + "?async=false")
+    assert response.status_code == 201, response.data
+    media_item = MediaItem.objects.get(pk=response.data["media_item_id"])
+    assert media_item.media_type == MediaItem.PHOTO
+
+    expected = blake3.blake3(content).hexdigest()
+    assert MediaItemHash.objects.filter(hash_type__name="blake3", hash_value=expected).exists()
+    upload = UploadSession.objects.get(pk=session["upload_id"])
+    assert upload.status == UploadSession.COMPLETED
+    assert upload.media_item_id == media_item.id
+    assert not os.path.exists(chunked_upload.part_path(upload.id))
+
+
+def test_parallel_writers_hash_in_order(tmp_path):
+    content = os.urandom(10 * 4096 + 123)
+    chunk_size = 4096
+    path = str(tmp_path / "upload.part")
+    chunked_upload.allocate_part_file(path, len(content))
+    hasher = chunked_upload.InOrderHasher(path, chunk_size, len(content))
+    indexes = list(range(-(-len(content) // chunk_size)))
+    random.Random(2).shuffle(indexes)
+
+    def put(index):
+        data = _chunk(content, index, chunk_size)
+        chunked_upload.write_at(path, index * chunk_size, io.BytesIO(data), len(data))
+        hasher.chunk_written(index)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(put, indexes))
+
+    assert hasher.hashed_bytes == len(content)  # Fully hashed while receiving.
+    assert hasher.hexdigest() == blake3.blake3(content).hexdigest()
+
+
+@pytest.mark.django_db
+def test_resent_chunk_is_hashed_with_its_final_bytes(user_factory, uploads):
+    content = os.urandom(3 * 64 * 1024 + 123)
+    session = chunked_upload.create_session(user_factory(), "clip.mp4", len(content))
+    chunk_size = session.chunk_size
+
+    # A first, corrupted attempt at chunk 0, hashed before being re-sent.
+    chunked_upload.write_chunk(session, 0, io.BytesIO(b"\x00" * chunk_size))
+    for index in [2, 0, 1, 3]:
+        session = chunked_upload.write_chunk(session, index, io.BytesIO(_chunk(content, index, chunk_size)))
+
+    assert session.chunk_writes == session.chunk_count + 1
+    assert session.received_chunks == [0, 1, 2, 3]
+    assembled = chunked_upload.assemble(session)
+    try:
+        assert assembled.blake3 == blake3.blake3(content).hexdigest()
+        assert assembled.read() == content
+    finally:
+        assembled.close()
+
+
+@pytest.mark.django_db
+def test_rejected_resend_keeps_the_received_chunk(user_factory, uploads):
+    content = os.urandom(3 * 64 * 1024)
+    session = chunked_upload.create_session(user_factory(), "clip.mp4", len(content))
+    chunk_size = session.chunk_size
+    for index in range(session.chunk_count):
+        session = chunked_upload.write_chunk(session, index, io.BytesIO(_chunk(content, index, chunk_size)))
+
+    # Short and overlong re-sends of a hashed chunk are refused before touching the file.
+    for data in (b"\x00" * 100, b"\x00" * (chunk_size + 1)):
+        with pytest.raises(chunked_upload.ChunkError):
+            chunked_upload.write_chunk(session, 1, io.BytesIO(data))
+
+    session.refresh_from_db()
+    assert session.received_chunks == [0, 1, 2]
+    assembled = chunked_upload.assemble(session)
+    try:
+        assert assembled.read() == content
+        assert assembled.blake3 == blake3.blake3(content).hexdigest()
+    finally:
+        assembled.close()
+
+
+@pytest.mark.django_db
+def test_wrong_chunk_length_and_missing_chunks_are_rejected(user_factory, uploads):
+    client = _client(user_factory())
+    content = os.urandom(3 * 64 * 1024)
+    session = _start(client, content)
+
+    response = _put(client, session["upload_id"], 0, content[:100])
+    assert response.status_code == 400
+    assert _put(client, session["upload_id"], 5, content[:100]).status_code == 400
+    assert _put(client, session["upload_id"], 1, _chunk(content, 1, session["chunk_size"])).status_code == 200
+
+    response = client.post(reverse("upload-session-complete", kwargs={"upload_id": session["upload_id"]}))
+    assert response.status_code == 400
+    assert response.data["missing_chunks"] == [0, 2]
+
+    detail = client.get(reverse("upload-session-detail", kwargs={"upload_id": session["upload_id"]}))
+    assert detail.data["received_chunks"] == [1]
+    assert detail.data["status"] == "open"
+
+
+@pytest.mark.django_db
+def test_sessions_are_private_to_owner(user_factory, uploads):
+    session = chunked_upload.create_session(user_factory(), "photo.jpg", 1000)
+    response = _put(_client(user_factory()), session.id, 0, b"x" * 1000)
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_expired_sessions_are_cleaned_up(user_factory, uploads):
+    user = user_factory()
+    expired = chunked_upload.create_session(user, "old.mp4", 1000)
+    active = chunked_upload.create_session(user, "new.mp4", 1000)
+    UploadSession.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+    expired.refresh_from_db()
+    with pytest.raises(chunked_upload.ChunkError):
+        chunked_upload.write_chunk(expired, 0, io.BytesIO(b"x" * 1000))
+
+    assert chunked_upload.cleanup_expired_sessions() == 1
+    assert not UploadSession.objects.filter(pk=expired.pk).exists()
+    assert not os.path.exists(chunked_upload.part_path(expired.id))
+    assert os.path.exists(chunked_upload.part_path(active.id))
+
+
+@pytest.mark.django_db
+def test_abandoned_hashers_are_evicted(user_factory, uploads, settings, monkeypatch):
+    settings.MEDIA_UPLOAD_MAX_HASHERS = 2
+    user = user_factory()
+    content = os.urandom(2 * 64 * 1024)
+    now = [1000.0]
+    monkeypatch.setattr(chunked_upload.time, "monotonic", lambda: now[0])
+    sessions = [chunked_upload.create_session(user, f"clip{i}.mp4", len(content)) for i in range(3)]
+    for session in sessions:
+        chunked_upload.write_chunk(session, 0, io.BytesIO(_chunk(content, 0, session.chunk_size)))
+
+    # Least recently used first once over the cap...
+    assert list(chunked_upload._hashers) == [str(session.id) for session in sessions[1:]]
+    # ...and every hasher idle for longer than the session TTL.
+    now[0] += settings.MEDIA_UPLOAD_SESSION_TTL + 1
+    last = chunked_upload.write_chunk(sessions[2], 1, io.BytesIO(_chunk(content, 1, sessions[2].chunk_size)))
+    assert list(chunked_upload._hashers) == [str(sessions[2].id)]
+
+    # An evicted upload is hashed again when it completes.
+    first = chunked_upload.write_chunk(sessions[0], 1, io.BytesIO(_chunk(content, 1, sessions[0].chunk_size)))
+    for session in (first, last):
+        assembled = chunked_upload.assemble(session)
+        try:
+            assert assembled.blake3 == blake3.blake3(content).hexdigest()
+        finally:
+            assembled.close()
+    assert not chunked_upload._hashers
@@ -0,0 +1,157 @@
+# tests/media/test_derivative_cache.py
+
+import io
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.managers.media_versions import media_version_handlers
+from media.models import HashType, MediaItem, MediaItemHash, MediaItemVersion
+from media.services import image_pipeline, video_pipeline
+from media.services.derivative_cache import IMAGE, VIDEO, derivative_key
+from media.services.file_processor import process_uploaded_file
+from media.services.media_probe import ProbeResult
+
+V = MediaItemVersion
+IMAGE_VERSIONS = [V.PREVIEW, V.WATERMARKED, V.BLURRED_THUMBNAIL, V.BLURRED_PREVIEW]
+SOURCE = "ab" * 32
+
+
+def _jpeg(name="photo.jpg"):
+    image = Image.linear_gradient("L").resize((800, 500)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+    original_render_versions = image_pipeline.render_versions
+
+    def counting_render_versions(file_obj, config, version_types, **kwargs):
+        calls.append(list(version_types))
+        return original_render_versions(file_obj, config, version_types, **kwargs)
+
+    monkeypatch.setattr(media_version_handlers, "render_versions", counting_render_versions)
+    return calls
+
+
+def test_keys_depend_only_on_what_the_rendition_reads(settings):
+    config = dict(DEFAULT_SETTINGS)
+    key = derivative_key(SOURCE, IMAGE, V.THUMBNAIL, config)
+    assert len(key) == 64
+    assert derivative_key(SOURCE, IMAGE, V.THUMBNAIL, dict(config, preview_blur_radius=99)) == key
+    assert derivative_key(SOURCE, IMAGE, V.THUMBNAIL, dict(config, thumbnail_size=301)) != key
+    assert derivative_key("cd" * 32, IMAGE, V.THUMBNAIL, config) != key
+    assert derivative_key(SOURCE, VIDEO, V.THUMBNAIL, config) != key
+    # Settings stored as strings give the same key.
+    assert derivative_key(SOURCE, IMAGE, V.THUMBNAIL, dict(config, thumbnail_size="300")) == key
+
+    preview = derivative_key(SOURCE, IMAGE, V.PREVIEW, config)
+    settings.WATERMARK_TEXT_FOR_PREVIEWS = "other.com"
+    assert derivative_key(SOURCE, IMAGE, V.PREVIEW, config) != preview
+    assert derivative_key(None, IMAGE, V.PREVIEW, config) is None
+    assert derivative_key(SOURCE, IMAGE, V.ORIGINAL, config) is None
+
+
+def test_video_keys_follow_the_encoding_profile(settings):
+    config = dict(DEFAULT_SETTINGS)
+    watermarked = derivative_key(SOURCE, VIDEO, V.WATERMARKED, config)
+    preview = derivative_key(SOURCE, VIDEO, V.PREVIEW, config)
+    assert derivative_key(SOURCE, VIDEO, V.WATERMARKED, dict(config, watermarked_video_profile="two_pass")) != watermarked
+    # The preview may be cut from the watermarked encode.
+    assert derivative_key(SOURCE, VIDEO, V.PREVIEW, dict(config, watermarked_video_profile="two_pass")) != preview
+    assert derivative_key(SOURCE, VIDEO, V.WATERMARKED, dict(config, video_encode_segments=4)) != watermarked
+    assert derivative_key(SOURCE, VIDEO, V.PREVIEW, dict(config, video_segmented_min_duration=0)) != preview
+    assert derivative_key(SOURCE, VIDEO, V.THUMBNAIL, dict(config, video_encode_segments=4)) == \
+        derivative_key(SOURCE, VIDEO, V.THUMBNAIL, config)
+    settings.FONT_LOCATION = "/fonts/Other.ttf"
+    assert derivative_key(SOURCE, VIDEO, V.WATERMARKED, config) != watermarked
+    assert derivative_key(SOURCE, VIDEO, V.PREVIEW, config) != preview
+
+
+@pytest.mark.django_db
+def test_regeneration_reuses_renditions(user_factory, settings, tmp_path, renders):
+    settings.MEDIA_ROOT = str(tmp_path)
+    config = dict(DEFAULT_SETTINGS, allowed_versions=IMAGE_VERSIONS)
+    item = MediaItem.objects.get(pk=process_uploaded_file(_jpeg(), user_factory())["media_item_id"])
+
+    first_context = media_version_handlers.handle_image_derivatives(item.pk, config)
+    firsts = {v.version_type: v for v in item.versions.exclude(version_type=V.ORIGINAL)}
+    second_context = media_version_handlers.handle_image_derivatives(item.pk, config, regenerate=True)
+
+    # Not decoded again: every version and the phash are reused.
+    assert len(renders) == 1
+    assert second_context["hash_value"] == first_context["hash_value"]
+    seconds = {v.version_type: v for v in item.versions.filter(derivative_reused=True)}
+    assert set(seconds) == set(IMAGE_VERSIONS)
+    for version_type, version in seconds.items():
+        assert not firsts[version_type].derivative_reused
+        assert version.derivative_key == firsts[version_type].derivative_key
+        assert version.file.name == firsts[version_type].file.name
+        assert (version.width, version.height, version.file_size) == (
+            firsts[version_type].width, firsts[version_type].height, firsts[version_type].file_size
+        )
+        assert version.hashes.get(hash_type__name="blake3").hash_value == \
+            firsts[version_type].hashes.get(hash_type__name="blake3").hash_value
+    item.refresh_from_db()
+    assert str(V.PREVIEW) in item.renditions
+
+
+@pytest.mark.django_db
+def test_changed_setting_renders_only_what_depends_on_it(user_factory, settings, tmp_path, renders):
+    settings.MEDIA_ROOT = str(tmp_path)
+    item = MediaItem.objects.get(pk=process_uploaded_file(_jpeg(), user_factory())["media_item_id"])
+    media_version_handlers.handle_image_derivatives(item.pk, dict(DEFAULT_SETTINGS, allowed_versions=IMAGE_VERSIONS))
+    media_version_handlers.handle_image_derivatives(
+        item.pk, dict(DEFAULT_SETTINGS, preview_blur_radius=3, allowed_versions=IMAGE_VERSIONS)
+    )
+    assert renders == [IMAGE_VERSIONS, [V.BLURRED_PREVIEW]]
+
+    # A missing file is not reused.
+    for version in item.versions.filter(version_type=V.WATERMARKED):
+        version.file.storage.delete(version.file.name)
+    media_version_handlers.handle_image_derivatives(item.pk, dict(DEFAULT_SETTINGS, allowed_versions=IMAGE_VERSIONS))
+    assert renders[-1] == [V.WATERMARKED]
+
+    call_command("derivative_cache_stats")
+
+
+@pytest.mark.django_db
+def test_regenerated_video_is_not_encoded_again(media_item_factory, settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+    settings.MEDIA_SCRATCH_RESERVE = 0
+    item = media_item_factory(media_type=MediaItem.VIDEO)
+    original = MediaItemVersion.objects.create(
+        media_item=item, version_type=V.ORIGINAL,
+        file=SimpleUploadedFile("clip.mov", b"\x00" * 1024, content_type="video/quicktime"),
+        probe=ProbeResult("video", 1280, 720, "mov", 1024, 0, "h264", 60.0).to_dict()
+    )
+    MediaItemHash.objects.create(
+        media_item_version=original, hash_type=HashType.objects.get_or_create(name="blake3")[0], hash_value=SOURCE
+    )
+
+    commands = []
+
+    def fake_ffmpeg(cmd):
+        commands.append(cmd)
+        for path in [arg for arg in cmd if arg.startswith(str(tmp_path)) and arg != original.file.path]:
+            if path.endswith(".png"):
+                Image.new("RGB", (300, 169)).save(path, format="PNG")
+            else:
+                with open(path, "wb") as f:
+                    f.write(b"mp4 " + path.encode())
+
+    monkeypatch.setattr(video_pipeline, "_run", fake_ffmpeg)
+    config = dict(DEFAULT_SETTINGS, allowed_versions=[V.WATERMARKED, V.PREVIEW, V.THUMBNAIL])
+    assert media_version_handlers.handle_video_derivatives(item.id, config)
+    rendered = len(commands)
+    assert media_version_handlers.handle_video_derivatives(item.id, config, regenerate=True)
+
+    assert len(commands) == rendered
+    reused = item.versions.filter(derivative_reused=True)
+    assert sorted(reused.values_list("version_type", flat=True)) == sorted(config["allowed_versions"])
+    assert all(version.video_duration for version in reused.exclude(version_type=V.THUMBNAIL))
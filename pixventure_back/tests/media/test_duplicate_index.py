@@ -0,0 +1,194 @@
+# tests/media/test_duplicate_index.py
+
+from datetime import timedelta
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from media.managers.duplicates.duplicate_handlers import handle_duplicate_detection
+from media.managers.duplicates.duplicate_manager import DuplicateManager
+from media.models import DuplicateCluster, HashType, MediaItemHash, MediaItemVersion, _is_better_than
+from media.services import duplicate_index
+from media.utils.hamming_index import HammingIndex, hex_to_code
+
+BASE = 0x0123456789ABCDEF
+
+
+def _flip(code, *bits):
+    for bit in bits:
+        code ^= 1 << bit
+    return code
+
+
+@pytest.fixture(autouse=True)
+def index_dir(settings, tmp_path):
+    settings.DUPLICATE_INDEX_DIR = str(tmp_path)
+    settings.DUPLICATE_INDEX_SAVE_EVERY = 1
+    duplicate_index.clear_loaded_index()
+    yield tmp_path
+    duplicate_index.clear_loaded_index()
+
+
+def _original(media_item_factory, code, width=100, height=100, file_size=1000):
+    item = media_item_factory()
+    version = MediaItemVersion.objects.create(
+        media_item=item, version_type=MediaItemVersion.ORIGINAL, file=f"originals/{item.id}.jpg",
+        width=width, height=height, file_size=file_size
+    )
+    MediaItemHash.objects.create(
+        media_item_version=version, hash_type=HashType.objects.get_or_create(name="phash")[0],
+        hash_value=f"{code:016x}"
+    )
+    return version
+
+
+def test_index_matches_linear_scan(tmp_path):
+    rng = np.random.default_rng(1)
+    codes = rng.integers(0, 1 << 64, size=20000, dtype=np.uint64)
+    planted = [_flip(int(codes[7]), *range(bits)) for bits in range(12)]
+    index = HammingIndex()
+    index.add(np.arange(len(codes)), codes)
+    index.merge()
+    # Unsorted tail, a replaced id and a removed one.
+    index.add(np.arange(100000, 100000 + len(planted)), planted)
+    index.add([8], [_flip(int(codes[7]), 2)])
+    index.remove([100003])
+
+    for radius in (0, 3, 6, 10, 20):
+        ids, distances = index.query(int(codes[7]), radius)
+        expected_ids, expected_distances = index.scan(int(codes[7]), radius)
+        assert sorted(ids.tolist()) == sorted(expected_ids.tolist())
+        assert list(distances) == sorted(distances) and max(distances) <= radius
+    assert 100003 not in index.query(int(codes[7]), 10)[0]
+    assert {7, 8, 100000, 100002} <= set(index.query(int(codes[7]), 2)[0].tolist())
+
+    index.save(tmp_path / "index.npz", watermark="w")
+    loaded, meta = HammingIndex.load(tmp_path / "index.npz")
+    assert meta == {"watermark": "w"} and len(loaded) == len(index)
+    assert sorted(loaded.query(int(codes[7]), 6)[0]) == sorted(index.query(int(codes[7]), 6)[0])
+    assert hex_to_code("0123456789abcdef") == BASE and hex_to_code("abc") is None
+
+
+@pytest.mark.django_db
+def test_index_is_refreshed_incrementally_and_persisted(media_item_factory, index_dir):
+    first = _original(media_item_factory, BASE)
+    assert duplicate_index.find_similar_versions(f"{_flip(BASE, 1):016x}", 2) == {first.id: 1}
+
+    second = _original(media_item_factory, _flip(BASE, 1, 2))
+    assert duplicate_index.find_similar_versions(f"{BASE:016x}", 2, exclude_version_id=first.id) == {second.id: 2}
+    assert (index_dir / duplicate_index.INDEX_FILE).exists()
+
+    # A restarted worker loads the saved index and catches up from its watermark.
+    duplicate_index.clear_loaded_index()
+    third = _original(media_item_factory, _flip(BASE, 40))
+    assert set(duplicate_index.find_similar_versions(f"{BASE:016x}", 2)) == {first.id, second.id, third.id}
+    assert duplicate_index.find_similar_versions("not-a-phash", 2) is None
+
+    # A hash committed late, timestamped before the watermark, is still picked up.
+    late = _original(media_item_factory, _flip(BASE, 41))
+    MediaItemHash.objects.filter(media_item_version=late).update(updated=timezone.now() - timedelta(minutes=1))
+    assert late.id in duplicate_index.find_similar_versions(f"{BASE:016x}", 2)
+
+    call_command("build_duplicate_index")
+    assert len(duplicate_index.get_index()) == 4
+
+
+@pytest.mark.django_db
+def test_near_duplicates_are_clustered_within_threshold(media_item_factory, settings):
+    first = _original(media_item_factory, BASE, width=50, height=50)
+    near = _original(media_item_factory, _flip(BASE, 3, 9, 30), width=200, height=100)
+    far = _original(media_item_factory, _flip(BASE, *range(0, 64, 8)))
+    assert handle_duplicate_detection(first.id, {}, False) == {"duplicate_cases_created": 1}
+
+    cluster = DuplicateCluster.objects.get()
+    assert set(cluster.items.all()) == {first.media_item, near.media_item}
+    assert cluster.best_item == near.media_item
+
+    # A new near-duplicate of a clustered item joins the existing cluster.
+    latest = _original(media_item_factory, _flip(BASE, 3, 9, 30, 50))
+    handle_duplicate_detection(
+        {"media_item_version_id": latest.id, "hash_value": f"{_flip(BASE, 3, 9, 30, 50):016x}",
+         "hash_type": "phash"}, {}, False
+    )
+    assert DuplicateCluster.objects.count() == 1
+    assert cluster.items.count() == 3
+
+    # The threshold comes from the config when given.
+    assert handle_duplicate_detection(far.id, {"duplicate_hamming_threshold": 8}, False)["duplicate_cases_created"] == 1
+    assert handle_duplicate_detection(far.id, {"duplicate_hamming_threshold": 7}, False)["duplicate_cases_created"] == 0
+    assert far.media_item in DuplicateCluster.objects.get().items.all()
+
+
+@pytest.mark.django_db
+def test_item_bridging_two_clusters_merges_them(media_item_factory):
+    left = [_original(media_item_factory, BASE, width=100), _original(media_item_factory, _flip(BASE, 1), width=300)]
+    far = _flip(BASE, 10, 11, 12, 13, 14, 15, 16, 17)
+    right = [_original(media_item_factory, far, width=200) for _ in range(3)]
+    for version in (left[0], right[0]):
+        DuplicateManager.process_duplicates(version.id, version.hashes.get().hash_value, threshold=4)
+    assert DuplicateCluster.objects.count() == 2
+
+    bridge_code = _flip(BASE, 10, 11, 12, 13)
+    bridge = _original(media_item_factory, bridge_code, width=250)
+    cluster = DuplicateManager.process_duplicates(bridge.id, f"{bridge_code:016x}", threshold=4)
+
+    # The left items are moved into the larger right cluster, which is kept.
+    assert list(DuplicateCluster.objects.all()) == [cluster]
+    assert cluster.hash_value == f"{far:016x}"
+    assert set(cluster.items.all()) == {version.media_item for version in left + right + [bridge]}
+    assert cluster.best_item == left[1].media_item
+
+
+@pytest.mark.django_db
+def test_merging_keeps_a_confirmed_decision(media_item_factory):
+    confirmed = [_original(media_item_factory, BASE) for _ in range(2)]
+    far = _flip(BASE, 10, 11, 12, 13, 14, 15, 16, 17)
+    pending = [_original(media_item_factory, far) for _ in range(3)]
+    for version in (confirmed[0], pending[0]):
+        DuplicateManager.process_duplicates(version.id, version.hashes.get().hash_value, threshold=4)
+    DuplicateCluster.objects.filter(hash_value=f"{BASE:016x}").update(status=DuplicateCluster.CONFIRMED)
+
+    bridge_code = _flip(BASE, 10, 11, 12, 13)
+    bridge = _original(media_item_factory, bridge_code)
+    cluster = DuplicateManager.process_duplicates(bridge.id, f"{bridge_code:016x}", threshold=4)
+
+    # The smaller confirmed cluster is merged into the pending one, which takes its status.
+    assert cluster.hash_value == f"{far:016x}"
+    cluster.refresh_from_db()
+    assert cluster.status == DuplicateCluster.CONFIRMED
+    assert cluster.items.count() == 6
+
+
+@pytest.mark.django_db
+def test_cluster_updates_take_constant_queries(media_item_factory):
+    def add_to_cluster(count, code):
+        versions = [_original(media_item_factory, code, width=i + 1) for i in range(count)]
+        for version in versions:
+            DuplicateManager.process_duplicates(version.id, f"{code:016x}", threshold=0)
+        newcomer = _original(media_item_factory, code, width=count + 1)
+        with CaptureQueriesContext(connection) as queries:
+            cluster = DuplicateManager.process_duplicates(newcomer.id, f"{code:016x}", threshold=0)
+        assert cluster.best_item == newcomer.media_item
+        assert cluster.items.count() == count + 1
+        cluster.delete()
+        return len(queries)
+
+    assert add_to_cluster(3, BASE) == add_to_cluster(25, _flip(BASE, 63))
+
+
+@pytest.mark.django_db
+def test_best_item_comparisons_use_one_query(media_item_factory):
+    small = _original(media_item_factory, BASE, width=10, file_size=5000).media_item
+    large = _original(media_item_factory, BASE, width=20, file_size=10).media_item
+    same = _original(media_item_factory, BASE, width=20, file_size=11).media_item
+    with CaptureQueriesContext(connection) as queries:
+        assert _is_better_than(large, small) and _is_better_than(same, large) and not _is_better_than(small, same)
+    assert len(queries) == 3
+
+    cluster = DuplicateCluster.objects.create(hash_type=HashType.objects.get(name="phash"), hash_value="x")
+    cluster.add_items([small.id, large.id, same.id])
+    cluster.update_best_item()
+    assert cluster.best_item == same
+    assert not cluster.consider_best_item([small.id, large.id])
@@ -0,0 +1,143 @@
+# tests/media/test_encode_governor.py
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.services import scratch
+from media.services.encode_governor import (
+    EncodeSlotUnavailable,
+    EncodeTimeout,
+    cap_threads,
+    encode_slot,
+    governed_command,
+    run_ffmpeg,
+)
+from media.services.scratch import InsufficientScratchSpace, cleanup_stale_workspaces, scratch_workspace
+from media.services.video_pipeline import options_from_config
+
+
+@pytest.fixture(autouse=True)
+def governor(settings, tmp_path):
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+    settings.MEDIA_SCRATCH_DIR = None
+    settings.MEDIA_SCRATCH_RESERVE = 0
+    settings.FFMPEG_LOCK_DIR = str(tmp_path / "locks")
+    settings.FFMPEG_MAX_JOBS = 2
+    settings.FFMPEG_NICE = 10
+    settings.FFMPEG_THREADS = 0
+    return settings
+
+
+def test_workspaces_are_unique_and_removed(tmp_path):
+    with scratch_workspace(prefix="video-") as first, scratch_workspace(prefix="video-") as second:
+        assert first != second
+        assert os.path.dirname(first) == str(tmp_path / "spool" / "scratch")
+        with open(os.path.join(first, "passlog-0.log"), "w") as f:
+            f.write("stats")
+    assert not os.path.exists(first) and not os.path.exists(second)
+
+    with pytest.raises(ValueError):
+        with scratch_workspace() as workdir:
+            raise ValueError("ffmpeg failed")
+    assert not os.path.exists(workdir)
+
+
+def test_workspaces_can_live_on_another_volume(governor, tmp_path):
+    governor.MEDIA_SCRATCH_DIR = str(tmp_path / "tmpfs")
+    with scratch_workspace() as workdir:
+        assert os.path.dirname(workdir) == str(tmp_path / "tmpfs")
+
+
+def test_disk_space_is_checked_before_starting(governor, monkeypatch):
+    monkeypatch.setattr(scratch.shutil, "disk_usage", lambda path: SimpleNamespace(free=10 * 1024 * 1024))
+    governor.MEDIA_SCRATCH_RESERVE = 4 * 1024 * 1024
+    with scratch_workspace(needed_bytes=6 * 1024 * 1024):
+        pass
+    with pytest.raises(InsufficientScratchSpace):
+        with scratch_workspace(needed_bytes=7 * 1024 * 1024):
+            pass
+    assert not os.listdir(scratch.get_scratch_root())
+
+
+def test_stale_workspaces_are_cleaned_up():
+    root = scratch.get_scratch_root()
+    stale, fresh = os.path.join(root, "video-stale"), os.path.join(root, "video-fresh")
+    os.makedirs(stale)
+    os.makedirs(fresh)
+    day_ago = time.time() - 2 * 24 * 60 * 60
+    os.utime(stale, (day_ago, day_ago))
+
+    assert cleanup_stale_workspaces() == 1
+    assert os.listdir(root) == ["video-fresh"]
+
+
+def test_slots_limit_concurrent_jobs():
+    with encode_slot() as first, encode_slot() as second:
+        assert {first, second} == {0, 1}
+        with pytest.raises(EncodeSlotUnavailable):
+            with encode_slot(wait=0.3):
+                pass
+    with encode_slot() as slot:
+        assert slot == 0
+
+
+def test_slots_are_shared_between_processes(governor):
+    governor.FFMPEG_MAX_JOBS = 1
+    os.makedirs(governor.FFMPEG_LOCK_DIR)
+    holder = subprocess.Popen([
+        sys.executable, "-c",
+        "import fcntl, sys, time; f = open(sys.argv[1], 'a'); fcntl.flock(f, fcntl.LOCK_EX); "
+        "print('locked', flush=True); time.sleep(0.5)",
+        os.path.join(governor.FFMPEG_LOCK_DIR, "slot-0.lock"),
+    ], stdout=subprocess.PIPE, text=True)
+    assert holder.stdout.readline().strip() == "locked"
+
+    started = time.monotonic()
+    with encode_slot(wait=5):
+        # Freed by the kernel when the holder exits.
+        assert time.monotonic() - started > 0.2
+    holder.wait()
+
+
+def test_waiting_jobs_get_a_slot_when_one_is_freed(governor):
+    governor.FFMPEG_MAX_JOBS = 1
+    order = []
+
+    def job(name, hold):
+        with encode_slot(wait=5):
+            order.append(name)
+            time.sleep(hold)
+
+    first = threading.Thread(target=job, args=("first", 0.3))
+    first.start()
+    time.sleep(0.1)
+    job("second", 0)
+    first.join()
+    assert order == ["first", "second"]
+
+
+def test_ffmpeg_runs_niced_with_a_hard_timeout(governor):
+    assert governed_command(["ffmpeg", "-i", "in"]) == ["nice", "-n", "10", "ffmpeg", "-i", "in"]
+    governor.FFMPEG_NICE = 0
+    assert governed_command(["ffmpeg"]) == ["ffmpeg"]
+
+    with pytest.raises(EncodeTimeout):
+        run_ffmpeg(["sleep", "5"], timeout=0.2)
+    with pytest.raises(subprocess.CalledProcessError):
+        run_ffmpeg(["false"])
+    # The slot was released both times.
+    with encode_slot(wait=0) as slot:
+        assert slot == 0
+
+
+def test_encoder_threads_are_capped(governor):
+    assert cap_threads(0) == 0 and cap_threads(8) == 8
+    governor.FFMPEG_THREADS = 4
+    assert cap_threads(0) == 4 and cap_threads(2) == 2 and cap_threads(8) == 4
+    options = options_from_config(DEFAULT_SETTINGS)
+    assert options.watermarked_profile.threads == 4 and options.preview_profile.threads == 4
@@ -0,0 +1,73 @@
+# tests/media/test_image_loader.py
+
+import io
+import struct
+import pytest
+from PIL import Image
+from media.services.image_pipeline import decode_image
+from media.utils.image_loader import open_image, required_size
+
+
+def _exif_with_thumbnail(thumbnail_bytes):
+    """
+    A big-endian EXIF block with an empty IFD0 and an IFD1 pointing at a JPEG thumbnail.
+    """
+    ifd1 = (struct.pack(">H", 2)
+            + struct.pack(">HHII", 0x0201, 4, 1, 44)
+            + struct.pack(">HHII", 0x0202, 4, 1, len(thumbnail_bytes))
+            + struct.pack(">I", 0))
+    tiff = b"MM\x00\x2a" + struct.pack(">IHI", 8, 0, 14) + ifd1
+    return b"Exif\x00\x00" + tiff + thumbnail_bytes
+
+
+def _image_file(size=(4000, 3000), image_format="JPEG", thumbnail_size=None):
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    options = {}
+    if thumbnail_size:
+        thumbnail = io.BytesIO()
+        image.resize(thumbnail_size).save(thumbnail, format="JPEG")
+        options["exif"] = _exif_with_thumbnail(thumbnail.getvalue())
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    buffer.seek(0)
+    buffer.name = f"image.{image_format.lower()}"
+    return buffer
+
+
+def test_required_size_matches_thumbnail():
+    assert required_size((4000, 3000), (300, 300)) == (300, 225)
+    assert required_size((200, 100), (300, 300)) == (200, 100)
+
+
+def test_jpeg_is_decoded_with_dct_scaling():
+    image = open_image(_image_file(), target_size=300)
+    # 1/8 scale is the largest one that still covers 300x225.
+    assert image.size == (500, 375)
+    assert image.info["original_size"] == (4000, 3000)
+    assert image.format == "JPEG"
+
+
+@pytest.mark.parametrize("thumbnail_size, expected", [
+    ((400, 300), (400, 300)),   # Large enough: used instead of decoding the image.
+    ((160, 120), (500, 375)),   # Too small for 300px: DCT scaling.
+    ((400, 400), (500, 375)),   # Letterboxed: wrong aspect ratio.
+])
+def test_embedded_thumbnail_is_used_when_large_enough(thumbnail_size, expected):
+    image = open_image(_image_file(thumbnail_size=thumbnail_size), target_size=300)
+    assert image.size == expected
+    assert image.info["original_size"] == (4000, 3000)
+
+
+def test_other_formats_are_reduced():
+    image = open_image(_image_file((2000, 1000), "PNG"), target_size=(800, 800))
+    assert image.size == (1000, 500)
+    assert image.info["original_size"] == (2000, 1000)
+
+    # No target: the full image, lazily opened as before.
+    assert open_image(_image_file((2000, 1000), "PNG")).size == (2000, 1000)
+
+
+def test_decode_image_reports_original_size():
+    decoded = decode_image(_image_file(), target_size=800)
+    assert (decoded.width, decoded.height) == (4000, 3000)
+    assert decoded.image.width >= 800 and decoded.image.width < 4000
@@ -0,0 +1,85 @@
+# tests/media/test_image_pipeline.py
+
+import io
+import imagehash
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.managers.media_versions.media_version_handlers import handle_image_derivatives
+from media.models import MediaItem, MediaItemHash, MediaItemVersion
+from media.services import image_pipeline
+from media.services.file_processor import process_uploaded_file
+from media.services.image_pipeline import render_versions
+
+V = MediaItemVersion
+IMAGE_VERSIONS = [V.PREVIEW, V.WATERMARKED, V.BLURRED_THUMBNAIL, V.BLURRED_PREVIEW]
+
+
+def _jpeg(width=1600, height=1000, name="photo.jpg"):
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@pytest.fixture
+def count_decodes(monkeypatch):
+    calls = []
+    original_open_image = image_pipeline.open_image
+
+    def counting_open_image(file_obj, **kwargs):
+        calls.append(kwargs.get("target_size"))
+        return original_open_image(file_obj, **kwargs)
+
+    monkeypatch.setattr(image_pipeline, "open_image", counting_open_image)
+    return calls
+
+
+def test_all_renditions_from_one_decode(count_decodes):
+    result = render_versions(_jpeg(), DEFAULT_SETTINGS, IMAGE_VERSIONS + [V.THUMBNAIL])
+
+    assert len(count_decodes) == 1
+    assert (result.original.width, result.original.height) == (1600, 1000)
+    assert result.original.format == "JPEG"
+    sizes = {version_type: (r.width, r.height) for version_type, r in result.versions.items()}
+    assert sizes == {
+        V.WATERMARKED: (1600, 1000),
+        V.PREVIEW: (800, 500),
+        V.BLURRED_PREVIEW: (800, 500),
+        V.THUMBNAIL: (300, 188),
+        V.BLURRED_THUMBNAIL: (300, 188),
+    }
+    assert {"decode", "watermarked", "preview", "phash", "total"} <= set(result.timings)
+
+
+def test_phash_matches_full_resolution_hash():
+    upload = _jpeg()
+    result = render_versions(upload, DEFAULT_SETTINGS, [])
+    upload.seek(0)
+    full = imagehash.phash(Image.open(upload).convert("RGB"))
+    assert imagehash.hex_to_hash(result.phash) - full <= 4
+
+
+@pytest.mark.django_db
+def test_upload_and_pipeline_store_versions(user_factory, settings, tmp_path, count_decodes):
+    settings.MEDIA_ROOT = str(tmp_path)
+    result = process_uploaded_file(_jpeg(), user_factory())
+    assert "error" not in result
+    # Only decoded at the size the thumbnail needs.
+    assert count_decodes == [(300, 300)]
+
+    media_item = MediaItem.objects.get(pk=result["media_item_id"])
+    context = handle_image_derivatives(
+        media_item.pk, dict(DEFAULT_SETTINGS, allowed_versions=IMAGE_VERSIONS)
+    )
+    assert len(count_decodes) == 2
+
+    versions = {v.version_type: v for v in media_item.versions.all()}
+    assert set(versions) == {V.ORIGINAL, V.THUMBNAIL, *IMAGE_VERSIONS}
+    assert (versions[V.ORIGINAL].width, versions[V.ORIGINAL].height) == (1600, 1000)
+    assert (versions[V.PREVIEW].width, versions[V.PREVIEW].height) == (800, 500)
+    assert context["media_item_version_id"] == versions[V.ORIGINAL].pk
+    assert MediaItemHash.objects.get(
+        media_item_version=versions[V.ORIGINAL], hash_type__name="phash"
+    ).hash_value == context["hash_value"]
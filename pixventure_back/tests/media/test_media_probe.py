@@ -0,0 +1,99 @@
+# tests/media/test_media_probe.py
+
+import io
+import os
+import struct
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from media.models import MediaItem, MediaItemVersion
+from media.services.media_probe import MediaProbe, ProbeError, parse_ffprobe_output
+from media.services.media_version_creator import create_media_item_version
+
+
+def _box(box_type, body):
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+
+def _full_box(box_type, body, version=0, flags=0):
+    return _box(box_type, bytes([version]) + flags.to_bytes(3, "big") + body)
+
+
+def _heic_header(primary=(4032, 3024), thumbnail=(320, 240), quarter_turns=1):
+    """
+    ftyp + meta with two items: the primary image (ispe + irot) and a thumbnail.
+    """
+    ispe_primary = _full_box(b"ispe", struct.pack(">II", *primary))
+    ispe_thumbnail = _full_box(b"ispe", struct.pack(">II", *thumbnail))
+    irot = _box(b"irot", bytes([quarter_turns]))
+    ipco = _box(b"ipco", ispe_thumbnail + ispe_primary + irot)
+    # Item 1 (primary) -> properties 2 and 3; item 2 -> property 1.
+    ipma = _full_box(b"ipma", struct.pack(">I", 2) + struct.pack(">HB", 1, 2) + bytes([2, 3])
+                     + struct.pack(">HB", 2, 1) + bytes([1]))
+    meta = _full_box(b"meta", _full_box(b"pitm", struct.pack(">H", 1)) + _box(b"iprp", ipco + ipma))
+    ftyp = _box(b"ftyp", b"heic" + b"\x00\x00\x00\x00" + b"mif1heic")
+    # The pixel data (mdat) is never read.
+    return ftyp + meta + _box(b"mdat", b"\x00" * 1024)
+
+
+def _jpeg(size=(640, 480), orientation=None):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new("RGB", size, "white").save(buffer, format="JPEG", exif=exif.tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+def test_image_probe_reads_header_and_orientation():
+    probe = MediaProbe.probe(_jpeg((640, 480), orientation=6), is_image=True)
+    assert (probe.kind, probe.format, probe.width, probe.height) == ("image", "JPEG", 640, 480)
+    assert probe.rotation == 90
+    assert probe.display_size == (480, 640)
+
+
+def test_heic_probe_uses_primary_item_properties():
+    probe = MediaProbe.probe(io.BytesIO(_heic_header()), is_image=True)
+    assert (probe.width, probe.height) == (4032, 3024)
+    assert probe.format == "HEIC"
+    assert probe.rotation == 270  # One counter-clockwise quarter turn.
+
+
+def test_unreadable_image_raises():
+    with pytest.raises(ProbeError):
+        MediaProbe.probe(io.BytesIO(b"not an image" * 10), is_image=True)
+
+
+def test_ffprobe_output_is_parsed_with_rotation():
+    data = {
+        "streams": [{
+            "codec_name": "hevc", "width": 1920, "height": 1080,
+            "side_data_list": [{"side_data_type": "Display Matrix", "rotation": -90}],
+        }],
+        "format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "12.480000"},
+    }
+    probe = parse_ffprobe_output(data, file_size=1000)
+    assert (probe.kind, probe.format, probe.codec) == ("video", "mov", "hevc")
+    assert probe.duration == pytest.approx(12.48)
+    assert probe.rotation == 90
+    assert probe.display_size == (1080, 1920)
+
+    legacy = parse_ffprobe_output({"streams": [{"width": 640, "height": 360, "tags": {"rotate": "180"}}]}, 10)
+    assert legacy.rotation == 180 and legacy.duration is None
+
+
+@pytest.mark.django_db
+def test_probe_is_cached_on_the_original(media_item_factory, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    media_item = media_item_factory(media_type=MediaItem.PHOTO)
+    upload = SimpleUploadedFile("photo.jpg", _jpeg((800, 600), orientation=8).getvalue(), content_type="image/jpeg")
+    original = create_media_item_version(media_item, upload, MediaItemVersion.ORIGINAL, is_image=True)
+
+    original.refresh_from_db()
+    assert (original.width, original.height) == (800, 600)
+    assert original.probe["rotation"] == 270
+
+    # Later stages read the probe from the database, not from the file.
+    os.remove(original.file.path)
+    assert MediaProbe.for_media_item(media_item).display_size == (600, 800)
@@ -0,0 +1,95 @@
+# tests/media/test_memory_budget.py
+
+import io
+import os
+import pytest
+from PIL import Image, ImageChops
+from django.core.files.uploadedfile import SimpleUploadedFile
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.models import MediaItemVersion
+from media.services import watermark
+from media.services.image_pipeline import render_versions
+from media.services.memory_budget import (
+    PEAK_BYTES_PER_PIXEL,
+    REFUSE,
+    WEBP_MAX_DIMENSION,
+    ImageTooLarge,
+    plan_full_resolution,
+    track_peak_rss,
+)
+
+V = MediaItemVersion
+IMAGE_VERSIONS = [V.PREVIEW, V.WATERMARKED, V.BLURRED_THUMBNAIL, V.BLURRED_PREVIEW]
+
+
+@pytest.fixture(autouse=True)
+def spool(settings, tmp_path):
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+    return tmp_path / "spool"
+
+
+def _jpeg(width=2000, height=1500):
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize((width, height)).convert("RGB").save(buffer, format="JPEG", quality=90)
+    return SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+
+def test_plan_keeps_images_within_budget():
+    budget = 100 * 1024 * 1024
+    assert plan_full_resolution(2000, 1500, budget=budget).target_size is None
+
+    plan = plan_full_resolution(12000, 8000, budget=budget)
+    width, height = plan.target_size
+    assert width * height * PEAK_BYTES_PER_PIXEL <= budget
+    assert abs(width / height - 1.5) < 0.01
+
+    with pytest.raises(ImageTooLarge):
+        plan_full_resolution(12000, 8000, budget=budget, policy=REFUSE)
+
+    # WebP cannot hold more than 16383 pixels on a side, whatever the budget.
+    panorama = plan_full_resolution(40000, 2000, budget=1024 ** 4)
+    assert panorama.target_size[0] <= WEBP_MAX_DIMENSION
+
+
+def test_watermark_is_composited_in_place_over_its_region_only():
+    image = Image.new("RGB", (3000, 2000), (40, 40, 40))
+    original = image.copy()
+
+    result = watermark.render_full_watermarked(image, watermark_transparency=200, in_place=True)
+    assert result is image
+    changed = ImageChops.difference(original, result).getbbox()
+    assert changed is not None
+    # The text covers ~12% of the width; nothing else is touched.
+    assert changed[2] - changed[0] < 0.2 * image.width
+    assert changed[3] - changed[1] < 0.2 * image.height
+
+
+def test_pipeline_downscales_originals_over_budget(settings, spool):
+    settings.IMAGE_TASK_MEMORY_BUDGET = 1000 * 750 * PEAK_BYTES_PER_PIXEL
+    result = render_versions(_jpeg(), DEFAULT_SETTINGS, IMAGE_VERSIONS)
+
+    watermarked = result.versions[V.WATERMARKED]
+    assert (watermarked.width, watermarked.height) == (1000, 750)
+    assert (result.original.width, result.original.height) == (2000, 1500)
+    # Encoded to a spool file, not to memory.
+    assert os.path.dirname(watermarked.file.temporary_file_path()) == str(spool)
+    assert Image.open(watermarked.file).size == (1000, 750)
+
+
+def test_pipeline_refuses_full_resolution_over_budget(settings):
+    settings.IMAGE_TASK_MEMORY_BUDGET = 1000 * 750 * PEAK_BYTES_PER_PIXEL
+    settings.IMAGE_OVERSIZE_POLICY = REFUSE
+    result = render_versions(_jpeg(), DEFAULT_SETTINGS, IMAGE_VERSIONS)
+
+    assert V.WATERMARKED not in result.versions
+    assert {V.PREVIEW, V.BLURRED_PREVIEW, V.BLURRED_THUMBNAIL} <= set(result.versions)
+
+
+def test_track_peak_rss_reports_allocations():
+    with track_peak_rss() as rss:
+        block = bytearray(64 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+    assert rss.elapsed_ms >= 0
+    assert rss.peak_mb > 0
+    if rss.growth_mb is not None:
+        assert rss.growth_mb >= 32
@@ -0,0 +1,84 @@
+# tests/media/test_renditions.py
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from media.models import MediaItem, MediaItemVersion
+from media.services.rendition_manifest import refresh_rendition_manifest
+from media.utils.media_file import get_media_display_info, is_media_locked
+from media.utils.renditions import select_rendition
+
+V = MediaItemVersion
+
+MANIFEST = {
+    str(version_type): {"url": f"/media/{name}.jpg", "width": 100 + version_type, "height": 50, "file_size": 1}
+    for version_type, name in [
+        (V.ORIGINAL, "original"),
+        (V.THUMBNAIL, "thumb"),
+        (V.PREVIEW, "preview"),
+        (V.BLURRED_THUMBNAIL, "blurred_thumb"),
+        (V.BLURRED_PREVIEW, "blurred_preview"),
+        (V.WATERMARKED, "watermarked"),
+    ]
+}
+
+
+@pytest.mark.parametrize("media_type, paying, blurred, thumbnail, expected", [
+    (MediaItem.PHOTO, True, False, False, V.WATERMARKED),
+    (MediaItem.PHOTO, True, True, True, V.THUMBNAIL),
+    (MediaItem.PHOTO, False, False, False, V.PREVIEW),
+    (MediaItem.PHOTO, False, False, True, V.THUMBNAIL),
+    (MediaItem.PHOTO, False, True, False, V.BLURRED_PREVIEW),
+    (MediaItem.PHOTO, False, True, True, V.BLURRED_THUMBNAIL),
+    (MediaItem.VIDEO, True, False, False, V.WATERMARKED),
+    (MediaItem.VIDEO, False, True, False, V.PREVIEW),
+    (MediaItem.VIDEO, False, True, True, V.THUMBNAIL),
+])
+def test_select_rendition(media_type, paying, blurred, thumbnail, expected):
+    rendition = select_rendition(MANIFEST, media_type, paying, blurred, thumbnail)
+    assert rendition.version_type == expected
+    assert rendition.url == MANIFEST[str(expected)]["url"]
+    assert rendition.width == 100 + expected
+
+
+def test_select_rendition_missing_version():
+    manifest = {str(V.THUMBNAIL): MANIFEST[str(V.THUMBNAIL)]}
+    assert select_rendition(manifest, MediaItem.PHOTO, True, False, thumbnail=False) is None
+    assert select_rendition({}, MediaItem.PHOTO, False, False, thumbnail=True) is None
+
+
+@pytest.mark.django_db
+def test_display_info_reads_stored_manifest_without_queries(media_item_factory):
+    item = media_item_factory(media_type=MediaItem.PHOTO, is_blurred=True)
+    for version_type, name in [(V.PREVIEW, "preview.jpg"), (V.BLURRED_PREVIEW, "blurred.jpg")]:
+        MediaItemVersion.objects.create(media_item=item, version_type=version_type, file=name, width=640, height=480)
+    MediaItemVersion.objects.create(media_item=item, version_type=V.THUMBNAIL)  # no file: not in the manifest
+    refresh_rendition_manifest(item)
+
+    item = MediaItem.objects.get(pk=item.pk)
+    assert set(item.renditions) == {str(V.PREVIEW), str(V.BLURRED_PREVIEW)}
+
+    with CaptureQueriesContext(connection) as ctx:
+        rendition, url = get_media_display_info(item, None, user_is_paying=False)
+        thumb, thumb_url = get_media_display_info(item, None, thumbnail=True, user_is_paying=True)
+        locked = is_media_locked(item, None, user_is_paying=False)
+    assert len(ctx.captured_queries) == 0
+    assert rendition.version_type == V.BLURRED_PREVIEW
+    assert url.endswith("blurred.jpg")
+    assert (rendition.width, rendition.height) == (640, 480)
+    assert (thumb, thumb_url) == (None, "")
+    assert locked is True
+
+
+@pytest.mark.django_db
+def test_display_info_falls_back_to_versions_without_manifest(media_item_factory):
+    item = media_item_factory(media_type=MediaItem.VIDEO)
+    MediaItemVersion.objects.create(media_item=item, version_type=V.WATERMARKED, file="wm.mp4")
+    item = MediaItem.objects.get(pk=item.pk)
+    assert item.renditions == {}
+
+    with CaptureQueriesContext(connection) as ctx:
+        _, first = get_media_display_info(item, None, user_is_paying=True)
+        _, second = get_media_display_info(item, None, user_is_paying=True)
+    assert len(ctx.captured_queries) == 1
+    assert first == second and first.endswith("wm.mp4")
@@ -0,0 +1,129 @@
+# tests/media/test_segmented_encode.py
+
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.models import MediaItemVersion
+from media.services import video_pipeline
+from media.services.media_probe import ProbeResult
+from media.services.segmented_encode import (
+    Segment,
+    SegmentedEncodeError,
+    build_concat_command,
+    build_segment_command,
+    parse_stream_summary,
+    plan_segments,
+    verify_output,
+)
+from media.services.video_pipeline import options_from_config, render_video_files, should_segment
+
+V = MediaItemVersion
+LONG_PROBE = ProbeResult("video", 1280, 720, "mov", 500 * 1024 * 1024, 0, "h264", 1200.0)
+
+
+def _option(cmd, name):
+    return cmd[cmd.index(name) + 1]
+
+
+def test_segments_start_at_keyframes_and_cover_every_frame():
+    frame_times = [i / 25 for i in range(25 * 120)]        # 120 s at 25 fps
+    keyframes = [float(t) for t in range(0, 120, 7)]       # one every 7 s
+    plan = plan_segments(keyframes, 120.0, 4, frame_times=frame_times)
+
+    assert [segment.start for segment in plan] == [0.0, 28.0, 63.0, 91.0]
+    assert all(segment.start in keyframes for segment in plan)
+    assert plan[-1].end is None and plan[-1].frames is None
+    # Consecutive, and the frame counts add up to every frame before the last segment.
+    assert all(a.end == b.start for a, b in zip(plan, plan[1:]))
+    assert sum(segment.frames for segment in plan[:-1]) == 25 * 91
+
+
+def test_short_or_keyframe_poor_videos_are_not_split():
+    assert plan_segments([0.0, 5.0], 15.0, 4) == [Segment(0, 0.0, None)]
+    assert plan_segments([0.0], 600.0, 4) == [Segment(0, 0.0, None)]
+    assert len(plan_segments([0.0, 300.0], 600.0, 8)) == 2
+
+
+def test_segment_command_seeks_the_input_and_counts_frames():
+    segment = Segment(1, 28.0, 56.0, 700)
+    cmd = build_segment_command("/in.mov", segment, "drawtext=x", ["-c:v", "libx264"], "/w/s1.mp4")
+    assert cmd.index("-ss") < cmd.index("-i")
+    assert float(_option(cmd, "-ss")) < 28.0
+    assert _option(cmd, "-frames:v") == "700"
+    assert "-an" in cmd and _option(cmd, "-vf") == "drawtext=x"
+
+    first = build_segment_command("/in.mov", Segment(0, 0.0, None), "f", [], "/w/s0.mp4", first_pass=True)
+    assert "-ss" not in first and "-frames:v" not in first
+    assert _option(first, "-f") == "null"
+
+
+def test_concat_takes_the_audio_from_the_source():
+    cmd = build_concat_command("/w/list.txt", "/in.mov", ["-map", "1:a:0?", "-c:a", "copy"], "/w/out.mp4")
+    assert _option(cmd, "-f") == "concat"
+    assert _option(cmd, "-c:v") == "copy"
+    assert cmd.count("-i") == 2 and _option(cmd, "-map") == "0:v:0"
+    assert "1:a:0?" in cmd
+
+
+def test_output_is_checked_against_the_source():
+    source = parse_stream_summary({
+        "format": {"duration": "1200.04", "start_time": "0.000000"},
+        "streams": [
+            {"codec_type": "video", "nb_read_packets": "30000", "start_time": "0.000000", "duration": "1200.000"},
+            {"codec_type": "audio", "start_time": "0.000000", "duration": "1200.040"},
+        ],
+    })
+    assert source.video_frames == 30000 and abs(source.av_offset - 0.04) < 1e-9
+    assert verify_output(source, source, 0.04) == []
+
+    dropped = source._replace(video_frames=29999)
+    assert "frame count" in verify_output(source, dropped, 0.04)[0]
+    drifted = source._replace(audio_start=0.5)
+    assert "A/V offset" in verify_output(source, drifted, 0.04)[0]
+    silent = source._replace(audio_start=None, audio_duration=None)
+    assert verify_output(source, silent, 0.04) == ["audio stream missing"]
+    assert verify_output(source, source._replace(video_duration=1190.0), 0.04)
+
+
+def test_only_long_videos_are_segmented():
+    options = options_from_config(DEFAULT_SETTINGS)
+    outputs = {V.WATERMARKED: "/w/wm.mp4"}
+    assert should_segment(outputs, options, 1200.0)
+    assert not should_segment(outputs, options, 60.0)
+    assert not should_segment({V.PREVIEW: "/w/p.mp4"}, options, 1200.0)
+    assert not should_segment(outputs, options._replace(segment_min_duration=0), 1200.0)
+
+
+def test_segmented_watermark_and_other_renditions(tmp_path, monkeypatch):
+    segmented, commands = [], []
+    monkeypatch.setattr(video_pipeline, "_run", commands.append)
+    monkeypatch.setattr(
+        video_pipeline, "encode_watermarked_segmented",
+        lambda input_path, probe, options, output_path, workdir, copy_preview: segmented.append(copy_preview) or 4
+    )
+    options = options_from_config(DEFAULT_SETTINGS)
+    rendered = render_video_files("/in.mov", LONG_PROBE, options, [V.WATERMARKED, V.PREVIEW, V.THUMBNAIL],
+                                  str(tmp_path))
+
+    assert segmented == [True]
+    # The poster frame in its own run, then the preview cut from the watermarked version.
+    assert len(commands) == 2
+    assert rendered.paths[V.THUMBNAIL] in commands[0]
+    assert rendered.paths[V.WATERMARKED] not in commands[0]
+    assert rendered.encodes[V.WATERMARKED].segments == 4
+    assert rendered.encodes[V.PREVIEW].stream_copied and rendered.encodes[V.PREVIEW].segments == 4
+
+
+def test_failed_segmented_encode_falls_back_to_one_run(tmp_path, monkeypatch):
+    commands = []
+    monkeypatch.setattr(video_pipeline, "_run", commands.append)
+
+    def fail(*args):
+        raise SegmentedEncodeError("frame count 29999 != 30000")
+
+    monkeypatch.setattr(video_pipeline, "encode_watermarked_segmented", fail)
+    options = options_from_config(DEFAULT_SETTINGS)
+    rendered = render_video_files("/in.mov", LONG_PROBE, options, [V.WATERMARKED, V.THUMBNAIL], str(tmp_path))
+
+    assert len(commands) == 1
+    assert rendered.paths[V.WATERMARKED] in commands[0] and rendered.paths[V.THUMBNAIL] in commands[0]
+    assert "segmented" not in rendered.timings
+    assert rendered.encodes[V.WATERMARKED].segments == 1
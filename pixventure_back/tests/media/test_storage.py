@@ -0,0 +1,106 @@
+# tests/media/test_storage.py
+
+import os
+import blake3
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory
+from media.models import MediaItem, MediaItemVersion
+from media.services.media_version_creator import create_media_item_version
+from media.services.storage_relink import pending_versions, relink_batch
+from media.storage import content_name, digest_from_name, serve_media
+
+V = MediaItemVersion
+DATA = b"same bytes" * 100
+DIGEST = blake3.blake3(DATA).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_STORAGE_LAYOUT = "content"
+    return tmp_path
+
+
+def _store(item, version_type=V.PREVIEW, data=DATA, name="preview.WEBP"):
+    return create_media_item_version(
+        item, SimpleUploadedFile(name, data, content_type="image/webp"), version_type,
+        meta={"width": 10, "height": 10, "file_size": len(data)}
+    )
+
+
+def test_content_names_are_sharded_by_digest():
+    name = content_name(DIGEST, ".webp")
+    assert name == f"content/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.webp"
+    assert digest_from_name(name) == DIGEST
+    assert digest_from_name("preview/preview_0123.webp") is None
+    assert digest_from_name(f"content/00/00/{DIGEST}.webp") is None
+
+
+@pytest.mark.django_db
+def test_identical_content_is_stored_once(media_item_factory, media_root):
+    first = _store(media_item_factory())
+    second = _store(media_item_factory(), version_type=V.THUMBNAIL, name="thumb.webp")
+
+    assert first.file.name == second.file.name == content_name(DIGEST, ".webp")
+    assert os.listdir(media_root / "content" / DIGEST[:2] / DIGEST[2:4]) == [f"{DIGEST}.webp"]
+    # The digest is taken from the name instead of reading the file again.
+    assert first.hashes.get(hash_type__name="blake3").hash_value == DIGEST
+    other = _store(media_item_factory(), data=b"other")
+    assert other.file.name != first.file.name
+
+
+@pytest.mark.django_db
+def test_legacy_layout(media_item_factory, settings):
+    settings.MEDIA_STORAGE_LAYOUT = "legacy"
+    version = _store(media_item_factory())
+    assert version.file.name.startswith("preview/preview_")
+
+
+@pytest.mark.django_db
+def test_relink_in_resumable_batches(media_item_factory, settings, media_root):
+    settings.MEDIA_STORAGE_LAYOUT = "legacy"
+    item = media_item_factory()
+    versions = [_store(item), _store(item, V.THUMBNAIL), _store(media_item_factory(), data=b"other")]
+    old_names = [version.file.name for version in versions]
+    renamed = _store(item, V.WATERMARKED, data=b"seo")
+    MediaItemVersion.objects.filter(pk=renamed.pk).update(is_renamed=True)
+    settings.MEDIA_STORAGE_LAYOUT = "content"
+    assert pending_versions().count() == 3
+
+    batch = relink_batch(batch_size=2)
+    assert (batch.relinked, batch.deduplicated, batch.last_id) == (2, 1, versions[1].id)
+    assert pending_versions().count() == 1
+    item.refresh_from_db()
+    assert digest_from_name(item.renditions[str(V.PREVIEW)]["url"].split("/media/")[-1]) == DIGEST
+
+    batch = relink_batch(after_id=batch.last_id, batch_size=2, remove_old=True)
+    assert batch.relinked == 1 and batch.removed == 1
+    assert relink_batch(after_id=batch.last_id).last_id is None
+
+    for version in versions:
+        version.refresh_from_db()
+        assert digest_from_name(version.file.name)
+        assert version.file.read()
+    # Old files are kept unless asked, and left in place for SEO-renamed versions.
+    assert all(os.path.exists(media_root / name) for name in old_names[:2])
+    assert not os.path.exists(media_root / old_names[2])
+    renamed.refresh_from_db()
+    assert renamed.file.name.startswith("watermarked/")
+
+    call_command("relink_media_files")
+
+
+@pytest.mark.django_db
+def test_content_addressed_files_are_served_immutable(media_item_factory, media_root):
+    version = _store(media_item_factory())
+    request = RequestFactory().get("/media/" + version.file.name)
+    response = serve_media(request, version.file.name, document_root=str(media_root))
+    assert "immutable" in response["Cache-Control"] and "max-age=31536000" in response["Cache-Control"]
+
+    os.makedirs(media_root / "preview")
+    (media_root / "preview" / "old.webp").write_bytes(DATA)
+    response = serve_media(RequestFactory().get("/media/preview/old.webp"), "preview/old.webp",
+                           document_root=str(media_root))
+    assert not response.has_header("Cache-Control")
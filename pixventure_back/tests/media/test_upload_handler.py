@@ -0,0 +1,85 @@
+# tests/media/test_upload_handler.py
+
+import io
+import os
+import blake3
+import pytest
+from PIL import Image
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from media.models import MediaItem, MediaItemHash, MediaItemVersion
+from media.upload_handlers import HashingUploadHandler, sniff_content_type
+
+
+def _jpeg_bytes(width=640, height=480):
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize((width, height)).convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def media_dirs(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+    return tmp_path
+
+
+@pytest.mark.parametrize("header, expected", [
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00", "image/png"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00", "image/heic"),
+    (b"\x00\x00\x00\x20ftypisom\x00\x00", "video/mp4"),
+    (b"\x00\x00\x00\x14ftypqt  \x00\x00", "video/quicktime"),
+    (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81", "video/webm"),
+    (b"plain text", None),
+])
+def test_sniff_content_type(header, expected):
+    assert sniff_content_type(header) == expected
+
+
+def test_handler_spools_and_hashes_in_chunks(media_dirs):
+    data = _jpeg_bytes() * 3
+    handler = HashingUploadHandler()
+    handler.chunk_size = 1000
+    handler.new_file("file", "photo.jpg", "application/octet-stream", None)
+    for start in range(0, len(data), handler.chunk_size):
+        handler.receive_data_chunk(data[start:start + handler.chunk_size], start)
+    uploaded = handler.file_complete(len(data))
+
+    assert uploaded.blake3 == blake3.blake3(data).hexdigest()
+    assert uploaded.sniffed_content_type == "image/jpeg"
+    assert os.path.dirname(uploaded.temporary_file_path()) == str(media_dirs / "spool")
+    assert uploaded.read() == data
+    uploaded.close()
+
+
+@pytest.mark.django_db
+def test_upload_view_stores_streamed_file(user_factory, media_dirs):
+    user = user_factory()
+    client = APIClient()
+    client.force_authenticate(user)
+    data = _jpeg_bytes()
+
+    upload = io.BytesIO(data)
+    upload.name = "photo.bin"  # Declared type is wrong; the content is sniffed.
+    response = client.post(reverse("media-item-create"), {"file": upload}, format="multipart")
+    assert response.status_code == 201, response.data
+
+    media_item = MediaItem.objects.get(pk=response.data["media_item_id"])
+    assert media_item.media_type == MediaItem.PHOTO
+    original = media_item.versions.get(version_type=MediaItemVersion.ORIGINAL)
+    assert (original.width, original.height) == (640, 480)
+    assert MediaItemHash.objects.get(media_item_version=original, hash_type__name="blake3").hash_value \
+        == blake3.blake3(data).hexdigest()
+    assert os.listdir(media_dirs / "spool") == []
+
+    # Re-uploading the same bytes is rejected by a single hash lookup.
+    upload = io.BytesIO(data)
+    upload.name = "again.jpg"
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.post(reverse("media-item-create"), {"file": upload}, format="multipart")
+    assert response.status_code == 400
+    assert len([q for q in ctx.captured_queries if "media_mediaitemhash" in q["sql"]]) == 1
@@ -0,0 +1,207 @@
+# tests/media/test_video_pipeline.py
+
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from main.default_settings_config import DEFAULT_SETTINGS
+from media.models import MediaItem, MediaItemVersion, VideoEncodeStat
+from media.managers.media_versions import media_version_handlers, media_version_scheduler
+from media.services import video_pipeline
+from media.services.media_probe import ProbeResult
+from media.services.video_pipeline import (
+    build_preview_copy_command,
+    build_render_command,
+    encoder_args,
+    escape_drawtext,
+    get_encoding_profile,
+    options_from_config,
+    preview_can_be_copied,
+    target_bitrate,
+)
+
+V = MediaItemVersion
+PROBE = ProbeResult("video", 1279, 720, "mov", 50 * 1024 * 1024, 0, "h264", 60.0)
+OUTPUTS = {V.WATERMARKED: "/w/wm.mp4", V.PREVIEW: "/w/preview.mp4", V.THUMBNAIL: "/w/thumb.png"}
+
+
+def _option(cmd, name):
+    return cmd[cmd.index(name) + 1]
+
+
+def test_options_from_config_resolves_profiles():
+    options = options_from_config(DEFAULT_SETTINGS)
+    assert options.watermarked_profile == options.preview_profile
+    assert options.watermarked_profile.name == "capped_crf"
+    assert not options.watermarked_profile.two_pass
+    assert options.max_bitrate == 5000000
+    assert options.preview_duration == 2
+    # A quality setting other than -1 overrides the profile's CRF.
+    assert options_from_config({"full_watermarked_version_quality": 23}).watermarked_profile.crf == 23
+    assert get_encoding_profile("no-such-profile").name == "capped_crf"
+
+
+def test_profiles_build_encoder_options():
+    crf = encoder_args(get_encoding_profile("capped_crf_fast"), bitrate_cap=5_000_000)
+    assert _option(crf, "-preset") == "veryfast" and _option(crf, "-crf") == "23"
+    # The lower of the profile cap and the source cap wins.
+    assert _option(crf, "-maxrate") == "3000k" and _option(crf, "-bufsize") == "6000k"
+
+    two_pass = get_encoding_profile("two_pass")
+    second = encoder_args(two_pass, bitrate_cap=2_000_000, pass_number=2, passlog="/w/log")
+    assert _option(second, "-b:v") == "2000k" and _option(second, "-pass") == "2"
+    assert "-crf" not in second
+
+
+def test_target_bitrate_is_capped():
+    assert target_bitrate(1_000_000, 8, 5_000_000) == 1_000_000
+    assert target_bitrate(100_000_000, 8, 5_000_000) == 5_000_000
+    assert target_bitrate(1_000_000, None, 5_000_000) == 5_000_000
+
+
+def test_drawtext_escaping():
+    assert escape_drawtext("pixventure.com") == "pixventure.com"
+    assert escape_drawtext("a:b") == "a\\\\:b"
+    assert escape_drawtext("a,b") == "a\\,b"
+
+
+def test_one_invocation_renders_every_rendition_from_one_decode():
+    options = options_from_config(dict(DEFAULT_SETTINGS, preview_video_quality=28))
+    cmd = build_render_command("/in.mov", PROBE, options, OUTPUTS)
+
+    assert cmd.count("-i") == 1
+    graph = _option(cmd, "-filter_complex")
+    assert graph.startswith("[0:v]split=2[src][thumbsrc]")
+    assert "scale=1280:720" in graph
+    assert "trim=start=30.000" in graph
+    assert "trim=duration=2.0" in graph
+    for output in OUTPUTS.values():
+        assert output in cmd
+    # The preview is encoded with its own quality, the watermarked version capped at the source bitrate.
+    watermarked = cmd[:cmd.index("/w/wm.mp4")]
+    assert _option(watermarked, "-crf") == "20" and _option(watermarked, "-maxrate") == "5000k"
+    assert _option(watermarked, "-c:a") == "copy"
+    preview = cmd[cmd.index("/w/wm.mp4"):cmd.index("/w/preview.mp4")]
+    assert _option(preview, "-crf") == "28"
+    assert "-force_key_frames" not in cmd
+
+
+def test_preview_is_stream_copied_when_quality_matches():
+    options = options_from_config(DEFAULT_SETTINGS)
+    assert preview_can_be_copied(OUTPUTS, options, PROBE.duration)
+    assert not preview_can_be_copied(OUTPUTS, options, 1.5)
+    assert not preview_can_be_copied({V.PREVIEW: "p"}, options, PROBE.duration)
+
+    cmd = build_render_command("/in.mov", PROBE, options, OUTPUTS, copy_preview=True)
+    assert "/w/preview.mp4" not in cmd
+    assert "[preview]" not in _option(cmd, "-filter_complex")
+    assert _option(cmd, "-force_key_frames") == "2.0"
+
+    copy = build_preview_copy_command("/w/wm.mp4", 2.0, "/w/preview.mp4")
+    assert _option(copy, "-c") == "copy"
+    assert _option(copy, "-t") == "2.0"
+
+
+def test_two_pass_profile_adds_an_analysis_run():
+    options = options_from_config(dict(DEFAULT_SETTINGS, watermarked_video_profile="two_pass"))
+    first = build_render_command("/in.mov", PROBE, options, OUTPUTS, passlog="/w/log", first_pass=True)
+    second = build_render_command("/in.mov", PROBE, options, OUTPUTS, passlog="/w/log")
+
+    assert _option(first, "-pass") == "1" and _option(first, "-f") == "null"
+    assert "-an" in first and "/w/thumb.png" not in first and "[preview]" not in _option(first, "-filter_complex")
+    assert _option(second, "-pass") == "2"
+    assert _option(first, "-passlogfile") == _option(second, "-passlogfile")
+    # The single-pass preview is encoded in the second run only.
+    assert second.count("-pass") == 1 and "/w/preview.mp4" in second
+
+
+def test_encode_stats_cover_every_first_pass(monkeypatch, tmp_path):
+    config = dict(DEFAULT_SETTINGS, watermarked_video_profile="two_pass", preview_video_profile="two_pass",
+                  preview_video_quality=30)
+    options = options_from_config(config)
+    children_cpu, first_passes = [0.0], []
+
+    def fake_ffmpeg(cmd):
+        # Analysis runs cost 2 CPU seconds per two-pass rendition, encodes 1 second.
+        passes = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-pass"]
+        if "1" in passes:
+            first_passes.append(cmd)
+        children_cpu[0] += 2.0 * passes.count("1") or 1.0
+
+    monkeypatch.setattr(video_pipeline, "_run", fake_ffmpeg)
+    monkeypatch.setattr(video_pipeline, "_children_cpu_seconds", lambda: children_cpu[0])
+    rendered = video_pipeline.render_video_files(
+        "/in.mov", PROBE, options, [V.WATERMARKED, V.PREVIEW, V.THUMBNAIL], str(tmp_path)
+    )
+
+    assert not rendered.preview_stream_copied
+    assert sum(cmd.count("-pass") for cmd in first_passes) == 2
+    for version_type in (V.WATERMARKED, V.PREVIEW):
+        assert rendered.encodes[version_type].profile == "two_pass"
+        # Both analyses and the shared encode.
+        assert rendered.encodes[version_type].cpu_seconds == 5.0
+
+
+def test_poster_frame_alone_seeks_the_input():
+    options = options_from_config(DEFAULT_SETTINGS)
+    cmd = build_render_command("/in.mov", PROBE, options, {V.THUMBNAIL: "/w/thumb.png"})
+    assert cmd.index("-ss") < cmd.index("-i")
+    assert "-filter_complex" not in cmd
+
+
+@pytest.mark.django_db
+def test_video_versions_are_scheduled_as_one_task(media_item_factory, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        media_version_scheduler.dispatcher, "dispatch_video_pipeline",
+        lambda media_item_id, config, regenerate: calls.append(config["allowed_versions"])
+    )
+    item = media_item_factory(media_type=MediaItem.VIDEO)
+    media_version_scheduler.schedule_versions(
+        item, dict(DEFAULT_SETTINGS), [V.WATERMARKED, V.PREVIEW, V.THUMBNAIL, V.BLURRED_PREVIEW]
+    )
+    assert calls == [[V.WATERMARKED, V.PREVIEW, V.THUMBNAIL]]
+
+
+@pytest.mark.django_db
+def test_handler_stores_every_rendition(media_item_factory, settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_UPLOAD_SPOOL_DIR = str(tmp_path / "spool")
+    settings.MEDIA_SCRATCH_RESERVE = 0
+    item = media_item_factory(media_type=MediaItem.VIDEO)
+    original = MediaItemVersion.objects.create(
+        media_item=item, version_type=V.ORIGINAL,
+        file=SimpleUploadedFile("clip.mov", b"\x00" * 1024, content_type="video/quicktime"),
+        probe=PROBE._replace(file_size=1024).to_dict()
+    )
+
+    commands = []
+
+    def fake_ffmpeg(cmd):
+        # Writes what ffmpeg would: every output path of the command.
+        commands.append(cmd)
+        for path in [arg for arg in cmd if arg.startswith(str(tmp_path)) and arg != original.file.path]:
+            if path.endswith(".png"):
+                Image.new("RGB", (300, 169)).save(path, format="PNG")
+            else:
+                with open(path, "wb") as f:
+                    f.write(b"mp4 " + path.encode())
+
+    monkeypatch.setattr(video_pipeline, "_run", fake_ffmpeg)
+    config = dict(DEFAULT_SETTINGS, allowed_versions=[V.WATERMARKED, V.PREVIEW, V.THUMBNAIL])
+    assert media_version_handlers.handle_video_derivatives(item.id, config)
+
+    # One render, plus the stream-copied preview cut.
+    assert len(commands) == 2 and "-c" in commands[1]
+    versions = {version.version_type: version for version in item.versions.all()}
+    assert set(versions) == {V.ORIGINAL, V.WATERMARKED, V.PREVIEW, V.THUMBNAIL}
+    assert (versions[V.WATERMARKED].width, versions[V.WATERMARKED].height) == (1280, 720)
+    assert versions[V.PREVIEW].video_duration == 2
+    assert versions[V.THUMBNAIL].file.name.endswith(".webp")
+    assert (versions[V.THUMBNAIL].width, versions[V.THUMBNAIL].height) == (300, 169)
+    assert not list((tmp_path / "spool" / "scratch").iterdir())
+
+    stats = {stat.media_item_version.version_type: stat for stat in VideoEncodeStat.objects.all()}
+    assert set(stats) == {V.WATERMARKED, V.PREVIEW}
+    assert stats[V.WATERMARKED].profile == "capped_crf" and not stats[V.WATERMARKED].stream_copied
+    assert stats[V.PREVIEW].stream_copied
+    assert stats[V.WATERMARKED].output_bitrate == int(versions[V.WATERMARKED].file_size * 8 / 60)
@@ -0,0 +1,58 @@
+# tests/media/test_watermark_engine.py
+
+import random
+import numpy as np
+import pytest
+from PIL import Image, ImageFont
+from django.conf import settings
+from media.services import watermark, watermark_engine
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    watermark_engine.clear_caches()
+    yield
+    watermark_engine.clear_caches()
+
+
+def _incremental_font_size(text, max_width):
+    # The previous algorithm: one font load per point from 5pt up.
+    size = 5
+    font = ImageFont.truetype(settings.FONT_LOCATION, size)
+    while font.getbbox(text)[2] < max_width:
+        size += 1
+        font = ImageFont.truetype(settings.FONT_LOCATION, size)
+    return max(1, size - 1)
+
+
+@pytest.mark.parametrize("max_width", [1, 30, 147, 500, 1184, 2613])
+def test_fit_font_size_matches_incremental_search(max_width):
+    assert watermark_engine.fit_font_size("sample.com", max_width) == _incremental_font_size("sample.com", max_width)
+
+
+def test_fonts_and_stamps_are_cached():
+    assert watermark_engine.get_font(40) is watermark_engine.get_font(40)
+    stamp = watermark_engine.get_text_stamp("sample.com", 40, (255, 255, 255, 80))
+    assert stamp is watermark_engine.get_text_stamp("sample.com", 40, [255, 255, 255, 80])
+    assert stamp.mode == "RGBA"
+    assert stamp.getbbox() is not None
+
+
+def test_mean_luminance_matches_pillow_luma():
+    pixels = np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    expected = np.asarray(image.convert("L"), dtype=np.float64).mean()
+    assert watermark_engine.mean_luminance(image) == pytest.approx(expected, abs=0.6)
+    assert watermark_engine.mean_luminance(image.convert("L")) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("background, text_value", [((20, 20, 20), 255), ((230, 230, 230), 0)])
+def test_watermark_contrasts_with_background(background, text_value):
+    random.seed(3)
+    image = Image.new("RGB", (1500, 1000), background)
+    result = watermark.render_full_watermarked(image, watermark_transparency=255)
+    changed = np.argwhere(np.asarray(result) != np.asarray(image))
+    assert len(changed) > 0
+    # Fully opaque text: the darkest/lightest pixel is the text colour itself.
+    values = np.asarray(result)[changed[:, 0], changed[:, 1]]
+    assert (values == text_value).all(axis=1).any()
@@ -0,0 +1,60 @@
+# tests/memberships/test_entitlements.py
+
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from memberships.models import MembershipPlan, UserMembership
+from memberships.manager import MembershipManager
+from memberships.utils import check_if_user_is_paying
+
+User = get_user_model()
+
+
+@pytest.fixture
+def plan():
+    return MembershipPlan.objects.create(name="Monthly", duration_days=30, price=Decimal("10.00"))
+
+
+@pytest.mark.django_db
+def test_entitlement_resolved_once_per_request_and_cached(user_factory, plan):
+    user = user_factory()
+    UserMembership.objects.create(user=user, plan=plan)
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert check_if_user_is_paying(user) is True
+        assert check_if_user_is_paying(user) is True
+    assert len(ctx.captured_queries) == 1
+
+    # A new request authenticates a fresh user instance; the shared cache serves it.
+    fresh_user = User.objects.get(pk=user.pk)
+    with CaptureQueriesContext(connection) as ctx:
+        assert check_if_user_is_paying(fresh_user) is True
+    assert len(ctx.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_expired_membership_is_not_paying(user_factory, plan):
+    user = user_factory()
+    UserMembership.objects.create(
+        user=user,
+        plan=plan,
+        end_date=timezone.now() - timedelta(days=1),
+    )
+    assert check_if_user_is_paying(user) is False
+
+
+@pytest.mark.django_db
+def test_create_membership_invalidates_cached_entitlement(user_factory, plan, django_capture_on_commit_callbacks):
+    user = user_factory()
+    assert check_if_user_is_paying(user) is False
+
+    with django_capture_on_commit_callbacks(execute=True):
+        MembershipManager().create_membership(User.objects.get(pk=user.pk), plan)
+
+    fresh_user = User.objects.get(pk=user.pk)
+    assert check_if_user_is_paying(fresh_user) is True
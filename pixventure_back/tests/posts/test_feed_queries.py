@@ -0,0 +1,118 @@
+# tests/posts/test_feed_queries.py
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from taxonomy.models import Term
+from media.models import MediaItem, MediaItemVersion
+from posts.models import Post, PostMedia
+from social.models import Like
+from memberships.entitlements import invalidate_entitlement
+from social.like_state import invalidate_liked_ids
+
+# Pagination COUNT + page query + featured versions prefetch
+# + liked-set load + paying flag lookup, both on a cold cache
+# (+ term lookup on category/tag feeds).
+FEED_QUERY_BUDGET = 6
+
+
+def _create_published_posts(count, owner, category, tag, media_item_factory):
+    posts = []
+    for i in range(count):
+        featured = media_item_factory(owner=owner, status=MediaItem.PUBLISHED)
+        MediaItemVersion.objects.create(
+            media_item=featured,
+            version_type=MediaItemVersion.THUMBNAIL,
+            file=f"thumbnail/thumb_{featured.pk}.webp",
+            width=300,
+            height=200,
+        )
+        video = media_item_factory(owner=owner, media_type=MediaItem.VIDEO, status=MediaItem.PUBLISHED)
+        post = Post.objects.create(
+            owner=owner,
+            name=f"Feed post {i}",
+            slug=f"feed-post-{i}",
+            text="searchable",
+            main_category=category,
+            featured_item=featured,
+            status=Post.PUBLISHED,
+            published=timezone.now(),
+            is_featured_post=True,
+        )
+        post.terms.add(category, tag)
+        PostMedia.objects.create(post=post, media_item=featured, position=0)
+        PostMedia.objects.create(post=post, media_item=video, position=1)
+        posts.append(post)
+    return posts
+
+
+def _feed_urls(category, tag):
+    return [
+        reverse('post-public-list'),
+        reverse('featured-posts-list'),
+        reverse('category-posts-list', kwargs={'slug': category.slug}),
+        reverse('tag-posts-list', kwargs={'slug': tag.slug}),
+        reverse('search-basic') + '?q=searchable',
+    ]
+
+
+@pytest.mark.django_db
+class TestFeedQueryBudget:
+
+    def _count_queries(self, client, url, user):
+        # Measure every feed with cold entitlement and like caches.
+        invalidate_entitlement(user)
+        invalidate_liked_ids(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        assert response.status_code == 200, response.data
+        return len(ctx.captured_queries), response.json()
+
+    def test_feeds_run_in_constant_queries(self, user_factory, media_item_factory, term_factory):
+        owner = user_factory()
+        viewer = user_factory()
+        category = term_factory(term_type=Term.CATEGORY)
+        tag = term_factory(term_type=Term.TAG)
+
+        client = APIClient()
+        client.force_authenticate(user=viewer)
+
+        posts = _create_published_posts(2, owner, category, tag, media_item_factory)
+        small_counts = {url: self._count_queries(client, url, viewer)[0] for url in _feed_urls(category, tag)}
+
+        posts += _create_published_posts(12, owner, category, tag, media_item_factory)
+        Like.objects.create(liking_user=viewer, post=posts[0], is_active=True)
+
+        for url in _feed_urls(category, tag):
+            large_count, data = self._count_queries(client, url, viewer)
+            assert large_count == small_counts[url], (
+                f"{url}: query count grew with page size ({small_counts[url]} -> {large_count})"
+            )
+            assert large_count <= FEED_QUERY_BUDGET, f"{url}: {large_count} queries exceeds budget"
+            assert len(data["results"]) == 14
+
+    def test_feed_payload_uses_preloaded_values(self, user_factory, media_item_factory, term_factory):
+        owner = user_factory()
+        viewer = user_factory()
+        category = term_factory(term_type=Term.CATEGORY)
+        tag = term_factory(term_type=Term.TAG)
+        posts = _create_published_posts(2, owner, category, tag, media_item_factory)
+        Like.objects.create(liking_user=viewer, post=posts[1], is_active=True)
+
+        client = APIClient()
+        client.force_authenticate(user=viewer)
+        data = client.get(reverse('post-public-list')).json()
+
+        by_id = {row["id"]: row for row in data["results"]}
+        assert by_id[posts[1].pk]["has_liked"] is True
+        assert by_id[posts[0].pk]["has_liked"] is False
+        for row in data["results"]:
+            assert row["images_count"] == 1
+            assert row["videos_count"] == 1
+            assert row["thumbnail_url"].endswith(".webp")
+            assert row["tile_size"] == "small"
+            assert row["owner_username"] == owner.username
+            assert row["main_category_slug"] == category.slug
@@ -0,0 +1,84 @@
+# tests/posts/test_keyset_pagination.py
+
+import pytest
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from posts.models import Post
+from taxonomy.models import Term
+
+POST_COUNT = 45
+
+
+@pytest.fixture
+def published_posts(user_factory, term_factory):
+    owner = user_factory()
+    category = term_factory(term_type=Term.CATEGORY)
+    base = timezone.now()
+    posts = []
+    for i in range(POST_COUNT):
+        posts.append(Post.objects.create(
+            owner=owner,
+            name=f"Post {i}",
+            slug=f"post-{i}",
+            main_category=category,
+            status=Post.PUBLISHED,
+            # Pairs of posts share a timestamp, so ties are broken by id.
+            published=base - timedelta(minutes=i // 2),
+        ))
+    return posts
+
+
+def _expected_order(posts):
+    return [p.pk for p in sorted(posts, key=lambda p: (p.published, p.pk), reverse=True)]
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+
+    def test_walks_feed_forwards_and_backwards(self, published_posts):
+        client = APIClient()
+        url = reverse('post-public-list') + '?pagination=cursor'
+        pages = []
+        while url:
+            data = client.get(url).json()
+            assert 'total_pages' not in data
+            pages.append(data)
+            url = data['next']
+
+        seen = [row['id'] for page in pages for row in page['results']]
+        assert seen == _expected_order(published_posts)
+        assert [len(page['results']) for page in pages] == [20, 20, 5]
+        assert pages[0]['previous'] is None
+
+        previous = client.get(pages[2]['previous']).json()
+        assert previous['results'] == pages[1]['results']
+        assert previous['next'] is not None
+
+    def test_cursor_pages_skip_count_query(self, published_posts):
+        client = APIClient()
+        first = client.get(reverse('post-public-list') + '?pagination=cursor').json()
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(first['next'])
+        assert not any(q['sql'].upper().startswith('SELECT COUNT(') for q in ctx.captured_queries)
+
+    def test_approximate_count_is_cached(self, published_posts):
+        client = APIClient()
+        url = reverse('post-public-list') + '?pagination=cursor&with_count=true'
+        assert client.get(url).json()['count'] == POST_COUNT
+        Post.objects.filter(pk=published_posts[0].pk).update(status=Post.DRAFT)
+        assert client.get(url).json()['count'] == POST_COUNT
+
+    def test_page_number_mode_is_unchanged(self, published_posts):
+        data = APIClient().get(reverse('post-public-list') + '?page=2').json()
+        assert data['count'] == POST_COUNT
+        assert data['total_pages'] == 3
+        assert data['current_page'] == 2
+        assert [row['id'] for row in data['results']] == _expected_order(published_posts)[20:40]
+
+    def test_invalid_cursor_returns_404(self, published_posts):
+        response = APIClient().get(reverse('post-public-list') + '?cursor=not-a-cursor')
+        assert response.status_code == 404
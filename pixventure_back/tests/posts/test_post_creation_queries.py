@@ -0,0 +1,68 @@
+# tests/posts/test_post_creation_queries.py
+"""
+Micro-benchmark: Setting queries issued while creating a post with 50 media items.
+
+Run with `pytest -s tests/posts/test_post_creation_queries.py` to see the report.
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from main.default_settings_config import DEFAULT_SETTINGS
+from main.models import Setting
+from main.providers.settings_provider import SettingsProvider
+from posts.managers.post_creation_manager import PostCreationManager
+from taxonomy.models import Term
+
+ITEM_COUNT = 50
+
+
+def _legacy_get_all_settings():
+    # The previous implementation: one query per key.
+    settings = {}
+    for key, default in DEFAULT_SETTINGS.items():
+        try:
+            settings[key] = Setting.objects.get(key=key).value
+        except Setting.DoesNotExist:
+            settings[key] = default
+    return settings
+
+
+def _setting_queries(ctx):
+    return len([q for q in ctx.captured_queries if "main_setting" in q["sql"]])
+
+
+@pytest.mark.django_db
+def test_post_creation_loads_settings_once(user_factory, media_item_factory, term_factory, monkeypatch):
+    user = user_factory()
+    items = [media_item_factory(owner=user) for _ in range(ITEM_COUNT)]
+    category = term_factory(term_type=Term.CATEGORY)
+    data = {
+        "name": "Benchmark post",
+        "featured_item": items[0].id,
+        "items": [item.id for item in items],
+        "terms": [category.id],
+    }
+
+    provider_calls = []
+    original = SettingsProvider.get_snapshot.__func__
+
+    def counting_get_snapshot(cls):
+        provider_calls.append(1)
+        return original(cls)
+
+    monkeypatch.setattr(SettingsProvider, "get_snapshot", classmethod(counting_get_snapshot))
+
+    with CaptureQueriesContext(connection) as ctx:
+        PostCreationManager.create_post(data, user)
+    after = _setting_queries(ctx)
+
+    with CaptureQueriesContext(connection) as legacy_ctx:
+        _legacy_get_all_settings()
+    # Every provider call used to run the legacy per-key lookup (or one query for get_setting).
+    before = len(provider_calls) * _setting_queries(legacy_ctx)
+
+    summary = (f"{ITEM_COUNT}-item post creation: {len(provider_calls)} settings lookups, "
+               f"Setting queries before ~{before}, after {after}")
+    assert after == 1, summary
+    assert before > after, summary
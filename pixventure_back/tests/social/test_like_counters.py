@@ -0,0 +1,290 @@
+# tests/social/test_like_counters.py
+
+import random
+import threading
+import time
+import pytest
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from accounts.models import UserProfile
+from media.models import MediaItem
+from posts.models import Post
+from social import counters
+from social.counters import InMemoryCounterBuffer, RedisCounterBuffer, flush_buffered_deltas
+from social.models import Like
+from social.utils import toggle_like
+from taxonomy.models import Term
+
+
+@pytest.fixture(autouse=True)
+def fresh_buffer():
+    counters._buffer = None
+    yield
+    counters._buffer = None
+
+
+@pytest.mark.django_db
+def test_atomic_mode_updates_counter_in_place(user_factory, media_item_factory):
+    item = media_item_factory()
+    users = [user_factory() for _ in range(3)]
+
+    for user in users:
+        toggle_like(user, 'media', item.pk, like=True)
+    toggle_like(users[0], 'media', item.pk, like=True)  # Already liked: no change.
+    toggle_like(users[1], 'media', item.pk, like=False)
+
+    item.refresh_from_db()
+    assert item.likes_counter == 2
+
+
+@pytest.mark.django_db
+def test_counter_never_goes_negative(media_item_factory):
+    item = media_item_factory()
+    counters.apply_delta('media', [item.pk], -5)
+    item.refresh_from_db()
+    assert item.likes_counter == 0
+
+
+@pytest.mark.django_db
+def test_user_likes_are_counted_on_profile(user_factory):
+    liker, liked = user_factory(), user_factory()
+    toggle_like(liker, 'user', liked.pk, like=True)
+    assert UserProfile.objects.get(user=liked).likes_counter == 1
+
+
+@pytest.mark.django_db
+def test_write_behind_buffers_until_flush(settings, user_factory, media_item_factory,
+                                          django_capture_on_commit_callbacks):
+    settings.LIKE_COUNTER_MODE = counters.WRITE_BEHIND
+    counters._buffer = InMemoryCounterBuffer()
+    item = media_item_factory()
+    users = [user_factory() for _ in range(4)]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for user in users:
+            toggle_like(user, 'media', item.pk, like=True)
+        toggle_like(users[0], 'media', item.pk, like=False)
+
+    item.refresh_from_db()
+    assert item.likes_counter == 0
+
+    assert flush_buffered_deltas() == 1
+    item.refresh_from_db()
+    assert item.likes_counter == 3
+    assert flush_buffered_deltas() == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_without_redis_falls_back_to_atomic(settings, user_factory, media_item_factory):
+    # The test cache is locmem: an in-process buffer would never reach the flush task.
+    settings.LIKE_COUNTER_MODE = counters.WRITE_BEHIND
+    item = media_item_factory()
+    toggle_like(user_factory(), 'media', item.pk, like=True)
+
+    item.refresh_from_db()
+    assert item.likes_counter == 1
+    assert counters.get_buffer() is None and flush_buffered_deltas() == 0
+
+
+def test_buffer_loses_no_deltas_under_concurrency():
+    buffer = InMemoryCounterBuffer()
+    threads, per_thread = 16, 2000
+    drained = []
+
+    def worker():
+        for i in range(per_thread):
+            buffer.add('post', i % 7, 1)
+
+    def drainer():
+        for _ in range(50):
+            drained.append(buffer.drain())
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    flusher = threading.Thread(target=drainer)
+    for thread in workers + [flusher]:
+        thread.start()
+    for thread in workers + [flusher]:
+        thread.join()
+    drained.append(buffer.drain())
+
+    total = sum(delta for batch in drained for delta in batch.values())
+    assert total == threads * per_thread
+
+
+def _locked(error):
+    while error is not None:
+        if isinstance(error, OperationalError) and "locked" in str(error):
+            return True
+        error = error.__context__
+    return False
+
+
+def _in_thread(fn):
+    """
+    Runs fn on the thread's own connection. SQLite (the test database) refuses a
+    statement that would have to wait on another writer's lock ("database table
+    is locked", possibly wrapped by toggle_like): the transaction was rolled back
+    whole, so it is retried.
+    """
+    try:
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not _locked(e):
+                    raise
+                time.sleep(random.uniform(0, 0.01))
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("mode", [counters.ATOMIC, counters.WRITE_BEHIND])
+def test_concurrent_likes_on_one_post_are_all_counted(mode, settings, user_factory, term_factory):
+    settings.LIKE_COUNTER_MODE = mode
+    if mode == counters.WRITE_BEHIND:
+        counters._buffer = InMemoryCounterBuffer()
+    post = Post.objects.create(
+        name="Hot", slug="hot", status=Post.PUBLISHED, main_category=term_factory(term_type=Term.CATEGORY)
+    )
+    users = [user_factory() for _ in range(12)]
+    unlikers = users[::3]
+    done = threading.Event()
+
+    def like(user):
+        _in_thread(lambda: toggle_like(user, 'post', post.pk, like=True))
+        if user in unlikers:
+            _in_thread(lambda: toggle_like(user, 'post', post.pk, like=False))
+
+    def flusher():
+        # Write-behind: flushes run while likes are being recorded.
+        while not done.is_set():
+            _in_thread(flush_buffered_deltas)
+
+    threads = [threading.Thread(target=like, args=(user,)) for user in users]
+    flushing = threading.Thread(target=flusher)
+    for thread in threads + [flushing]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    flushing.join()
+    flush_buffered_deltas()
+
+    post.refresh_from_db()
+    assert post.likes_counter == len(users) - len(unlikers)
+    assert Like.objects.filter(post=post, is_active=True).count() == post.likes_counter
+
+
+class _HashStore:
+    """
+    The few Redis hash commands RedisCounterBuffer uses (no Redis server in tests).
+    """
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hincrby(self, key, field, delta):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = fields.get(field.encode(), 0) + delta
+
+    def renamenx(self, key, new_key):
+        from redis.exceptions import ResponseError
+        if key not in self.hashes:
+            raise ResponseError("no such key")
+        if new_key in self.hashes:
+            return False
+        self.hashes[new_key] = self.hashes.pop(key)
+        return True
+
+    def pipeline(self):
+        store, commands = self, []
+
+        class Pipeline:
+            def hgetall(self, key):
+                commands.append(lambda: dict(store.hashes.get(key, {})))
+
+            def delete(self, key):
+                commands.append(lambda: int(store.hashes.pop(key, None) is not None))
+
+            def execute(self):
+                return [command() for command in commands]
+
+        return Pipeline()
+
+
+def test_redis_drain_keeps_deltas_of_a_crashed_flush():
+    store = _HashStore()
+    buffer = RedisCounterBuffer(shard_count=1, redis=store)
+    buffer.add('post', 1, 3)
+    # A flush renamed the shard away, then died before reading it.
+    store.renamenx("social:like_deltas:0", "social:like_deltas:0:flushing")
+    buffer.add('post', 1, 2)
+    buffer.add('post', 2, 1)
+
+    assert buffer.drain() == {'post:1': 3}
+    assert buffer.drain() == {'post:1': 2, 'post:2': 1}
+    assert buffer.drain() == {} and store.hashes == {}
+
+
+@pytest.mark.django_db
+def test_reconcile_fixes_drifted_counters(user_factory, media_item_factory):
+    item, other = media_item_factory(), media_item_factory()
+    for _ in range(3):
+        Like.objects.create(liking_user=user_factory(), media_item=item)
+    Like.objects.create(liking_user=user_factory(), media_item=item, is_active=False)
+    MediaItem.objects.filter(pk=other.pk).update(likes_counter=9)
+
+    call_command('reconcile_like_counters', '--type', 'media', '--dry-run')
+    item.refresh_from_db()
+    assert item.likes_counter == 0
+
+    call_command('reconcile_like_counters', '--type', 'media')
+    item.refresh_from_db()
+    other.refresh_from_db()
+    assert item.likes_counter == 3
+    assert other.likes_counter == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_does_not_count_buffered_likes_twice(settings, monkeypatch, user_factory, media_item_factory,
+                                                      django_capture_on_commit_callbacks):
+    from social.management.commands import reconcile_like_counters
+
+    settings.LIKE_COUNTER_MODE = counters.WRITE_BEHIND
+    counters._buffer = InMemoryCounterBuffer()
+    item, liked_user = media_item_factory(), user_factory()
+    with django_capture_on_commit_callbacks(execute=True):
+        toggle_like(user_factory(), 'media', item.pk, like=True)
+        toggle_like(user_factory(), 'user', liked_user.pk, like=True)
+
+    # A like committed while the command runs, before its recount.
+    subquery = reconcile_like_counters.active_likes_subquery
+
+    def like_then_count(target_type, target_field):
+        with django_capture_on_commit_callbacks(execute=True):
+            toggle_like(user_factory(), 'media', item.pk, like=True)
+        return subquery(target_type, target_field)
+
+    monkeypatch.setattr(reconcile_like_counters, 'active_likes_subquery', like_then_count)
+    call_command('reconcile_like_counters', '--type', 'media')
+    flush_buffered_deltas()
+
+    item.refresh_from_db()
+    assert item.likes_counter == 2
+    # Deltas of types not reconciled are applied, not dropped.
+    assert UserProfile.objects.get(user=liked_user).likes_counter == 1
+
+
+@pytest.mark.django_db
+def test_flush_is_skipped_while_the_lock_is_held(media_item_factory):
+    counters._buffer = InMemoryCounterBuffer()
+    item = media_item_factory()
+    counters._buffer.add('media', item.pk, 1)
+
+    with counters.flush_lock() as acquired:
+        assert acquired
+        assert flush_buffered_deltas() == 0  # Skipped: deltas stay buffered.
+    assert flush_buffered_deltas() == 1
+    item.refresh_from_db()
+    assert item.likes_counter == 1
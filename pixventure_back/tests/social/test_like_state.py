@@ -0,0 +1,103 @@
+# tests/social/test_like_state.py
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from media.models import MediaItem
+from social import like_state
+from social.like_state import MEDIA, get_liked_ids
+from social.models import Like
+from social.utils import toggle_like, user_has_liked
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_page_resolved_from_cached_set(user_factory, media_item_factory):
+    user = user_factory()
+    items = [media_item_factory() for _ in range(5)]
+    for item in items[:2]:
+        Like.objects.create(liking_user=user, media_item=item)
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_liked_ids(user, MEDIA, [i.pk for i in items]) == {items[0].pk, items[1].pk}
+    assert len(ctx.captured_queries) == 1
+
+    # A later request (fresh user instance) is served by the shared cache.
+    fresh_user = User.objects.get(pk=user.pk)
+    with CaptureQueriesContext(connection) as ctx:
+        assert user_has_liked(fresh_user, media_item=items[0]) is True
+        assert user_has_liked(fresh_user, media_item=items[4]) is False
+    assert len(ctx.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_toggle_like_updates_cached_set(user_factory, media_item_factory, django_capture_on_commit_callbacks):
+    user = user_factory()
+    item = media_item_factory()
+    assert get_liked_ids(user, MEDIA, [item.pk]) == set()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        toggle_like(user, 'media', item.pk, like=True)
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_liked_ids(User.objects.get(pk=user.pk), MEDIA, [item.pk]) == {item.pk}
+    assert len(ctx.captured_queries) == 1  # the user lookup only
+
+    with django_capture_on_commit_callbacks(execute=True):
+        toggle_like(user, 'media', item.pk, like=False)
+    assert get_liked_ids(User.objects.get(pk=user.pk), MEDIA, [item.pk]) == set()
+
+
+@pytest.mark.django_db
+def test_set_loaded_before_a_like_commits_is_not_served(user_factory, media_item_factory, monkeypatch,
+                                                       django_capture_on_commit_callbacks):
+    user = user_factory()
+    item = media_item_factory()
+    load_packed = like_state._load_packed
+
+    def load_then_like(reader, target_type):
+        # The reader has loaded the old set when the like commits and updates the cache.
+        packed = load_packed(reader, target_type)
+        with django_capture_on_commit_callbacks(execute=True):
+            toggle_like(user, 'media', item.pk, like=True)
+        return packed
+
+    monkeypatch.setattr(like_state, "_load_packed", load_then_like)
+    assert get_liked_ids(User.objects.get(pk=user.pk), MEDIA, [item.pk]) == set()
+    monkeypatch.setattr(like_state, "_load_packed", load_packed)
+
+    # The stale set written last is stamped with the old version and reloaded.
+    assert get_liked_ids(User.objects.get(pk=user.pk), MEDIA, [item.pk]) == {item.pk}
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_liked_ids(User.objects.get(pk=user.pk), MEDIA, [item.pk]) == {item.pk}
+    assert len(ctx.captured_queries) == 1  # the user lookup only
+
+
+@pytest.mark.django_db
+def test_heavy_likers_fall_back_to_page_query(user_factory, media_item_factory, monkeypatch):
+    monkeypatch.setattr(like_state, "MAX_CACHED_LIKES", 2)
+    user = user_factory()
+    items = [media_item_factory() for _ in range(4)]
+    for item in items[:3]:
+        Like.objects.create(liking_user=user, media_item=item)
+
+    assert get_liked_ids(user, MEDIA, [items[0].pk, items[3].pk]) == {items[0].pk}
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_liked_ids(user, MEDIA, [items[2].pk]) == {items[2].pk}
+    assert len(ctx.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_media_list_has_liked_uses_context(user_factory, media_item_factory):
+    user = user_factory()
+    items = [media_item_factory(owner=user, status=MediaItem.PUBLISHED) for _ in range(6)]
+    Like.objects.create(liking_user=user, media_item=items[2])
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    data = client.get(reverse('media-item-list')).json()
+    liked = {row['id'] for row in data['results'] if row['has_liked']}
+    assert liked == {items[2].pk}